@@ -0,0 +1,282 @@
+"""fold_startup_schema_checks
+
+把原先应用启动时 _check_and_update_schema 中的 create_all 与补列/改名逻辑固化为迁移。
+所有操作都先检查现状，既能用于按迁移链新建的库，也能用于由 create_all 建成、
+被启动检查改动过的旧库（旧库会先被标记到 6215500199ca 再升级）。
+
+Revision ID: 34a053b8c4a6
+Revises: 8b2d4e6f1a93
+Create Date: 2026-10-19 05:33:48.119934
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '34a053b8c4a6'
+down_revision: Union[str, None] = '8b2d4e6f1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _columns(table: str) -> set:
+    return {column['name'] for column in _inspector().get_columns(table)}
+
+
+def _indexes(table: str) -> set:
+    return {index['name'] for index in _inspector().get_indexes(table)}
+
+
+def _has_table(table: str) -> bool:
+    return _inspector().has_table(table)
+
+
+def _create_tables() -> None:
+    """迁移链之外、原先只由 create_all 创建的表"""
+    if not _has_table('journals'):
+        op.create_table('journals',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('publisher', sa.String(length=255), nullable=True),
+        sa.Column('issn', sa.String(length=20), nullable=True),
+        sa.Column('impact_factor', sa.Float(), nullable=True),
+        sa.Column('h_index', sa.Integer(), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('website', sa.String(length=255), nullable=True),
+        sa.Column('abbreviation', sa.String(length=50), nullable=True),
+        sa.Column('ranking', sa.String(length=50), nullable=True),
+        sa.Column('category', sa.String(length=100), nullable=True),
+        sa.Column('url', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if not _has_table('projects'):
+        op.create_table('projects',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('is_public', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_projects_id'), 'projects', ['id'], unique=False)
+    if not _has_table('search_histories'):
+        op.create_table('search_histories',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('query', sa.String(length=255), nullable=False, comment='搜索查询内容'),
+        sa.Column('result_info', sa.Text(), nullable=True, comment='搜索结果信息摘要'),
+        sa.Column('doi', sa.String(length=255), nullable=True, comment='DOI标识符'),
+        sa.Column('url', sa.String(length=512), nullable=True, comment='结果URL'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_search_histories_id'), 'search_histories', ['id'], unique=False)
+    if not _has_table('user_activities'):
+        op.create_table('user_activities',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('activity_type', sa.String(length=50), nullable=False, comment='操作类型，如search, download等'),
+        sa.Column('content', sa.Text(), nullable=False, comment='操作内容描述'),
+        sa.Column('activity_metadata', sa.Text(), nullable=True, comment='额外的元数据，如DOI、URL等'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_user_activities_id'), 'user_activities', ['id'], unique=False)
+        op.create_index('ix_user_activities_user_created', 'user_activities', ['user_id', 'created_at'], unique=False)
+    if not _has_table('user_interests'):
+        op.create_table('user_interests',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('concept_id', sa.Integer(), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['concept_id'], ['concepts.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_user_interests_user_concept', 'user_interests', ['user_id', 'concept_id'], unique=False)
+    if not _has_table('citations'):
+        op.create_table('citations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('paper_id', sa.Integer(), nullable=False),
+        sa.Column('cited_paper_id', sa.Integer(), nullable=False),
+        sa.Column('citation_text', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['cited_paper_id'], ['papers.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_citations_id'), 'citations', ['id'], unique=False)
+    if not _has_table('latest_papers'):
+        op.create_table('latest_papers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('journal_id', sa.Integer(), nullable=True),
+        sa.Column('paper_id', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(length=500), nullable=True),
+        sa.Column('authors', sa.String(length=1000), nullable=True),
+        sa.Column('abstract', sa.Text(), nullable=True),
+        sa.Column('url', sa.String(length=500), nullable=True),
+        sa.Column('doi', sa.String(length=100), nullable=True),
+        sa.Column('publish_date', sa.DateTime(), nullable=True),
+        sa.Column('publication_date', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['journal_id'], ['journals.id'], ),
+        sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_latest_papers_created', 'latest_papers', ['created_at'], unique=False)
+    if not _has_table('paper_tag'):
+        op.create_table('paper_tag',
+        sa.Column('paper_id', sa.Integer(), nullable=False),
+        sa.Column('tag_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ),
+        sa.ForeignKeyConstraint(['tag_id'], ['tags.id'], ),
+        sa.PrimaryKeyConstraint('paper_id', 'tag_id')
+        )
+        # 初始迁移建的是 paper_tags，模型使用 paper_tag，迁移已有关联
+        if _has_table('paper_tags'):
+            op.execute("INSERT INTO paper_tag (paper_id, tag_id) SELECT DISTINCT paper_id, tag_id FROM paper_tags")
+    if not _has_table('project_paper'):
+        op.create_table('project_paper',
+        sa.Column('project_id', sa.Integer(), nullable=False),
+        sa.Column('paper_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ),
+        sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ),
+        sa.PrimaryKeyConstraint('project_id', 'paper_id')
+        )
+
+
+# 需要补齐的列（表 -> 列定义），新增列一律允许为空，避免已有数据行违反约束
+MISSING_COLUMNS = {
+    'papers': [
+        sa.Column('doi', sa.String(length=100), nullable=True),
+        sa.Column('arxiv_id', sa.String(length=50), nullable=True),
+        sa.Column('url', sa.String(length=500), nullable=True),
+        sa.Column('publication_date', sa.DateTime(), nullable=True),
+        sa.Column('venue', sa.String(length=255), nullable=True),
+        sa.Column('journal_id', sa.Integer(), nullable=True),
+        sa.Column('citation_count', sa.Integer(), nullable=True),
+        sa.Column('reference_count', sa.Integer(), nullable=True),
+        sa.Column('is_public', sa.Boolean(), nullable=True),
+        sa.Column('source', sa.String(length=255), nullable=True),
+        sa.Column('project_id', sa.Integer(), nullable=True),
+        sa.Column('journal', sa.String(length=255), nullable=True),
+        sa.Column('year', sa.Integer(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ],
+    'reading_history': [
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ],
+    'recommendations': [
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    ],
+    'tags': [
+        sa.Column('description', sa.String(length=200), nullable=True),
+    ],
+    'users': [
+        sa.Column('fullname', sa.String(length=100), nullable=True),
+        sa.Column('avatar_url', sa.String(length=255), nullable=True),
+        sa.Column('bio', sa.Text(), nullable=True),
+        sa.Column('last_login', sa.DateTime(), nullable=True),
+        sa.Column('first_name', sa.String(length=50), nullable=True),
+        sa.Column('last_name', sa.String(length=50), nullable=True),
+    ],
+    'concepts': [
+        sa.Column('category', sa.Integer(), server_default=sa.text('0'), nullable=True),
+    ],
+    'latest_papers': [
+        sa.Column('doi', sa.String(length=100), nullable=True),
+        sa.Column('title', sa.String(length=500), nullable=True),
+        sa.Column('authors', sa.String(length=1000), nullable=True),
+        sa.Column('abstract', sa.Text(), nullable=True),
+        sa.Column('url', sa.String(length=500), nullable=True),
+    ],
+}
+
+
+def _migrate_legacy_users() -> None:
+    """旧版 users 表：password -> hashed_password，avatar -> avatar_url，拼接 fullname"""
+    columns = _columns('users')
+    if 'password' in columns and 'hashed_password' not in columns:
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.alter_column('password', new_column_name='hashed_password',
+                                  existing_type=sa.String(length=255))
+    elif 'hashed_password' not in columns:
+        op.add_column('users', sa.Column('hashed_password', sa.String(length=255), nullable=True))
+
+    columns = _columns('users')
+    if 'avatar' in columns and 'avatar_url' not in columns:
+        op.add_column('users', sa.Column('avatar_url', sa.String(length=255), nullable=True))
+        op.execute("UPDATE users SET avatar_url = avatar")
+    if 'fullname' not in columns:
+        op.add_column('users', sa.Column('fullname', sa.String(length=100), nullable=True))
+        if 'first_name' in columns and 'last_name' in columns:
+            op.execute(
+                "UPDATE users SET fullname = TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '')) "
+                "WHERE TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '')) != ''"
+            )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _create_tables()
+    _migrate_legacy_users()
+
+    # 旧库的 pdf_path 复制到 file_path
+    paper_columns = _columns('papers')
+    if 'pdf_path' in paper_columns and 'file_path' not in paper_columns:
+        op.add_column('papers', sa.Column('file_path', sa.String(length=500), nullable=True))
+        op.execute("UPDATE papers SET file_path = pdf_path")
+
+    for table, columns in MISSING_COLUMNS.items():
+        if not _has_table(table):
+            continue
+        existing = _columns(table)
+        for column in columns:
+            if column.name not in existing:
+                op.add_column(table, column.copy())
+
+    indexes = {
+        'papers': [('ix_papers_arxiv_id', ['arxiv_id'], False), ('ix_papers_doi', ['doi'], True)],
+        'tags': [('ix_tags_name', ['name'], True)],
+        'users': [('ix_users_email', ['email'], True), ('ix_users_username', ['username'], True)],
+        'concepts': [('ix_concepts_name', ['name'], True)],
+    }
+    bind = op.get_bind()
+    for table, table_indexes in indexes.items():
+        existing = _indexes(table)
+        for name, columns, unique in table_indexes:
+            if name in existing:
+                continue
+            if unique:
+                # 旧数据存在重复值时无法建唯一索引，跳过（仍由应用层去重）
+                column_list = ", ".join(columns)
+                duplicates = bind.execute(sa.text(
+                    f"SELECT 1 FROM {table} WHERE {columns[0]} IS NOT NULL "
+                    f"GROUP BY {column_list} HAVING COUNT(*) > 1 LIMIT 1"
+                )).first()
+                if duplicates:
+                    continue
+            op.create_index(name, table, columns, unique=unique)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 本迁移只做补齐，降级不删除数据与列
+    pass
@@ -0,0 +1,57 @@
+"""add_paper_neighbors_table
+
+Revision ID: 3f1c9a7d2b54
+Revises: 6215500199ca
+Create Date: 2026-10-19 10:12:41.503217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2b54'
+down_revision: Union[str, None] = '6215500199ca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 由 create_all 建成的旧库中可能已存在
+    if sa.inspect(op.get_bind()).has_table('paper_neighbors'):
+        return
+    # 论文相似近邻表
+    op.create_table('paper_neighbors',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('paper_id', sa.Integer(), nullable=False),
+    sa.Column('neighbor_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('shared_concepts', sa.Integer(), nullable=True),
+    sa.Column('concept_similarity', sa.Float(), nullable=True),
+    sa.Column('title_similarity', sa.Float(), nullable=True),
+    sa.Column('author_similarity', sa.Float(), nullable=True),
+    sa.Column('venue_similarity', sa.Float(), nullable=True),
+    sa.Column('year_similarity', sa.Float(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['neighbor_id'], ['papers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_paper_neighbors_id'), 'paper_neighbors', ['id'], unique=False)
+    op.create_index('ix_paper_neighbors_paper_score', 'paper_neighbors', ['paper_id', 'score'], unique=False)
+    op.create_index('ix_paper_neighbors_neighbor', 'paper_neighbors', ['neighbor_id'], unique=False)
+    op.create_index('ix_paper_neighbors_user', 'paper_neighbors', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_paper_neighbors_user', table_name='paper_neighbors')
+    op.drop_index('ix_paper_neighbors_neighbor', table_name='paper_neighbors')
+    op.drop_index('ix_paper_neighbors_paper_score', table_name='paper_neighbors')
+    op.drop_index(op.f('ix_paper_neighbors_id'), table_name='paper_neighbors')
+    op.drop_table('paper_neighbors')
@@ -0,0 +1,101 @@
+"""add_full_text_search_index
+
+SQLite: papers_fts / notes_fts 两张 FTS5 外部内容表（trigram 分词，与 ILIKE 子串匹配语义一致，
+支持中文；SQLite 3.34 以下退回 unicode61），由触发器与原表保持同步。
+PostgreSQL: papers / notes 增加 search_vector 生成列与 GIN 索引。
+
+Revision ID: 5c7e9a1b3d20
+Revises: 34a053b8c4a6
+Create Date: 2026-10-19 14:05:12.440319
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c7e9a1b3d20'
+down_revision: Union[str, None] = '34a053b8c4a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 索引表 -> (原表, 索引列)
+FTS_TABLES = {
+    'papers_fts': ('papers', ['title', 'abstract', 'authors']),
+    'notes_fts': ('notes', ['content']),
+}
+
+# PostgreSQL 生成列表达式，标题权重最高
+PG_VECTORS = {
+    'papers': "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+              "setweight(to_tsvector('simple', coalesce(authors, '')), 'B') || "
+              "setweight(to_tsvector('simple', coalesce(abstract, '')), 'C')",
+    'notes': "to_tsvector('simple', coalesce(content, ''))",
+}
+
+
+def _sqlite_tokenizer() -> str:
+    version = tuple(int(part) for part in op.get_bind().exec_driver_sql("SELECT sqlite_version()").scalar().split("."))
+    return 'trigram' if version >= (3, 34, 0) else 'unicode61'
+
+
+def _upgrade_sqlite() -> None:
+    tokenizer = _sqlite_tokenizer()
+    for fts, (table, columns) in FTS_TABLES.items():
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        op.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{column_list}, content='{table}', content_rowid='id', tokenize='{tokenizer}')"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); END"
+        )
+        op.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column_list} ON {table} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {column_list}) VALUES ('delete', old.id, {old_values}); "
+            f"INSERT INTO {fts}(rowid, {column_list}) VALUES (new.id, {new_values}); END"
+        )
+        # 为已有数据建立索引
+        op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _upgrade_postgresql() -> None:
+    for table, expression in PG_VECTORS.items():
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({expression}) STORED"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _upgrade_sqlite()
+    elif dialect == 'postgresql':
+        _upgrade_postgresql()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for fts in FTS_TABLES:
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+            op.execute(f"DROP TABLE IF EXISTS {fts}")
+    elif dialect == 'postgresql':
+        for table in PG_VECTORS:
+            op.execute(f"DROP INDEX IF EXISTS ix_{table}_search_vector")
+            op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
@@ -0,0 +1,58 @@
+"""add_secondary_indexes
+
+Revision ID: 8b2d4e6f1a93
+Revises: 3f1c9a7d2b54
+Create Date: 2026-10-19 13:40:08.118472
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2d4e6f1a93'
+down_revision: Union[str, None] = '3f1c9a7d2b54'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (索引名, 表名, 列) —— 与模型 __table_args__ 中的定义保持一致
+INDEXES = [
+    ('ix_papers_user_created', 'papers', ['user_id', 'created_at']),
+    ('ix_papers_user_year', 'papers', ['user_id', 'year']),
+    ('ix_reading_history_user_paper', 'reading_history', ['user_id', 'paper_id']),
+    ('ix_reading_history_paper', 'reading_history', ['paper_id']),
+    ('ix_recommendations_user_score', 'recommendations', ['user_id', 'score']),
+    ('ix_user_interests_user_concept', 'user_interests', ['user_id', 'concept_id']),
+    ('ix_user_activities_user_created', 'user_activities', ['user_id', 'created_at']),
+    ('ix_notes_paper_user', 'notes', ['paper_id', 'user_id']),
+    ('ix_latest_papers_created', 'latest_papers', ['created_at']),
+    ('ix_concept_relations_source_target', 'concept_relations', ['source_id', 'target_id']),
+    ('ix_concept_relations_target', 'concept_relations', ['target_id']),
+]
+
+
+def _existing_indexes(table: str) -> Union[set, None]:
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table(table):
+        return None
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 新建的库可能已由 create_all 创建了这些索引，已存在的跳过
+    for name, table, columns in INDEXES:
+        existing = _existing_indexes(table)
+        if existing is not None and name not in existing:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        existing = _existing_indexes(table)
+        if existing and name in existing:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,59 @@
+"""add_blob_store
+
+blobs 表：按 SHA-256 内容寻址存储的文件及其引用计数；papers 增加 pdf_blob_id 指向论文的PDF文件。
+
+Revision ID: 9d4f2b7c1e65
+Revises: 5c7e9a1b3d20
+Create Date: 2026-10-19 16:40:27.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4f2b7c1e65'
+down_revision: Union[str, None] = '5c7e9a1b3d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    # 由 create_all 建成的旧库中可能已存在
+    if not inspector.has_table('blobs'):
+        op.create_table('blobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=100), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_blobs_id'), 'blobs', ['id'], unique=False)
+        op.create_index(op.f('ix_blobs_sha256'), 'blobs', ['sha256'], unique=True)
+        op.create_index('ix_blobs_unreferenced', 'blobs', ['ref_count', 'updated_at'], unique=False)
+
+    if 'pdf_blob_id' not in {column['name'] for column in inspector.get_columns('papers')}:
+        op.add_column('papers', sa.Column('pdf_blob_id', sa.Integer(), nullable=True))
+        op.create_index(op.f('ix_papers_pdf_blob_id'), 'papers', ['pdf_blob_id'], unique=False)
+        # SQLite 不支持 ALTER TABLE 添加外键约束（重建 papers 表会丢失全文索引触发器），只在其他数据库上添加
+        if op.get_bind().dialect.name != 'sqlite':
+            op.create_foreign_key('fk_papers_pdf_blob_id', 'papers', 'blobs', ['pdf_blob_id'], ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('fk_papers_pdf_blob_id', 'papers', type_='foreignkey')
+    op.drop_index(op.f('ix_papers_pdf_blob_id'), table_name='papers')
+    op.drop_column('papers', 'pdf_blob_id')
+    op.drop_index('ix_blobs_unreferenced', table_name='blobs')
+    op.drop_index(op.f('ix_blobs_sha256'), table_name='blobs')
+    op.drop_index(op.f('ix_blobs_id'), table_name='blobs')
+    op.drop_table('blobs')
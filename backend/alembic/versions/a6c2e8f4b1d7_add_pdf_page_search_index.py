@@ -0,0 +1,70 @@
+"""add_pdf_page_search_index
+
+PDF逐页文本（pdf_pages）的全文索引。
+SQLite: pdf_pages_fts 外部内容表（分词器与 papers_fts 一致），由触发器与 pdf_pages 保持同步；
+PostgreSQL: pdf_pages 增加 search_vector 生成列与 GIN 索引。
+
+Revision ID: a6c2e8f4b1d7
+Revises: f19b6d2e8a53
+Create Date: 2026-10-19 20:18:07.935216
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6c2e8f4b1d7'
+down_revision: Union[str, None] = 'f19b6d2e8a53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _sqlite_tokenizer() -> str:
+    version = tuple(int(part) for part in op.get_bind().exec_driver_sql("SELECT sqlite_version()").scalar().split("."))
+    return 'trigram' if version >= (3, 34, 0) else 'unicode61'
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS pdf_pages_fts USING fts5("
+            f"text, content='pdf_pages', content_rowid='id', tokenize='{_sqlite_tokenizer()}')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_ai AFTER INSERT ON pdf_pages BEGIN "
+            "INSERT INTO pdf_pages_fts(rowid, text) VALUES (new.id, new.text); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_ad AFTER DELETE ON pdf_pages BEGIN "
+            "INSERT INTO pdf_pages_fts(pdf_pages_fts, rowid, text) VALUES ('delete', old.id, old.text); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS pdf_pages_fts_au AFTER UPDATE OF text ON pdf_pages BEGIN "
+            "INSERT INTO pdf_pages_fts(pdf_pages_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+            "INSERT INTO pdf_pages_fts(rowid, text) VALUES (new.id, new.text); END"
+        )
+        # 为已缓存的页面建立索引
+        op.execute("INSERT INTO pdf_pages_fts(pdf_pages_fts) VALUES ('rebuild')")
+    elif dialect == 'postgresql':
+        op.execute(
+            "ALTER TABLE pdf_pages ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED"
+        )
+        op.execute("CREATE INDEX IF NOT EXISTS ix_pdf_pages_search_vector ON pdf_pages USING GIN (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS pdf_pages_fts_{suffix}")
+        op.execute("DROP TABLE IF EXISTS pdf_pages_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_pdf_pages_search_vector")
+        op.execute("ALTER TABLE pdf_pages DROP COLUMN IF EXISTS search_vector")
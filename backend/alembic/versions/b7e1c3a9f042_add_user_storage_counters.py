@@ -0,0 +1,41 @@
+"""add_user_storage_counters
+
+users 增加 storage_used_bytes（论文引用的文件总字节数，随PDF变更原子增减）并按现有数据回填；
+storage_capacity（MB）原先只由 add_storage_column.py 脚本添加，缺失时补上。
+
+Revision ID: b7e1c3a9f042
+Revises: 9d4f2b7c1e65
+Create Date: 2026-10-19 17:52:03.614270
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e1c3a9f042'
+down_revision: Union[str, None] = '9d4f2b7c1e65'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('users')}
+    if 'storage_capacity' not in columns:
+        op.add_column('users', sa.Column('storage_capacity', sa.Integer(), nullable=True))
+    if 'storage_used_bytes' not in columns:
+        op.add_column('users', sa.Column('storage_used_bytes', sa.BigInteger(), server_default='0', nullable=False))
+    op.execute(
+        "UPDATE users SET storage_used_bytes = ("
+        "SELECT COALESCE(SUM(blobs.size), 0) FROM papers JOIN blobs ON blobs.id = papers.pdf_blob_id "
+        "WHERE papers.user_id = users.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # storage_capacity 可能早于本迁移存在，保留
+    op.drop_column('users', 'storage_used_bytes')
@@ -0,0 +1,47 @@
+"""add_mirror_health
+
+mirror_health：外部镜像的健康分数与延迟（指数加权移动平均），后台探测的结果在进程重启后保留。
+
+Revision ID: c4d8f2a6e193
+Revises: a6c2e8f4b1d7
+Create Date: 2026-10-19 22:41:26.503817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d8f2a6e193'
+down_revision: Union[str, None] = 'a6c2e8f4b1d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 由 create_all 建成的库中可能已存在
+    if sa.inspect(op.get_bind()).has_table('mirror_health'):
+        return
+    op.create_table('mirror_health',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('service', sa.String(length=50), nullable=False),
+    sa.Column('url', sa.String(length=255), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('latency_ms', sa.Float(), nullable=True),
+    sa.Column('failures', sa.Integer(), nullable=False),
+    sa.Column('checked_at', sa.DateTime(), nullable=True),
+    sa.Column('last_ok_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_mirror_health_id'), 'mirror_health', ['id'], unique=False)
+    op.create_index('ix_mirror_health_service_url', 'mirror_health', ['service', 'url'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_mirror_health_service_url', table_name='mirror_health')
+    op.drop_index(op.f('ix_mirror_health_id'), table_name='mirror_health')
+    op.drop_table('mirror_health')
@@ -0,0 +1,43 @@
+"""add_paper_neighbor_status
+
+paper_neighbor_status：记录每篇论文近邻表的计算时间。没有相似论文的论文在 paper_neighbors 中没有行，
+此前每次读取都会重新计算；有了计算记录后只在论文变化时计算。
+
+Revision ID: d7a3e9c5b280
+Revises: c4d8f2a6e193
+Create Date: 2026-10-20 10:12:44.218305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3e9c5b280'
+down_revision: Union[str, None] = 'c4d8f2a6e193'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 由 create_all 建成的库中可能已存在
+    if sa.inspect(op.get_bind()).has_table('paper_neighbor_status'):
+        return
+    op.create_table('paper_neighbor_status',
+    sa.Column('paper_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('paper_id')
+    )
+    op.create_index('ix_paper_neighbor_status_user', 'paper_neighbor_status', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_paper_neighbor_status_user', table_name='paper_neighbor_status')
+    op.drop_table('paper_neighbor_status')
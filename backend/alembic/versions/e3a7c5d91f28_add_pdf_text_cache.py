@@ -0,0 +1,61 @@
+"""add_pdf_text_cache
+
+pdf_texts / pdf_pages：按文件内容 sha256 缓存的PDF解析结果（文档信息与逐页文本）。
+
+Revision ID: e3a7c5d91f28
+Revises: b7e1c3a9f042
+Create Date: 2026-10-19 18:41:26.502317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e3a7c5d91f28'
+down_revision: Union[str, None] = 'b7e1c3a9f042'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    # 由 create_all 建成的库中可能已存在
+    if not inspector.has_table('pdf_texts'):
+        op.create_table('pdf_texts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('page_count', sa.Integer(), nullable=False),
+        sa.Column('extractor', sa.String(length=20), nullable=True),
+        sa.Column('title', sa.String(length=500), nullable=True),
+        sa.Column('author', sa.String(length=500), nullable=True),
+        sa.Column('subject', sa.String(length=500), nullable=True),
+        sa.Column('keywords', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_pdf_texts_id'), 'pdf_texts', ['id'], unique=False)
+        op.create_index(op.f('ix_pdf_texts_sha256'), 'pdf_texts', ['sha256'], unique=True)
+    if not inspector.has_table('pdf_pages'):
+        op.create_table('pdf_pages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('page_number', sa.Integer(), nullable=False),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_pdf_pages_id'), 'pdf_pages', ['id'], unique=False)
+        op.create_index('ix_pdf_pages_sha256_page', 'pdf_pages', ['sha256', 'page_number'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_pdf_pages_sha256_page', table_name='pdf_pages')
+    op.drop_index(op.f('ix_pdf_pages_id'), table_name='pdf_pages')
+    op.drop_table('pdf_pages')
+    op.drop_index(op.f('ix_pdf_texts_sha256'), table_name='pdf_texts')
+    op.drop_index(op.f('ix_pdf_texts_id'), table_name='pdf_texts')
+    op.drop_table('pdf_texts')
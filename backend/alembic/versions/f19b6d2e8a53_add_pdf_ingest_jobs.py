@@ -0,0 +1,48 @@
+"""add_pdf_ingest_jobs
+
+pdf_ingest_jobs：论文PDF变更后待后台处理（元数据、参考文献、缩略图）的任务队列。
+
+Revision ID: f19b6d2e8a53
+Revises: e3a7c5d91f28
+Create Date: 2026-10-19 19:36:48.271904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f19b6d2e8a53'
+down_revision: Union[str, None] = 'e3a7c5d91f28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 由 create_all 建成的库中可能已存在
+    if sa.inspect(op.get_bind()).has_table('pdf_ingest_jobs'):
+        return
+    op.create_table('pdf_ingest_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('paper_id', sa.Integer(), nullable=False),
+    sa.Column('blob_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('error', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['paper_id'], ['papers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pdf_ingest_jobs_id'), 'pdf_ingest_jobs', ['id'], unique=False)
+    op.create_index('ix_pdf_ingest_jobs_status', 'pdf_ingest_jobs', ['status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_pdf_ingest_jobs_status', table_name='pdf_ingest_jobs')
+    op.drop_index(op.f('ix_pdf_ingest_jobs_id'), table_name='pdf_ingest_jobs')
+    op.drop_table('pdf_ingest_jobs')
@@ -14,6 +14,25 @@ class Settings(BaseSettings):
     # 数据库配置
     DATABASE_URL: str = "sqlite:///app.db"
     SQLALCHEMY_DATABASE_URL: str = DATABASE_URL  # 兼容性字段
+    # 数据库引擎配置档: auto / dev / production-sqlite / postgres
+    DATABASE_PROFILE: str = "auto"
+    DATABASE_POOL_SIZE: int = 5  # 每个工作进程的连接池大小
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: int = 30  # 等待空闲连接的秒数
+    DATABASE_POOL_RECYCLE: int = 1800  # 连接回收周期（秒）
+    DATABASE_BUSY_TIMEOUT: int = 5000  # SQLite 锁等待超时（毫秒）
+    # 查询日志路径（非空时记录执行过的查询，供索引顾问分析）
+    QUERY_LOG_PATH: str = ""
+    # 请求级SQL统计（Server-Timing 响应头、结构化日志与 /api/metrics）
+    QUERY_METRICS_ENABLED: bool = True
+    # 每个请求/路由保留的最慢语句条数
+    QUERY_METRICS_SLOWEST: int = 3
+    # 是否为每个请求输出一行JSON格式的统计日志
+    QUERY_METRICS_LOG: bool = True
+    # 启动时数据库版本落后于迁移脚本时是否自动执行 alembic upgrade head
+    AUTO_MIGRATE: bool = True
+    # 列表总数（X-Total-Count）缓存秒数；本进程的写入提交后立即失效
+    PAGINATION_COUNT_TTL: int = 60
     
     # JWT配置
     SECRET_KEY: str = "your-secret-key-here"
@@ -22,10 +41,64 @@ class Settings(BaseSettings):
     
     # 上传目录
     UPLOAD_DIRECTORY: str = str(BASE_DIR / "uploads")
+    # 上传文件按块流式写入磁盘：每次读取的字节数与单个PDF文件的大小上限（MB）
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_MAX_SIZE_MB: int = 100
+    # 按内容寻址的文件存储目录；引用计数为0的文件保留的小时数与垃圾回收间隔（小时，0表示不定期执行）
+    BLOB_DIRECTORY: str = str(BASE_DIR / "uploads" / "blobs")
+    BLOB_GC_GRACE_HOURS: float = 24
+    BLOB_GC_INTERVAL_HOURS: float = 6
+    # PDF响应的缓存时间（秒，私有缓存，过期后用ETag重新验证）
+    PDF_CACHE_MAX_AGE: int = 0
+    # 非空时由nginx发送PDF：响应X-Accel-Redirect到该前缀（nginx中对应BLOB_DIRECTORY的internal location）
+    PDF_ACCEL_REDIRECT_PREFIX: str = ""
+    # 批量解析PDF的进程数（0表示CPU核数）
+    PDF_EXTRACT_WORKERS: int = 0
+    # PDF入库后台任务：同时处理的任务数（0表示不启动）、解析与渲染缩略图的进程数（0表示CPU核数）、
+    # 失败重试次数、空闲时检查队列的间隔（秒）、运行中任务的超时（分钟）与缩略图宽度（像素）
+    PDF_INGEST_CONCURRENCY: int = 2
+    PDF_INGEST_PROCESSES: int = 2
+    PDF_INGEST_MAX_ATTEMPTS: int = 3
+    PDF_INGEST_POLL_SECONDS: float = 30
+    PDF_INGEST_JOB_TIMEOUT_MINUTES: float = 30
+    PDF_THUMBNAIL_WIDTH: int = 320
+    # 头像：上传文件大小上限（MB）与像素数上限、生成的正方形尺寸（像素）、不指定尺寸时返回的尺寸与WebP质量
+    AVATAR_MAX_SIZE_MB: int = 5
+    AVATAR_MAX_PIXELS: int = 40_000_000
+    AVATAR_SIZES: List[int] = [32, 64, 128, 256]
+    AVATAR_DEFAULT_SIZE: int = 128
+    AVATAR_QUALITY: int = 85
+    # 用户默认存储容量（MB）与已用空间的校正间隔（小时，0表示不定期执行）
+    STORAGE_DEFAULT_CAPACITY_MB: int = 1024
+    STORAGE_RECONCILE_INTERVAL_HOURS: float = 24
+    # 批量导入题录文件的大小上限（MB）与每个事务写入的条数
+    IMPORT_MAX_SIZE_MB: int = 50
+    IMPORT_CHUNK_SIZE: int = 500
+    
+    # 知识图谱持久化目录（TF-IDF状态与图数据）
+    KNOWLEDGE_GRAPH_DIR: str = str(BASE_DIR / "data" / "knowledge_graph")
+    # 构建知识图谱时每篇文献保留的相似文献数量（0表示不限制，仅按阈值）
+    KNOWLEDGE_GRAPH_TOP_K: int = 20
+    # 构建相似度边时的并行线程数（1表示串行）
+    KNOWLEDGE_GRAPH_WORKERS: int = 1
+    # 文献变更批量写入知识图谱的间隔（秒），读取图谱前也会写入
+    KNOWLEDGE_GRAPH_FLUSH_INTERVAL_SECONDS: float = 30
     
     # API密钥
     EASYSCHOLAR_API_KEY: str = ""
     
+    # Sci-Hub：镜像地址（为空时使用内置列表；可指向本地测试服务器）、请求超时（秒）、
+    # 连接中断后断点续传的次数与本地PDF缓存（BLOB_DIRECTORY/scihub）的大小上限（MB，0表示不限制）
+    SCIHUB_DOMAINS: List[str] = []
+    SCIHUB_TIMEOUT: float = 30
+    SCIHUB_RESUME_ATTEMPTS: int = 3
+    SCIHUB_CACHE_MAX_MB: int = 2048
+    # 镜像健康检查（Sci-Hub、谷歌学术）：后台并发探测的间隔（秒，0表示不启动）、单次探测超时（秒）
+    # 与健康分数、延迟的指数加权系数（越大越看重最近的结果）
+    MIRROR_HEALTH_INTERVAL_SECONDS: float = 600
+    MIRROR_PROBE_TIMEOUT: float = 5
+    MIRROR_HEALTH_ALPHA: float = 0.3
+    
     # CORS设置
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000", "http://localhost:8001", "http://127.0.0.1:3000", "http://127.0.0.1:8000", "http://127.0.0.1:8001", "http://localhost:8003"]
     
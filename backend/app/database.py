@@ -1,14 +1,18 @@
 from sqlalchemy import create_engine, event, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+import re
 import logging
 import time
+from contextlib import contextmanager
 from sqlalchemy import text
 from sqlalchemy import __version__ as sa_version
 
-from .config import settings
+from .config import settings, BASE_DIR
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
@@ -22,8 +26,189 @@ import sqlalchemy
 sqlalchemy_version = sqlalchemy.__version__
 logger.info(f"使用SQLAlchemy版本: {sqlalchemy_version}")
 
+# 数据库引擎配置档：
+# - dev: 默认连接池，仅设置忙等待超时，便于本地调试
+# - production-sqlite: WAL日志、synchronous=NORMAL、内存映射与页缓存，读写互不阻塞
+# - postgres: 连接池大小/溢出/回收与连接前探活
+ENGINE_PROFILES = ("dev", "production-sqlite", "postgres")
+
+# 每个新连接执行的PRAGMA（按配置档）
+SQLITE_PRAGMAS = {
+    "dev": {},
+    "production-sqlite": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "mmap_size": 256 * 1024 * 1024,
+        "cache_size": -64000,  # 负数单位为KiB，约64MB
+    },
+}
+
+
+def resolve_profile(url: str, profile: str = "auto") -> str:
+    """解析引擎配置档，auto 时按数据库类型与DEBUG推断"""
+    if profile and profile != "auto":
+        if profile not in ENGINE_PROFILES:
+            raise ValueError(f"未知的数据库配置档: {profile}，可选: {', '.join(ENGINE_PROFILES)}")
+        return profile
+    if url.startswith("sqlite"):
+        return "dev" if settings.DEBUG else "production-sqlite"
+    return "postgres"
+
+
+def _register_sqlite_pragmas(engine, pragmas: dict, busy_timeout: int):
+    """通过 connect 事件在每个新连接上设置PRAGMA"""
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout)}")
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+
+def create_app_engine(url: str = None, profile: str = None, **overrides):
+    """
+    按配置档创建数据库引擎
+
+    参数:
+    - url: 数据库URL，默认取 settings.DATABASE_URL
+    - profile: dev / production-sqlite / postgres / auto，默认取 settings.DATABASE_PROFILE
+    - overrides: 直接传给 create_engine 的额外参数
+    """
+    url = url or settings.DATABASE_URL
+    profile = resolve_profile(url, profile or settings.DATABASE_PROFILE)
+    options = {}
+
+    if url.startswith("sqlite"):
+        # 连接可能在线程池中被不同线程使用；timeout为驱动层的锁等待秒数
+        options["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.DATABASE_BUSY_TIMEOUT / 1000,
+        }
+        if profile != "dev" and ":memory:" not in url:
+            options.update(
+                pool_size=settings.DATABASE_POOL_SIZE,
+                max_overflow=settings.DATABASE_MAX_OVERFLOW,
+                pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            )
+    elif profile == "postgres":
+        options.update(
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+
+    options.update(overrides)
+    new_engine = create_engine(url, **options)
+    if url.startswith("sqlite"):
+        _register_sqlite_pragmas(new_engine, SQLITE_PRAGMAS.get(profile, {}), settings.DATABASE_BUSY_TIMEOUT)
+    logger.info(f"数据库引擎配置档: {profile}")
+    return new_engine
+
+
+# 同步URL方言 -> 异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgres": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """把同步数据库URL转换为对应异步驱动的URL（已指定驱动的保持不变）"""
+    scheme, sep, rest = url.partition("://")
+    if "+" in scheme:
+        return url
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def create_async_app_engine(url: str = None, profile: str = None, **overrides):
+    """按配置档创建异步数据库引擎，连接池与PRAGMA设置与同步引擎一致"""
+    url = url or settings.DATABASE_URL
+    profile = resolve_profile(url, profile or settings.DATABASE_PROFILE)
+    options = {}
+
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"timeout": settings.DATABASE_BUSY_TIMEOUT / 1000}
+        if profile != "dev" and ":memory:" not in url:
+            # SQLAlchemy 2.0 的 aiosqlite 默认使用 NullPool（2.1 起才默认连接池），需显式指定
+            options.update(
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=settings.DATABASE_POOL_SIZE,
+                max_overflow=settings.DATABASE_MAX_OVERFLOW,
+                pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            )
+    elif profile == "postgres":
+        options.update(
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+
+    options.update(overrides)
+    new_engine = create_async_engine(to_async_url(url), **options)
+    if url.startswith("sqlite"):
+        _register_sqlite_pragmas(new_engine.sync_engine, SQLITE_PRAGMAS.get(profile, {}), settings.DATABASE_BUSY_TIMEOUT)
+    return new_engine
+
+
 # 创建数据库引擎
-engine = create_engine(settings.DATABASE_URL)
+engine = create_app_engine()
+
+# 设置 QUERY_LOG_PATH 时记录执行过的查询，供索引顾问（app.utils.index_advisor）分析
+if settings.QUERY_LOG_PATH:
+    from .utils.index_advisor import enable_query_log
+    enable_query_log(engine, settings.QUERY_LOG_PATH)
+
+# 请求级查询数与耗时统计（app.utils.query_metrics）
+if settings.QUERY_METRICS_ENABLED:
+    from .utils.query_metrics import instrument_engine
+    instrument_engine(engine)
+
+# 异步引擎在首次使用时创建，未安装异步驱动时不影响同步接口
+_async_engine = None
+_async_session_factory = None
+
+
+def get_async_engine():
+    """获取（必要时创建）全局异步引擎"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        _async_engine = create_async_app_engine()
+        if settings.QUERY_LOG_PATH:
+            from .utils.index_advisor import enable_query_log
+            enable_query_log(_async_engine.sync_engine, settings.QUERY_LOG_PATH)
+        if settings.QUERY_METRICS_ENABLED:
+            from .utils.query_metrics import instrument_engine
+            instrument_engine(_async_engine.sync_engine)
+        _async_session_factory = async_sessionmaker(
+            _async_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False
+        )
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """创建异步会话"""
+    get_async_engine()
+    return _async_session_factory()
+
+
+def _dispose_engines_after_fork():
+    engine.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+
+
+# gunicorn等多进程部署时，子进程不能复用父进程的连接，fork后丢弃继承的连接池
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
 
 # 创建会话
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -45,8 +230,9 @@ def init_db():
     logger.info(f"使用SQLAlchemy版本: {sa_version}")
     logger.info("开始初始化数据库...")
     
-    # 创建所有表
-    Base.metadata.create_all(bind=engine)
+    # 按迁移脚本创建/升级表结构
+    with engine.begin() as conn:
+        upgrade_schema(conn)
     logger.info("数据库表创建成功")
     
     # 创建初始数据
@@ -58,275 +244,108 @@ def init_db():
     
     logger.info("数据库初始化完成")
 
-def _check_and_update_schema():
-    """检查并更新数据库结构"""
-    # 使用反射方式检查表结构
-    inspector = inspect(engine)
-    
-    # 清除缓存，强制刷新表定义
-    Base.metadata.clear()
-    
-    # 重新加载模型类
-    # 不要从models导入Base，直接使用当前模块定义的Base
-    from .models import (
-        User, UserRole, Paper, Tag, Note, Concept, 
-        ConceptRelation, ReadingHistory, Recommendation, 
-        Project, SearchHistory, Journal, LatestPaper, 
-        UserInterest, UserActivity, Citation
-    )
-    
-    # 尝试强制创建缺失的列
+# 旧库（由 create_all 建表、未记录迁移版本）对应的基线版本，之后的迁移均可在其上重复执行
+LEGACY_BASELINE_REVISION = "6215500199ca"
+
+
+def _alembic_config(connection=None):
+    """构造 Alembic 配置；传入 connection 时迁移直接复用该连接"""
+    from alembic.config import Config
+
+    cfg = Config(str(BASE_DIR / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BASE_DIR / "alembic"))
+    if connection is not None:
+        cfg.attributes["connection"] = connection
+    return cfg
+
+
+def get_schema_revision(connection) -> str:
+    """读取数据库中记录的迁移版本，未记录时返回 None"""
+    if not inspect(connection).has_table("alembic_version"):
+        return None
+    return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+
+# 迁移脚本头部的版本声明，如 revision: str = '34a053b8c4a6'
+_REVISION_PATTERN = re.compile(r"^(down_revision|revision)\b[^=]*=\s*['\"]?([\w]+)", re.MULTILINE)
+
+
+def get_head_revision() -> str:
+    """
+    迁移脚本的最新版本
+
+    只用正则读取 alembic/versions 下各脚本的 revision/down_revision，
+    不导入 alembic 和迁移模块，启动检查的耗时因此与迁移数量基本无关。
+    """
+    revisions, parents = set(), set()
+    for path in (BASE_DIR / "alembic" / "versions").glob("*.py"):
+        declared = dict(_REVISION_PATTERN.findall(path.read_text(encoding="utf-8")))
+        if "revision" in declared:
+            revisions.add(declared["revision"])
+            if declared.get("down_revision", "None") != "None":
+                parents.add(declared["down_revision"])
+    heads = revisions - parents
+    if len(heads) != 1:
+        raise RuntimeError(f"迁移脚本存在多个或不存在最新版本: {sorted(heads)}")
+    return heads.pop()
+
+
+def upgrade_schema(connection) -> None:
+    """在给定连接上把数据库升级到最新版本"""
+    from alembic import command
+
+    cfg = _alembic_config(connection)
+    if get_schema_revision(connection) is None and inspect(connection).has_table("users"):
+        # 启动时建表的旧库：先标记为基线版本，后续迁移会按现状补齐
+        logger.info(f"检测到未记录迁移版本的旧数据库，标记为 {LEGACY_BASELINE_REVISION}")
+        command.stamp(cfg, LEGACY_BASELINE_REVISION)
+    command.upgrade(cfg, "head")
+
+
+@contextmanager
+def _migration_lock():
+    """多进程同时启动时只允许一个进程执行迁移"""
     try:
-        # 在不删除现有数据的情况下更新表结构
-        Base.metadata.create_all(bind=engine)
-        logger.info("成功更新表结构")
-    except Exception as e:
-        logger.error(f"更新表结构失败: {e}")
-        
-    # 继续执行原有的检查逻辑
-    # 检查users表是否存在并检查字段
-    if inspector.has_table("users"):
-        columns = [col['name'] for col in inspector.get_columns('users')]
-        
-        # 如果存在password字段但不存在hashed_password字段，需要重命名
-        if 'password' in columns and 'hashed_password' not in columns:
-            logger.info("重命名users表的password字段为hashed_password...")
-            try:
-                with engine.connect() as conn:
-                    # SQLite不直接支持重命名列，需要创建新表并复制数据
-                    # 1. 创建临时表
-                    conn.execute(text("""
-                        CREATE TABLE users_new (
-                            id INTEGER PRIMARY KEY,
-                            username VARCHAR(50) NOT NULL UNIQUE,
-                            email VARCHAR(100) NOT NULL UNIQUE,
-                            hashed_password VARCHAR(255) NOT NULL,
-                            role VARCHAR(10),
-                            first_name VARCHAR(50),
-                            last_name VARCHAR(50),
-                            avatar_url VARCHAR(255),
-                            fullname VARCHAR(100),
-                            bio TEXT,
-                            is_active BOOLEAN,
-                            last_login DATETIME,
-                            created_at DATETIME,
-                            updated_at DATETIME
-                        )
-                    """))
-                    
-                    # 2. 复制数据，使用password值填充hashed_password
-                    conn.execute(text("""
-                        INSERT INTO users_new (id, username, email, hashed_password, role, 
-                                             first_name, last_name, avatar_url, fullname, bio, is_active, 
-                                             last_login, created_at, updated_at)
-                        SELECT id, username, email, password, role, 
-                               first_name, last_name, avatar, NULL, bio, is_active,
-                               last_login, created_at, updated_at
-                        FROM users
-                    """))
-                    
-                    # 3. 删除旧表
-                    conn.execute(text("DROP TABLE users"))
-                    
-                    # 4. 重命名新表
-                    conn.execute(text("ALTER TABLE users_new RENAME TO users"))
-                    
-                    conn.commit()
-                    logger.info("重命名users表的password字段为hashed_password完成")
-            except Exception as e:
-                logger.error(f"重命名password字段失败: {e}")
-        
-        # 如果不存在hashed_password字段，需要添加
-        elif 'hashed_password' not in columns and 'password' not in columns:
-            logger.info("添加users表的hashed_password字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE users ADD COLUMN hashed_password VARCHAR(255)"))
-                    conn.commit()
-                    logger.info("添加hashed_password字段完成")
-            except Exception as e:
-                logger.error(f"添加hashed_password字段失败: {e}")
-    
-    # 检查papers表是否存在
-    if inspector.has_table("papers"):
-        # 检查papers表的字段
-        columns = [col['name'] for col in inspector.get_columns('papers')]
-        
-        # 添加journal字段
-        if 'journal' not in columns:
-            logger.info("添加papers表的journal字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE papers ADD COLUMN journal VARCHAR(255)"))
-                    conn.commit()
-                    logger.info("添加journal字段完成")
-            except Exception as e:
-                logger.error(f"添加journal字段失败: {e}")
-        
-        # 添加doi字段
-        if 'doi' not in columns:
-            logger.info("添加papers表的doi字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE papers ADD COLUMN doi VARCHAR(100)"))
-                    conn.commit()
-                    logger.info("添加doi字段完成")
-            except Exception as e:
-                logger.error(f"添加doi字段失败: {e}")
-        
-        # 添加url字段
-        if 'url' not in columns:
-            logger.info("添加papers表的url字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE papers ADD COLUMN url VARCHAR(500)"))
-                    conn.commit()
-                    logger.info("添加url字段完成")
-            except Exception as e:
-                logger.error(f"添加url字段失败: {e}")
-        
-        # 添加source字段
-        if 'source' not in columns:
-            logger.info("添加papers表的source字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE papers ADD COLUMN source VARCHAR(255)"))
-                    conn.commit()
-                    logger.info("添加source字段完成")
-            except Exception as e:
-                logger.error(f"添加source字段失败: {e}")
-        
-        # 添加publication_date字段
-        if 'publication_date' not in columns:
-            logger.info("添加papers表的publication_date字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE papers ADD COLUMN publication_date DATETIME"))
-                    conn.commit()
-                    logger.info("添加publication_date字段完成")
-            except Exception as e:
-                logger.error(f"添加publication_date字段失败: {e}")
-        
-        # 添加updated_at字段，如果不存在的话
-        if 'updated_at' not in columns:
-            logger.info("添加papers表的updated_at字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE papers ADD COLUMN updated_at DATETIME"))
-                    conn.commit()
-                    logger.info("添加updated_at字段完成")
-            except Exception as e:
-                logger.error(f"添加updated_at字段失败: {e}")
-                
-        # 添加file_path字段，如果不存在的话
-        if 'file_path' not in columns and 'pdf_path' in columns:
-            logger.info("重命名papers表的pdf_path字段为file_path...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE papers ADD COLUMN file_path VARCHAR(500)"))
-                    conn.execute(text("UPDATE papers SET file_path = pdf_path"))
-                    conn.commit()
-                    logger.info("添加file_path字段并复制pdf_path数据完成")
-            except Exception as e:
-                logger.error(f"处理file_path字段失败: {e}")
-
-    # 检查users表的字段
-    inspector = inspect(engine)
-    users_columns = [column['name'] for column in inspector.get_columns('users')]
-    
-    # 将avatar字段重命名为avatar_url，如果需要的话
-    if 'avatar' in users_columns and 'avatar_url' not in users_columns:
-        logger.info("重命名users表的avatar字段为avatar_url...")
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("ALTER TABLE users ADD COLUMN avatar_url VARCHAR(255)"))
-                conn.execute(text("UPDATE users SET avatar_url = avatar"))
-                conn.commit()
-                logger.info("重命名avatar字段为avatar_url完成")
-        except Exception as e:
-            logger.error(f"重命名avatar字段失败: {e}")
-    elif 'avatar' not in users_columns and 'avatar_url' not in users_columns:
-        # 如果两个字段都不存在，直接添加avatar_url
-        logger.info("添加users表的avatar_url字段...")
-        try:
-            with engine.connect() as conn:
-                conn.execute(text("ALTER TABLE users ADD COLUMN avatar_url VARCHAR(255)"))
-                conn.commit()
-                logger.info("添加avatar_url字段完成")
-        except Exception as e:
-            logger.error(f"添加avatar_url字段失败: {e}")
-            
-    # 添加fullname字段，如果不存在
-    if 'fullname' not in users_columns:
-        logger.info("添加users表的fullname字段...")
+        import fcntl
+    except ImportError:  # Windows
+        yield
+        return
+    lock_path = BASE_DIR / "data" / ".migration.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
         try:
-            with engine.connect() as conn:
-                conn.execute(text("ALTER TABLE users ADD COLUMN fullname VARCHAR(100)"))
-                # 尝试用first_name和last_name拼接填充fullname
-                if 'first_name' in users_columns and 'last_name' in users_columns:
-                    conn.execute(text("UPDATE users SET fullname = TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '')) WHERE TRIM(COALESCE(first_name, '') || ' ' || COALESCE(last_name, '')) != ''"))
-                conn.commit()
-                logger.info("添加fullname字段完成")
-        except Exception as e:
-            logger.error(f"添加fullname字段失败: {e}")
-            
-    # 添加其他可能缺失的字段
-    missing_columns = {
-        'first_name': 'VARCHAR(50)',
-        'last_name': 'VARCHAR(50)',
-        'bio': 'TEXT',
-        'last_login': 'DATETIME'
-    }
-    
-    for col_name, col_type in missing_columns.items():
-        if col_name not in users_columns:
-            logger.info(f"添加users表的{col_name}字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text(f"ALTER TABLE users ADD COLUMN {col_name} {col_type}"))
-                    conn.commit()
-                    logger.info(f"添加{col_name}字段完成")
-            except Exception as e:
-                logger.error(f"添加{col_name}字段失败: {e}")
-    
-    # 检查concepts表是否有category字段
-    if inspector.has_table("concepts"):
-        concepts_columns = [col['name'] for col in inspector.get_columns('concepts')]
-        
-        # 添加category字段
-        if 'category' not in concepts_columns:
-            logger.info("添加concepts表的category字段...")
-            try:
-                with engine.connect() as conn:
-                    conn.execute(text("ALTER TABLE concepts ADD COLUMN category INTEGER DEFAULT 0"))
-                    conn.commit()
-                    logger.info("添加category字段完成")
-            except Exception as e:
-                logger.error(f"添加category字段失败: {e}")
-    
-    # 检查latest_papers表是否有doi字段
-    if inspector.has_table("latest_papers"):
-        latest_papers_columns = [col['name'] for col in inspector.get_columns('latest_papers')]
-        
-        # 需要添加的字段列表
-        latest_papers_missing_cols = {
-            'doi': 'VARCHAR(100)',
-            'title': 'VARCHAR(500)',
-            'authors': 'VARCHAR(1000)',
-            'abstract': 'TEXT',
-            'url': 'VARCHAR(500)'
-        }
-        
-        for col_name, col_type in latest_papers_missing_cols.items():
-            if col_name not in latest_papers_columns:
-                logger.info(f"添加latest_papers表的{col_name}字段...")
-                try:
-                    with engine.connect() as conn:
-                        conn.execute(text(f"ALTER TABLE latest_papers ADD COLUMN {col_name} {col_type}"))
-                        conn.commit()
-                        logger.info(f"添加{col_name}字段完成")
-                except Exception as e:
-                    logger.error(f"添加{col_name}字段失败: {e}")
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def ensure_schema_current() -> bool:
+    """
+    启动时检查数据库版本
+
+    只比较 alembic_version 中记录的版本与迁移脚本的最新版本，一致时直接返回；
+    不一致时若开启 AUTO_MIGRATE 则加锁升级，否则抛出异常提示手动执行 alembic upgrade head。
+    返回是否执行了迁移。
+    """
+    head = get_head_revision()
+    with engine.connect() as conn:
+        current = get_schema_revision(conn)
+    if current == head:
+        return False
+
+    if not settings.AUTO_MIGRATE:
+        raise RuntimeError(f"数据库版本 {current} 不是最新版本 {head}，请先执行 alembic upgrade head")
+
+    with _migration_lock():
+        with engine.begin() as conn:
+            # 拿到锁后重新检查，其他进程可能已完成迁移
+            current = get_schema_revision(conn)
+            if current == head:
+                return False
+            logger.info(f"升级数据库: {current} -> {head}")
+            upgrade_schema(conn)
+    return True
 
 def reset_db():
     """重置数据库（仅用于测试）"""
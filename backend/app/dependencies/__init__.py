@@ -1,14 +1,16 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 from typing import Optional
 import logging
 import uuid
 
 from ..config import settings
-from ..database import SessionLocal
+from ..database import SessionLocal, AsyncSessionLocal
 from ..models.user import User, UserRole
 from ..crud.user import get_user_by_username, create_user
 from ..services.auth_service import AuthService
@@ -29,6 +31,12 @@ def get_db():
     finally:
         db.close()
 
+# 异步数据库会话依赖（async def 路由使用，查询不阻塞事件循环）
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # 认证服务依赖
 def get_auth_service():
     """获取认证服务实例"""
@@ -60,6 +68,30 @@ async def get_current_user(
     
     return user
 
+def _username_from_token(token: str) -> Optional[str]:
+    """解析令牌中的用户名，无效时返回None"""
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+# 当前用户依赖（异步会话）
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """获取当前登录用户，使用异步会话查询"""
+    username = _username_from_token(token)
+    user = await db.scalar(select(User).where(User.username == username)) if username else None
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的认证凭据",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
+
 # 管理员用户依赖
 async def get_current_admin(
     current_user: User = Depends(get_current_user)
@@ -18,6 +18,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, FileResponse, RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from fastapi.exceptions import RequestValidationError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import uvicorn
 import requests
@@ -26,7 +28,7 @@ from fastapi.staticfiles import StaticFiles
 
 logger = logging.getLogger(__name__)
 
-from .database import get_db, init_db, create_initial_data, _check_and_update_schema
+from .database import get_db, init_db, create_initial_data, ensure_schema_current
 # 从重构后的模型包导入所需的所有模型类
 from .models import Base, User, UserRole, Paper, Note, Tag, Journal, LatestPaper, Project, Recommendation, SearchHistory, UserActivity
 from .config import settings
@@ -37,15 +39,27 @@ from .schemas.user import UserProfile, User as UserSchema, UserUpdate, Token
 from .schemas.paper import Paper as PaperSchema, PaperCreate, PaperUpdate, PaperWithTags
 
 # 导入服务类
-from .services.scihub_service import SciHubService
+from .services.scihub_proxy_service import scihub_proxy
+from .services.scholar_service import GoogleScholarService
+from .services.mirror_health_service import mirror_health_service
 from .services.easyscholar_service import EasyScholarService
-from .services.knowledge_graph_service import KnowledgeGraphService
+from .services.knowledge_graph_service import knowledge_graph_service
 from .services.recommendation_service import RecommendationService
 from .services.journal_service import JournalService
 from .services.history_service import HistoryService
+from .services.paper_listing_service import paper_listing_service
+from .services.file_service import file_service
+from .services.blob_service import blob_service
+from .services.avatar_service import avatar_service
+from .services.storage_service import storage_service
+from .services.pdf_ingest_service import pdf_ingest_service
+from .services.pdf_service import pdf_service
 
 # 导入路由模块
-from .routers import papers, users, notes, knowledge_graph, recommendations, projects, publication_rank, search
+from .routers import papers, users, notes, knowledge_graph, recommendations, projects, publication_rank, search, metrics
+from .utils.query_metrics import QueryMetricsMiddleware, metrics_registry
+from .utils.pagination import Keyset, InvalidCursor, paginate, count_cache
+from .utils.periodic import periodic_jobs
 
 # 仅保留必要的模型导入，其他模型需要时再导入
 # 避免导入循环问题
@@ -73,10 +87,17 @@ app.add_middleware(
     expose_headers=["*"]  # 允许暴露所有响应头
 )
 
+# 请求级SQL统计：Server-Timing 响应头、结构化日志，并汇总到 /api/metrics
+if settings.QUERY_METRICS_ENABLED:
+    metrics_registry.slowest_limit = settings.QUERY_METRICS_SLOWEST
+    app.add_middleware(
+        QueryMetricsMiddleware,
+        slowest_limit=settings.QUERY_METRICS_SLOWEST,
+        log_requests=settings.QUERY_METRICS_LOG,
+    )
+
 # 初始化服务
-scihub_service = SciHubService()
 easyscholar_service = EasyScholarService()
-knowledge_graph_service = KnowledgeGraphService()
 recommendation_service = RecommendationService()
 journal_service = JournalService()
 history_service = HistoryService()
@@ -90,6 +111,7 @@ app.include_router(recommendations.router, prefix="/api/recommendations", tags=[
 app.include_router(projects.router, prefix="/api/projects", tags=["projects"])
 app.include_router(publication_rank.router, prefix="/api/publication-rank", tags=["publication_rank"])
 app.include_router(search.router, prefix="/api/search", tags=["search"])
+app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 
 # 添加直接登录路由，确保路径正确
 @app.post("/api/token", response_model=Token)
@@ -136,7 +158,7 @@ async def get_current_user_papers(
     """获取当前用户的所有论文"""
     try:
         logger.info(f"主路由: 开始获取用户论文，用户ID: {current_user.id}, 跳过: {skip}, 限制: {limit}")
-        papers = db.query(Paper).filter(Paper.user_id == current_user.id).offset(skip).limit(limit).all()
+        papers = paper_listing_service.list_papers(db, user_id=current_user.id, skip=skip, limit=limit)
         logger.info(f"主路由: 成功检索到论文数量: {len(papers)}")
         return papers
     except Exception as e:
@@ -151,19 +173,44 @@ async def get_current_user_papers(
 async def startup_event():
     """应用程序启动时执行的操作"""
     try:
-        # 检查并更新数据库模式
+        # 检查数据库迁移版本（结构变更由 alembic/versions 中的迁移完成）
         try:
-            logger.info("检查并更新数据库结构...")
-            _check_and_update_schema()
-            logger.info("数据库结构检查完成")
+            if ensure_schema_current():
+                logger.info("数据库结构已升级到最新版本")
         except Exception as e:
-            logger.error(f"数据库结构更新失败: {str(e)}")
+            logger.error(f"数据库结构检查失败: {str(e)}")
+            
+        # 定时回收不再被引用的文件与头像
+        periodic_jobs.start("blob_gc", settings.BLOB_GC_INTERVAL_HOURS * 3600, blob_service.gc_task)
+        periodic_jobs.start("avatar_gc", settings.BLOB_GC_INTERVAL_HOURS * 3600, avatar_service.gc_task)
+        # Sci-Hub下载缓存超过上限时按访问时间淘汰
+        periodic_jobs.start("scihub_cache_prune", 3600, scihub_proxy.prune_task)
+        # Sci-Hub与谷歌学术镜像的后台健康检查（请求中直接使用排好序的结果）
+        mirror_health_service.start()
+        # 定时校正用户已用空间计数
+        periodic_jobs.start("storage_reconcile", settings.STORAGE_RECONCILE_INTERVAL_HOURS * 3600,
+                            storage_service.reconcile_task)
+        # PDF入库后台任务（元数据补全、参考文献关联、缩略图），超时任务每小时放回队列
+        pdf_ingest_service.start()
+        periodic_jobs.start("pdf_ingest_maintenance", 3600, pdf_ingest_service.maintenance_task, initial_delay=60)
+        # 文献变更批量写入知识图谱
+        periodic_jobs.start("knowledge_graph_flush", settings.KNOWLEDGE_GRAPH_FLUSH_INTERVAL_SECONDS,
+                            knowledge_graph_service.flush_task)
             
         logger.info("应用启动成功")
     except Exception as e:
         logger.error(f"启动事件处理失败: {str(e)}")
         # 应用继续运行，但日志记录错误
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用程序关闭时停止定时任务与后台任务"""
+    await periodic_jobs.stop()
+    await pdf_ingest_service.stop()
+    await mirror_health_service.stop()
+    pdf_service.shutdown()
+    knowledge_graph_service.flush_task()
+
 # 基础路由
 @app.get("/")
 async def root():
@@ -232,7 +279,8 @@ async def search_paper(
     
     try:
         # 使用CrossRef API查询论文信息
-        response = httpx.get(f"https://api.crossref.org/works/{doi}")
+        async with httpx.AsyncClient(timeout=15) as client:
+            response = await client.get(f"https://api.crossref.org/works/{doi}")
         response.raise_for_status()
         data = response.json()["message"]
         
@@ -251,20 +299,16 @@ async def search_paper(
             return paper_info
             
         # 尝试从Sci-Hub获取PDF并保存
-        if file_service and scihub_service:
+        if file_service:
             try:
-                # 获取PDF下载链接
-                pdf_url = scihub_service.get_pdf_url(doi)
-                if pdf_url:
-                    # 下载PDF
-                    pdf_content = scihub_service.download_pdf(pdf_url)
-                    if pdf_content:
-                        # 保存PDF
-                        file_path = file_service.save_paper(pdf_content, doi)
-                        paper_info["pdf_path"] = file_path
+                # 异步下载到本地缓存（与同一DOI的并发下载合并），再按文件登记到文件存储（硬链接并分块计算哈希，不读入内存）
+                cached_pdf = await scihub_proxy.fetch(doi)
+                if cached_pdf:
+                    file_path, _ = await run_in_threadpool(file_service.save_paper, db, cached_pdf)
+                    paper_info["pdf_path"] = file_path
             except Exception as e:
                 # 这里不抛出异常，即使PDF获取失败也返回元数据
-                print(f"PDF获取或保存失败: {e}")
+                logger.error(f"PDF获取或保存失败: {e}")
         
         return paper_info
     except Exception as e:
@@ -294,10 +338,16 @@ async def get_paper_from_scihub(doi: str):
 #         raise HTTPException(status_code=500, detail="获取知识图谱数据失败")
 
 @app.get("/api/papers/{paper_id}/graph")
-async def get_paper_graph(paper_id: int):
-    """获取单个文献的知识关联图"""
+def get_paper_graph(paper_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """获取当前用户某篇文献的知识关联图（只包含该用户自己的文献与笔记）"""
+    paper = db.query(Paper.id).filter(Paper.id == paper_id, Paper.user_id == current_user.id).first()
+    if not paper:
+        raise HTTPException(status_code=404, detail="文献不存在或无权访问")
     try:
-        graph_data = knowledge_graph_service.get_paper_graph(paper_id)
+        paper_ids = set(db.scalars(select(Paper.id).where(Paper.user_id == current_user.id)))
+        note_ids = set(db.scalars(select(Note.id).where(Note.user_id == current_user.id)))
+        # 首次访问时增量计算相似度，在线程池中执行
+        graph_data = knowledge_graph_service.get_paper_graph(paper_id, paper_ids, note_ids)
         return {"graph": graph_data}
     except Exception as e:
         logger.error(f"获取文献知识图谱失败: {str(e)}")
@@ -309,25 +359,44 @@ async def get_notes(db: Session = Depends(get_db)):
     notes = db.query(Note).all()
     return {"notes": notes}
 
-@app.get("/api/papers/{paper_id}/pdf")
-async def get_paper_pdf(paper_id: int, db: Session = Depends(get_db)):
-    """获取PDF文件"""
+@app.api_route("/api/papers/{paper_id}/pdf", methods=["GET", "HEAD"])
+async def get_paper_pdf(paper_id: int, request: Request, db: Session = Depends(get_db)):
+    """获取PDF文件（支持 Range 分段加载与条件请求）"""
     paper = db.query(Paper).filter(Paper.id == paper_id).first()
     
     if not paper:
         raise HTTPException(status_code=404, detail="文献不存在")
     
-    if not paper.pdf_path or not os.path.exists(paper.pdf_path):
-        raise HTTPException(status_code=404, detail="PDF文件不存在")
+    return file_service.pdf_response(request, paper, disposition="inline")
+
+@app.api_route("/api/papers/{paper_id}/thumbnail", methods=["GET", "HEAD"])
+async def get_paper_thumbnail(paper_id: int, request: Request, db: Session = Depends(get_db)):
+    """获取PDF第一页缩略图（上传后由后台任务生成）"""
+    paper = db.query(Paper).filter(Paper.id == paper_id).first()
     
-    # 从完整路径中提取文件名
-    filename = os.path.basename(paper.pdf_path)
+    if not paper:
+        raise HTTPException(status_code=404, detail="文献不存在")
     
-    return FileResponse(
-        paper.pdf_path,
-        media_type="application/pdf",
-        filename=f"{paper.title}.pdf"
-    )
+    return file_service.thumbnail_response(request, paper)
+
+@app.get("/api/storage-info")
+async def get_storage_info(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """获取当前用户的存储空间使用情况（MB）"""
+    try:
+        info = storage_service.get_user_storage_info(db, current_user.id)
+        mb = 1024 * 1024
+        return {
+            "storage_capacity": round(info["storage_capacity"] / mb, 2),
+            "storage_used": round(info["storage_used"] / mb, 2),
+            "storage_free": round(info["storage_free"] / mb, 2),
+            "usage_percentage": round(info["usage_percentage"], 2)
+        }
+    except Exception as e:
+        logger.error(f"获取存储信息失败: {str(e)}")
+        raise HTTPException(status_code=500, detail="获取存储信息失败")
 
 # 用户管理相关路由
 @app.get("/api/users/me", response_model=UserProfile)
@@ -436,16 +505,21 @@ async def delete_user(
 # 搜索历史API路由
 @app.get("/api/search-history")
 async def get_search_history(
+    response: Response,
     limit: Optional[int] = 10, 
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取当前用户的搜索历史"""
-    histories = db.query(SearchHistory).filter(
-        SearchHistory.user_id == current_user.id
-    ).order_by(SearchHistory.created_at.desc()).limit(limit).all()
-    
-    return histories
+    """获取当前用户的搜索历史（cursor 游标翻页，见 X-Next-Cursor / X-Total-Count 响应头）"""
+    query = select(SearchHistory).where(SearchHistory.user_id == current_user.id)
+    try:
+        page = paginate(db, query, Keyset(SearchHistory.created_at, SearchHistory.id), limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page.total = count_cache.count(db, ("search_histories", current_user.id), ("search_histories",), query)
+    page.apply_headers(response)
+    return page.items
 
 @app.post("/api/search-history")
 async def create_search_history(
@@ -476,6 +550,7 @@ async def create_search_history(
 @app.get("/api/papers/{paper_id}/download")
 async def download_paper(
     paper_id: int,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -494,29 +569,16 @@ async def download_paper(
             detail="论文不存在或无权访问"
         )
     
-    if not paper.pdf_path or not os.path.exists(paper.pdf_path):
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="论文文件不存在"
-        )
-    
-    # 从完整路径中提取文件名
-    filename = os.path.basename(paper.pdf_path)
-    
-    # 返回文件
-    return FileResponse(
-        path=paper.pdf_path, 
-        filename=filename,
-        media_type="application/pdf"
-    )
+    return file_service.pdf_response(request, paper, disposition="attachment")
 
 # SciHub下载
-@app.get("/api/scihub/download/{doi}")
+@app.get("/api/scihub/download/{doi:path}")
 async def download_from_scihub(
     doi: str, 
+    request: Request,
     current_user: User = Depends(get_current_user)
 ):
-    """从SciHub下载论文"""
+    """从SciHub下载论文：边下载边发送，同一DOI下载完成后直接读取本地缓存（支持 Range 续传）"""
     try:
         # 记录访问历史
         await history_service.add_history(
@@ -525,48 +587,8 @@ async def download_from_scihub(
             content=f"从SciHub下载论文，DOI: {doi}"
         )
         
-        # 获取论文PDF链接
-        scihub_service = SciHubService()
-        paper_info = await scihub_service.get_paper_by_doi(doi)
-        
-        if not paper_info:
-            raise HTTPException(
-                status_code=404,
-                detail="无法从SciHub获取论文信息"
-            )
-            
-        # 检查是否找到PDF链接
-        if not paper_info.get("pdf_url"):
-            raise HTTPException(
-                status_code=404,
-                detail="未找到PDF链接，请使用备用下载选项"
-            )
-        
-        # 下载PDF内容而不是重定向
-        try:
-            pdf_content = await scihub_service.download_pdf_async(paper_info["pdf_url"])
-            if not pdf_content:
-                raise HTTPException(
-                    status_code=404,
-                    detail="PDF下载失败，请使用备用下载选项"
-                )
-            
-            # 返回PDF内容
-            filename = f"{doi.replace('/', '_')}.pdf"
-            return Response(
-                content=pdf_content,
-                media_type="application/pdf",
-                headers={
-                    "Content-Disposition": f"attachment; filename={filename}"
-                }
-            )
-        except Exception as e:
-            logging.error(f"PDF下载失败: {str(e)}")
-            raise HTTPException(
-                status_code=500,
-                detail=f"PDF下载失败: {str(e)}"
-            )
-        
+        filename = f"{doi.replace('/', '_')}.pdf"
+        return await scihub_proxy.response(request, doi, filename)
     except HTTPException as e:
         # 重新抛出HTTP异常
         raise e
@@ -603,7 +625,6 @@ async def scholar_proxy(
         )
         
         # 使用会话和代理请求Google Scholar
-        from .services.scholar_service import GoogleScholarService
         scholar_service = GoogleScholarService()
         result = await scholar_service.search(q)
         
@@ -24,11 +24,16 @@ from .user_activity import UserActivity
 from .search_history import SearchHistory
 from .recommendation import Recommendation, ReadingHistory
 from .citation import Citation
+from .paper_similarity import PaperNeighbor, PaperNeighborStatus
+from .blob import Blob
+from .pdf_text import PdfText, PdfPage
+from .pdf_ingest_job import PdfIngestJob
+from .mirror_health import MirrorHealth
 
 # 导出所有模型
 __all__ = [
     'Base', 'User', 'UserRole', 'Paper', 'Tag', 'Note', 'Concept', 'ConceptRelation',
     'ReadingHistory', 'Recommendation', 'Project', 'SearchHistory',
     'Journal', 'LatestPaper', 'UserInterest', 'UserActivity',
-    'Citation', 'paper_tag', 'project_paper', 'paper_concepts', 'note_concepts'
+    'Citation', 'PaperNeighbor', 'PaperNeighborStatus', 'Blob', 'PdfText', 'PdfPage', 'PdfIngestJob', 'MirrorHealth', 'paper_tag', 'project_paper', 'paper_concepts', 'note_concepts'
 ] 
\ No newline at end of file
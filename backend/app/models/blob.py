@@ -0,0 +1,85 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Index, event, inspect, update, select, func
+from datetime import datetime
+
+from ..database import Base
+from .paper import Paper
+from .user import User
+
+class Blob(Base):
+    """
+    按内容寻址存储的文件（PDF等），相同内容只在磁盘上保存一份
+
+    文件路径由 sha256 决定（见 blob_service），ref_count 为引用该文件的论文数；
+    引用计数为 0 且超过保留期的记录与文件由垃圾回收任务删除。
+    """
+    __tablename__ = "blobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    content_type = Column(String(100))
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # 引用计数最后一次变化的时间，垃圾回收按它判断是否超过保留期
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_blobs_unreferenced", "ref_count", "updated_at"),
+    )
+
+
+def _adjust_refs(connection, user_id, blob_id, delta: int):
+    """引用计数与论文所有者的已用空间一起增减（单条 UPDATE 原子完成，不读后写）"""
+    if blob_id is None:
+        return
+    blobs = Blob.__table__
+    connection.execute(
+        update(blobs)
+        .where(blobs.c.id == blob_id)
+        .values(ref_count=blobs.c.ref_count + delta, updated_at=datetime.utcnow())
+    )
+    if user_id is not None:
+        users = User.__table__
+        size = select(blobs.c.size).where(blobs.c.id == blob_id).scalar_subquery()
+        connection.execute(
+            update(users)
+            .where(users.c.id == user_id)
+            .values(storage_used_bytes=users.c.storage_used_bytes + delta * func.coalesce(size, 0))
+        )
+
+
+def _previous(history, current):
+    return history.deleted[0] if history.deleted else current
+
+
+# 论文的 pdf_blob_id 在 flush 时同步维护引用计数与所有者的已用空间，与论文的变更在同一事务中提交；
+# 批量 insert()/update() 语句不经过这些事件，由垃圾回收与存储校正任务按 papers 表重新计算。
+
+@event.listens_for(Paper, "after_insert")
+def _paper_inserted(mapper, connection, target):
+    _adjust_refs(connection, target.user_id, target.pdf_blob_id, 1)
+
+
+@event.listens_for(Paper, "after_update")
+def _paper_updated(mapper, connection, target):
+    state = inspect(target)
+    blob_history = state.attrs.pdf_blob_id.history
+    user_history = state.attrs.user_id.history
+    if not blob_history.has_changes() and not user_history.has_changes():
+        return
+    _adjust_refs(connection, _previous(user_history, target.user_id),
+                 _previous(blob_history, target.pdf_blob_id), -1)
+    _adjust_refs(connection, target.user_id, target.pdf_blob_id, 1)
+
+
+@event.listens_for(Paper, "before_delete")
+def _paper_deleted(mapper, connection, target):
+    # 删除语句执行前读取（属性已过期时需要从库中加载）
+    _adjust_refs(connection, target.user_id, target.pdf_blob_id, -1)
+
+
+@event.listens_for(Paper.pdf_blob_id, "set", active_history=True)
+@event.listens_for(Paper.user_id, "set", active_history=True)
+def _load_previous_value(target, value, oldvalue, initiator):
+    # active_history 使赋值前加载旧值，after_update 才能释放原来的引用与已用空间
+    return value
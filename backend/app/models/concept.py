@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -45,4 +45,9 @@ class ConceptRelation(Base):
     
     # 关系
     source = relationship("Concept", foreign_keys=[source_id], back_populates="source_relations")
-    target = relationship("Concept", foreign_keys=[target_id], back_populates="target_relations") 
\ No newline at end of file
+    target = relationship("Concept", foreign_keys=[target_id], back_populates="target_relations")
+
+    __table_args__ = (
+        Index("ix_concept_relations_source_target", "source_id", "target_id"),
+        Index("ix_concept_relations_target", "target_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -43,4 +43,8 @@ class LatestPaper(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # 关系
-    journal = relationship("Journal", back_populates="latest_papers") 
\ No newline at end of file
+    journal = relationship("Journal", back_populates="latest_papers")
+
+    __table_args__ = (
+        Index("ix_latest_papers_created", "created_at"),
+    )
@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, Index
+from datetime import datetime
+
+from ..database import Base
+
+class MirrorHealth(Base):
+    """
+    外部镜像（Sci-Hub、谷歌学术等）的健康状况
+
+    score 为探测与实际请求成功率的指数加权移动平均（0-1），latency_ms 为成功请求耗时的加权平均；
+    由 services/mirror_health_service.py 在后台刷新，进程重启后从这里恢复。
+    """
+    __tablename__ = "mirror_health"
+
+    id = Column(Integer, primary_key=True, index=True)
+    service = Column(String(50), nullable=False)
+    url = Column(String(255), nullable=False)
+    score = Column(Float, nullable=False, default=0.5)
+    latency_ms = Column(Float)
+    # 连续失败次数
+    failures = Column(Integer, nullable=False, default=0)
+    checked_at = Column(DateTime, default=datetime.utcnow)
+    last_ok_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_mirror_health_service_url", "service", "url", unique=True),
+    )
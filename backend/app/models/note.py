@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database import Base
@@ -27,4 +27,8 @@ class Note(Base):
     # 关联
     user = relationship("User", back_populates="notes")
     paper = relationship("Paper", back_populates="notes")
-    concepts = relationship("Concept", secondary=note_concepts, back_populates="notes") 
\ No newline at end of file
+    concepts = relationship("Concept", secondary=note_concepts, back_populates="notes")
+
+    __table_args__ = (
+        Index("ix_notes_paper_user", "paper_id", "user_id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Table, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Table, Float, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -46,6 +46,7 @@ class Paper(Base):
     source = Column(String(255))  # 论文来源，如arxiv, ieee等
     year = Column(Integer)  # 出版年份冗余存储
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=True)  # 项目ID
+    pdf_blob_id = Column(Integer, ForeignKey("blobs.id"), nullable=True, index=True)  # PDF文件（按内容寻址存储）
     
     # 关系
     user = relationship("User", back_populates="papers")
@@ -59,6 +60,12 @@ class Paper(Base):
     citations_to = relationship("Citation", foreign_keys="Citation.paper_id", back_populates="paper", cascade="all, delete-orphan")
     citations_from = relationship("Citation", foreign_keys="Citation.cited_paper_id", back_populates="cited_paper", cascade="all, delete-orphan")
     journal_relation = relationship("Journal", back_populates="papers")
+    pdf_blob = relationship("Blob")
+
+    __table_args__ = (
+        Index("ix_papers_user_created", "user_id", "created_at"),
+        Index("ix_papers_user_year", "user_id", "year"),
+    )
 
 class Tag(Base):
     """标签模型"""
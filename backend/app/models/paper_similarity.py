@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
+from datetime import datetime
+
+from ..database import Base
+
+class PaperNeighbor(Base):
+    """论文相似近邻表，持久化每篇论文的top-k相似论文"""
+    __tablename__ = "paper_neighbors"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    neighbor_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    score = Column(Float, nullable=False)  # 综合相似度
+    shared_concepts = Column(Integer, default=0)
+    concept_similarity = Column(Float, default=0.0)
+    title_similarity = Column(Float, default=0.0)
+    author_similarity = Column(Float, default=0.0)
+    venue_similarity = Column(Float, default=0.0)
+    year_similarity = Column(Float, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_paper_neighbors_paper_score", "paper_id", "score"),
+        Index("ix_paper_neighbors_neighbor", "neighbor_id"),
+        Index("ix_paper_neighbors_user", "user_id"),
+    )
+
+
+class PaperNeighborStatus(Base):
+    """论文近邻表的计算时间；没有相似论文的论文也有记录，读取时据此判断无需重新计算"""
+    __tablename__ = "paper_neighbor_status"
+
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_paper_neighbor_status_user", "user_id"),
+    )
@@ -0,0 +1,57 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, event, inspect, insert
+from sqlalchemy.orm import object_session
+from datetime import datetime
+
+from ..database import Base
+from .paper import Paper
+
+class PdfIngestJob(Base):
+    """
+    PDF入库处理队列（元数据补全、参考文献关联、缩略图）
+
+    论文的PDF变更时在同一事务中写入（见 services/pdf_ingest_service.py），由后台任务按 id 顺序领取；
+    status: pending / running / done / failed / skipped（论文已删除或PDF已被替换）。
+    """
+    __tablename__ = "pdf_ingest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    paper_id = Column(Integer, ForeignKey("papers.id", ondelete="CASCADE"), nullable=False)
+    # 不设外键：任务完成后文件仍可能被垃圾回收
+    blob_id = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(String(500))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_pdf_ingest_jobs_status", "status", "id"),
+    )
+
+
+# 论文获得新的PDF时在同一事务中入队；提交后由 pdf_ingest_service 的会话事件唤醒后台任务
+PENDING_KEY = "pdf_ingest_pending"
+
+
+def _enqueue(connection, target):
+    connection.execute(
+        insert(PdfIngestJob.__table__).values(
+            paper_id=target.id, blob_id=target.pdf_blob_id, status="pending", attempts=0,
+            created_at=datetime.utcnow(), updated_at=datetime.utcnow(),
+        )
+    )
+    session = object_session(target)
+    if session is not None:
+        session.info[PENDING_KEY] = True
+
+
+@event.listens_for(Paper, "after_insert")
+def _paper_inserted(mapper, connection, target):
+    if target.pdf_blob_id is not None:
+        _enqueue(connection, target)
+
+
+@event.listens_for(Paper, "after_update")
+def _paper_updated(mapper, connection, target):
+    if target.pdf_blob_id is not None and inspect(target).attrs.pdf_blob_id.history.has_changes():
+        _enqueue(connection, target)
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime
+
+from ..database import Base
+
+class PdfText(Base):
+    """
+    PDF解析结果缓存（文档级），按文件内容的 sha256 索引
+
+    相同内容只解析一次；逐页文本保存在 pdf_pages，元数据、参考文献与概念提取都从缓存读取。
+    文件被垃圾回收时缓存一起删除（见 blob_service.collect_garbage）。
+    """
+    __tablename__ = "pdf_texts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, nullable=False, index=True)
+    page_count = Column(Integer, nullable=False, default=0)
+    extractor = Column(String(20))  # pymupdf / pypdf2
+    # PDF文档信息字段
+    title = Column(String(500))
+    author = Column(String(500))
+    subject = Column(String(500))
+    keywords = Column(String(500))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class PdfPage(Base):
+    """PDF逐页文本缓存"""
+    __tablename__ = "pdf_pages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), nullable=False)
+    page_number = Column(Integer, nullable=False)  # 从1开始
+    text = Column(Text, nullable=False, default="")
+
+    __table_args__ = (
+        Index("ix_pdf_pages_sha256_page", "sha256", "page_number", unique=True),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database import Base
@@ -21,6 +21,11 @@ class ReadingHistory(Base):
     user = relationship("User", back_populates="reading_histories")
     paper = relationship("Paper", back_populates="reading_histories")
 
+    __table_args__ = (
+        Index("ix_reading_history_user_paper", "user_id", "paper_id"),
+        Index("ix_reading_history_paper", "paper_id"),
+    )
+
 # 推荐结果表
 class Recommendation(Base):
     __tablename__ = "recommendations"
@@ -36,4 +41,8 @@ class Recommendation(Base):
 
     # 关联关系
     user = relationship("User", back_populates="recommendations")
-    paper = relationship("Paper", back_populates="recommendations") 
\ No newline at end of file
+    paper = relationship("Paper", back_populates="recommendations")
+
+    __table_args__ = (
+        Index("ix_recommendations_user_score", "user_id", "score"),
+    )
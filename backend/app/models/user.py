@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, DateTime, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -19,6 +19,9 @@ class User(Base):
     bio = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True)
     last_login = Column(DateTime, nullable=True)
+    storage_capacity = Column(Integer, default=1024)  # 存储容量，单位MB，为空时使用默认容量
+    # 论文引用的文件总字节数，随论文PDF的变更在同一事务中原子增减（见 models/blob.py），由定时任务校正
+    storage_used_bytes = Column(BigInteger, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -16,4 +16,8 @@ class UserActivity(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     # 关系
-    user = relationship("User", back_populates="activities") 
\ No newline at end of file
+    user = relationship("User", back_populates="activities")
+
+    __table_args__ = (
+        Index("ix_user_activities_user_created", "user_id", "created_at"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, Float, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -17,4 +17,8 @@ class UserInterest(Base):
     
     # 关系
     user = relationship("User", back_populates="interests")
-    concept = relationship("Concept", back_populates="user_interests") 
\ No newline at end of file
+    concept = relationship("Concept", back_populates="user_interests")
+
+    __table_args__ = (
+        Index("ix_user_interests_user_concept", "user_id", "concept_id"),
+    )
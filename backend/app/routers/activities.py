@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -7,6 +8,7 @@ import logging
 from ..dependencies import get_db, get_current_user
 from ..models import User, UserActivity
 from ..schemas.activity import ActivityResponse
+from ..utils.pagination import Keyset, InvalidCursor, paginate, count_cache
 
 router = APIRouter(
     prefix="/activities",
@@ -18,31 +20,40 @@ logger = logging.getLogger(__name__)
 
 @router.get("/", response_model=List[ActivityResponse])
 async def get_user_activities(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     activity_type: Optional[str] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取用户的活动记录"""
+    """获取用户的活动记录（cursor 游标翻页，见 X-Next-Cursor / X-Total-Count 响应头）"""
     try:
         # 构建查询
-        query = db.query(UserActivity).filter(UserActivity.user_id == current_user.id)
+        query = select(UserActivity).where(UserActivity.user_id == current_user.id)
         
         # 应用过滤条件
         if activity_type:
-            query = query.filter(UserActivity.activity_type == activity_type)
+            query = query.where(UserActivity.activity_type == activity_type)
         if start_date:
-            query = query.filter(UserActivity.created_at >= start_date)
+            query = query.where(UserActivity.created_at >= start_date)
         if end_date:
-            query = query.filter(UserActivity.created_at <= end_date)
-        
-        # 按时间倒序排序并分页
-        activities = query.order_by(UserActivity.created_at.desc()).offset(skip).limit(limit).all()
+            query = query.where(UserActivity.created_at <= end_date)
         
-        return activities
+        # 按时间倒序游标分页
+        page = paginate(db, query, Keyset(UserActivity.created_at, UserActivity.id),
+                        limit=limit, cursor=cursor, skip=skip)
+        page.total = count_cache.count(
+            db, ("user_activities", current_user.id, activity_type, start_date, end_date),
+            ("user_activities",), query
+        )
+        page.apply_headers(response)
+        return page.items
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取用户活动记录失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取用户活动记录失败: {str(e)}")
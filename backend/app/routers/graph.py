@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ..dependencies import get_db, get_current_user
@@ -12,7 +12,8 @@ from ..schemas.graph import (
     ConceptRelationUpdate
 )
 from ..schemas.paper import Paper
-from sqlalchemy import func
+from ..utils.pagination import Keyset, InvalidCursor, paginate, count_cache
+from sqlalchemy import func, select
 import logging
 
 router = APIRouter(
@@ -25,15 +26,24 @@ logger = logging.getLogger(__name__)
 
 @router.get("/concepts/", response_model=List[ConceptNode])
 async def get_concepts(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取概念列表"""
     try:
-        concepts = db.query(Concept).offset(skip).limit(limit).all()
-        return concepts
+        # 按ID游标分页（cursor 取自上一页的 X-Next-Cursor 响应头）
+        query = select(Concept)
+        page = paginate(db, query, Keyset(Concept.id, Concept.id, descending=False),
+                        limit=limit, cursor=cursor, skip=skip)
+        page.total = count_cache.count(db, ("concepts",), ("concepts",), query)
+        page.apply_headers(response)
+        return page.items
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取概念列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取概念列表失败: {str(e)}")
@@ -1,10 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Body, Form, File, UploadFile
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Body, Form, File, UploadFile, BackgroundTasks, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, select
 from typing import List, Dict, Any, Optional, Set
 import logging
-from collections import Counter
-import re
 import networkx as nx
 from itertools import combinations
 from pydantic import BaseModel
@@ -21,6 +19,13 @@ from ..schemas.knowledge_graph import (
     PaperSimilarity,
     DetailedSimilarity
 )
+from ..services.paper_similarity_service import paper_similarity_service
+from ..services.graph_analytics_service import graph_analytics_service
+from ..services.pdf_service import pdf_service
+from ..services.blob_service import blob_service
+from ..utils.concept_terms import extract_concept_terms
+from ..utils.string_similarity import text_similarity
+from ..utils.pagination import Keyset, InvalidCursor, paginate, count_cache
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -54,14 +59,23 @@ async def create_concept(
 
 @router.get("/concepts/", response_model=List[ConceptSchema])
 async def get_concepts(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     try:
-        concepts = db.query(Concept).offset(skip).limit(limit).all()
-        return concepts
+        # 按ID游标分页（cursor 取自上一页的 X-Next-Cursor 响应头）
+        query = select(Concept)
+        page = paginate(db, query, Keyset(Concept.id, Concept.id, descending=False),
+                        limit=limit, cursor=cursor, skip=skip)
+        page.total = count_cache.count(db, ("concepts",), ("concepts",), query)
+        page.apply_headers(response)
+        return page.items
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取概念失败: {e}")
         raise HTTPException(
@@ -129,6 +143,7 @@ async def create_relation(
 
 @router.get("/knowledge-graph")
 def get_graph(
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -152,6 +167,12 @@ def get_graph(
             ).scalar() or 0
             concept_papers_count[concept.id] = paper_count
         
+        # 使用缓存的PageRank（可能略旧），不在本请求中计算
+        analytics = graph_analytics_service.cached()
+        if analytics is None:
+            background_tasks.add_task(graph_analytics_service.refresh)
+        pagerank = analytics.pagerank if analytics else {}
+        
         # 构建图数据
         nodes = [
             {
@@ -165,6 +186,7 @@ def get_graph(
                 # 添加更多元数据用于前端交互和展示
                 "weight": 1.0, # 默认权重
                 "paperCount": concept_papers_count[c.id],
+                "pagerank": pagerank.get(c.id, 0.0),
                 "createdAt": c.created_at.isoformat() if hasattr(c, 'created_at') else None,
                 "updatedAt": c.updated_at.isoformat() if hasattr(c, 'updated_at') else None
             }
@@ -327,70 +349,33 @@ async def get_papers_by_concept(
 
 # 新添加的功能：从论文中提取关键概念
 @router.post("/extract-concepts/{paper_id}")
-async def extract_concepts_from_paper(
+def extract_concepts_from_paper(
     paper_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """从论文标题和摘要中提取关键概念并添加到知识图谱中"""
+    """
+    从论文标题和摘要（没有摘要时从PDF正文）中提取关键概念并添加到知识图谱中
+
+    PDF解析是同步阻塞的，路由为普通函数，在线程池中执行。
+    """
     paper = db.query(Paper).filter(Paper.id == paper_id, Paper.user_id == current_user.id).first()
     if not paper:
         raise HTTPException(status_code=404, detail="论文不存在或无权访问")
         
-    if not paper.abstract or paper.abstract.strip() == "":
+    if paper.abstract and paper.abstract.strip():
+        top_concepts = extract_concept_terms(f"{paper.title} {paper.abstract}", paper.title)
+    elif paper.pdf_blob is not None:
+        # 没有摘要时从PDF正文提取（读取解析缓存，同一文件只解析一次）
+        top_concepts = pdf_service.extract_concepts(
+            db, blob_service.path_of(paper.pdf_blob), paper.pdf_blob.sha256, title=paper.title
+        )
+        if top_concepts is None:
+            raise HTTPException(status_code=400, detail="PDF文件无法解析，无法提取概念")
+    else:
         raise HTTPException(status_code=400, detail="论文没有摘要，无法提取概念")
     
-    # 改进的关键词提取算法
-    text = f"{paper.title} {paper.abstract}"
-    
-    # 使用预定义的停用词和正则表达式过滤常见单词
-    stop_words = {
-        "the", "a", "an", "and", "or", "but", "if", "then", "of", "at", "to", "for", "with", "by", 
-        "in", "on", "is", "are", "was", "were", "be", "this", "that", "have", "has", "had",
-        "do", "does", "did", "can", "could", "will", "would", "shall", "should", "may", "might",
-        "i", "you", "he", "she", "it", "we", "they", "their", "our", "my", "your", "his", "her",
-        "its", "there", "here", "where", "when", "why", "how", "what", "who", "which", "such",
-        "some", "any", "all", "many", "much", "more", "most", "other", "another", "each", "every"
-    }
-    
-    # 提取单词和短语
-    # 先尝试提取2-3个词的短语
-    phrases = re.findall(r'\b[a-zA-Z][a-zA-Z\-]{2,}\s+(?:[a-zA-Z][a-zA-Z\-]{2,}\s+){0,2}[a-zA-Z][a-zA-Z\-]{2,}\b', text.lower())
-    
-    # 提取单个重要术语
-    words = re.findall(r'\b[a-zA-Z][a-zA-Z\-]{2,}\b', text.lower())
-    
-    # 过滤停用词
-    filtered_words = [word for word in words if word not in stop_words]
-    filtered_phrases = []
-    
-    for phrase in phrases:
-        parts = phrase.split()
-        # 如果短语中所有单词都不是停用词
-        if all(part not in stop_words for part in parts):
-            filtered_phrases.append(phrase)
-    
-    # 组合短语和单词
-    all_concepts = filtered_phrases + filtered_words
-    
-    # 计算词频
-    concept_counts = Counter(all_concepts)
-    
-    # 选择频率较高的概念（至少出现1次）
-    # 优先选择短语，因为短语通常更有意义
-    top_phrases = [phrase for phrase, count in concept_counts.most_common(20) if len(phrase.split()) > 1 and count >= 1]
-    top_single_words = [word for word, count in concept_counts.most_common(20) if len(word.split()) == 1 and count >= 2]
-    
-    # 限制概念总数量
-    top_concepts = top_phrases[:10] + top_single_words[:10] 
-    
-    # 如果没有提取到任何概念，尝试使用文章标题作为概念
-    if not top_concepts and paper.title:
-        title_parts = paper.title.lower().split()
-        title_parts = [part for part in title_parts if part not in stop_words and len(part) > 3]
-        if title_parts:
-            top_concepts = [' '.join(title_parts[:3]) if len(title_parts) > 2 else ' '.join(title_parts)]
-    
     # 如果还是没有概念，返回错误
     if not top_concepts:
         raise HTTPException(status_code=400, detail="无法从论文中提取有效概念，请手动添加")
@@ -447,6 +432,9 @@ async def extract_concepts_from_paper(
     
     db.commit()
     
+    # 概念变化后在后台增量更新相似度近邻表
+    background_tasks.add_task(paper_similarity_service.refresh_paper_task, current_user.id, paper.id)
+    
     return {
         "paper_id": paper.id,
         "title": paper.title,
@@ -455,18 +443,18 @@ async def extract_concepts_from_paper(
 
 # 新添加的功能：批量从论文中提取概念
 @router.post("/batch-extract-concepts")
-async def batch_extract_concepts(
+def batch_extract_concepts(
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
     limit: int = Query(10, description="要处理的论文数量限制")
 ):
-    """批量从论文中提取概念并构建知识图谱"""
-    # 获取用户的论文，优先处理有摘要的论文
+    """批量从论文中提取概念并构建知识图谱（同步路由，在线程池中执行，PDF解析不阻塞事件循环）"""
+    # 获取用户有摘要或有PDF的论文
     papers = (
         db.query(Paper)
         .filter(Paper.user_id == current_user.id)
-        .filter(Paper.abstract != None)
-        .filter(Paper.abstract != "")
+        .filter(or_(and_(Paper.abstract != None, Paper.abstract != ""), Paper.pdf_blob_id != None))
         .limit(limit)
         .all()
     )
@@ -475,55 +463,24 @@ async def batch_extract_concepts(
         return {
             "processed_count": 0,
             "details": [],
-            "message": "没有找到可处理的论文，请确保论文有摘要"
+            "message": "没有找到可处理的论文，请确保论文有摘要或PDF"
         }
     
+    # 没有摘要的论文从PDF正文提取：未缓存的PDF先在进程池中并行解析
+    pdf_papers = [paper for paper in papers if not (paper.abstract and paper.abstract.strip())]
+    if pdf_papers:
+        pdf_service.load_many(db, [(blob_service.path_of(paper.pdf_blob), paper.pdf_blob.sha256) for paper in pdf_papers])
+    
     results = []
     for paper in papers:
         try:
             # 使用与单个论文相同的提取逻辑
-            text = f"{paper.title} {paper.abstract}"
-            
-            # 使用预定义的停用词
-            stop_words = {
-                "the", "a", "an", "and", "or", "but", "if", "then", "of", "at", "to", "for", "with", "by", 
-                "in", "on", "is", "are", "was", "were", "be", "this", "that", "have", "has", "had",
-                "do", "does", "did", "can", "could", "will", "would", "shall", "should", "may", "might",
-                "i", "you", "he", "she", "it", "we", "they", "their", "our", "my", "your", "his", "her",
-                "its", "there", "here", "where", "when", "why", "how", "what", "who", "which", "such",
-                "some", "any", "all", "many", "much", "more", "most", "other", "another", "each", "every"
-            }
-            
-            # 提取短语和单词
-            phrases = re.findall(r'\b[a-zA-Z][a-zA-Z\-]{2,}\s+(?:[a-zA-Z][a-zA-Z\-]{2,}\s+){0,2}[a-zA-Z][a-zA-Z\-]{2,}\b', text.lower())
-            words = re.findall(r'\b[a-zA-Z][a-zA-Z\-]{2,}\b', text.lower())
-            
-            # 过滤
-            filtered_words = [word for word in words if word not in stop_words]
-            filtered_phrases = []
-            
-            for phrase in phrases:
-                parts = phrase.split()
-                if all(part not in stop_words for part in parts):
-                    filtered_phrases.append(phrase)
-            
-            # 组合和计数
-            all_concepts = filtered_phrases + filtered_words
-            concept_counts = Counter(all_concepts)
-            
-            # 选择最佳概念
-            top_phrases = [phrase for phrase, count in concept_counts.most_common(20) if len(phrase.split()) > 1 and count >= 1]
-            top_single_words = [word for word, count in concept_counts.most_common(20) if len(word.split()) == 1 and count >= 2]
-            
-            # 限制概念总数
-            top_concepts = top_phrases[:10] + top_single_words[:10]
-            
-            # 如果没有提取到概念，尝试使用标题
-            if not top_concepts and paper.title:
-                title_parts = paper.title.lower().split()
-                title_parts = [part for part in title_parts if part not in stop_words and len(part) > 3]
-                if title_parts:
-                    top_concepts = [' '.join(title_parts[:3]) if len(title_parts) > 2 else ' '.join(title_parts)]
+            if paper.abstract and paper.abstract.strip():
+                top_concepts = extract_concept_terms(f"{paper.title} {paper.abstract}", paper.title)
+            else:
+                top_concepts = pdf_service.extract_concepts(
+                    db, blob_service.path_of(paper.pdf_blob), paper.pdf_blob.sha256, title=paper.title
+                ) or []
             
             # 如果没有有效概念，跳过这篇论文
             if not top_concepts:
@@ -581,6 +538,11 @@ async def batch_extract_concepts(
             logger.error(f"处理论文 {paper.id} 时出错: {str(e)}")
     
     db.commit()
+    
+    # 概念变化后在后台增量更新相似度近邻表
+    for result in results:
+        background_tasks.add_task(paper_similarity_service.refresh_paper_task, current_user.id, result["paper_id"])
+    
     return {
         "processed_count": len(results),
         "details": results,
@@ -590,45 +552,9 @@ async def batch_extract_concepts(
 # 辅助函数：计算文本相似度（使用Levenshtein距离归一化版本）
 def calculate_text_similarity(text1: str, text2: str) -> float:
     """计算两个文本字符串之间的相似度"""
-    if not text1 or not text2:
-        return 0.0
-    
-    # 转换为小写以忽略大小写
-    s1 = text1.lower()
-    s2 = text2.lower()
-    
-    # 如果字符串完全相同，返回1
-    if s1 == s2:
-        return 1.0
-    
-    # 计算Levenshtein距离
-    def levenshtein_distance(str1, str2):
-        m, n = len(str1), len(str2)
-        # 创建距离矩阵
-        dp = [[0 for _ in range(n+1)] for _ in range(m+1)]
-        
-        # 初始化第一行和第一列
-        for i in range(m+1):
-            dp[i][0] = i
-        for j in range(n+1):
-            dp[0][j] = j
-        
-        # 填充距离矩阵
-        for i in range(1, m+1):
-            for j in range(1, n+1):
-                cost = 0 if str1[i-1] == str2[j-1] else 1
-                dp[i][j] = min(
-                    dp[i-1][j] + 1,      # 删除
-                    dp[i][j-1] + 1,      # 插入
-                    dp[i-1][j-1] + cost  # 替换或匹配
-                )
-        
-        return dp[m][n]
-    
-    # 计算归一化相似度 (1 - normalized_distance)
-    distance = levenshtein_distance(s1, s2)
-    max_length = max(len(s1), len(s2))
-    return 1 - (distance / max_length) if max_length > 0 else 0
+    # 两行DP实现；两篇论文的相似度明细要返回精确值，不传阈值（不提前退出）
+    # 一对多并按阈值筛选的标题比较见相似度索引（paper_similarity_service）
+    return text_similarity(text1, text2)
 
 # 辅助函数：计算作者相似度
 def calculate_author_similarity(authors1: str, authors2: str) -> float:
@@ -748,7 +674,8 @@ def calculate_comprehensive_similarity(
 
 # 新添加的功能：计算论文相似度
 @router.post("/paper-similarity", response_model=List[PaperSimilarity])
-async def calculate_paper_similarity(
+def calculate_paper_similarity(
+    background_tasks: BackgroundTasks,
     paper_id: int = Query(..., description="要计算相似度的论文ID"),
     threshold: float = Query(0.3, ge=0, le=1, description="相似度阈值"),
     limit: int = Query(10, ge=1, le=50, description="返回结果数量限制"),
@@ -772,7 +699,7 @@ async def calculate_paper_similarity(
     paper_concept_ids = {concept.id for concept in paper_concepts_query}
     if not paper_concept_ids:
         # 如果论文没有关联概念，先尝试提取
-        await extract_concepts_from_paper(paper_id, db, current_user)
+        extract_concepts_from_paper(paper_id, background_tasks, db, current_user)
         
         # 重新查询概念
         paper_concepts_query = (
@@ -786,83 +713,110 @@ async def calculate_paper_similarity(
         if not paper_concept_ids:
             raise HTTPException(status_code=400, detail="无法从论文中提取概念")
     
-    # 查找用户的所有论文，而不仅仅是共享概念的论文
-    user_papers_query = (
-        db.query(
-            Paper.id,
-            Paper.title,
-            Paper.authors,
-            Paper.year,
-            Paper.venue,
-            Paper.journal
-        )
-        .filter(
-            Paper.id != paper_id,
-            Paper.user_id == current_user.id
-        )
-        .all()
+    # 从相似度索引读取top-k近邻（向量化打分并持久化在paper_neighbors表中）
+    return paper_similarity_service.similar_papers(
+        db, current_user.id, paper_id, limit=limit, threshold=threshold
     )
-    
-    # 计算综合相似度
-    similarities = []
-    for p in user_papers_query:
-        # 获取论文的概念
-        other_paper_concepts = (
-            db.query(Concept.id)
-            .join(paper_concepts, Concept.id == paper_concepts.c.concept_id)
-            .filter(paper_concepts.c.paper_id == p.id)
-            .all()
-        )
-        other_concept_ids = {concept.id for concept in other_paper_concepts}
-        
-        # 计算共享概念数量
-        shared_concepts = len(paper_concept_ids.intersection(other_concept_ids))
-        
-        # 计算各维度相似度
-        # 1. 概念相似度 (Jaccard系数)
-        concept_union = len(paper_concept_ids.union(other_concept_ids))
-        concept_similarity = shared_concepts / concept_union if concept_union > 0 else 0
-        
-        # 2. 标题相似度
-        title_similarity = calculate_text_similarity(paper.title, p.title)
-        
-        # 3. 作者相似度
-        author_similarity = calculate_author_similarity(paper.authors, p.authors)
-        
-        # 4. 期刊/会议相似度
-        paper1_venue = paper.venue if paper.venue else paper.journal
-        paper2_venue = p.venue if p.venue else p.journal
-        venue_similarity = calculate_venue_similarity(paper1_venue, paper2_venue)
-        
-        # 5. 年份相近度
-        year_similarity = calculate_year_similarity(paper.year, p.year)
-        
-        # 计算综合相似度
-        comprehensive_similarity = calculate_comprehensive_similarity(
-            paper, p, paper_concept_ids, {concept.id for concept in other_paper_concepts}, shared_concepts
-        )
-        
-        if comprehensive_similarity >= threshold:
-            similarities.append({
-                "paper_id": p.id,
-                "title": p.title,
-                "authors": p.authors,
-                "year": p.year,
-                "similarity": comprehensive_similarity,
-                "shared_concepts": shared_concepts,
-                "concept_similarity": concept_similarity,
-                "title_similarity": title_similarity,
-                "author_similarity": author_similarity,
-                "venue_similarity": venue_similarity,
-                "year_similarity": year_similarity,
-                "source_id": paper_id,
-                "target_id": p.id,
-                "abstract_similarity": 0.0  # 默认值，如果有计算可以替换
-            })
-    
-    # 按相似度排序并限制结果数量
-    similarities.sort(key=lambda x: x["similarity"], reverse=True)
-    return similarities[:limit]
+
+@router.post("/paper-similarity/rebuild")
+def rebuild_paper_similarity(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """全量重建当前用户的论文相似度索引（同步路由，在线程池中执行，不阻塞事件循环）"""
+    try:
+        count = paper_similarity_service.rebuild(db, current_user.id)
+        return {"status": "success", "paper_count": count}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"重建相似度索引失败: {e}")
+        raise HTTPException(status_code=500, detail=f"重建相似度索引失败: {e}")
+
+def _analytics_meta(snapshot, stale: bool) -> Dict[str, Any]:
+    return {
+        "computed_at": snapshot.computed_at.isoformat(),
+        "stale": stale,
+        "concept_count": len(snapshot.concepts)
+    }
+
+@router.get("/graph-analytics/ranking")
+def get_concept_ranking(
+    background_tasks: BackgroundTasks,
+    sort_by: str = Query("pagerank", pattern="^(pagerank|degree_centrality)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    按PageRank或度中心性对概念排序
+
+    分析路由都是普通函数：首次请求要同步计算PageRank与社区划分，在线程池中执行，不阻塞事件循环。
+    """
+    try:
+        snapshot, stale = graph_analytics_service.get_snapshot(db, background_tasks)
+        scores = snapshot.pagerank if sort_by == "pagerank" else snapshot.degree
+        ranked = sorted(snapshot.concepts, key=lambda cid: scores.get(cid, 0.0), reverse=True)[:limit]
+        return {
+            **_analytics_meta(snapshot, stale),
+            "concepts": [snapshot.concept_stats(cid) for cid in ranked]
+        }
+    except Exception as e:
+        logger.error(f"获取概念排名失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取概念排名失败: {e}")
+
+@router.get("/graph-analytics/communities")
+def get_concept_communities(
+    background_tasks: BackgroundTasks,
+    min_size: int = Query(1, ge=1),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取概念社区划分与连通分量"""
+    try:
+        snapshot, stale = graph_analytics_service.get_snapshot(db, background_tasks)
+        communities = [
+            {
+                "id": i,
+                "size": len(members),
+                "concepts": [{"id": cid, "name": snapshot.concepts.get(cid)} for cid in members]
+            }
+            for i, members in enumerate(snapshot.communities)
+            if len(members) >= min_size
+        ]
+        return {
+            **_analytics_meta(snapshot, stale),
+            "component_count": len(snapshot.components),
+            "component_sizes": [len(c) for c in snapshot.components],
+            "communities": communities
+        }
+    except Exception as e:
+        logger.error(f"获取概念社区失败: {e}")
+        raise HTTPException(status_code=500, detail=f"获取概念社区失败: {e}")
+
+@router.get("/graph-analytics/concepts/{concept_id}")
+def get_concept_analytics(
+    background_tasks: BackgroundTasks,
+    concept_id: int = Path(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取单个概念的中心性与所属社区"""
+    snapshot, stale = graph_analytics_service.get_snapshot(db, background_tasks)
+    if concept_id not in snapshot.concepts:
+        if not stale:
+            raise HTTPException(status_code=404, detail="概念不存在")
+        # 新建的概念尚未进入快照，先返回空指标
+        return {**_analytics_meta(snapshot, stale), "concept": {"id": concept_id}}
+    return {**_analytics_meta(snapshot, stale), "concept": snapshot.concept_stats(concept_id)}
+
+@router.post("/graph-analytics/refresh")
+async def refresh_graph_analytics(
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
+    """在后台重新计算概念图分析结果"""
+    background_tasks.add_task(graph_analytics_service.refresh)
+    return {"status": "scheduled"}
 
 # 新添加的功能：获取推荐阅读路径
 @router.get("/reading-path/{concept_id}")
@@ -1050,6 +1004,7 @@ async def update_concept(
 @router.delete("/concept/{concept_id}")
 async def delete_concept(
     concept_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -1064,6 +1019,13 @@ async def delete_concept(
                 detail="概念不存在"
             )
         
+        # 记录关联的论文，删除后需要更新它们的相似度近邻表
+        affected_paper_ids = [
+            pid for (pid,) in db.query(paper_concepts.c.paper_id).filter(
+                paper_concepts.c.concept_id == concept_id
+            )
+        ]
+        
         # 删除与概念相关的所有关系
         db.query(ConceptRelation).filter(
             or_(
@@ -1076,6 +1038,8 @@ async def delete_concept(
         db.delete(concept)
         db.commit()
         
+        background_tasks.add_task(paper_similarity_service.refresh_papers_task, affected_paper_ids)
+        
         return {"status": "success", "message": "概念已成功删除"}
     except Exception as e:
         logger.error(f"删除概念失败: {e}")
@@ -1117,7 +1081,8 @@ class DetailedSimilarity(BaseModel):
 
 # 添加计算两篇特定论文相似度的接口
 @router.post("/two-papers-similarity", response_model=DetailedSimilarity)
-async def calculate_two_papers_similarity(
+def calculate_two_papers_similarity(
+    background_tasks: BackgroundTasks,
     paper_id1: int = Body(..., embed=True),
     paper_id2: int = Body(..., embed=True),
     db: Session = Depends(get_db),
@@ -1141,7 +1106,7 @@ async def calculate_two_papers_similarity(
     paper1_concept_ids = {concept.id for concept in paper1_concepts}
     if not paper1_concept_ids:
         # 如果论文没有关联概念，先尝试提取
-        await extract_concepts_from_paper(paper_id1, db, current_user)
+        extract_concepts_from_paper(paper_id1, background_tasks, db, current_user)
         
         # 重新查询概念
         paper1_concepts = db.query(Concept.id).join(
@@ -1160,7 +1125,7 @@ async def calculate_two_papers_similarity(
     paper2_concept_ids = {concept.id for concept in paper2_concepts}
     if not paper2_concept_ids:
         # 如果论文没有关联概念，先尝试提取
-        await extract_concepts_from_paper(paper_id2, db, current_user)
+        extract_concepts_from_paper(paper_id2, background_tasks, db, current_user)
         
         # 重新查询概念
         paper2_concepts = db.query(Concept.id).join(
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends
+import logging
+
+from ..dependencies import get_current_admin
+from ..models import User
+from ..utils.query_metrics import metrics_registry
+from ..services.mirror_health_service import mirror_health_service
+
+router = APIRouter(
+    tags=["metrics"],
+    responses={404: {"description": "Not found"}},
+)
+
+logger = logging.getLogger(__name__)
+
+@router.get("/")
+async def get_metrics(current_user: User = Depends(get_current_admin)):
+    """
+    按路由汇总的请求指标
+
+    每个路由包含请求数、错误数、耗时直方图（毫秒）、每请求查询数直方图、
+    数据库总耗时与最慢的语句。直方图为累计计数，键为分桶上界。
+    """
+    return metrics_registry.snapshot()
+
+@router.delete("/")
+async def reset_metrics(current_user: User = Depends(get_current_admin)):
+    """清空已汇总的指标"""
+    metrics_registry.reset()
+    logger.info(f"管理员 {current_user.username} 清空了请求指标")
+    return {"message": "指标已清空"}
+
+@router.get("/mirrors")
+async def get_mirror_health(current_user: User = Depends(get_current_admin)):
+    """外部镜像的健康分数、延迟与最近一次检查时间（按请求中尝试的顺序排列）"""
+    return mirror_health_service.snapshot()
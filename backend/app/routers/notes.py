@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from datetime import datetime
 import logging
 
-from ..dependencies import get_db, get_current_user
+from ..dependencies import get_db, get_current_user, get_async_db, get_current_user_async
 from ..models import User, Paper, Note
 from ..schemas.note import NoteCreate, NoteUpdate, NoteResponse
+from ..utils.pagination import Keyset, InvalidCursor, paginate_async, count_cache
 
 router = APIRouter(
     prefix="/notes",
@@ -62,30 +65,46 @@ async def create_paper_note(
 @router.get("/papers/{paper_id}", response_model=List[NoteResponse])
 async def get_paper_notes(
     paper_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, description="每页条数，不传则返回全部"),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
-    """获取论文的笔记"""
+    """获取论文的笔记（传 limit 时按 cursor 游标翻页，见 X-Next-Cursor / X-Total-Count 响应头）"""
     try:
         # 检查论文是否存在
-        paper = db.query(Paper).filter(Paper.id == paper_id, Paper.user_id == current_user.id).first()
-        if not paper:
+        paper_exists = await db.scalar(
+            select(Paper.id).where(Paper.id == paper_id, Paper.user_id == current_user.id)
+        )
+        if paper_exists is None:
             raise HTTPException(status_code=404, detail="论文不存在或无权访问")
         
         # 获取笔记
-        notes = db.query(Note).filter(Note.paper_id == paper_id, Note.user_id == current_user.id).all()
+        query = select(Note).where(Note.paper_id == paper_id, Note.user_id == current_user.id)
+        page = await paginate_async(db, query, Keyset(Note.id, Note.id, descending=False),
+                                    limit=limit, cursor=cursor)
+        page.total = await count_cache.count_async(
+            db, ("notes", paper_id, current_user.id), ("notes",), query
+        ) if limit is not None else len(page.items)
+        page.apply_headers(response)
+        notes = page.items
         
         return [
             {
                 "id": note.id,
-                "title": note.title,
+                "title": getattr(note, "title", None) or f"第{note.page_number}页笔记",
                 "content": note.content,
                 "page_number": note.page_number,
+                "paper_id": note.paper_id,
+                "user_id": note.user_id,
                 "created_at": note.created_at,
                 "updated_at": note.updated_at
             }
             for note in notes
         ]
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -1,21 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body, File, UploadFile, Form, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Body, File, UploadFile, Form, Query, BackgroundTasks
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 import os
+import json
+import tempfile
 import sqlalchemy.orm
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 import urllib.parse
 
-from ..dependencies import get_db, get_current_user
-from ..models import User, Paper, Tag, UserRole, paper_tag, UserActivity
+from ..config import settings
+from ..database import SessionLocal
+from ..dependencies import get_db, get_current_user, get_async_db, get_current_user_async
+from ..models import User, Paper, Tag, UserRole, paper_tag, UserActivity, Project
 from ..schemas.paper import (
     PaperCreate, 
     PaperUpdate, 
     Paper as PaperSchema,
     PaperWithTags
 )
+from ..services.paper_similarity_service import paper_similarity_service
+from ..services.knowledge_graph_service import knowledge_graph_service
+from ..services.paper_listing_service import paper_listing_service
+from ..services.paper_import_service import paper_import_service
+from ..services.tag_service import tag_service
+from ..services.file_service import file_service
+from ..utils.reference_parsers import FORMATS, detect_format
+from ..utils.pagination import InvalidCursor
 from ..utils import logger
 
 router = APIRouter(
@@ -26,6 +42,7 @@ router = APIRouter(
 
 @router.post("/", response_model=PaperWithTags)
 async def create_paper(
+    background_tasks: BackgroundTasks,
     paper_data: PaperCreate = Body(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -61,67 +78,39 @@ async def create_paper(
         
         logger.info(f"创建论文对象: {paper.title}")
         
-        # 保存Paper
+        # 论文、项目关联与标签在同一个事务中写入，只提交一次
         db.add(paper)
-        db.commit()
-        db.refresh(paper)
-        logger.info(f"论文保存成功，ID: {paper.id}")
+        db.flush()
+        logger.info(f"论文写入成功，ID: {paper.id}")
         
         # 如果指定了项目，也建立项目与论文的多对多关联
         if paper_data.project_id is not None:
             try:
-                # 添加到project_paper关联表
-                logger.info(f"创建论文-项目关联: 论文ID {paper.id}, 项目ID {paper_data.project_id}")
-                db.execute(
-                    text("INSERT INTO project_paper (project_id, paper_id) VALUES (:project_id, :paper_id)"),
-                    {"project_id": paper_data.project_id, "paper_id": paper.id}
-                )
-                db.commit()
+                # 关联失败只回滚到保存点，不影响论文创建
+                with db.begin_nested():
+                    db.execute(
+                        text("INSERT INTO project_paper (project_id, paper_id) VALUES (:project_id, :paper_id)"),
+                        {"project_id": paper_data.project_id, "paper_id": paper.id}
+                    )
                 logger.info(f"论文已添加到项目 {paper_data.project_id}")
             except Exception as e:
                 logger.error(f"添加论文到项目失败: {str(e)}")
-                # 失败不影响论文创建成功
         
-        # 处理标签（如果有的话）
+        # 处理标签（一次查询解析整个标签列表，一次写入全部关联）
         tags = []
-        if paper_data.tags and len(paper_data.tags) > 0:
+        if paper_data.tags:
             try:
-                logger.info(f"开始处理标签: {paper_data.tags}")
-                for tag_name in paper_data.tags:
-                    # 查找或创建标签
-                    tag = db.query(Tag).filter(Tag.name == tag_name).first()
-                    if not tag:
-                        logger.info(f"创建新标签: {tag_name}")
-                        tag = Tag(name=tag_name)
-                        db.add(tag)
-                        db.commit()
-                        db.refresh(tag)
-                    else:
-                        logger.info(f"使用已有标签: {tag_name}, ID: {tag.id}")
-                    
-                    # 使用原始SQL直接添加关联
-                    logger.info(f"添加论文-标签关联: 论文ID {paper.id}, 标签ID {tag.id}")
-                    
-                    # 检查关联是否已存在
-                    existing = db.execute(
-                        text("SELECT 1 FROM paper_tag WHERE paper_id = :paper_id AND tag_id = :tag_id"),
-                        {"paper_id": paper.id, "tag_id": tag.id}
-                    ).fetchone()
-                    
-                    if not existing:
-                        db.execute(
-                            text("INSERT INTO paper_tag (paper_id, tag_id) VALUES (:paper_id, :tag_id)"),
-                            {"paper_id": paper.id, "tag_id": tag.id}
-                        )
-                        db.commit()
-                    
-                    tags.append(tag_name)
-                logger.info("标签处理完成")
+                with db.begin_nested():
+                    tags = tag_service.link(db, paper.id, paper_data.tags)
+                logger.info(f"标签处理完成: {tags}")
             except Exception as tag_error:
                 logger.error(f"添加标签时出错: {str(tag_error)}")
                 logger.exception("标签错误详情")
                 # 标签添加失败不影响论文创建成功
         
+        db.commit()
+        db.refresh(paper)
+        
         # 创建带有标签信息的返回对象
         paper_with_tags = {
             "id": paper.id,
@@ -138,6 +127,10 @@ async def create_paper(
             "tags": tags
         }
         
+        # 在后台增量更新相似度近邻表与知识图谱
+        background_tasks.add_task(paper_similarity_service.refresh_paper_task, current_user.id, paper.id)
+        background_tasks.add_task(knowledge_graph_service.update_graph_task, paper.id)
+        
         logger.info("论文创建完成")
         return paper_with_tags
     except Exception as e:
@@ -146,69 +139,127 @@ async def create_paper(
         logger.exception("详细错误信息")
         raise HTTPException(status_code=500, detail=f"创建论文失败: {str(e)}")
 
+def _discard(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+@router.post("/import")
+async def import_papers(
+    file: UploadFile = File(...),
+    format: Optional[str] = Form(None, description="bibtex / ris / csv，留空按文件名和内容识别"),
+    project_id: Optional[int] = Form(None),
+    tags: Optional[str] = Form(None, description="为每篇导入论文附加的标签，逗号分隔"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量导入题录（BibTeX / RIS / CSV）
+
+    按 DOI 与归一化标题查重，分批事务写入论文、标签与项目关联。
+    响应为 NDJSON 流，每提交一个批次输出一行进度，最后一行为 status 为 completed / failed 的汇总。
+    """
+    if project_id is not None:
+        project = db.query(Project).filter(Project.id == project_id, Project.user_id == current_user.id).first()
+        if not project:
+            raise HTTPException(status_code=404, detail="项目不存在或无权访问")
+
+    # 上传内容先落到临时文件，解析时按行流式读取
+    max_size = settings.IMPORT_MAX_SIZE_MB * 1024 * 1024
+    upload = tempfile.NamedTemporaryFile(prefix="import-", suffix=".tmp", delete=False)
+    try:
+        size = 0
+        while chunk := await file.read(1024 * 1024):
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail=f"导入文件超过 {settings.IMPORT_MAX_SIZE_MB}MB 限制")
+            upload.write(chunk)
+        upload.close()
+
+        with open(upload.name, "rb") as f:
+            head = f.read(4096).decode("utf-8", errors="ignore")
+        fmt = (format or "").lower() or detect_format(file.filename, head)
+        if fmt not in FORMATS:
+            raise HTTPException(status_code=400, detail="无法识别导入格式，请指定 format 为 bibtex、ris 或 csv")
+    except BaseException:
+        upload.close()
+        _discard(upload.name)
+        raise
+
+    extra_tags = [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else []
+    user_id = current_user.id
+    result = {"imported": 0}
+    logger.info(f"开始批量导入论文: 用户 {user_id}, 格式 {fmt}, 文件 {file.filename} ({size} 字节)")
+
+    def progress_lines():
+        # 依赖注入的会话在流式响应开始前就会关闭，导入使用独立会话
+        session = SessionLocal()
+        try:
+            with open(upload.name, "rb") as stream:
+                for progress in paper_import_service.import_stream(
+                    session, stream, fmt, user_id, project_id=project_id, extra_tags=extra_tags
+                ):
+                    result["imported"] = progress["imported"]
+                    yield json.dumps(progress, ensure_ascii=False) + "\n"
+        finally:
+            session.close()
+            _discard(upload.name)
+
+    def finish():
+        # 客户端在流开始前断开时生成器不会执行，临时文件在这里删除
+        _discard(upload.name)
+        if result["imported"]:
+            paper_similarity_service.rebuild_task(user_id)
+
+    return StreamingResponse(
+        progress_lines(),
+        media_type="application/x-ndjson",
+        background=BackgroundTask(finish),
+    )
+
 @router.get("/", response_model=List[PaperWithTags])
 async def get_papers(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="上一页响应头 X-Next-Cursor 的值"),
     search: Optional[str] = None,
     year: Optional[int] = None,
     tags: Optional[str] = None,
     sort_by: Optional[str] = None,
     sort_order: Optional[str] = "desc",
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
-    """获取当前用户的所有论文"""
+    """
+    获取当前用户的所有论文
+
+    使用 cursor 游标翻页（下一页游标在 X-Next-Cursor 响应头中，总数在 X-Total-Count 中），
+    skip 偏移分页仍然可用。
+    """
     try:
         logger.info("开始获取论文列表")
-        query = db.query(Paper).filter(Paper.user_id == current_user.id)
-        
-        # 添加搜索过滤
-        if search:
-            search_term = f"%{search}%"
-            query = query.filter(
-                (Paper.title.ilike(search_term)) | 
-                (Paper.abstract.ilike(search_term)) |
-                (Paper.authors.ilike(search_term))
-            )
-        
-        # 按年份过滤
-        if year:
-            query = query.filter(Paper.year == year)
-            
-        # 按标签过滤
-        if tags:
-            tag_list = [tag.strip() for tag in tags.split(",")]
-            for tag in tag_list:
-                query = query.filter(Paper.tags.any(name=tag))
-        
-        # 添加排序
-        if sort_by:
-            sort_column = getattr(Paper, sort_by, None)
-            if sort_column:
-                if sort_order.lower() == "desc":
-                    query = query.order_by(sort_column.desc())
-                else:
-                    query = query.order_by(sort_column.asc())
-            else:
-                # 默认按创建时间倒序排列
-                query = query.order_by(Paper.created_at.desc())
-        else:
-            # 默认按创建时间倒序排列
-            query = query.order_by(Paper.created_at.desc())
-            
-        logger.info(f"执行查询: 跳过 {skip}, 限制 {limit}")
-        papers = query.offset(skip).limit(limit).all()
-        logger.info(f"查询结果: {len(papers)} 条论文")
-        
-        # 为每篇论文构建返回结果
-        result = []
-        for paper in papers:
-            paper_with_tags = PaperWithTags.from_orm(paper)
-            paper_with_tags.tags = [tag.name for tag in paper.tags]
-            result.append(paper_with_tags)
-            
-        return result
+        tag_list = [tag.strip() for tag in tags.split(",")] if tags else None
+        # 标签用一次IN查询预加载，整页只需两次查询（总数缓存未命中时再加一次COUNT）
+        page = await paper_listing_service.list_page_async(
+            db,
+            include=("tags",),
+            user_id=current_user.id,
+            search=search,
+            year=year,
+            tags=tag_list,
+            sort_by=sort_by,
+            sort_order=sort_order,
+            cursor=cursor,
+            skip=skip,
+            limit=limit,
+        )
+        page.apply_headers(response)
+        logger.info(f"查询结果: {len(page.items)} 条论文")
+        return page.items
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取论文列表失败: {str(e)}")
         raise HTTPException(status_code=500, detail=f"获取论文列表失败: {str(e)}")
@@ -241,15 +292,15 @@ async def search_paper_by_doi(
 @router.get("/{paper_id}", response_model=PaperWithTags)
 async def get_paper(
     paper_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """获取单个论文详情"""
     try:
-        paper = db.query(Paper).filter(
-            Paper.id == paper_id,
-            Paper.user_id == current_user.id
-        ).first()
+        papers = await paper_listing_service.list_papers_async(
+            db, include=("tags",), user_id=current_user.id, paper_ids=[paper_id], limit=1
+        )
+        paper = papers[0] if papers else None
         
         if not paper:
             raise HTTPException(
@@ -268,6 +319,7 @@ async def get_paper(
 async def update_paper(
     paper_id: int,
     paper_data: PaperUpdate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -310,19 +362,9 @@ async def update_paper(
             if key == "tags":
                 # 处理标签
                 if value:
-                    # 清除现有标签
-                    paper.tags = []
-                    
-                    # 添加新标签
-                    for tag_name in value:
-                        tag = db.query(Tag).filter(Tag.name == tag_name).first()
-                        if not tag:
-                            tag = Tag(name=tag_name)
-                            db.add(tag)
-                            db.commit()
-                            db.refresh(tag)
-                        
-                        paper.tags.append(tag)
+                    # 替换现有标签，与其他字段一起提交
+                    tag_service.link(db, paper.id, value, replace=True)
+                    db.expire(paper, ["tags"])
             else:
                 # 更新其他字段
                 setattr(paper, key, value)
@@ -390,6 +432,10 @@ async def update_paper(
                     logger.info(f"论文 {paper_id} 已从项目 {old_project_id} 的关联表中移除")
                 except Exception as e:
                     logger.error(f"移除旧项目论文关联失败: {str(e)}")
+        
+        # 在后台增量更新相似度近邻表与知识图谱
+        background_tasks.add_task(paper_similarity_service.refresh_paper_task, current_user.id, paper_id)
+        background_tasks.add_task(knowledge_graph_service.update_graph_task, paper_id)
                     
         return paper
     except Exception as e:
@@ -402,6 +448,7 @@ async def update_paper(
 @router.delete("/{paper_id}")
 async def delete_paper(
     paper_id: int,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -417,13 +464,55 @@ async def delete_paper(
             raise HTTPException(status_code=403, detail="没有权限删除此论文")
         
         # 删除论文
+        owner_id = paper.user_id
         db.delete(paper)
         db.commit()
         
+        # 在后台清理相似度近邻表与知识图谱
+        if owner_id is not None:
+            background_tasks.add_task(paper_similarity_service.refresh_paper_task, owner_id, paper_id, True)
+        background_tasks.add_task(knowledge_graph_service.remove_paper_task, paper_id)
+        
         return {"detail": "论文已成功删除"}
     except Exception as e:
         db.rollback()
         logger.error(f"删除论文失败: {str(e)}")
         if isinstance(e, HTTPException):
             raise e
-        raise HTTPException(status_code=500, detail=f"删除论文失败: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"删除论文失败: {str(e)}")
+
+@router.post("/{paper_id}/pdf")
+async def upload_paper_pdf(
+    paper_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """上传论文的PDF（替换已有PDF）；相同内容的文件在服务器上只保存一份"""
+    try:
+        pdf_url = await file_service.upload_pdf(db, paper_id, file, current_user.id)
+        if pdf_url is None:
+            raise HTTPException(status_code=404, detail="论文不存在或无权访问")
+        return {"pdf_url": pdf_url}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"上传论文PDF失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"上传论文PDF失败: {str(e)}")
+
+@router.delete("/{paper_id}/pdf")
+async def delete_paper_pdf(
+    paper_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """删除论文的PDF"""
+    try:
+        if not file_service.delete_pdf(db, paper_id, current_user.id):
+            raise HTTPException(status_code=404, detail="论文不存在或没有PDF")
+        return {"detail": "PDF已删除"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"删除论文PDF失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"删除论文PDF失败: {str(e)}")
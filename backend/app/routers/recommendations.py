@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from .. import schemas
-from ..dependencies import get_db, get_current_user
+from ..database import SessionLocal
+from ..dependencies import get_db, get_current_user, get_async_db, get_current_user_async
 from ..models import User, Paper, Concept, ReadingHistory, Recommendation
 from ..schemas.recommendation import (
     ReadingHistoryCreate,
@@ -11,7 +14,7 @@ from ..schemas.recommendation import (
 )
 from ..services.recommendation_service import RecommendationService
 from datetime import datetime
-from sqlalchemy import func, case
+from sqlalchemy import func, case, select, delete
 
 router = APIRouter()
 
@@ -55,33 +58,61 @@ async def get_reading_history(
     
     return history
 
+def _recommendation_with_paper(recommendation: Recommendation) -> dict:
+    """展开预加载的论文字段，匹配 RecommendationWithPaper"""
+    paper = recommendation.paper
+    return {
+        "id": recommendation.id,
+        "user_id": recommendation.user_id,
+        "paper_id": recommendation.paper_id,
+        "score": recommendation.score,
+        "reason": recommendation.reason or "",
+        "is_read": recommendation.is_read,
+        "created_at": recommendation.created_at,
+        "paper_title": paper.title if paper else "",
+        "paper_authors": (paper.authors if paper else None) or "",
+        "paper_abstract": paper.abstract if paper else None,
+        "paper_year": paper.year if paper else None,
+        "paper_citations": paper.citation_count if paper else None
+    }
+
+def _generate_recommendations(user_id: int):
+    db = SessionLocal()
+    try:
+        RecommendationService().generate_recommendations(db=db, user_id=user_id)
+    finally:
+        db.close()
+
 @router.get("/", response_model=List[RecommendationWithPaper])
 async def get_recommendations(
     limit: int = 10,
     refresh: bool = False,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     # 如果请求刷新或者没有现有推荐，则生成新的推荐
-    if refresh or db.query(Recommendation).filter(
-        Recommendation.user_id == current_user.id
-    ).count() == 0:
+    existing = await db.scalar(
+        select(func.count(Recommendation.id)).where(Recommendation.user_id == current_user.id)
+    )
+    if refresh or existing == 0:
         # 清除现有推荐
-        db.query(Recommendation).filter(
-            Recommendation.user_id == current_user.id
-        ).delete()
-        db.commit()
+        await db.execute(delete(Recommendation).where(Recommendation.user_id == current_user.id))
+        await db.commit()
         
-        # 生成新推荐
-        recommendation_service = RecommendationService()
-        recommendation_service.generate_recommendations(db=db, user_id=current_user.id)
-    
-    # 获取推荐列表
-    recommendations = db.query(Recommendation).filter(
-        Recommendation.user_id == current_user.id
-    ).order_by(Recommendation.score.desc()).limit(limit).all()
-    
-    return recommendations
+        # 生成新推荐：推荐服务是同步的CPU密集实现，用独立的同步会话在线程池中运行，不阻塞事件循环
+        # （AsyncSession.run_sync 在事件循环所在线程中执行，不能用于耗时计算）
+        await run_in_threadpool(_generate_recommendations, current_user.id)
+    
+    # 获取推荐列表，论文信息一次性预加载
+    recommendations = (await db.scalars(
+        select(Recommendation)
+        .where(Recommendation.user_id == current_user.id)
+        .options(selectinload(Recommendation.paper))
+        .order_by(Recommendation.score.desc())
+        .limit(limit)
+    )).all()
+    
+    return [_recommendation_with_paper(r) for r in recommendations]
 
 @router.put("/{recommendation_id}/read", response_model=RecommendationWithPaper)
 async def mark_recommendation_as_read(
@@ -1,9 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.orm import Session
 from typing import List, Optional
-from ..schemas.search import SearchResult
+import logging
+from ..schemas.search import SearchResult, PaperSearchHit, NoteSearchHit, PdfPageSearchHit
 from ..services.scholar import search_scholar, search_scihub, search_easyscholar
+from ..services.search_index_service import search_index_service
+from ..dependencies import get_db
 from app.dependencies.auth import get_current_user
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
 @router.get("/scholar", response_model=List[SearchResult])
@@ -47,4 +53,57 @@ async def search_easyscholar_papers(
         results = await search_easyscholar(q)
         return results
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+@router.get("/papers", response_model=List[PaperSearchHit])
+def search_local_papers(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    在自己的论文库中全文检索（标题、摘要、作者），按BM25相关度排序并返回高亮片段
+    """
+    try:
+        return search_index_service.search_papers(db, q, current_user.id, limit=limit, offset=offset)
+    except Exception as e:
+        logger.error(f"论文全文检索失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/notes", response_model=List[NoteSearchHit])
+def search_local_notes(
+    q: str = Query(..., min_length=1),
+    paper_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    在自己的笔记中全文检索，可限定某篇论文
+    """
+    try:
+        return search_index_service.search_notes(db, q, current_user.id, paper_id=paper_id, limit=limit, offset=offset)
+    except Exception as e:
+        logger.error(f"笔记全文检索失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/pdf", response_model=List[PdfPageSearchHit])
+def search_pdf_content(
+    q: str = Query(..., min_length=1),
+    paper_id: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    在自己论文的PDF正文中全文检索，可限定某篇论文，按页返回命中片段与页码
+    """
+    try:
+        return search_index_service.search_pdf_pages(db, q, current_user.id, paper_id=paper_id, limit=limit, offset=offset)
+    except Exception as e:
+        logger.error(f"PDF全文检索失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
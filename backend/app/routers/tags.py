@@ -6,6 +6,7 @@ import logging
 from ..dependencies import get_db, get_current_user
 from ..models import User, Tag, Paper
 from ..schemas.tag import TagCreate, TagResponse
+from ..services.tag_service import tag_service
 
 router = APIRouter(
     prefix="/tags",
@@ -82,6 +83,7 @@ async def delete_tag(
         # 删除标签
         db.delete(tag)
         db.commit()
+        tag_service.invalidate(tag.name)
         
         return {"detail": "标签已成功删除"}
     except Exception as e:
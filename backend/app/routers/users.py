@@ -1,13 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Body
+from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile, Form, Body, Response, Request, Query
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict
 from datetime import timedelta, datetime
 import os
+import mimetypes
 import shutil
 import logging
 import traceback
-from fastapi.responses import FileResponse
 
 from ..dependencies import get_db, get_current_user, get_current_admin, create_access_token, create_guest_user
 from ..models import User, UserRole, UserActivity, Paper
@@ -23,8 +24,12 @@ from ..config import settings
 from ..crud.user import create_user, get_user_by_username
 from ..services.file_service import FileService
 from ..services.auth_service import AuthService
+from ..services.avatar_service import avatar_service
+from ..services.paper_listing_service import paper_listing_service
 from ..schemas.paper import Paper as PaperSchema
 from ..utils import logger
+from ..utils.file_delivery import file_response
+from ..utils.pagination import Keyset, InvalidCursor, paginate, count_cache
 
 # 创建路由器
 router = APIRouter(
@@ -36,6 +41,18 @@ router = APIRouter(
 file_service = FileService(upload_dir=settings.UPLOAD_DIRECTORY if hasattr(settings, "UPLOAD_DIRECTORY") else "uploads")
 auth_service = AuthService()
 
+
+def _users_page(db: Session, response: Response, skip: int, limit: int, cursor: Optional[str]) -> List[User]:
+    """按ID游标分页的用户列表，无效游标返回400"""
+    query = select(User)
+    try:
+        page = paginate(db, query, Keyset(User.id, User.id, descending=False), limit=limit, cursor=cursor, skip=skip)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page.total = count_cache.count(db, ("users",), ("users",), query)
+    page.apply_headers(response)
+    return page.items
+
 @router.post("/register", response_model=UserSchema)
 async def register_user(user_data: UserCreate, db: Session = Depends(get_db)):
     """注册新用户"""
@@ -142,13 +159,15 @@ def update_user_me(
 
 @router.get("/", response_model=List[UserSchema])
 async def read_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_admin),
     db: Session = Depends(get_db)
 ):
     # 只有管理员可以获取所有用户列表
-    users = db.query(User).offset(skip).limit(limit).all()
+    users = _users_page(db, response, skip, limit, cursor)
     return [UserSchema.from_orm(user) for user in users]
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -182,61 +201,76 @@ async def update_avatar(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    """上传头像：归一化为固定尺寸后按内容寻址保存，avatar_url 指向 /api/users/avatar/<哈希>"""
     try:
-        # 导入文件服务
-        from ..services.file_service import FileService
-        file_service = FileService(upload_dir=os.path.abspath(settings.UPLOAD_DIRECTORY))
-        
-        # 使用文件服务保存头像
-        avatar_path = await file_service.save_avatar(avatar, current_user.id)
-        print(f"头像已成功保存到: {avatar_path}")
-        
-        # 更新用户头像路径
-        current_user.avatar_url = avatar_path
+        key = await avatar_service.save_upload(avatar)
+        current_user.avatar_url = avatar_service.url_for(key)
         db.commit()
         db.refresh(current_user)
         
         return current_user
+    except HTTPException:
+        # 文件过大、图片无法解码等错误保持原状态码
+        raise
     except Exception as e:
-        print(f"头像上传失败: {str(e)}")
+        db.rollback()
+        logger.error(f"头像上传失败: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"头像上传失败: {str(e)}"
         )
 
+def _default_avatar(request: Request):
+    default_avatar = os.path.join(settings.UPLOAD_DIRECTORY, "avatars", "default.png")
+    if not os.path.exists(default_avatar):
+        raise HTTPException(status_code=404, detail="头像不存在")
+    return file_response(request, default_avatar, media_type="image/png")
+
 @router.get("/avatar/{filename}")
-async def get_avatar(filename: str):
-    """获取用户头像"""
-    avatar_path = os.path.join(settings.UPLOAD_DIRECTORY, "avatars", filename)
-    
-    if not os.path.exists(avatar_path):
-        # 返回默认头像
-        default_avatar = os.path.join(settings.UPLOAD_DIRECTORY, "avatars", "default.png")
-        if os.path.exists(default_avatar):
-            return FileResponse(default_avatar)
-        else:
-            raise HTTPException(status_code=404, detail="头像不存在")
-    
-    return FileResponse(avatar_path)
+async def get_avatar(request: Request, filename: str, size: Optional[int] = Query(None, ge=1, le=2048)):
+    """
+    获取用户头像
+
+    filename 为内容哈希时返回不小于 size 的最小尺寸（默认 AVATAR_DEFAULT_SIZE），地址不变内容就不变，
+    带长期 immutable 缓存；旧版本上传的头像按文件名返回原图。
+    """
+    if avatar_service.is_key(filename):
+        try:
+            return avatar_service.response(request, filename, size)
+        except FileNotFoundError:
+            return _default_avatar(request)
+
+    avatar_path = os.path.join(settings.UPLOAD_DIRECTORY, "avatars", os.path.basename(filename))
+    if not os.path.isfile(avatar_path):
+        return _default_avatar(request)
+    return file_response(request, avatar_path, media_type=mimetypes.guess_type(avatar_path)[0] or "application/octet-stream")
 
 # 新增：获取用户当前头像
 @router.get("/me/avatar")
-async def get_current_avatar(current_user: User = Depends(get_current_user)):
-    """获取当前用户头像"""
-    if not current_user.avatar_url or not os.path.exists(current_user.avatar_url):
-        # 返回默认头像
-        default_avatar = os.path.join(settings.UPLOAD_DIRECTORY, "avatars", "default.png")
-        if os.path.exists(default_avatar):
-            return FileResponse(default_avatar)
-        else:
-            raise HTTPException(status_code=404, detail="头像不存在")
-    
-    return FileResponse(current_user.avatar_url)
+async def get_current_avatar(
+    request: Request,
+    size: Optional[int] = Query(None, ge=1, le=2048),
+    current_user: User = Depends(get_current_user)
+):
+    """获取当前用户头像（地址不随头像变化，每次用 ETag 重新验证）"""
+    key = avatar_service.key_from_url(current_user.avatar_url)
+    if key:
+        try:
+            return avatar_service.response(request, key, size, cache_control="private, no-cache")
+        except FileNotFoundError:
+            return _default_avatar(request)
+
+    if not current_user.avatar_url or not os.path.isfile(current_user.avatar_url):
+        return _default_avatar(request)
+    return file_response(request, current_user.avatar_url,
+                         media_type=mimetypes.guess_type(current_user.avatar_url)[0] or "application/octet-stream")
 
 @router.get("/", response_model=List[UserSchema])
 async def get_users(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -248,7 +282,7 @@ async def get_users(
                 detail="需要管理员权限"
             )
         
-        users = db.query(User).offset(skip).limit(limit).all()
+        users = _users_page(db, response, skip, limit, cursor)
         return [UserSchema.from_orm(user) for user in users]
     except Exception as e:
         logger.error(f"获取用户列表失败: {str(e)}")
@@ -398,26 +432,29 @@ async def activate_user(
 @router.get("/me/papers", response_model=List[PaperSchema])
 @router.get("/papers", response_model=List[PaperSchema])
 async def get_user_papers(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """获取当前用户的所有论文"""
+    """获取当前用户的所有论文（cursor 游标翻页，见 X-Next-Cursor / X-Total-Count 响应头）"""
     try:
         # 添加详细的调试日志
         logger.info(f"开始获取用户论文，用户ID: {current_user.id}, 跳过: {skip}, 限制: {limit}")
         
-        # 检查用户是否存在论文
-        papers_count = db.query(Paper).filter(Paper.user_id == current_user.id).count()
-        logger.info(f"用户论文总数: {papers_count}")
-        
-        # 获取论文列表
-        papers = db.query(Paper).filter(Paper.user_id == current_user.id).offset(skip).limit(limit).all()
-        logger.info(f"成功检索到论文数量: {len(papers)}")
+        # 获取论文列表（只加载响应需要的列）
+        page = paper_listing_service.list_page(
+            db, user_id=current_user.id, cursor=cursor, skip=skip, limit=limit
+        )
+        page.apply_headers(response)
+        logger.info(f"成功检索到论文数量: {len(page.items)}")
         
         # 返回论文列表
-        return papers
+        return page.items
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取用户论文失败: {str(e)}")
         logger.error(f"错误详情: {traceback.format_exc()}")
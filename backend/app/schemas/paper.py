@@ -37,6 +37,7 @@ class PaperUpdate(PaperBase):
     read_count: Optional[int] = None
     is_public: Optional[bool] = None
     project_id: Optional[int] = None
+    tags: Optional[List[str]] = None
 
 class Paper(PaperBase):
     id: int
@@ -10,4 +10,31 @@ class SearchResult(BaseModel):
     doi: Optional[str] = None
     url: Optional[str] = None
     source: str
-    has_pdf: bool = False 
\ No newline at end of file
+    has_pdf: bool = False 
+class PaperSearchHit(BaseModel):
+    """本地论文全文检索结果，*_highlight / abstract_snippet 中命中的词以 <mark> 标记"""
+    id: int
+    title: str
+    authors: Optional[str] = None
+    year: Optional[int] = None
+    journal: Optional[str] = None
+    title_highlight: Optional[str] = None
+    authors_highlight: Optional[str] = None
+    abstract_snippet: Optional[str] = None
+    score: Optional[float] = None
+
+class PdfPageSearchHit(BaseModel):
+    """PDF正文全文检索结果（按页），snippet 中命中的词以 <mark> 标记"""
+    paper_id: int
+    title: str
+    page_number: int
+    snippet: Optional[str] = None
+    score: Optional[float] = None
+
+class NoteSearchHit(BaseModel):
+    """笔记全文检索结果"""
+    id: int
+    paper_id: Optional[int] = None
+    page_number: Optional[int] = None
+    snippet: Optional[str] = None
+    score: Optional[float] = None
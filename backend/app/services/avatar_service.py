@@ -0,0 +1,191 @@
+"""
+用户头像
+
+上传的图片归一化为 AVATAR_SIZES 中的几种正方形 WebP（见 utils/avatar_images.py），按上传内容的
+SHA-256 存放在 BLOB_DIRECTORY/avatars/ab/<sha256>/<尺寸>.webp；用户的 avatar_url 为
+/api/users/avatar/<sha256>，列表等页面用 ?size= 取所需尺寸。
+同一内容的地址永远不变，响应带 immutable 的长期缓存头与 ETag，浏览器与CDN只需下载一次；
+相同图片被多次上传时只转换一次。不再被任何用户引用且超过保留期的头像由 collect_garbage 删除。
+"""
+from fastapi import HTTPException, Request, Response, UploadFile
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Set
+from datetime import timedelta
+from pathlib import Path
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import User
+from ..utils.avatar_images import InvalidAvatarImage, normalize_avatar, write_variants
+from ..utils.file_delivery import file_response
+from .blob_service import blob_service
+from .file_service import file_service
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = "/api/users/avatar/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_KEY_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+class AvatarService:
+    """头像的归一化、存储、下发与回收"""
+
+    def __init__(self, root: Optional[Path] = None, sizes=None, default_size: int = settings.AVATAR_DEFAULT_SIZE,
+                 grace_hours: float = settings.BLOB_GC_GRACE_HOURS):
+        self.root = Path(root) if root is not None else blob_service.root / "avatars"
+        self.sizes = sorted(set(sizes or settings.AVATAR_SIZES))
+        self.default_size = default_size
+        self.grace = timedelta(hours=grace_hours)
+
+    # ------------------------------------------------------------ 地址
+
+    @staticmethod
+    def is_key(value: str) -> bool:
+        return bool(_KEY_PATTERN.match(value or ""))
+
+    @staticmethod
+    def url_for(key: str) -> str:
+        return f"{URL_PREFIX}{key}"
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        """从 avatar_url 中取出头像的内容哈希；旧版本保存的文件路径返回 None"""
+        if not url or not url.startswith(URL_PREFIX):
+            return None
+        key = url[len(URL_PREFIX):]
+        return key if self.is_key(key) else None
+
+    def relative_path(self, key: str, size: int) -> str:
+        """相对于存储目录的路径（nginx X-Accel-Redirect 使用）"""
+        return f"avatars/{key[:2]}/{key}/{size}.webp"
+
+    def directory(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def pick_size(self, size: Optional[int]) -> int:
+        """不小于请求尺寸的最小尺寸；请求超过最大尺寸时返回最大尺寸"""
+        if not size:
+            size = self.default_size
+        for candidate in self.sizes:
+            if candidate >= size:
+                return candidate
+        return self.sizes[-1]
+
+    # ------------------------------------------------------------ 上传
+
+    def _complete(self, directory: Path) -> bool:
+        return all((directory / f"{size}.webp").exists() for size in self.sizes)
+
+    def _materialize(self, source: Path, key: str):
+        """生成各尺寸并原子地放到内容地址（先写临时目录再改名；并发上传相同内容时保留先完成的一份）"""
+        directory = self.directory(key)
+        if self._complete(directory):
+            # 刷新修改时间，避免尚未被引用的头像在保留期内被回收
+            os.utime(directory)
+            return
+        try:
+            variants = normalize_avatar(str(source), self.sizes, settings.AVATAR_MAX_PIXELS, settings.AVATAR_QUALITY)
+        except InvalidAvatarImage as e:
+            raise HTTPException(status_code=400, detail=f"不支持的头像图片: {e}")
+        temp_dir = directory.parent / f".{key}.{uuid.uuid4().hex}.part"
+        try:
+            write_variants(str(temp_dir), variants)
+            if directory.exists():
+                # 配置增加了尺寸的旧头像：补齐缺少的文件
+                for size in self.sizes:
+                    if not (directory / f"{size}.webp").exists():
+                        os.replace(temp_dir / f"{size}.webp", directory / f"{size}.webp")
+                os.utime(directory)
+            else:
+                try:
+                    os.rename(temp_dir, directory)
+                except OSError:
+                    # 并发上传的相同内容已先放好
+                    pass
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    async def save_upload(self, file: UploadFile) -> str:
+        """保存上传的头像，返回内容哈希（图片无法解码时返回 400，超过大小上限时返回 413）"""
+        staged = blob_service.staging_path()
+        try:
+            stored = await file_service.stream_upload(
+                file, staged, max_bytes=settings.AVATAR_MAX_SIZE_MB * 1024 * 1024,
+                too_large=lambda size: f"头像文件过大，上限为 {settings.AVATAR_MAX_SIZE_MB}MB",
+            )
+            # 图片解码与缩放是CPU密集型，在线程池中执行
+            await run_in_threadpool(self._materialize, stored.path, stored.sha256)
+            logger.info(f"头像已保存: {stored.sha256}")
+            return stored.sha256
+        finally:
+            try:
+                os.remove(staged)
+            except OSError:
+                pass
+
+    # ------------------------------------------------------------ 下发
+
+    def response(self, request: Request, key: str, size: Optional[int] = None,
+                 cache_control: str = IMMUTABLE_CACHE_CONTROL) -> Response:
+        """发送指定尺寸的头像（文件不存在时抛出 FileNotFoundError，由调用方返回默认头像）"""
+        size = self.pick_size(size)
+        return file_response(
+            request, self.directory(key) / f"{size}.webp",
+            media_type="image/webp",
+            etag=f"{key}-{size}",
+            cache_control=cache_control,
+            accel_path=self.relative_path(key, size),
+        )
+
+    # ------------------------------------------------------------ 回收
+
+    def referenced_keys(self, db: Session) -> Set[str]:
+        urls = db.execute(select(User.avatar_url).where(User.avatar_url.like(f"{URL_PREFIX}%"))).scalars()
+        return {key for key in map(self.key_from_url, urls) if key}
+
+    def collect_garbage(self, db: Session, grace: Optional[timedelta] = None) -> Dict[str, int]:
+        """删除不再被任何用户引用、且修改时间早于保留期的头像（包括遗留的临时目录）"""
+        grace = self.grace if grace is None else grace
+        stale_before = time.time() - grace.total_seconds()
+        referenced = self.referenced_keys(db)
+        db.commit()
+        stats = {"removed": 0}
+        if not self.root.exists():
+            return stats
+        for shard in self.root.iterdir():
+            if not shard.is_dir():
+                continue
+            for directory in shard.iterdir():
+                try:
+                    if directory.name in referenced or directory.stat().st_mtime >= stale_before:
+                        continue
+                    shutil.rmtree(directory)
+                    stats["removed"] += 1
+                except OSError as e:
+                    logger.error(f"删除头像 {directory.name} 失败: {e}")
+        logger.info(f"头像垃圾回收完成: 删除 {stats['removed']} 个")
+        return stats
+
+    def gc_task(self) -> Dict[str, int]:
+        """定时任务入口，使用独立的数据库会话"""
+        db = SessionLocal()
+        try:
+            return self.collect_garbage(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"头像垃圾回收失败: {str(e)}")
+            return {}
+        finally:
+            db.close()
+
+
+avatar_service = AvatarService()
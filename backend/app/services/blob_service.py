@@ -0,0 +1,276 @@
+"""
+按内容寻址的文件存储
+
+文件按 SHA-256 存放在 BLOB_DIRECTORY/ab/cd/abcd... 下（两级目录分片，避免单个目录文件过多），
+相同内容无论被多少用户上传、被下载多少次都只保存一份；blobs 表记录大小与引用计数，
+论文通过 pdf_blob_id 引用文件，引用计数随论文的变更在同一事务中维护（见 models/blob.py）。
+
+写入流程:
+1. 上传内容先流式写入暂存目录并计算哈希
+2. 在调用方的事务中登记 blobs 记录（不存在时创建，引用计数为0）
+3. 事务提交后把暂存文件移动到内容地址（已存在相同内容时直接删除暂存文件），回滚时删除暂存文件
+
+引用计数为0且超过保留期（BLOB_GC_GRACE_HOURS）的文件由 collect_garbage 删除；
+保留期同时保护刚登记、尚未被论文引用的文件不被并发的回收删除。
+"""
+from sqlalchemy import select, update, delete, func, event
+from sqlalchemy.orm import Session
+from typing import Dict, Optional, Union
+from datetime import datetime, timedelta
+from pathlib import Path
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Blob, Paper, User, PdfText, PdfPage
+from .tag_service import insert_ignore
+
+logger = logging.getLogger(__name__)
+
+_PENDING_KEY = "blob_service_pending"
+
+
+class BlobService:
+    """内容寻址文件存储与垃圾回收"""
+
+    def __init__(self, root: Union[str, Path] = settings.BLOB_DIRECTORY,
+                 grace_hours: float = settings.BLOB_GC_GRACE_HOURS):
+        self.root = Path(root)
+        self.staging_dir = self.root / "staging"
+        self.grace = timedelta(hours=grace_hours)
+
+    # ------------------------------------------------------------ 路径
+
+    def relative_path(self, sha256: str) -> str:
+        """相对于存储目录的路径（nginx X-Accel-Redirect 使用）"""
+        return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+    def path_for(self, sha256: str) -> Path:
+        return self.root / self.relative_path(sha256)
+
+    def path_of(self, blob: Blob) -> Path:
+        return self.path_for(blob.sha256)
+
+    def thumbnail_relative_path(self, sha256: str) -> str:
+        """PDF第一页缩略图（由入库任务生成，随文件一起回收）"""
+        return f"thumbnails/{sha256[:2]}/{sha256}.png"
+
+    def thumbnail_path(self, sha256: str) -> Path:
+        return self.root / self.thumbnail_relative_path(sha256)
+
+    def staging_path(self) -> Path:
+        """暂存文件路径（调用方写入后交给 register 登记）"""
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        return self.staging_dir / f"{uuid.uuid4().hex}.blob"
+
+    # ------------------------------------------------------------ 登记
+
+    def register(self, db: Session, staged_path: Union[str, Path], sha256: str, size: int,
+                 content_type: Optional[str] = None) -> Blob:
+        """
+        在当前事务中登记暂存文件，返回 Blob 记录（不提交）
+
+        新记录的引用计数为0，由引用它的论文在 flush 时加1；已有记录刷新 updated_at，重新开始保留期。
+        """
+        now = datetime.utcnow()
+        touched = db.execute(
+            update(Blob).where(Blob.sha256 == sha256).values(updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        if touched.rowcount == 0:
+            db.execute(insert_ignore(db, Blob.__table__).values(
+                sha256=sha256, size=size, content_type=content_type, ref_count=0, created_at=now, updated_at=now,
+            ))
+        db.info.setdefault(_PENDING_KEY, []).append((self, Path(staged_path), sha256))
+        return db.scalars(select(Blob).where(Blob.sha256 == sha256)).one()
+
+    def store_bytes(self, db: Session, content: bytes, content_type: Optional[str] = None) -> Blob:
+        """登记内存中的内容（如下载得到的PDF），不提交"""
+        staged = self.staging_path()
+        with open(staged, "wb") as f:
+            f.write(content)
+        return self.register(db, staged, hashlib.sha256(content).hexdigest(), len(content), content_type)
+
+    def store_file(self, db: Session, source: Union[str, Path], content_type: Optional[str] = None,
+                   chunk_size: int = settings.UPLOAD_CHUNK_SIZE) -> Blob:
+        """
+        登记磁盘上已有的文件（如Sci-Hub下载缓存），不提交
+
+        硬链接到暂存目录（跨文件系统时复制），再按块计算哈希，不把整个文件读入内存；
+        源文件之后被替换或删除不影响暂存的内容。
+        """
+        staged = self.staging_path()
+        try:
+            try:
+                os.link(source, staged)
+            except OSError:
+                shutil.copyfile(source, staged)
+            digest = hashlib.sha256()
+            with open(staged, "rb") as f:
+                while True:
+                    chunk = f.read(chunk_size)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                size = os.fstat(f.fileno()).st_size
+        except BaseException:
+            self._discard(staged)
+            raise
+        return self.register(db, staged, digest.hexdigest(), size, content_type)
+
+    def _place(self, staged: Path, sha256: str):
+        target = self.path_for(sha256)
+        try:
+            if target.exists():
+                os.remove(staged)
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(staged, target)
+        except OSError as e:
+            logger.error(f"移动暂存文件到 {target} 失败: {e}")
+
+    def _discard(self, staged: Path):
+        try:
+            os.remove(staged)
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------ 用量
+
+    def user_usage(self, db: Session, user_id: int) -> int:
+        """
+        按 papers / blobs 表计算用户论文引用的文件总字节数：每篇论文各自计入，不因磁盘上去重而减少
+
+        需要聚合该用户的所有论文，日常的配额检查读 users.storage_used_bytes（见 storage_service）。
+        """
+        statement = (
+            select(func.coalesce(func.sum(Blob.size), 0))
+            .select_from(Paper).join(Blob, Paper.pdf_blob_id == Blob.id)
+            .where(Paper.user_id == user_id)
+        )
+        return int(db.scalar(statement))
+
+    def usage_subquery(self):
+        """与 users 表关联的 user_usage 标量子查询"""
+        return (
+            select(func.coalesce(func.sum(Blob.size), 0))
+            .select_from(Paper).join(Blob, Paper.pdf_blob_id == Blob.id)
+            .where(Paper.user_id == User.id)
+            .correlate(User).scalar_subquery()
+        )
+
+    # ------------------------------------------------------------ 垃圾回收
+
+    def recount(self, db: Session) -> int:
+        """按 papers 表重新计算引用计数，校正绕过 ORM 的写入造成的偏差，返回校正的记录数"""
+        refs = (
+            select(func.count(Paper.id)).where(Paper.pdf_blob_id == Blob.id)
+            .correlate(Blob).scalar_subquery()
+        )
+        result = db.execute(
+            update(Blob).where(Blob.ref_count != refs).values(ref_count=refs, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+
+    def collect_garbage(self, db: Session, grace: Optional[timedelta] = None, batch_size: int = 500) -> Dict[str, int]:
+        """
+        删除引用计数为0且超过保留期的文件，以及遗留的暂存文件
+
+        每个文件在删除其记录的事务中删除：并发的 register 要么在回收之前刷新了 updated_at
+        （条件删除不再匹配），要么等回收提交后重新创建记录并放回文件。
+        """
+        grace = self.grace if grace is None else grace
+        cutoff = datetime.utcnow() - grace
+        stats = {"recounted": self.recount(db), "removed": 0, "bytes_freed": 0, "stale_staged": 0}
+
+        last_id = 0
+        while True:
+            candidates = db.execute(
+                select(Blob.id, Blob.sha256, Blob.size)
+                .where(Blob.ref_count == 0, Blob.updated_at < cutoff, Blob.id > last_id)
+                .order_by(Blob.id).limit(batch_size)
+            ).all()
+            db.commit()
+            if not candidates:
+                break
+            for blob_id, sha256, size in candidates:
+                last_id = blob_id
+                deleted = db.execute(
+                    delete(Blob).where(Blob.id == blob_id, Blob.ref_count == 0, Blob.updated_at < cutoff)
+                    .execution_options(synchronize_session=False)
+                )
+                if deleted.rowcount == 0:
+                    db.rollback()
+                    continue
+                # 解析结果缓存与缩略图随文件一起删除
+                db.execute(delete(PdfPage).where(PdfPage.sha256 == sha256))
+                db.execute(delete(PdfText).where(PdfText.sha256 == sha256))
+                try:
+                    os.remove(self.path_for(sha256))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    db.rollback()
+                    logger.error(f"删除文件 {sha256} 失败: {e}")
+                    continue
+                try:
+                    os.remove(self.thumbnail_path(sha256))
+                except OSError:
+                    pass
+                db.commit()
+                stats["removed"] += 1
+                stats["bytes_freed"] += size
+
+        # 进程在提交前退出时遗留的暂存文件
+        if self.staging_dir.exists():
+            stale_before = time.time() - grace.total_seconds()
+            for staged in self.staging_dir.iterdir():
+                try:
+                    if staged.stat().st_mtime < stale_before:
+                        staged.unlink()
+                        stats["stale_staged"] += 1
+                except OSError:
+                    pass
+
+        logger.info(
+            f"文件垃圾回收完成: 校正引用计数 {stats['recounted']} 条, 删除文件 {stats['removed']} 个, "
+            f"释放 {stats['bytes_freed'] / 1024 / 1024:.2f}MB, 清理暂存文件 {stats['stale_staged']} 个"
+        )
+        return stats
+
+    def gc_task(self) -> Dict[str, int]:
+        """定时任务入口，使用独立的数据库会话"""
+        db = SessionLocal()
+        try:
+            return self.collect_garbage(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"文件垃圾回收失败: {str(e)}")
+            return {}
+        finally:
+            db.close()
+
+
+blob_service = BlobService()
+
+
+@event.listens_for(Session, "after_commit")
+def _place_staged_blobs(session):
+    # 保存点提交时也会触发，只在最外层事务提交后移动文件
+    if not session.in_nested_transaction() and _PENDING_KEY in session.info:
+        for service, staged, sha256 in session.info.pop(_PENDING_KEY):
+            service._place(staged, sha256)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_staged_blobs(session):
+    if not session.in_nested_transaction() and _PENDING_KEY in session.info:
+        for service, staged, _ in session.info.pop(_PENDING_KEY):
+            service._discard(staged)
@@ -2,25 +2,89 @@ import os
 import logging
 import shutil
 from datetime import datetime
-from fastapi import UploadFile, HTTPException
+from fastapi import UploadFile, HTTPException, Request, Response
 import uuid
 import math
-from typing import Optional
+import hashlib
+from typing import Callable, Optional, Union
 from ..config import settings
 from sqlalchemy.orm import Session
 from pathlib import Path
 import aiofiles
 
-from ..models import Paper
+from ..models import Paper, Blob
+from ..utils.file_delivery import file_response
 from .paper_service import PaperService
+from .blob_service import blob_service
+from .storage_service import storage_service
 
 logger = logging.getLogger(__name__)
 
+_MB = 1024 * 1024
+
+
+class StoredUpload:
+    """流式写入完成的上传文件：最终路径、字节数与内容的 SHA-256"""
+
+    __slots__ = ("path", "size", "sha256")
+
+    def __init__(self, path: Path, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    @property
+    def size_mb(self) -> float:
+        return self.size / _MB
+
+
 class FileService:
-    def __init__(self, upload_dir: str = "uploads"):
+    def __init__(self, upload_dir: str = "uploads", chunk_size: int = settings.UPLOAD_CHUNK_SIZE):
         self.paper_service = PaperService()
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
+        self.chunk_size = chunk_size
+
+    async def stream_upload(
+        self,
+        file: UploadFile,
+        destination: Union[str, Path],
+        max_bytes: Optional[int] = None,
+        too_large: Optional[Callable[[int], str]] = None,
+    ) -> StoredUpload:
+        """
+        按块把上传文件写入 destination，内存占用与文件大小无关
+
+        先写入同目录下的临时文件，边写边计算 SHA-256 并检查 max_bytes，
+        超出时立即中止并返回 413（too_large 根据已读取的字节数生成错误信息）；
+        写完后用 os.replace 原子地移动到目标位置，失败时不会留下不完整的文件。
+        """
+        destination = Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = destination.with_name(f".{destination.name}.{uuid.uuid4().hex}.part")
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(temp_path, "wb") as f:
+                while True:
+                    chunk = await file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        detail = too_large(size) if too_large else f"文件过大，上限为 {max_bytes / _MB:.2f}MB"
+                        raise HTTPException(status_code=413, detail=detail)
+                    digest.update(chunk)
+                    await f.write(chunk)
+            os.replace(temp_path, destination)
+        except BaseException:
+            # 包括客户端断开时的取消，临时文件一并清理
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        return StoredUpload(destination, size, digest.hexdigest())
     
     async def upload_pdf(self, db: Session, paper_id: int, file: UploadFile, user_id: int) -> Optional[str]:
         """上传PDF文件"""
@@ -30,29 +94,41 @@ class FileService:
             if not paper:
                 return None
             
-            # 确保上传目录存在
-            user_dir = self.upload_dir / str(user_id)
-            user_dir.mkdir(exist_ok=True)
-            
-            # 设置文件保存路径
-            file_path = user_dir / f"paper_{paper_id}.pdf"
+            # 配额检查只读用户行的计数；替换已有PDF时，原文件的大小不计入已用空间
+            used, capacity = storage_service.get_usage(db, user_id)
+            if paper.pdf_blob is not None:
+                used -= paper.pdf_blob.size
+            remaining = max(0, capacity - used)
+            max_bytes = min(settings.UPLOAD_MAX_SIZE_MB * _MB, remaining)
+            too_large = None
+            if max_bytes == remaining:
+                too_large = lambda size: f"存储空间不足！剩余 {remaining / _MB:.2f}MB，文件大小超过 {size / _MB:.2f}MB"
             
-            # 异步保存文件
+            # 流式写入暂存区并计算哈希
             try:
-                async with aiofiles.open(file_path, 'wb') as f:
-                    content = await file.read()
-                    await f.write(content)
+                stored = await self.stream_upload(file, blob_service.staging_path(), max_bytes=max_bytes,
+                                                  too_large=too_large)
+            except HTTPException:
+                raise
             except Exception as e:
                 logger.error(f"文件写入失败: {e}")
                 raise
             
-            # 更新论文记录
-            pdf_url = f"/uploads/{user_id}/paper_{paper_id}.pdf"
-            paper.pdf_url = pdf_url
-            paper.has_pdf = True
+            # 按内容登记文件，相同内容只保存一份；引用计数与已用空间在 flush 时随 pdf_blob_id 原子更新
+            blob = blob_service.register(db, stored.path, stored.sha256, stored.size, "application/pdf")
+            paper.pdf_blob_id = blob.id
+            db.flush()
+            
+            # 并发上传都通过了上面的检查时，以提交前的计数为准
+            used, capacity = storage_service.get_usage(db, user_id)
+            if used > capacity:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"存储空间不足！容量 {capacity / _MB:.2f}MB，上传后将使用 {used / _MB:.2f}MB"
+                )
             db.commit()
             
-            return pdf_url
+            return f"/api/papers/{paper_id}/pdf"
         except Exception as e:
             db.rollback()
             logger.error(f"上传PDF失败: {e}")
@@ -62,35 +138,66 @@ class FileService:
         """获取PDF文件的物理路径"""
         # 检查论文是否存在且属于当前用户
         paper = self.paper_service.get_paper(db, paper_id, user_id)
-        if not paper or not paper.has_pdf:
+        if not paper or paper.pdf_blob is None:
             return None
         
-        # 构建文件路径
-        file_path = self.upload_dir / str(user_id) / f"paper_{paper_id}.pdf"
-        
+        file_path = blob_service.path_of(paper.pdf_blob)
         if not file_path.exists():
             return None
         
         return str(file_path)
     
+    def blob_response(self, request: Request, blob: Blob, filename: str, disposition: str = "inline") -> Response:
+        """
+        发送存储中的文件，支持 Range（206）与条件请求（304）
+
+        文件按内容寻址，ETag 直接使用 SHA-256；配置了 PDF_ACCEL_REDIRECT_PREFIX 时交给 nginx 发送。
+        """
+        file_path = blob_service.path_of(blob)
+        try:
+            return file_response(
+                request, file_path,
+                media_type=blob.content_type or "application/pdf",
+                filename=filename,
+                disposition=disposition,
+                etag=blob.sha256,
+                accel_path=blob_service.relative_path(blob.sha256),
+            )
+        except FileNotFoundError:
+            logger.error(f"文件缺失: {file_path}")
+            raise HTTPException(status_code=404, detail="PDF文件不存在")
+    
+    def pdf_response(self, request: Request, paper: Paper, disposition: str = "inline") -> Response:
+        """发送论文的PDF，论文没有PDF时返回 404"""
+        if paper.pdf_blob is None:
+            raise HTTPException(status_code=404, detail="PDF文件不存在")
+        return self.blob_response(request, paper.pdf_blob, f"{paper.title}.pdf", disposition)
+    
+    def thumbnail_response(self, request: Request, paper: Paper) -> Response:
+        """发送论文PDF第一页的缩略图（由入库任务生成，尚未生成时返回 404）"""
+        if paper.pdf_blob is None:
+            raise HTTPException(status_code=404, detail="PDF文件不存在")
+        sha256 = paper.pdf_blob.sha256
+        try:
+            return file_response(
+                request, blob_service.thumbnail_path(sha256),
+                media_type="image/png",
+                etag=f"{sha256}-thumbnail",
+                accel_path=blob_service.thumbnail_relative_path(sha256),
+            )
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="缩略图尚未生成")
+    
     def delete_pdf(self, db: Session, paper_id: int, user_id: int) -> bool:
-        """删除PDF文件"""
+        """删除论文的PDF（文件在不再被任何论文引用并超过保留期后由垃圾回收删除）"""
         try:
             # 检查论文是否存在且属于当前用户
             paper = self.paper_service.get_paper(db, paper_id, user_id)
-            if not paper or not paper.has_pdf:
+            if not paper or paper.pdf_blob_id is None:
                 return False
             
-            # 构建文件路径
-            file_path = self.upload_dir / str(user_id) / f"paper_{paper_id}.pdf"
-            
-            # 删除文件
-            if file_path.exists():
-                os.remove(file_path)
-            
-            # 更新论文记录
-            paper.pdf_url = None
-            paper.has_pdf = False
+            # 更新论文记录，引用计数随之减1
+            paper.pdf_blob_id = None
             db.commit()
             
             return True
@@ -100,135 +207,68 @@ class FileService:
             raise
     
     def get_user_storage_info(self, db: Session, user_id: int) -> dict:
-        """获取用户存储信息"""
-        try:
-            # 默认限制为1GB
-            storage_capacity = 1024 * 1024 * 1024
-            
-            # 计算已用空间
-            user_dir = self.upload_dir / str(user_id)
-            storage_used = 0
-            
-            if user_dir.exists():
-                for file_path in user_dir.glob("**/*"):
-                    if file_path.is_file():
-                        storage_used += file_path.stat().st_size
-            
-            # 计算剩余空间和使用百分比
-            storage_free = max(0, storage_capacity - storage_used)
-            usage_percentage = (storage_used / storage_capacity) * 100 if storage_capacity > 0 else 0
-            
-            return {
-                "storage_capacity": storage_capacity,
-                "storage_used": storage_used,
-                "storage_free": storage_free,
-                "usage_percentage": usage_percentage
-            }
-        except Exception as e:
-            logger.error(f"获取存储信息失败: {e}")
-            raise
+        """获取用户存储信息（字节）；已用空间按用户论文引用的文件计算，与其他用户共用同一文件时各自计入"""
+        return storage_service.get_user_storage_info(db, user_id)
+
+    def save_paper(self, db: Session, file_content: Union[bytes, str, Path]):
+        """
+        保存论文文件（如从Sci-Hub下载的PDF），返回 (文件路径, 大小MB)
 
-    def save_paper(self, file_content, filename=None, doi=None):
-        """保存论文文件"""
+        file_content 可以是内容本身，也可以是磁盘上的文件路径（流式登记，不读入内存）。
+        相同内容只保存一份；文件在被论文引用前按未引用文件处理，超过保留期后由垃圾回收删除。
+        """
         try:
-            if doi:
-                # 如果提供了DOI，使用DOI作为文件名
-                safe_filename = f"{doi.replace('/', '_').replace(':', '_')}.pdf"
-            elif filename:
-                # 如果提供了文件名，生成安全的文件名
-                name, ext = os.path.splitext(filename)
-                timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-                safe_filename = f"{name}_{timestamp}{ext}"
+            if isinstance(file_content, bytes):
+                blob = blob_service.store_bytes(db, file_content, "application/pdf")
             else:
-                # 生成随机文件名
-                safe_filename = f"{uuid.uuid4()}.pdf"
-            
-            # 完整路径
-            file_path = os.path.join(self.upload_dir, safe_filename)
-            
-            # 保存文件
-            with open(file_path, "wb") as f:
-                f.write(file_content)
+                blob = blob_service.store_file(db, file_content, "application/pdf")
+            db.commit()
+            file_path = str(blob_service.path_of(blob))
             
             # 计算文件大小（MB）
-            file_size_mb = self.get_file_size_mb(file_path)
+            file_size_mb = math.ceil(blob.size / _MB)
             
             logger.info(f"论文文件已保存: {file_path}, 大小: {file_size_mb}MB")
             return file_path, file_size_mb
         except Exception as e:
+            db.rollback()
             logger.error(f"保存论文文件失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
     
-    async def save_uploaded_paper(self, file: UploadFile, user=None):
-        """保存上传的论文文件，并计算文件大小"""
+    async def save_uploaded_paper(self, db: Session, file: UploadFile, user=None):
+        """保存上传的论文文件，并计算文件大小（存储方式同 save_paper）"""
         try:
+            max_bytes = settings.UPLOAD_MAX_SIZE_MB * _MB
+            too_large = None
             # 检查用户存储空间
             if user:
-                # 确保用户有storage_used和storage_capacity属性
-                if not hasattr(user, 'storage_used') or user.storage_used is None:
-                    user.storage_used = 0
-                    logger.info(f"为用户 {user.username} 设置默认storage_used=0")
+                used, capacity = storage_service.get_usage(db, user.id)
                 
-                if not hasattr(user, 'storage_capacity') or user.storage_capacity is None:
-                    user.storage_capacity = 1024
-                    logger.info(f"为用户 {user.username} 设置默认storage_capacity=1024")
-                
-                content = await file.read()
-                file_size_mb = len(content) / (1024 * 1024)  # 转换为MB
-                
-                # 检查用户剩余空间
-                if user.storage_used + file_size_mb > user.storage_capacity:
-                    raise HTTPException(
-                        status_code=413,
-                        detail=f"存储空间不足！当前已使用 {user.storage_used:.2f}MB，剩余 {user.storage_capacity - user.storage_used:.2f}MB，文件大小 {file_size_mb:.2f}MB"
-                    )
-            else:
-                content = await file.read()
-                file_size_mb = len(content) / (1024 * 1024)  # 转换为MB
+                # 写入过程中一旦超出剩余空间就中止，不必读完整个文件
+                remaining = max(0, capacity - used)
+                max_bytes = min(max_bytes, remaining)
+                too_large = lambda size: (
+                    f"存储空间不足！当前已使用 {used / _MB:.2f}MB，剩余 {remaining / _MB:.2f}MB，"
+                    f"文件大小超过 {size / _MB:.2f}MB"
+                )
             
-            # 生成安全的文件名
-            original_filename = file.filename
-            name, ext = os.path.splitext(original_filename)
-            timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-            safe_filename = f"{name}_{timestamp}{ext}"
-            
-            # 完整路径
-            file_path = os.path.join(self.upload_dir, safe_filename)
-            
-            # 保存文件
-            with open(file_path, "wb") as f:
-                f.write(content)
+            # 流式写入暂存区，再按内容登记
+            stored = await self.stream_upload(file, blob_service.staging_path(), max_bytes=max_bytes,
+                                              too_large=too_large)
+            blob = blob_service.register(db, stored.path, stored.sha256, stored.size, file.content_type)
+            db.commit()
+            file_path = str(blob_service.path_of(blob))
             
-            logger.info(f"上传的论文文件已保存: {file_path}, 大小: {file_size_mb:.2f}MB")
-            return file_path, math.ceil(file_size_mb)  # 向上取整，确保不会低估文件大小
+            logger.info(f"上传的论文文件已保存: {file_path}, 大小: {stored.size_mb:.2f}MB")
+            return file_path, math.ceil(stored.size_mb)  # 向上取整，确保不会低估文件大小
         except HTTPException as he:
             # 直接重新抛出HTTP异常
             raise he
         except Exception as e:
+            db.rollback()
             logger.error(f"保存上传论文文件失败: {str(e)}")
             raise HTTPException(status_code=500, detail=f"文件上传失败: {str(e)}")
     
-    async def save_avatar(self, file: UploadFile, user_id: int):
-        """保存用户头像"""
-        try:
-            # 生成安全的文件名
-            _, ext = os.path.splitext(file.filename)
-            safe_filename = f"avatar_{user_id}_{datetime.now().strftime('%Y%m%d%H%M%S')}{ext}"
-            
-            # 完整路径
-            file_path = os.path.join(self.upload_dir, safe_filename)
-            
-            # 保存文件
-            with open(file_path, "wb") as f:
-                content = await file.read()
-                f.write(content)
-            
-            logger.info(f"用户头像已保存: {file_path}")
-            return file_path
-        except Exception as e:
-            logger.error(f"保存用户头像失败: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"头像上传失败: {str(e)}")
-    
     def delete_file(self, file_path):
         """删除文件"""
         try:
@@ -253,4 +293,7 @@ class FileService:
             return math.ceil(size_mb)  # 向上取整
         except Exception as e:
             logger.error(f"获取文件大小失败: {str(e)}")
-            return 0 
\ No newline at end of file
+            return 0
+
+
+file_service = FileService(upload_dir=settings.UPLOAD_DIRECTORY)
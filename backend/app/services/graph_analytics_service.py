@@ -0,0 +1,156 @@
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime
+import logging
+import threading
+
+import networkx as nx
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models import Concept, ConceptRelation, paper_concepts
+
+logger = logging.getLogger(__name__)
+
+# 社区划分使用固定随机种子，保证同一版本的图结果稳定
+COMMUNITY_SEED = 42
+
+
+class GraphSnapshot:
+    """某一版本概念图的分析结果"""
+
+    def __init__(self, version: Tuple, concepts: Dict[int, str], paper_counts: Dict[int, int],
+                 pagerank: Dict[int, float], degree: Dict[int, float],
+                 components: List[List[int]], communities: List[List[int]]):
+        self.version = version
+        self.computed_at = datetime.utcnow()
+        self.concepts = concepts
+        self.paper_counts = paper_counts
+        self.pagerank = pagerank
+        self.degree = degree
+        self.components = components
+        self.communities = communities
+        self.community_of = {cid: i for i, members in enumerate(communities) for cid in members}
+        self.component_of = {cid: i for i, members in enumerate(components) for cid in members}
+
+    def concept_stats(self, concept_id: int) -> Dict[str, Any]:
+        return {
+            "id": concept_id,
+            "name": self.concepts.get(concept_id),
+            "pagerank": self.pagerank.get(concept_id, 0.0),
+            "degree_centrality": self.degree.get(concept_id, 0.0),
+            "community": self.community_of.get(concept_id),
+            "component": self.component_of.get(concept_id),
+            "paper_count": self.paper_counts.get(concept_id, 0)
+        }
+
+
+class GraphAnalyticsService:
+    """
+    概念图分析服务
+
+    基于 concepts/concept_relations 的快照计算 PageRank、度中心性、连通分量和社区划分，
+    结果缓存在内存中并以数据版本签名失效。签名变化后请求会先拿到旧结果（标记为stale），
+    重新计算在后台任务中完成，不阻塞请求。
+    """
+
+    def __init__(self):
+        self._snapshot: Optional[GraphSnapshot] = None
+        self._lock = threading.Lock()
+        self._computing = False
+
+    def version(self, db: Session) -> Tuple:
+        """概念图的版本签名，概念、关系或概念-文献关联变化时签名随之改变"""
+        concept_count, concept_updated, concept_sum = db.query(
+            func.count(Concept.id), func.max(Concept.updated_at), func.sum(Concept.id)
+        ).one()
+        relation_count, relation_updated, relation_sum = db.query(
+            func.count(ConceptRelation.id), func.max(ConceptRelation.updated_at), func.sum(ConceptRelation.id)
+        ).one()
+        link_count = db.query(func.count(paper_concepts.c.concept_id)).scalar()
+        return (concept_count, concept_updated, concept_sum,
+                relation_count, relation_updated, relation_sum, link_count)
+
+    def compute(self, db: Session) -> GraphSnapshot:
+        """读取概念图快照并完成全部分析计算"""
+        version = self.version(db)
+        concepts = dict(db.query(Concept.id, Concept.name).all())
+        relations = db.query(
+            ConceptRelation.source_id, ConceptRelation.target_id, ConceptRelation.weight
+        ).all()
+        paper_counts = dict(
+            db.query(paper_concepts.c.concept_id, func.count(paper_concepts.c.paper_id))
+            .group_by(paper_concepts.c.concept_id)
+            .all()
+        )
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(concepts)
+        for source_id, target_id, weight in relations:
+            if source_id in concepts and target_id in concepts:
+                # 多条同向关系的权重累加
+                previous = graph.get_edge_data(source_id, target_id, {}).get("weight", 0.0)
+                graph.add_edge(source_id, target_id, weight=previous + (weight or 1.0))
+
+        undirected = graph.to_undirected()
+        pagerank = nx.pagerank(graph, weight="weight") if graph.number_of_nodes() else {}
+        degree = nx.degree_centrality(undirected) if graph.number_of_nodes() else {}
+        components = sorted(
+            (sorted(c) for c in nx.connected_components(undirected)),
+            key=len, reverse=True
+        )
+        communities = sorted(
+            (sorted(c) for c in nx.community.louvain_communities(undirected, weight="weight", seed=COMMUNITY_SEED)),
+            key=len, reverse=True
+        ) if graph.number_of_nodes() else []
+
+        return GraphSnapshot(version, concepts, paper_counts, pagerank, degree, components, communities)
+
+    def refresh(self):
+        """在独立会话中重新计算并替换缓存（供后台任务调用）"""
+        with self._lock:
+            if self._computing:
+                return
+            self._computing = True
+        db = SessionLocal()
+        try:
+            snapshot = self.compute(db)
+            with self._lock:
+                self._snapshot = snapshot
+            logger.info(f"概念图分析已更新，概念数: {len(snapshot.concepts)}")
+        except Exception as e:
+            logger.error(f"概念图分析计算失败: {e}")
+        finally:
+            db.close()
+            with self._lock:
+                self._computing = False
+
+    def cached(self) -> Optional[GraphSnapshot]:
+        """返回当前缓存的分析结果（可能已过期），不触发计算"""
+        return self._snapshot
+
+    def get_snapshot(self, db: Session, background_tasks=None) -> Tuple[GraphSnapshot, bool]:
+        """
+        获取分析结果
+
+        返回 (快照, 是否过期)。版本一致时直接返回缓存；缓存过期时返回旧结果并在后台重新计算；
+        尚无任何结果时才在当前请求中同步计算一次。
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.compute(db)
+            with self._lock:
+                self._snapshot = snapshot
+            return snapshot, False
+
+        if snapshot.version == self.version(db):
+            return snapshot, False
+
+        if background_tasks is not None:
+            background_tasks.add_task(self.refresh)
+        else:
+            threading.Thread(target=self.refresh, daemon=True).start()
+        return snapshot, True
+
+
+graph_analytics_service = GraphAnalyticsService()
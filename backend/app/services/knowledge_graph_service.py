@@ -1,212 +1,668 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, Set, Tuple
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import networkx as nx
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils import murmurhash3_32
+
+from ..config import settings
 from ..models import Paper, Note
 from ..database import SessionLocal
 
-class KnowledgeGraphService:
+logger = logging.getLogger(__name__)
+
+# 哈希特征空间大小，词表固定后新增文献无需重新拟合
+N_FEATURES = 2 ** 18
+SIMILARITY_THRESHOLD = 0.3  # 相似度阈值
+KEYWORD_THRESHOLD = 0.1  # 关键词权重阈值
+TOP_KEYWORDS = 5
+# 分块计算相似度时每块的行数，单块相似度矩阵最多 chunk × N 个非零元素
+SIMILARITY_CHUNK_SIZE = 512
+
+
+def _replace_file(path: str, write, mode: str = "wb"):
+    """
+    原子地替换文件：先写同目录下的唯一临时文件再 os.replace
+
+    临时文件名各不相同，多个进程同时保存时不会写到同一个临时文件上。
+    """
+    directory, name = os.path.split(path)
+    tmp = tempfile.NamedTemporaryFile(mode, dir=directory, prefix=f"{name}.", suffix=".tmp", delete=False,
+                                      **({} if "b" in mode else {"encoding": "utf-8"}))
+    try:
+        with tmp:
+            write(tmp)
+        os.replace(tmp.name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp.name)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+@contextmanager
+def _storage_lock(directory: str, shared: bool = False):
+    """跨进程的存储目录锁：保存时独占，加载时共享，避免读到其他进程写了一半的文件"""
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _top_k_edges(block: sparse.csr_matrix, offset: int, top_k: int,
+                 threshold: float) -> List[Tuple[int, int, float]]:
+    """
+    从一块相似度矩阵中取出每行超过阈值的前k个相似项
+
+    block 为 (chunk, N) 的稀疏相似度矩阵，第 local 行对应全局行号 offset + local。
+    返回 (行号, 列号, 相似度) 列表。
+    """
+    edges = []
+    for local in range(block.shape[0]):
+        start, end = block.indptr[local], block.indptr[local + 1]
+        columns = block.indices[start:end]
+        values = block.data[start:end]
+        row = offset + local
+        keep = (values > threshold) & (columns != row)
+        columns, values = columns[keep], values[keep]
+        if top_k and len(values) > top_k:
+            best = np.argpartition(-values, top_k - 1)[:top_k]
+            columns, values = columns[best], values[best]
+        edges.extend((row, int(column), float(value)) for column, value in zip(columns, values))
+    return edges
+
+
+class TfidfState:
+    """
+    可增量维护的TF-IDF状态
+
+    词项通过哈希映射到固定的特征空间，保存每篇文献的原始词频矩阵与文档频率，
+    IDF 在打分时由文档频率现算，因此新增文献只需追加一行并更新文档频率。
+    """
+
     def __init__(self):
-        self.graph = nx.Graph()
-        self.vectorizer = TfidfVectorizer(
-            max_features=1000,
+        self.counts = sparse.csr_matrix((0, N_FEATURES), dtype=np.float64)
+        self.df = np.zeros(N_FEATURES, dtype=np.int64)
+        self.paper_ids: List[Optional[int]] = []  # 行号 -> 文献ID，已删除的行为None
+        self.row_of: Dict[int, int] = {}
+        self.terms: Dict[int, str] = {}  # 特征下标 -> 词项，用于生成概念节点名称
+        self._analyzer = HashingVectorizer(
             stop_words='english',
             ngram_range=(1, 2)
+        ).build_analyzer()
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.row_of)
+
+    def vectorize(self, text: str) -> sparse.csr_matrix:
+        """把文本转换为哈希词频行向量，并记录出现过的词项"""
+        counts = Counter()
+        for token in self._analyzer(text):
+            index = murmurhash3_32(token, positive=True) % N_FEATURES
+            counts[index] += 1
+            self.terms.setdefault(index, token)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.float64, count=len(counts))
+        order = np.argsort(indices)
+        return sparse.csr_matrix(
+            (values[order], indices[order], [0, len(indices)]),
+            shape=(1, N_FEATURES)
+        )
+
+    def idf(self) -> np.ndarray:
+        """平滑IDF，与 TfidfVectorizer(smooth_idf=True) 的定义一致"""
+        return np.log((1 + self.n_docs) / (1 + self.df)) + 1
+
+    def add(self, paper_id: int, text: str) -> int:
+        """追加（或替换）一篇文献，返回其行号"""
+        self.remove(paper_id)
+        row = self.vectorize(text)
+        self.df[row.indices] += 1
+        self.counts = sparse.vstack([self.counts, row], format='csr')
+        self.paper_ids.append(paper_id)
+        self.row_of[paper_id] = len(self.paper_ids) - 1
+        return self.row_of[paper_id]
+
+    def remove(self, paper_id: int):
+        """删除文献：清空对应行并扣减文档频率"""
+        row = self.row_of.pop(paper_id, None)
+        if row is None:
+            return
+        start, end = self.counts.indptr[row], self.counts.indptr[row + 1]
+        self.df[self.counts.indices[start:end]] -= 1
+        self.counts.data[start:end] = 0
+        self.paper_ids[row] = None
+        # 已删除的行过多时压缩矩阵
+        if len(self.paper_ids) > 2 * max(self.n_docs, 16):
+            self.compact()
+
+    def compact(self):
+        live = [i for i, pid in enumerate(self.paper_ids) if pid is not None]
+        self.counts = self.counts[live]
+        self.counts.eliminate_zeros()
+        self.paper_ids = [self.paper_ids[i] for i in live]
+        self.row_of = {pid: i for i, pid in enumerate(self.paper_ids)}
+
+    def tfidf_row(self, row: int, idf: np.ndarray) -> sparse.csr_matrix:
+        vector = self.counts[row].multiply(idf).tocsr()
+        norm = np.sqrt(vector.multiply(vector).sum())
+        return vector / norm if norm > 0 else vector
+
+    def tfidf_matrix(self) -> sparse.csr_matrix:
+        """全部行的L2归一化TF-IDF矩阵"""
+        matrix = self.counts.multiply(self.idf()).tocsr()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms) @ matrix
+
+    def similarities(self, row: int) -> np.ndarray:
+        """
+        一篇文献与所有行的余弦相似度
+
+        只做一次稀疏矩阵-向量乘法和一次按行求范数，整体为 O(nnz)，
+        不需要构造 N×N 相似度矩阵。
+        """
+        idf = self.idf()
+        query = self.tfidf_row(row, idf)
+        # counts·(idf ⊙ q) 即各行TF-IDF与q的点积（未归一化）
+        dots = self.counts @ query.multiply(idf).T
+        dots = np.asarray(dots.todense()).ravel()
+        squared = self.counts.multiply(self.counts) @ (idf ** 2)
+        norms = np.sqrt(np.asarray(squared).ravel())
+        sims = np.divide(dots, norms, out=np.zeros_like(dots), where=norms > 0)
+        sims[row] = 0.0
+        return sims
+
+    def iter_similarity_edges(self, top_k: int = 0, threshold: float = SIMILARITY_THRESHOLD,
+                              chunk_size: int = SIMILARITY_CHUNK_SIZE,
+                              workers: int = 1) -> Iterator[Tuple[int, int, float]]:
+        """
+        流式生成文献间的相似度边 (文献ID, 文献ID, 相似度)
+
+        按行分块计算 M[chunk] · Mᵀ 的稀疏乘积，每行只保留超过阈值的前 top_k 项
+        （top_k 为0时保留全部超过阈值的项），不构造 N×N 稠密矩阵。
+        workers 大于1时用线程池并行计算各块，同时最多保留 2×workers 块的结果，内存有界。
+        每条无向边只生成一次。
+        """
+        matrix = self.tfidf_matrix()
+        transposed = matrix.T.tocsc()
+        starts = range(0, matrix.shape[0], chunk_size)
+
+        def score(start: int) -> List[Tuple[int, int, float]]:
+            block = (matrix[start:start + chunk_size] @ transposed).tocsr()
+            return _top_k_edges(block, start, top_k, threshold)
+
+        def chunk_results() -> Iterator[List[Tuple[int, int, float]]]:
+            if workers <= 1:
+                for start in starts:
+                    yield score(start)
+                return
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = deque()
+                for start in starts:
+                    pending.append(executor.submit(score, start))
+                    if len(pending) >= 2 * workers:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+
+        # 已生成的边，规模为 O(N·k)
+        emitted = set()
+        for edges in chunk_results():
+            for row, column, value in edges:
+                pair = (row, column) if row < column else (column, row)
+                if pair in emitted:
+                    continue
+                source, target = self.paper_ids[row], self.paper_ids[column]
+                if source is None or target is None:
+                    continue
+                emitted.add(pair)
+                yield source, target, value
+
+    def save(self, directory: str):
+        """
+        保存到 directory；每个文件先写临时文件再替换，中途失败时不会留下写了一半的文件
+
+        调用方需持有 _storage_lock。三个文件依次替换，进程在替换之间退出时文件可能来自前后两次保存，
+        load 按 paper_ids 与矩阵行数校验，不一致时返回 None 并全量重建。
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.compact()
+        _replace_file(os.path.join(directory, "tfidf_counts.npz"), lambda f: sparse.save_npz(f, self.counts))
+        _replace_file(os.path.join(directory, "tfidf_state.npz"), lambda f: np.savez_compressed(
+            f,
+            df=self.df,
+            paper_ids=np.asarray(self.paper_ids, dtype=np.int64)
+        ))
+        _replace_file(os.path.join(directory, "tfidf_terms.json"),
+                      lambda f: json.dump(self.terms, f, ensure_ascii=False), mode="w")
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["TfidfState"]:
+        counts_path = os.path.join(directory, "tfidf_counts.npz")
+        state_path = os.path.join(directory, "tfidf_state.npz")
+        terms_path = os.path.join(directory, "tfidf_terms.json")
+        if not (os.path.exists(counts_path) and os.path.exists(state_path)):
+            return None
+        state = cls()
+        state.counts = sparse.load_npz(counts_path).tocsr()
+        with np.load(state_path) as data:
+            state.df = data["df"]
+            state.paper_ids = [int(pid) for pid in data["paper_ids"]]
+        if state.counts.shape != (len(state.paper_ids), N_FEATURES) or state.df.shape != (N_FEATURES,):
+            logger.warning("TF-IDF状态文件不一致，将重新构建")
+            return None
+        state.row_of = {pid: i for i, pid in enumerate(state.paper_ids)}
+        if os.path.exists(terms_path):
+            with open(terms_path, encoding="utf-8") as f:
+                state.terms = {int(k): v for k, v in json.load(f).items()}
+        return state
+
+
+class KnowledgeGraphService:
+    """
+    知识图谱服务
+
+    每个工作进程在内存中保存一份图与TF-IDF状态。文献变更先记入待处理队列，
+    由 flush 批量应用并写盘（定时执行，读取图谱前也会执行一次）；
+    写盘时持有跨进程的独占锁并递增 version 文件中的版本号，
+    其他进程读取前发现磁盘版本更新时重新加载，多个进程的更新不会互相覆盖。
+    """
+
+    def __init__(self, storage_dir: Optional[str] = None):
+        self.storage_dir = storage_dir or settings.KNOWLEDGE_GRAPH_DIR
+        self._lock = threading.Lock()
+        # 待写入的文献变更：文献ID -> 是否已删除
+        self._pending: Dict[int, bool] = {}
+        self._pending_lock = threading.Lock()
+        self.version = 0
+        self.state = TfidfState()
+        self.graph = nx.Graph()
+        # 目录不存在时尚未保存过，不必创建目录与锁文件
+        if os.path.isdir(self.storage_dir):
+            with _storage_lock(self.storage_dir, shared=True):
+                self._load()
+
+    @property
+    def _graph_path(self) -> str:
+        return os.path.join(self.storage_dir, "graph.json")
+
+    @property
+    def _version_path(self) -> str:
+        return os.path.join(self.storage_dir, "version")
+
+    def _disk_version(self) -> int:
+        try:
+            with open(self._version_path, encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _load(self):
+        """从磁盘加载TF-IDF状态与图数据（调用方需持有 _storage_lock）"""
+        self.version = self._disk_version()
+        self.state = self._load_state()
+        self.graph = self._load_graph()
+
+    def _load_state(self) -> TfidfState:
+        try:
+            state = TfidfState.load(self.storage_dir)
+            if state is not None:
+                logger.info(f"已加载持久化的TF-IDF状态，文献数: {state.n_docs}")
+                return state
+        except Exception as e:
+            logger.error(f"加载TF-IDF状态失败，将重新构建: {str(e)}")
+        return TfidfState()
+
+    def _load_graph(self) -> nx.Graph:
+        """加载持久化的图数据，服务重启后无需从数据库重建"""
+        graph = nx.Graph()
+        if not os.path.exists(self._graph_path):
+            return graph
+        try:
+            with open(self._graph_path, encoding="utf-8") as f:
+                data = json.load(f)
+            graph.add_nodes_from((node, attrs) for node, attrs in data["nodes"])
+            graph.add_edges_from((u, v, attrs) for u, v, attrs in data["edges"])
+            logger.info(f"已加载持久化的知识图谱，节点数: {graph.number_of_nodes()}")
+        except Exception as e:
+            logger.error(f"加载知识图谱失败，将重新构建: {str(e)}")
+            graph.clear()
+        return graph
+
+    def _reload_if_stale(self):
+        """其他进程写入了更新的版本时重新加载（调用方需持有 _storage_lock）"""
+        if self._disk_version() > self.version:
+            self._load()
+
+    def _save_graph(self):
+        try:
+            os.makedirs(self.storage_dir, exist_ok=True)
+            data = {
+                "nodes": [[node, attrs] for node, attrs in self.graph.nodes(data=True)],
+                "edges": [[u, v, attrs] for u, v, attrs in self.graph.edges(data=True)]
+            }
+            _replace_file(self._graph_path, lambda f: json.dump(data, f, ensure_ascii=False), mode="w")
+        except Exception as e:
+            logger.error(f"保存知识图谱失败: {str(e)}")
+
+    def _save_state(self):
+        """写入状态与图数据并递增版本号（调用方需持有 _storage_lock 独占锁）"""
+        try:
+            self.state.save(self.storage_dir)
+        except Exception as e:
+            logger.error(f"保存TF-IDF状态失败: {str(e)}")
+        self._save_graph()
+        try:
+            version = max(self.version, self._disk_version()) + 1
+            _replace_file(self._version_path, lambda f: f.write(str(version)), mode="w")
+            self.version = version
+        except Exception as e:
+            logger.error(f"保存知识图谱版本失败: {str(e)}")
+
+    @staticmethod
+    def _paper_text(paper) -> str:
+        return f"{paper.title} {paper.abstract or ''}"
+
+    def _add_keyword_nodes(self, paper_id: int, vector: sparse.csr_matrix) -> List[str]:
+        """把文献TF-IDF向量中权重最高的词项作为概念节点连接到文献"""
+        added = []
+        if vector.nnz == 0:
+            return added
+        order = np.argsort(vector.data)[-TOP_KEYWORDS:]
+        for pos in order:
+            weight = float(vector.data[pos])
+            term = self.state.terms.get(int(vector.indices[pos]))
+            if weight <= KEYWORD_THRESHOLD or not term:
+                continue
+            concept_id = f"concept_{term}"
+            if not self.graph.has_node(concept_id):
+                self.graph.add_node(concept_id, name=term, category=2, type="concept")
+                added.append(concept_id)
+            self.graph.add_edge(f"paper_{paper_id}", concept_id, type="contains", weight=weight)
+        return added
+
+    def _serialize(self, node_ids=None, edges=None) -> Dict[str, Any]:
+        """转换为前端需要的格式，可只序列化部分节点和边"""
+        node_iter = self.graph.nodes(data=True) if node_ids is None else (
+            (n, self.graph.nodes[n]) for n in node_ids if self.graph.has_node(n)
+        )
+        edge_iter = self.graph.edges(data=True) if edges is None else (
+            (u, v, self.graph.edges[u, v]) for u, v in edges if self.graph.has_edge(u, v)
         )
-        
-    def build_graph(self) -> Dict[str, Any]:
-        """构建知识图谱"""
+        nodes = [
+            {
+                "id": node,
+                "name": data["name"],
+                "category": data["category"],
+                "symbolSize": 10 + self.graph.degree(node) * 2
+            }
+            for node, data in node_iter
+        ]
+        links = [
+            {"source": u, "target": v, "value": data.get("weight", 1)}
+            for u, v, data in edge_iter
+        ]
+        return {"nodes": nodes, "links": links}
+
+    def build_graph(self, top_k: Optional[int] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        构建知识图谱（全量重建TF-IDF状态）
+
+        参数:
+        - top_k: 每篇文献最多保留的相似文献数，默认取 KNOWLEDGE_GRAPH_TOP_K，0表示不限制
+        - workers: 计算相似度边的线程数，默认取 KNOWLEDGE_GRAPH_WORKERS
+        """
+        top_k = settings.KNOWLEDGE_GRAPH_TOP_K if top_k is None else top_k
+        workers = settings.KNOWLEDGE_GRAPH_WORKERS if workers is None else workers
         db = SessionLocal()
         try:
+            # 待处理的变更已提交到数据库，全量构建会包含它们
+            with self._pending_lock:
+                self._pending.clear()
             # 获取所有文献和笔记
             papers = db.query(Paper).all()
             notes = db.query(Note).all()
-            
-            # 清空现有图
-            self.graph.clear()
-            
-            # 添加文献节点
-            for paper in papers:
-                self.graph.add_node(
-                    f"paper_{paper.id}",
-                    name=paper.title,
-                    category=0,  # 文献类别
-                    type="paper"
-                )
-            
-            # 添加笔记节点
-            for note in notes:
-                self.graph.add_node(
-                    f"note_{note.id}",
-                    name=f"Note on {note.paper.title}",
-                    category=1,  # 笔记类别
-                    type="note"
-                )
-                # 连接笔记和文献
-                self.graph.add_edge(
-                    f"note_{note.id}",
-                    f"paper_{note.paper_id}",
-                    type="belongs_to"
-                )
-            
-            # 计算文献相似度
-            paper_texts = [f"{p.title} {p.abstract}" for p in papers]
-            tfidf_matrix = self.vectorizer.fit_transform(paper_texts)
-            similarity_matrix = cosine_similarity(tfidf_matrix)
-            
-            # 添加文献间的相似度边
-            for i in range(len(papers)):
-                for j in range(i + 1, len(papers)):
-                    if similarity_matrix[i, j] > 0.3:  # 相似度阈值
-                        self.graph.add_edge(
-                            f"paper_{papers[i].id}",
-                            f"paper_{papers[j].id}",
-                            type="similar",
-                            weight=float(similarity_matrix[i, j])
-                        )
-            
-            # 提取关键词作为概念节点
-            feature_names = self.vectorizer.get_feature_names_out()
-            for i, paper in enumerate(papers):
-                # 获取文献的top关键词
-                paper_vector = tfidf_matrix[i].toarray().flatten()
-                top_indices = np.argsort(paper_vector)[-5:]  # 取top5关键词
-                
-                for idx in top_indices:
-                    if paper_vector[idx] > 0.1:  # 关键词权重阈值
-                        concept = feature_names[idx]
-                        concept_id = f"concept_{concept}"
-                        
-                        # 添加概念节点
-                        if not self.graph.has_node(concept_id):
-                            self.graph.add_node(
-                                concept_id,
-                                name=concept,
-                                category=2,  # 概念类别
-                                type="concept"
-                            )
-                        
-                        # 连接文献和概念
-                        self.graph.add_edge(
-                            f"paper_{paper.id}",
-                            concept_id,
-                            type="contains",
-                            weight=float(paper_vector[idx])
-                        )
-            
-            # 转换为前端需要的格式
-            nodes = []
-            links = []
-            
-            for node in self.graph.nodes(data=True):
-                nodes.append({
-                    "id": node[0],
-                    "name": node[1]["name"],
-                    "category": node[1]["category"],
-                    "symbolSize": 10 + len(list(self.graph.neighbors(node[0]))) * 2
-                })
-            
-            for edge in self.graph.edges(data=True):
-                links.append({
-                    "source": edge[0],
-                    "target": edge[1],
-                    "value": edge[2].get("weight", 1)
-                })
-            
-            return {
-                "nodes": nodes,
-                "links": links
-            }
-            
+
+            with self._lock, _storage_lock(self.storage_dir):
+                # 清空现有图
+                self.graph.clear()
+                self.state = TfidfState()
+
+                # 添加文献节点
+                for paper in papers:
+                    self.graph.add_node(
+                        f"paper_{paper.id}",
+                        name=paper.title,
+                        category=0,  # 文献类别
+                        type="paper"
+                    )
+                    self.state.add(paper.id, self._paper_text(paper))
+
+                # 添加笔记节点
+                for note in notes:
+                    self.graph.add_node(
+                        f"note_{note.id}",
+                        name=f"Note on {note.paper.title}",
+                        category=1,  # 笔记类别
+                        type="note"
+                    )
+                    # 连接笔记和文献
+                    self.graph.add_edge(
+                        f"note_{note.id}",
+                        f"paper_{note.paper_id}",
+                        type="belongs_to"
+                    )
+
+                # 分块计算文献相似度并流式添加相似度边
+                for source, target, weight in self.state.iter_similarity_edges(top_k=top_k, workers=workers):
+                    self.graph.add_edge(
+                        f"paper_{source}",
+                        f"paper_{target}",
+                        type="similar",
+                        weight=weight
+                    )
+
+                # 提取关键词作为概念节点
+                tfidf_matrix = self.state.tfidf_matrix()
+                for row, paper_id in enumerate(self.state.paper_ids):
+                    self._add_keyword_nodes(paper_id, tfidf_matrix[row])
+
+                self._save_state()
+                return self._serialize()
+
         finally:
             db.close()
-    
+
+    def _update_paper(self, db, paper_id: int) -> Dict[str, Any]:
+        """
+        把一篇文献的变更应用到内存中的图与TF-IDF状态（调用方需持有 _lock）
+
+        新文献只与已有各行打分一次，整体为 O(N) 的稀疏运算；
+        返回值只包含本次新增/变化的节点和边。
+        """
+        # 获取新添加的文献
+        new_paper = db.query(Paper).filter(Paper.id == paper_id).first()
+        if not new_paper:
+            raise ValueError(f"Paper with id {paper_id} not found")
+
+        node_id = f"paper_{new_paper.id}"
+        # 修改文献时先移除旧的相似度边与关键词边
+        if self.graph.has_node(node_id):
+            stale = [
+                (u, v) for u, v, data in self.graph.edges(node_id, data=True)
+                if data.get("type") in ("similar", "contains")
+            ]
+            self.graph.remove_edges_from(stale)
+
+        # 添加新文献节点
+        self.graph.add_node(node_id, name=new_paper.title, category=0, type="paper")
+        row = self.state.add(new_paper.id, self._paper_text(new_paper))
+
+        changed_nodes = [node_id]
+        changed_edges = []
+
+        # 计算与已有文献的相似度并按文献ID建边
+        sims = self.state.similarities(row)
+        candidates = np.flatnonzero(sims > SIMILARITY_THRESHOLD)
+        top_k = settings.KNOWLEDGE_GRAPH_TOP_K
+        if top_k and len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-sims[candidates], top_k - 1)[:top_k]]
+        for other_row in candidates:
+            other_id = self.state.paper_ids[other_row]
+            if other_id is None:
+                continue
+            other_node = f"paper_{other_id}"
+            self.graph.add_edge(node_id, other_node, type="similar", weight=float(sims[other_row]))
+            changed_nodes.append(other_node)
+            changed_edges.append((node_id, other_node))
+
+        # 提取新文献的关键词
+        vector = self.state.tfidf_row(row, self.state.idf())
+        changed_nodes.extend(self._add_keyword_nodes(new_paper.id, vector))
+        changed_edges.extend(
+            (u, v) for u, v, data in self.graph.edges(node_id, data=True)
+            if data.get("type") == "contains"
+        )
+        return self._serialize(changed_nodes, changed_edges)
+
+    def _remove_paper(self, paper_id: int):
+        """从内存中的图与TF-IDF状态中删除文献（调用方需持有 _lock）"""
+        node_id = f"paper_{paper_id}"
+        if self.graph.has_node(node_id):
+            self.graph.remove_node(node_id)
+        self.state.remove(paper_id)
+
     def update_graph(self, paper_id: int) -> Dict[str, Any]:
-        """更新知识图谱(添加新文献后)"""
+        """
+        立即增量更新知识图谱并写盘(添加或修改文献后)
+
+        返回值只包含本次新增/变化的节点和边，全量数据请使用 get_graph_data。
+        请求中的文献变更请使用 update_graph_task，由 flush 批量写盘。
+        """
         db = SessionLocal()
         try:
-            # 获取新添加的文献
-            new_paper = db.query(Paper).filter(Paper.id == paper_id).first()
-            if not new_paper:
-                raise ValueError(f"Paper with id {paper_id} not found")
-            
-            # 添加新文献节点
-            self.graph.add_node(
-                f"paper_{new_paper.id}",
-                name=new_paper.title,
-                category=0,
-                type="paper"
-            )
-            
-            # 计算与新文献的相似度
-            paper_texts = [f"{p.title} {p.abstract}" for p in db.query(Paper).all()]
-            tfidf_matrix = self.vectorizer.fit_transform(paper_texts)
-            similarity_matrix = cosine_similarity(tfidf_matrix)
-            
-            # 添加相似度边
-            new_paper_idx = paper_texts.index(f"{new_paper.title} {new_paper.abstract}")
-            for i in range(len(paper_texts)):
-                if i != new_paper_idx and similarity_matrix[new_paper_idx, i] > 0.3:
-                    self.graph.add_edge(
-                        f"paper_{new_paper.id}",
-                        f"paper_{i}",
-                        type="similar",
-                        weight=float(similarity_matrix[new_paper_idx, i])
-                    )
-            
-            # 提取新文献的关键词
-            feature_names = self.vectorizer.get_feature_names_out()
-            paper_vector = tfidf_matrix[new_paper_idx].toarray().flatten()
-            top_indices = np.argsort(paper_vector)[-5:]
-            
-            for idx in top_indices:
-                if paper_vector[idx] > 0.1:
-                    concept = feature_names[idx]
-                    concept_id = f"concept_{concept}"
-                    
-                    if not self.graph.has_node(concept_id):
-                        self.graph.add_node(
-                            concept_id,
-                            name=concept,
-                            category=2,
-                            type="concept"
-                        )
-                    
-                    self.graph.add_edge(
-                        f"paper_{new_paper.id}",
-                        concept_id,
-                        type="contains",
-                        weight=float(paper_vector[idx])
-                    )
-            
-            # 转换为前端需要的格式
-            nodes = []
-            links = []
-            
-            for node in self.graph.nodes(data=True):
-                nodes.append({
-                    "id": node[0],
-                    "name": node[1]["name"],
-                    "category": node[1]["category"],
-                    "symbolSize": 10 + len(list(self.graph.neighbors(node[0]))) * 2
-                })
-            
-            for edge in self.graph.edges(data=True):
-                links.append({
-                    "source": edge[0],
-                    "target": edge[1],
-                    "value": edge[2].get("weight", 1)
-                })
-            
-            return {
-                "nodes": nodes,
-                "links": links
-            }
-            
+            with self._lock, _storage_lock(self.storage_dir):
+                self._reload_if_stale()
+                changes = self._update_paper(db, paper_id)
+                self._save_state()
+                return changes
         finally:
             db.close()
-            
+
+    def remove_paper(self, paper_id: int):
+        """立即从图谱和TF-IDF状态中删除文献并写盘"""
+        with self._lock, _storage_lock(self.storage_dir):
+            self._reload_if_stale()
+            self._remove_paper(paper_id)
+            self._save_state()
+
+    def update_graph_task(self, paper_id: int):
+        """后台任务入口：文献新增或修改后记入待处理队列"""
+        with self._pending_lock:
+            self._pending[paper_id] = False
+
+    def remove_paper_task(self, paper_id: int):
+        """后台任务入口：文献删除后记入待处理队列"""
+        with self._pending_lock:
+            self._pending[paper_id] = True
+
+    def flush(self):
+        """
+        把待处理的文献变更批量应用到图谱并写盘一次
+
+        持有跨进程独占锁，先加载其他进程写入的更新版本再应用本进程的变更；
+        图谱尚未构建时丢弃变更，首次读取时会全量构建。
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        db = SessionLocal()
+        try:
+            with self._lock, _storage_lock(self.storage_dir):
+                self._reload_if_stale()
+                if self.graph.number_of_nodes() == 0:
+                    return
+                for paper_id, removed in pending.items():
+                    try:
+                        if removed:
+                            self._remove_paper(paper_id)
+                        else:
+                            self._update_paper(db, paper_id)
+                    except Exception as e:
+                        logger.error(f"更新文献 {paper_id} 的知识图谱失败: {str(e)}")
+                self._save_state()
+        finally:
+            db.close()
+
+    def flush_task(self):
+        """定时任务入口：写入待处理的文献变更"""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"写入知识图谱变更失败: {str(e)}")
+
+    def _sync(self):
+        """读取前写入本进程的待处理变更，并加载其他进程写入的更新版本"""
+        self.flush()
+        if self._disk_version() > self.version:
+            with self._lock, _storage_lock(self.storage_dir, shared=True):
+                self._reload_if_stale()
+
     def get_graph_data(self) -> Dict[str, Any]:
-        """获取知识图谱数据"""
-        return self.build_graph() 
\ No newline at end of file
+        """获取知识图谱数据，已有（含持久化加载的）图时直接返回"""
+        self._sync()
+        if self.graph.number_of_nodes() == 0:
+            return self.build_graph()
+        with self._lock:
+            return self._serialize()
+
+    @staticmethod
+    def _visible(node: str, paper_ids: Optional[Set[int]], note_ids: Optional[Set[int]]) -> bool:
+        kind, _, key = node.partition("_")
+        if kind == "paper" and paper_ids is not None:
+            return int(key) in paper_ids
+        if kind == "note" and note_ids is not None:
+            return int(key) in note_ids
+        return True
+
+    def get_paper_graph(self, paper_id: int, paper_ids: Optional[Set[int]] = None,
+                        note_ids: Optional[Set[int]] = None) -> Dict[str, Any]:
+        """
+        获取单个文献及其直接关联节点（相似文献、笔记、关键词）组成的子图
+
+        图谱包含所有用户的文献；给出 paper_ids / note_ids 时只返回其中的文献与笔记邻居。
+        """
+        node_id = f"paper_{paper_id}"
+        self._sync()
+        if self.graph.number_of_nodes() == 0:
+            self.build_graph()
+        if not self.graph.has_node(node_id):
+            self.update_graph(paper_id)
+        with self._lock:
+            neighbors = [node for node in self.graph.neighbors(node_id) if self._visible(node, paper_ids, note_ids)]
+            return self._serialize([node_id] + neighbors, [(node_id, node) for node in neighbors])
+
+
+# 全局共享的知识图谱实例
+knowledge_graph_service = KnowledgeGraphService()
@@ -0,0 +1,275 @@
+"""
+外部镜像的健康检查
+
+Sci-Hub 与谷歌学术都依赖一组可互相替代、经常失效的镜像。各服务把镜像列表与判断方式注册为 MirrorPool，
+后台任务每隔 MIRROR_HEALTH_INTERVAL_SECONDS 用 asyncio 并发探测所有镜像（一轮的耗时约等于一次探测超时），
+请求路径调用 candidates / best 立即得到排好序的镜像，不再在请求中逐个探测。
+
+- 健康分数：每次探测与实际请求成功(1)/失败(0)的指数加权移动平均，不低于 HEALTHY_SCORE 视为可用；
+  从未探测过的镜像按可用处理，排在已知延迟的镜像之后
+- 延迟：成功请求耗时的指数加权移动平均，可用镜像按它从快到慢排列
+- 实际请求的结果通过 record 反馈，两次探测之间失效的镜像也会很快排到后面
+- 结果保存在 mirror_health 表中，进程重启后立即可用（多个工作进程各自探测，后写入的覆盖先写入的）
+"""
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import httpx
+import logging
+import threading
+import time
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import MirrorHealth
+
+logger = logging.getLogger(__name__)
+
+HEALTHY_SCORE = 0.5
+# 从未探测过的镜像的初始分数（按可用处理）
+UNKNOWN_SCORE = 0.5
+
+
+class MirrorPool:
+    """
+    一组可互相替代的镜像
+
+    probe_url 根据镜像地址生成探测地址；is_healthy 根据状态码与页面内容判断镜像是否可用。
+    """
+
+    def __init__(self, name: str, urls: Iterable[str], probe_url: Optional[Callable[[str], str]] = None,
+                 is_healthy: Optional[Callable[[int, str], bool]] = None, headers: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.urls = list(dict.fromkeys(urls))
+        self.probe_url = probe_url or (lambda url: url)
+        self.is_healthy = is_healthy or (lambda status, text: status == 200)
+        self.headers = headers or {}
+
+
+class MirrorState:
+    """单个镜像的健康分数与延迟"""
+
+    __slots__ = ("url", "score", "latency_ms", "failures", "checked_at", "last_ok_at")
+
+    def __init__(self, url: str, score: float = UNKNOWN_SCORE, latency_ms: Optional[float] = None,
+                 failures: int = 0, checked_at: Optional[datetime] = None, last_ok_at: Optional[datetime] = None):
+        self.url = url
+        self.score = score
+        self.latency_ms = latency_ms
+        self.failures = failures
+        self.checked_at = checked_at
+        self.last_ok_at = last_ok_at
+
+    @property
+    def healthy(self) -> bool:
+        return self.score >= HEALTHY_SCORE
+
+    def update(self, ok: bool, latency_ms: Optional[float], alpha: float):
+        now = datetime.utcnow()
+        self.score = alpha * (1.0 if ok else 0.0) + (1 - alpha) * self.score
+        if ok:
+            if latency_ms is not None:
+                self.latency_ms = latency_ms if self.latency_ms is None else alpha * latency_ms + (1 - alpha) * self.latency_ms
+            self.failures = 0
+            self.last_ok_at = now
+        else:
+            self.failures += 1
+        self.checked_at = now
+
+
+class MirrorHealthService:
+    """镜像的并发探测、排序与持久化"""
+
+    def __init__(self, alpha: float = settings.MIRROR_HEALTH_ALPHA, probe_timeout: float = settings.MIRROR_PROBE_TIMEOUT,
+                 interval_seconds: float = settings.MIRROR_HEALTH_INTERVAL_SECONDS):
+        self.alpha = alpha
+        self.probe_timeout = probe_timeout
+        self.interval_seconds = interval_seconds
+        self.pools: Dict[str, MirrorPool] = {}
+        self._states: Dict[str, Dict[str, MirrorState]] = {}
+        # record 可能在线程池中被调用（同步的 requests 请求路径）
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------ 注册与选择
+
+    def register(self, pool: MirrorPool) -> MirrorPool:
+        """注册（或替换）一组镜像；已有的状态保留"""
+        with self._lock:
+            existing = self._states.get(pool.name, {})
+            self.pools[pool.name] = pool
+            self._states[pool.name] = {url: existing.get(url) or MirrorState(url) for url in pool.urls}
+        return pool
+
+    def ranked(self, name: str) -> List[str]:
+        """全部镜像：可用的按延迟从快到慢（未知延迟的在后），其余按健康分数从高到低"""
+        pool = self.pools.get(name)
+        if pool is None:
+            return []
+        order = {url: index for index, url in enumerate(pool.urls)}
+        with self._lock:
+            states = list(self._states[name].values())
+        healthy = sorted((state for state in states if state.healthy),
+                         key=lambda state: (state.latency_ms is None, state.latency_ms or 0, order[state.url]))
+        others = sorted((state for state in states if not state.healthy),
+                        key=lambda state: (-state.score, order[state.url]))
+        return [state.url for state in healthy + others]
+
+    def candidates(self, name: str, fallback: int = 3) -> List[str]:
+        """请求路径依次尝试的镜像：可用的镜像；没有可用镜像时取健康分数最高的 fallback 个"""
+        pool = self.pools.get(name)
+        if pool is None:
+            return []
+        with self._lock:
+            healthy = {url for url, state in self._states[name].items() if state.healthy}
+        ranked = self.ranked(name)
+        return [url for url in ranked if url in healthy] or ranked[:fallback]
+
+    def best(self, name: str) -> Optional[str]:
+        """最快的可用镜像，没有时返回 None"""
+        with self._lock:
+            healthy = {url for url, state in self._states.get(name, {}).items() if state.healthy}
+        return next((url for url in self.ranked(name) if url in healthy), None)
+
+    def record(self, name: str, url: str, ok: bool, latency_ms: Optional[float] = None):
+        """反馈一次探测或实际请求的结果（未注册的镜像忽略）"""
+        with self._lock:
+            state = self._states.get(name, {}).get(url)
+            if state is not None:
+                state.update(ok, latency_ms, self.alpha)
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """各组镜像的当前状态（按 ranked 的顺序）"""
+        result = {}
+        for name in list(self.pools):
+            with self._lock:
+                states = dict(self._states[name])
+            result[name] = [
+                {
+                    "url": url,
+                    "healthy": states[url].healthy,
+                    "score": round(states[url].score, 3),
+                    "latency_ms": round(states[url].latency_ms, 1) if states[url].latency_ms is not None else None,
+                    "failures": states[url].failures,
+                    "checked_at": states[url].checked_at,
+                    "last_ok_at": states[url].last_ok_at,
+                }
+                for url in self.ranked(name)
+            ]
+        return result
+
+    # ------------------------------------------------------------ 探测
+
+    async def _probe(self, client: httpx.AsyncClient, pool: MirrorPool, url: str) -> Tuple[bool, Optional[float]]:
+        start = time.perf_counter()
+        try:
+            response = await client.get(pool.probe_url(url), headers=pool.headers)
+            latency_ms = (time.perf_counter() - start) * 1000
+            return pool.is_healthy(response.status_code, response.text), latency_ms
+        except Exception as e:
+            logger.debug(f"镜像 {url} 探测失败: {e}")
+            return False, None
+
+    async def probe(self, name: str) -> Dict[str, bool]:
+        """并发探测一组镜像并更新状态，返回 镜像 -> 本次是否可用"""
+        pool = self.pools[name]
+        async with httpx.AsyncClient(timeout=self.probe_timeout, follow_redirects=True) as client:
+            results = await asyncio.gather(*(self._probe(client, pool, url) for url in pool.urls))
+        for url, (ok, latency_ms) in zip(pool.urls, results):
+            self.record(name, url, ok, latency_ms)
+        available = sum(1 for ok, _ in results if ok)
+        logger.info(f"镜像 {name} 探测完成: {available}/{len(pool.urls)} 可用")
+        return {url: ok for url, (ok, _) in zip(pool.urls, results)}
+
+    async def refresh(self):
+        """探测所有已注册的镜像（各组同时进行）并保存结果"""
+        results = await asyncio.gather(*(self.probe(name) for name in list(self.pools)), return_exceptions=True)
+        for name, result in zip(list(self.pools), results):
+            if isinstance(result, Exception):
+                logger.error(f"镜像 {name} 探测失败: {result}")
+        await run_in_threadpool(self.save_task)
+
+    # ------------------------------------------------------------ 持久化
+
+    def load(self, db: Session) -> int:
+        """从 mirror_health 表恢复已注册镜像的状态，返回恢复的条数"""
+        rows = db.execute(select(MirrorHealth)).scalars().all()
+        restored = 0
+        with self._lock:
+            for row in rows:
+                states = self._states.get(row.service)
+                if states is None or row.url not in states:
+                    continue
+                states[row.url] = MirrorState(row.url, row.score, row.latency_ms, row.failures,
+                                              row.checked_at, row.last_ok_at)
+                restored += 1
+        return restored
+
+    def save(self, db: Session):
+        existing = {(row.service, row.url): row for row in db.execute(select(MirrorHealth)).scalars()}
+        with self._lock:
+            states = [(name, state.url, state.score, state.latency_ms, state.failures, state.checked_at, state.last_ok_at)
+                      for name, pool_states in self._states.items() for state in pool_states.values()]
+        for name, url, score, latency_ms, failures, checked_at, last_ok_at in states:
+            if checked_at is None:
+                continue
+            row = existing.get((name, url))
+            if row is None:
+                row = MirrorHealth(service=name, url=url)
+                db.add(row)
+            row.score = score
+            row.latency_ms = latency_ms
+            row.failures = failures
+            row.checked_at = checked_at
+            row.last_ok_at = last_ok_at
+        db.commit()
+
+    def load_task(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.load(db)
+        except Exception as e:
+            logger.error(f"读取镜像健康状况失败: {str(e)}")
+            return 0
+        finally:
+            db.close()
+
+    def save_task(self):
+        db = SessionLocal()
+        try:
+            self.save(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"保存镜像健康状况失败: {str(e)}")
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------ 后台任务
+
+    async def _run(self):
+        restored = await run_in_threadpool(self.load_task)
+        logger.info(f"镜像健康检查已启动，间隔 {self.interval_seconds:.0f} 秒，恢复 {restored} 条记录")
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"镜像健康检查失败: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """随应用启动：先恢复保存的状态，随后立即探测一轮；MIRROR_HEALTH_INTERVAL_SECONDS 为0时不启动"""
+        if self.interval_seconds <= 0 or self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+
+mirror_health_service = MirrorHealthService()
@@ -0,0 +1,221 @@
+"""
+论文批量导入（BibTeX / RIS / CSV）
+
+题录按流解析，每 chunk_size 条为一个事务:
+1. 一次 IN 查询找出已存在的 DOI，标题按归一化键与用户已有论文查重（开始时一次性加载）
+2. 论文用一条 INSERT ... RETURNING 批量写入
+3. 标签由 tag_service 批量解析并关联，项目-论文关联一次 executemany
+每个批次提交后产出一次进度，单个批次失败只回滚该批次。
+"""
+from sqlalchemy import select, insert
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Iterator, Iterable, List, Optional, Sequence, Tuple, BinaryIO
+from datetime import datetime
+import logging
+import time
+
+from ..config import settings
+from ..models import Paper, Project, project_paper
+from ..utils.reference_parsers import iter_records, title_key, normalize_doi
+from .tag_service import tag_service
+
+logger = logging.getLogger(__name__)
+
+# 进度中最多保留的错误条数
+MAX_REPORTED_ERRORS = 20
+
+# 与模型列长度一致，超长的字段截断
+_MAX_LENGTHS = {"title": 500, "authors": 1000, "url": 500, "journal": 255}
+_MAX_DOI_LENGTH = 100
+
+
+def _chunks(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class ImportProgress:
+    """导入进度统计"""
+
+    def __init__(self, fmt: str):
+        self.format = fmt
+        self.processed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.failed = 0
+        self.errors: List[str] = []
+        self.paper_ids: List[int] = []
+        self.started = time.perf_counter()
+
+    def add_error(self, message: str):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def snapshot(self, status: str) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "status": status,
+            "format": self.format,
+            "processed": self.processed,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "failed": self.failed,
+            "errors": list(self.errors),
+            "elapsed": round(elapsed, 3),
+            "papers_per_second": round(self.processed / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+class PaperImportService:
+    """批量导入题录到用户的论文库"""
+
+    def __init__(self, chunk_size: int = 500):
+        self.chunk_size = chunk_size
+
+    def _existing_title_keys(self, db: Session, user_id: int) -> set:
+        """用户已有论文的归一化标题（流式读取，只取标题列）"""
+        keys = set()
+        for title in db.scalars(select(Paper.title).where(Paper.user_id == user_id).execution_options(yield_per=2000)):
+            keys.add(title_key(title))
+        return keys
+
+    def _existing_dois(self, db: Session, dois: Sequence[str]) -> set:
+        """批量查询已存在的DOI（DOI全局唯一；库中可能存有大写形式，一并查询）"""
+        if not dois:
+            return set()
+        candidates = set(dois) | {doi.upper() for doi in dois}
+        return {normalize_doi(doi) for doi in db.scalars(select(Paper.doi).where(Paper.doi.in_(candidates)))}
+
+    def _paper_row(self, record: Dict[str, Any], user_id: int, project_id: Optional[int], fmt: str) -> Dict[str, Any]:
+        values = {field: (record.get(field) or None) for field in ("title", "authors", "url", "journal")}
+        for field, length in _MAX_LENGTHS.items():
+            if values[field]:
+                values[field] = values[field][:length]
+        year = record.get("year")
+        doi = record.get("doi")
+        return {
+            **values,
+            "venue": values["journal"],
+            "abstract": record.get("abstract"),
+            "doi": doi if doi and len(doi) <= _MAX_DOI_LENGTH else None,
+            "year": year,
+            "publication_date": datetime(year, 1, 1) if year else None,
+            "citation_count": 0,
+            "is_public": True,
+            "user_id": user_id,
+            "project_id": project_id,
+            "source": f"import:{fmt}",
+        }
+
+    def _import_chunk(self, db: Session, chunk: List[Dict[str, Any]], user_id: int, project_id: Optional[int],
+                      fmt: str, extra_tags: Sequence[str], seen_titles: set, seen_dois: set,
+                      progress: ImportProgress) -> Tuple[List[int], set, set]:
+        """在当前事务中写入一个批次，返回 (新论文ID, 本批标题键, 本批DOI)，查重集合由调用方在提交后合并"""
+        existing_dois = self._existing_dois(db, [r["doi"] for r in chunk if r.get("doi")])
+        chunk_titles, chunk_dois = set(), set()
+        rows, row_tags = [], []
+        for record in chunk:
+            key = title_key(record.get("title"))
+            if not key:
+                progress.invalid += 1
+                continue
+            doi = record.get("doi")
+            if key in seen_titles or key in chunk_titles or (doi and (doi in existing_dois or doi in seen_dois
+                                                                        or doi in chunk_dois)):
+                progress.duplicates += 1
+                continue
+            chunk_titles.add(key)
+            if doi:
+                chunk_dois.add(doi)
+            rows.append(self._paper_row(record, user_id, project_id, fmt))
+            row_tags.append([*record.get("tags", []), *extra_tags])
+
+        if not rows:
+            return [], chunk_titles, chunk_dois
+        paper_ids = list(db.scalars(insert(Paper).returning(Paper.id, sort_by_parameter_order=True), rows))
+
+        tag_service.link_many(db, list(zip(paper_ids, row_tags)))
+        if project_id is not None:
+            db.execute(insert(project_paper), [{"project_id": project_id, "paper_id": pid} for pid in paper_ids])
+        return paper_ids, chunk_titles, chunk_dois
+
+    def import_stream(
+        self,
+        db: Session,
+        stream: BinaryIO,
+        fmt: str,
+        user_id: int,
+        project_id: Optional[int] = None,
+        extra_tags: Sequence[str] = (),
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        从二进制流导入题录，每提交一个批次产出一次进度，最后产出 status 为 completed / failed 的汇总
+
+        参数:
+        - fmt: bibtex / ris / csv
+        - project_id: 导入后同时加入该项目（调用方需先校验项目归属）
+        - extra_tags: 为每篇导入的论文附加的标签
+        """
+        progress = ImportProgress(fmt)
+        chunk_size = chunk_size or self.chunk_size
+        if project_id is not None and db.get(Project, project_id) is None:
+            raise ValueError(f"项目不存在: {project_id}")
+
+        seen_titles = self._existing_title_keys(db, user_id)
+        seen_dois: set = set()
+        db.commit()
+        status = "completed"
+        try:
+            for chunk in _chunks(iter_records(stream, fmt), chunk_size):
+                progress.processed += len(chunk)
+                counted = (progress.invalid, progress.duplicates)
+                try:
+                    paper_ids, chunk_titles, chunk_dois = self._import_chunk(
+                        db, chunk, user_id, project_id, fmt, extra_tags, seen_titles, seen_dois, progress
+                    )
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    # 整批回滚，本批的无效/重复计数一并计入失败
+                    progress.invalid, progress.duplicates = counted
+                    progress.failed += len(chunk)
+                    progress.add_error(f"第 {progress.processed - len(chunk) + 1}-{progress.processed} 条导入失败: {e}")
+                    logger.error(f"批量导入论文批次失败: {e}")
+                else:
+                    seen_titles.update(chunk_titles)
+                    seen_dois.update(chunk_dois)
+                    progress.imported += len(paper_ids)
+                    progress.paper_ids.extend(paper_ids)
+                yield progress.snapshot("running")
+        except Exception as e:
+            # 解析错误等无法继续读取的情况，已提交的批次保留
+            db.rollback()
+            status = "failed"
+            progress.add_error(f"解析文件失败: {e}")
+            logger.error(f"批量导入论文失败: {e}")
+
+        summary = progress.snapshot(status)
+        logger.info(
+            f"批量导入完成: 用户 {user_id}, 处理 {summary['processed']} 条, 导入 {summary['imported']} 篇, "
+            f"重复 {summary['duplicates']}, 用时 {summary['elapsed']}s ({summary['papers_per_second']} 篇/秒)"
+        )
+        yield summary
+
+    def import_records(self, db: Session, stream: BinaryIO, fmt: str, user_id: int, **kwargs) -> Dict[str, Any]:
+        """一次性执行导入，只返回最终汇总"""
+        summary = None
+        for summary in self.import_stream(db, stream, fmt, user_id, **kwargs):
+            pass
+        return summary
+
+
+paper_import_service = PaperImportService(chunk_size=settings.IMPORT_CHUNK_SIZE)
@@ -0,0 +1,236 @@
+from sqlalchemy import select, Select
+from sqlalchemy.orm import Session, selectinload, load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, List, Optional, Iterable, Sequence, Tuple
+import logging
+
+from ..models import Paper, Tag, Project, Concept, project_paper
+from ..utils.pagination import Keyset, Page, InvalidCursor, paginate, paginate_async, count_cache
+from .search_index_service import search_index_service, SearchBackend
+
+logger = logging.getLogger(__name__)
+
+# 列表响应（Paper / PaperWithTags / PaperInProject）需要的列
+LIST_COLUMNS = (
+    Paper.id, Paper.title, Paper.authors, Paper.abstract, Paper.year, Paper.doi, Paper.url,
+    Paper.journal, Paper.citation_count, Paper.is_public, Paper.project_id, Paper.user_id,
+    Paper.created_at, Paper.updated_at,
+)
+LIST_COLUMN_KEYS = frozenset(column.key for column in LIST_COLUMNS)
+
+# 可预加载的关联: 名称 -> (关系, 只加载的列)
+RELATIONS = {
+    "tags": (Paper.tags, Tag.name),
+    "projects": (Paper.projects, Project.name),
+    "concepts": (Paper.concepts, Concept.name),
+}
+
+# 允许排序的列
+SORTABLE_COLUMNS = {column.key for column in Paper.__table__.columns}
+
+# 参与总数缓存键的过滤参数
+COUNT_FILTERS = ("user_id", "project_id", "paper_ids", "search", "year", "tags")
+
+
+class PaperRow:
+    """论文列表行：只有响应需要的字段，关联以名称列表给出，不挂在会话上"""
+
+    __slots__ = tuple(column.key for column in LIST_COLUMNS) + tuple(RELATIONS)
+
+    def __init__(self, paper: Paper, include: Iterable[str] = ()):
+        for column in LIST_COLUMNS:
+            setattr(self, column.key, getattr(paper, column.key))
+        for name in RELATIONS:
+            related = getattr(paper, name) if name in include else []
+            setattr(self, name, [item.name for item in related])
+
+    @property
+    def citations(self) -> Optional[int]:
+        """项目详情中的引用数字段名"""
+        return self.citation_count
+
+
+class PaperListingService:
+    """论文列表查询：统一的过滤/排序/分页，按需用 selectinload 一次性加载关联"""
+
+    def filter_query(
+        self,
+        user_id: Optional[int] = None,
+        project_id: Optional[int] = None,
+        paper_ids: Optional[Sequence[int]] = None,
+        search: Optional[str] = None,
+        year: Optional[int] = None,
+        tags: Optional[Sequence[str]] = None,
+        include: Iterable[str] = (),
+        search_backend: Optional[SearchBackend] = None,
+        sort_by: Optional[str] = None,
+    ) -> Tuple[Select, Optional[Any]]:
+        """
+        构建未排序的过滤查询，返回 (查询, 全文检索相关度表达式或None)
+
+        只加载 LIST_COLUMNS 与排序列；游标取自最后一行的排序列，不在 LIST_COLUMNS 中的排序列也要加载，
+        否则读取时会懒加载（异步会话中直接报错）。
+        """
+        columns = LIST_COLUMNS
+        if sort_by in SORTABLE_COLUMNS and sort_by not in LIST_COLUMN_KEYS:
+            columns += (getattr(Paper, sort_by),)
+        query = select(Paper).options(load_only(*columns))
+        if user_id is not None:
+            query = query.where(Paper.user_id == user_id)
+        if project_id is not None:
+            query = query.join(project_paper, Paper.id == project_paper.c.paper_id).where(
+                project_paper.c.project_id == project_id
+            )
+        if paper_ids is not None:
+            query = query.where(Paper.id.in_(paper_ids))
+        rank = None
+        if search:
+            clauses, rank, fts_table = search_index_service.paper_search_clauses(
+                search_backend, search, Paper.__table__
+            )
+            if fts_table is not None:
+                query = query.join(fts_table, fts_table.c.rowid == Paper.id)
+            query = query.where(*clauses)
+        if year:
+            query = query.where(Paper.year == year)
+        for tag in tags or []:
+            query = query.where(Paper.tags.any(Tag.name == tag))
+
+        for name in include:
+            if name not in RELATIONS:
+                raise ValueError(f"不支持预加载的关联: {name}")
+            relation, column = RELATIONS[name]
+            query = query.options(selectinload(relation).load_only(column))
+        return query, rank
+
+    def keyset(self, sort_by: Optional[str] = None, sort_order: Optional[str] = "desc") -> Keyset:
+        """排序列 + ID 的游标分页排序；非法列名时按创建时间倒序"""
+        if sort_by in SORTABLE_COLUMNS:
+            return Keyset(getattr(Paper, sort_by), Paper.id, descending=(sort_order or "").lower() != "asc")
+        return Keyset(Paper.created_at, Paper.id)
+
+    def build_query(
+        self,
+        user_id: Optional[int] = None,
+        project_id: Optional[int] = None,
+        paper_ids: Optional[Sequence[int]] = None,
+        search: Optional[str] = None,
+        year: Optional[int] = None,
+        tags: Optional[Sequence[str]] = None,
+        sort_by: Optional[str] = None,
+        sort_order: Optional[str] = "desc",
+        include: Iterable[str] = (),
+        skip: int = 0,
+        limit: Optional[int] = 100,
+        search_backend: Optional[SearchBackend] = None,
+    ) -> Select:
+        """
+        构建论文列表查询（偏移分页）
+
+        参数:
+        - user_id / project_id / paper_ids: 按所属用户、所在项目（project_paper关联）或ID过滤
+        - search: 标题、摘要、作者检索；传入 search_backend 时走全文索引并在未指定排序时按相关度排序，
+          否则使用 ILIKE
+        - tags: 标签名列表，论文需包含全部标签
+        - sort_by: 排序列名，非法列名时按创建时间倒序；空值排在最后，相同排序值时按ID稳定分页
+        - include: 需要预加载的关联（tags / projects / concepts），每个关联额外一次IN查询
+        """
+        query, rank = self.filter_query(user_id, project_id, paper_ids, search, year, tags, include, search_backend,
+                                        sort_by)
+        if sort_by not in SORTABLE_COLUMNS and rank is not None:
+            query = query.order_by(rank, Paper.id.desc())
+        else:
+            query = self.keyset(sort_by, sort_order).order_by(query)
+
+        if skip:
+            query = query.offset(skip)
+        if limit is not None:
+            query = query.limit(limit)
+        return query
+
+    def to_rows(self, papers: Iterable[Paper], include: Iterable[str] = ()) -> List[PaperRow]:
+        include = tuple(include)
+        return [PaperRow(paper, include) for paper in papers]
+
+    def list_papers(self, db: Session, include: Iterable[str] = (), **filters) -> List[PaperRow]:
+        """同步会话执行论文列表查询"""
+        include = tuple(include)
+        if filters.get("search"):
+            filters["search_backend"] = search_index_service.backend(db.connection())
+        papers = db.scalars(self.build_query(include=include, **filters)).all()
+        return self.to_rows(papers, include)
+
+    async def list_papers_async(self, db: AsyncSession, include: Iterable[str] = (), **filters) -> List[PaperRow]:
+        """异步会话执行论文列表查询（关联必须通过 include 预加载，异步会话不能懒加载）"""
+        include = tuple(include)
+        if filters.get("search"):
+            filters["search_backend"] = await search_index_service.backend_async(db)
+        papers = (await db.scalars(self.build_query(include=include, **filters))).all()
+        return self.to_rows(papers, include)
+
+    @staticmethod
+    def _count_key(filters: dict) -> Tuple[Tuple, Tuple[str, ...]]:
+        """总数缓存的键与依赖的表"""
+        key = ("papers",) + tuple(
+            tuple(value) if isinstance(value, (list, tuple)) else value
+            for value in (filters.get(name) for name in COUNT_FILTERS)
+        )
+        tables = ["papers"]
+        if filters.get("tags"):
+            tables += ["paper_tag", "tags"]
+        if filters.get("project_id") is not None:
+            tables.append("project_paper")
+        return key, tuple(tables)
+
+    def _page_plan(self, filters: dict, include: Tuple[str, ...], sort_by, sort_order, cursor) -> Tuple[Select, Keyset]:
+        query, rank = self.filter_query(include=include, sort_by=sort_by, **filters)
+        if rank is not None and sort_by not in SORTABLE_COLUMNS:
+            # 相关度不是列，无法作为游标；检索结果按相关度排序时只支持 skip 分页
+            if cursor:
+                raise InvalidCursor("按相关度排序的检索结果不支持游标分页，请使用 skip 或指定 sort_by")
+            return query.order_by(rank, Paper.id.desc()), None
+        return query, self.keyset(sort_by, sort_order)
+
+    def list_page(self, db: Session, include: Iterable[str] = (), sort_by: Optional[str] = None,
+                  sort_order: Optional[str] = "desc", cursor: Optional[str] = None, skip: int = 0,
+                  limit: Optional[int] = 100, with_total: bool = True, **filters) -> Page:
+        """
+        游标分页的论文列表（同步会话）
+
+        filters 为 filter_query 的过滤参数；返回的 Page.items 为 PaperRow，
+        next_cursor 作为下一次请求的 cursor 参数，total 来自总数缓存。
+        """
+        include = tuple(include)
+        if filters.get("search"):
+            filters["search_backend"] = search_index_service.backend(db.connection())
+        query, keyset = self._page_plan(filters, include, sort_by, sort_order, cursor)
+        if keyset is None:
+            page = Page(db.scalars(query.offset(skip).limit(limit)).all())
+        else:
+            page = paginate(db, query, keyset, limit=limit, cursor=cursor, skip=skip)
+        page.items = self.to_rows(page.items, include)
+        if with_total:
+            key, tables = self._count_key(filters)
+            page.total = count_cache.count(db, key, tables, query)
+        return page
+
+    async def list_page_async(self, db: AsyncSession, include: Iterable[str] = (), sort_by: Optional[str] = None,
+                              sort_order: Optional[str] = "desc", cursor: Optional[str] = None, skip: int = 0,
+                              limit: Optional[int] = 100, with_total: bool = True, **filters) -> Page:
+        """list_page 的异步会话版本"""
+        include = tuple(include)
+        if filters.get("search"):
+            filters["search_backend"] = await search_index_service.backend_async(db)
+        query, keyset = self._page_plan(filters, include, sort_by, sort_order, cursor)
+        if keyset is None:
+            page = Page((await db.scalars(query.offset(skip).limit(limit))).all())
+        else:
+            page = await paginate_async(db, query, keyset, limit=limit, cursor=cursor, skip=skip)
+        page.items = self.to_rows(page.items, include)
+        if with_total:
+            key, tables = self._count_key(filters)
+            page.total = await count_cache.count_async(db, key, tables, query)
+        return page
+
+
+paper_listing_service = PaperListingService()
@@ -0,0 +1,461 @@
+from typing import List, Dict, Any, Optional, Iterable, Tuple
+import logging
+import threading
+
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sqlalchemy import func, or_, insert
+from datetime import datetime
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models import Paper, PaperNeighbor, PaperNeighborStatus, paper_concepts
+
+logger = logging.getLogger(__name__)
+
+# 各维度权重，与 calculate_comprehensive_similarity 的默认权重保持一致
+SIMILARITY_WEIGHTS = {
+    "concept": 0.5,
+    "title": 0.2,
+    "author": 0.15,
+    "venue": 0.1,
+    "year": 0.05
+}
+
+# 每篇论文持久化的近邻数量（与接口 limit 的上限一致）
+MAX_NEIGHBORS = 50
+
+# 批量打分时每块的行数，限制稠密打分矩阵的内存占用
+SCORE_CHUNK_SIZE = 256
+
+_COMPONENTS = (
+    "concept_similarity", "title_similarity", "author_similarity",
+    "venue_similarity", "year_similarity"
+)
+
+
+def _split_authors(authors: str) -> List[str]:
+    """按逗号拆分作者字符串（与 calculate_author_similarity 的规则一致）"""
+    return [a.strip() for a in authors.split(',') if a.strip()]
+
+
+class _UserFeatures:
+    """单个用户全部论文的向量化特征"""
+
+    def __init__(self, signature, paper_ids, concepts, titles, authors, venues, venue_keys, years):
+        self.signature = signature
+        self.paper_ids = np.asarray(paper_ids, dtype=np.int64)
+        self.position = {pid: i for i, pid in enumerate(paper_ids)}
+        self.concepts = concepts
+        self.concept_sizes = np.asarray(concepts.sum(axis=1)).ravel()
+        self.titles = titles
+        self.authors = authors
+        self.author_sizes = np.asarray(authors.sum(axis=1)).ravel()
+        self.venues = venues
+        self.venue_keys = venue_keys
+        self.years = years
+
+    def __len__(self):
+        return len(self.paper_ids)
+
+
+class PaperSimilarityService:
+    """
+    论文相似度索引
+
+    为每个用户的论文预先计算概念集合（稀疏0/1矩阵）、标题字符n-gram向量、
+    作者集合以及期刊/年份特征，用稀疏矩阵乘法一次性对整个文库打分，
+    并把每篇论文的top-k相似论文持久化到 paper_neighbors 表中。
+    论文或概念发生变化时通过 refresh_paper/remove_paper 增量维护近邻表。
+    """
+
+    def __init__(self, max_neighbors: int = MAX_NEIGHBORS):
+        self.max_neighbors = max_neighbors
+        # 标题/期刊使用字符3-gram哈希向量，无需拟合词表，便于增量更新
+        self._text_vectorizer = HashingVectorizer(
+            analyzer="char_wb",
+            ngram_range=(3, 3),
+            n_features=2 ** 18,
+            alternate_sign=False,
+            norm="l2"
+        )
+        self._author_vectorizer = HashingVectorizer(
+            analyzer=_split_authors,
+            n_features=2 ** 18,
+            alternate_sign=False,
+            binary=True,
+            norm=None
+        )
+        self._features: Dict[int, _UserFeatures] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 特征构建
+    # ------------------------------------------------------------------
+    def _signature(self, db: Session, user_id: int) -> Tuple:
+        """用户文库的版本签名，论文或概念关联变化时签名随之改变"""
+        paper_count, last_updated = db.query(
+            func.count(Paper.id), func.max(Paper.updated_at)
+        ).filter(Paper.user_id == user_id).one()
+        link_count, link_sum = db.query(
+            func.count(paper_concepts.c.concept_id), func.sum(paper_concepts.c.concept_id)
+        ).join(Paper, Paper.id == paper_concepts.c.paper_id).filter(Paper.user_id == user_id).one()
+        return (paper_count, last_updated, link_count, link_sum)
+
+    def _build_features(self, db: Session, user_id: int, signature: Tuple) -> _UserFeatures:
+        """从数据库一次性读取用户的论文与概念关联，构建向量化特征"""
+        rows = (
+            db.query(Paper.id, Paper.title, Paper.authors, Paper.venue, Paper.journal, Paper.year)
+            .filter(Paper.user_id == user_id)
+            .order_by(Paper.id)
+            .all()
+        )
+        paper_ids = [r.id for r in rows]
+        position = {pid: i for i, pid in enumerate(paper_ids)}
+        n = len(paper_ids)
+
+        links = (
+            db.query(paper_concepts.c.paper_id, paper_concepts.c.concept_id)
+            .join(Paper, Paper.id == paper_concepts.c.paper_id)
+            .filter(Paper.user_id == user_id)
+            .all()
+        )
+        if links:
+            link_rows = np.fromiter((position[l.paper_id] for l in links), dtype=np.int64, count=len(links))
+            concept_ids, link_cols = np.unique(
+                np.fromiter((l.concept_id for l in links), dtype=np.int64, count=len(links)),
+                return_inverse=True
+            )
+            concepts = sparse.csr_matrix(
+                (np.ones(len(links), dtype=np.float64), (link_rows, link_cols)),
+                shape=(n, len(concept_ids))
+            )
+            # 去除重复关联，保证是0/1集合
+            concepts.data[:] = 1.0
+        else:
+            concepts = sparse.csr_matrix((n, 0), dtype=np.float64)
+
+        titles = self._text_vectorizer.transform([r.title or "" for r in rows])
+        authors = self._author_vectorizer.transform([r.authors or "" for r in rows])
+        venue_texts = [str(r.venue or r.journal or "").strip() for r in rows]
+        venues = self._text_vectorizer.transform(venue_texts)
+        venue_keys = np.array([v.lower() for v in venue_texts], dtype=object)
+        years = np.array([r.year if r.year is not None else np.nan for r in rows], dtype=np.float64)
+
+        return _UserFeatures(signature, paper_ids, concepts, titles, authors, venues, venue_keys, years)
+
+    def get_features(self, db: Session, user_id: int) -> _UserFeatures:
+        """获取用户特征，签名未变化时直接复用内存中的索引"""
+        signature = self._signature(db, user_id)
+        with self._lock:
+            features = self._features.get(user_id)
+        if features is not None and features.signature == signature:
+            return features
+
+        features = self._build_features(db, user_id, signature)
+        with self._lock:
+            self._features[user_id] = features
+        logger.info(f"已重建用户 {user_id} 的相似度索引，论文数: {len(features)}")
+        return features
+
+    def invalidate(self, user_id: int):
+        """丢弃用户的内存索引"""
+        with self._lock:
+            self._features.pop(user_id, None)
+
+    # ------------------------------------------------------------------
+    # 向量化打分
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _jaccard(matrix, sizes, rows: np.ndarray):
+        """计算若干行与全部行之间的Jaccard系数，返回(交集大小, 相似度)"""
+        inter = (matrix[rows] @ matrix.T).toarray()
+        union = sizes[rows][:, None] + sizes[None, :] - inter
+        similarity = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        return inter, similarity
+
+    def _score_block(self, features: _UserFeatures, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """对给定行与全部论文计算各维度相似度，结果为 (len(rows), N) 的矩阵"""
+        shared, concept_sim = self._jaccard(features.concepts, features.concept_sizes, rows)
+        _, author_sim = self._jaccard(features.authors, features.author_sizes, rows)
+        title_sim = np.minimum((features.titles[rows] @ features.titles.T).toarray(), 1.0)
+
+        venue_sim = np.minimum((features.venues[rows] @ features.venues.T).toarray(), 1.0)
+        row_keys = features.venue_keys[rows]
+        same_venue = (row_keys[:, None] == features.venue_keys[None, :]) & (row_keys[:, None] != "")
+        venue_sim[same_venue] = 1.0
+
+        year_diff = np.abs(features.years[rows][:, None] - features.years[None, :])
+        year_sim = np.nan_to_num(np.clip(1 - year_diff / 10, 0, None), nan=0.0)
+
+        score = (
+            SIMILARITY_WEIGHTS["concept"] * concept_sim +
+            SIMILARITY_WEIGHTS["title"] * title_sim +
+            SIMILARITY_WEIGHTS["author"] * author_sim +
+            SIMILARITY_WEIGHTS["venue"] * venue_sim +
+            SIMILARITY_WEIGHTS["year"] * year_sim
+        )
+        # 排除自身
+        score[np.arange(len(rows)), rows] = -1.0
+
+        return {
+            "score": score,
+            "shared_concepts": shared,
+            "concept_similarity": concept_sim,
+            "title_similarity": title_sim,
+            "author_similarity": author_sim,
+            "venue_similarity": venue_sim,
+            "year_similarity": year_sim
+        }
+
+    def _neighbor_mappings(self, user_id: int, features: _UserFeatures, block: Dict[str, np.ndarray],
+                           i: int, row: int) -> List[Dict[str, Any]]:
+        """从打分矩阵的第i行选出top-k近邻，生成待插入的记录"""
+        scores = block["score"][i]
+        k = min(self.max_neighbors, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[scores[top] > 0]
+        return [self._mapping(user_id, features, block, i, row, int(j)) for j in top]
+
+    @staticmethod
+    def _mapping(user_id: int, features: _UserFeatures, block: Dict[str, np.ndarray],
+                 i: int, row: int, col: int) -> Dict[str, Any]:
+        mapping = {
+            "user_id": user_id,
+            "paper_id": int(features.paper_ids[row]),
+            "neighbor_id": int(features.paper_ids[col]),
+            "score": float(block["score"][i, col]),
+            "shared_concepts": int(block["shared_concepts"][i, col])
+        }
+        for name in _COMPONENTS:
+            mapping[name] = float(block[name][i, col])
+        return mapping
+
+    def _rewrite_rows(self, db: Session, user_id: int, features: _UserFeatures, rows: Iterable[int]):
+        """分块重新计算并覆盖若干论文的近邻表"""
+        rows = np.asarray(sorted(set(rows)), dtype=np.int64)
+        for start in range(0, len(rows), SCORE_CHUNK_SIZE):
+            chunk = rows[start:start + SCORE_CHUNK_SIZE]
+            block = self._score_block(features, chunk)
+            chunk_ids = [int(features.paper_ids[r]) for r in chunk]
+            db.query(PaperNeighbor).filter(
+                PaperNeighbor.paper_id.in_(chunk_ids)
+            ).delete(synchronize_session=False)
+            mappings = []
+            for i, row in enumerate(chunk):
+                mappings.extend(self._neighbor_mappings(user_id, features, block, i, int(row)))
+            if mappings:
+                db.execute(insert(PaperNeighbor), mappings)
+            self._mark_computed(db, user_id, chunk_ids)
+
+    @staticmethod
+    def _mark_computed(db: Session, user_id: int, paper_ids: List[int]):
+        """记录论文的近邻表已计算（包括没有任何相似论文的情况）"""
+        db.query(PaperNeighborStatus).filter(
+            PaperNeighborStatus.paper_id.in_(paper_ids)
+        ).delete(synchronize_session=False)
+        now = datetime.utcnow()
+        db.execute(insert(PaperNeighborStatus), [
+            {"paper_id": pid, "user_id": user_id, "computed_at": now} for pid in paper_ids
+        ])
+
+    @staticmethod
+    def _is_computed(db: Session, paper_id: int) -> bool:
+        # 旧版本没有计算记录，已有近邻行的也视为已计算
+        return bool(
+            db.query(PaperNeighborStatus.paper_id).filter(PaperNeighborStatus.paper_id == paper_id).first()
+            or db.query(PaperNeighbor.id).filter(PaperNeighbor.paper_id == paper_id).first()
+        )
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+    def similar_papers(self, db: Session, user_id: int, paper_id: int,
+                       limit: int = 10, threshold: float = 0.0) -> List[Dict[str, Any]]:
+        """读取论文的top-k相似论文，从未计算过近邻表时先增量计算（计算过但没有相似论文的不再重算）"""
+        if not self._is_computed(db, paper_id):
+            self.refresh_paper(db, user_id, paper_id)
+
+        rows = (
+            db.query(PaperNeighbor, Paper.title, Paper.authors, Paper.year)
+            .join(Paper, Paper.id == PaperNeighbor.neighbor_id)
+            .filter(
+                PaperNeighbor.paper_id == paper_id,
+                PaperNeighbor.score >= threshold
+            )
+            .order_by(PaperNeighbor.score.desc())
+            .limit(limit)
+            .all()
+        )
+        return [
+            {
+                "paper_id": n.neighbor_id,
+                "title": title,
+                "authors": authors,
+                "year": year,
+                "similarity": n.score,
+                "shared_concepts": n.shared_concepts,
+                "concept_similarity": n.concept_similarity,
+                "title_similarity": n.title_similarity,
+                "author_similarity": n.author_similarity,
+                "venue_similarity": n.venue_similarity,
+                "year_similarity": n.year_similarity,
+                "source_id": paper_id,
+                "target_id": n.neighbor_id,
+                "abstract_similarity": 0.0
+            }
+            for n, title, authors, year in rows
+        ]
+
+    def refresh_paper(self, db: Session, user_id: int, paper_id: int):
+        """
+        论文新增、修改或概念变化后增量更新近邻表
+
+        只对该论文与文库其余论文打分一次(O(N)稀疏运算)：
+        1. 覆盖该论文自己的近邻表；
+        2. 此前把它列为近邻的论文，旧分数已失效，整行重算；
+        3. 其余论文若新分数能进入其top-k，则直接插入并裁剪到k条。
+        """
+        features = self.get_features(db, user_id)
+        row = features.position.get(paper_id)
+        if row is None:
+            self.remove_paper(db, user_id, paper_id)
+            return
+
+        stale_owners = {
+            pid for (pid,) in db.query(PaperNeighbor.paper_id).filter(
+                PaperNeighbor.neighbor_id == paper_id,
+                PaperNeighbor.user_id == user_id
+            )
+        }
+        db.query(PaperNeighbor).filter(
+            PaperNeighbor.neighbor_id == paper_id
+        ).delete(synchronize_session=False)
+
+        block = self._score_block(features, np.array([row]))
+        db.query(PaperNeighbor).filter(PaperNeighbor.paper_id == paper_id).delete(synchronize_session=False)
+        mappings = self._neighbor_mappings(user_id, features, block, 0, row)
+
+        # 各论文当前近邻表的条数与最低分；计算过但没有近邻的论文条数为0
+        stats = {
+            pid: (count, lowest)
+            for pid, count, lowest in db.query(
+                PaperNeighbor.paper_id, func.count(PaperNeighbor.id), func.min(PaperNeighbor.score)
+            ).filter(PaperNeighbor.user_id == user_id).group_by(PaperNeighbor.paper_id)
+        }
+        for (pid,) in db.query(PaperNeighborStatus.paper_id).filter(PaperNeighborStatus.user_id == user_id):
+            stats.setdefault(pid, (0, None))
+
+        # 相似度是对称的，score(q, p) 即 block 中第 q 列
+        scores = block["score"][0]
+        overfull = []
+        for col in np.flatnonzero(scores > 0):
+            other_id = int(features.paper_ids[col])
+            if other_id in stale_owners or other_id not in stats:
+                # 旧表需整行重算；从未计算过近邻表的论文在首次查询时再计算
+                continue
+            count, lowest = stats[other_id]
+            if count < self.max_neighbors or lowest is None or scores[col] > lowest:
+                reverse = self._mapping(user_id, features, block, 0, row, int(col))
+                reverse["paper_id"], reverse["neighbor_id"] = other_id, paper_id
+                mappings.append(reverse)
+                if count >= self.max_neighbors:
+                    overfull.append(other_id)
+
+        if mappings:
+            db.execute(insert(PaperNeighbor), mappings)
+
+        for other_id in overfull:
+            lowest_id = (
+                db.query(PaperNeighbor.id)
+                .filter(PaperNeighbor.paper_id == other_id)
+                .order_by(PaperNeighbor.score.asc())
+                .limit(1)
+                .scalar()
+            )
+            db.query(PaperNeighbor).filter(PaperNeighbor.id == lowest_id).delete(synchronize_session=False)
+
+        self._mark_computed(db, user_id, [paper_id])
+        stale_rows = [features.position[pid] for pid in stale_owners if pid in features.position]
+        self._rewrite_rows(db, user_id, features, stale_rows)
+        db.commit()
+
+    def remove_paper(self, db: Session, user_id: int, paper_id: int):
+        """论文删除后清理近邻表，并重算曾把它列为近邻的论文"""
+        owners = {
+            pid for (pid,) in db.query(PaperNeighbor.paper_id).filter(
+                PaperNeighbor.neighbor_id == paper_id
+            )
+        }
+        db.query(PaperNeighbor).filter(
+            or_(PaperNeighbor.paper_id == paper_id, PaperNeighbor.neighbor_id == paper_id)
+        ).delete(synchronize_session=False)
+        db.query(PaperNeighborStatus).filter(PaperNeighborStatus.paper_id == paper_id).delete(synchronize_session=False)
+
+        features = self.get_features(db, user_id)
+        rows = [features.position[pid] for pid in owners if pid in features.position]
+        self._rewrite_rows(db, user_id, features, rows)
+        db.commit()
+
+    def rebuild(self, db: Session, user_id: int) -> int:
+        """全量重建用户的近邻表，返回处理的论文数量"""
+        self.invalidate(user_id)
+        features = self.get_features(db, user_id)
+        db.query(PaperNeighbor).filter(PaperNeighbor.user_id == user_id).delete(synchronize_session=False)
+        db.query(PaperNeighborStatus).filter(PaperNeighborStatus.user_id == user_id).delete(synchronize_session=False)
+        self._rewrite_rows(db, user_id, features, range(len(features)))
+        db.commit()
+        return len(features)
+
+    def refresh_papers(self, db: Session, paper_ids: Iterable[int]):
+        """按用户分组增量刷新多篇论文（如概念被删除时）"""
+        paper_ids = list(paper_ids)
+        if not paper_ids:
+            return
+        owners = db.query(Paper.id, Paper.user_id).filter(Paper.id.in_(paper_ids)).all()
+        for pid, user_id in owners:
+            if user_id is not None:
+                self.refresh_paper(db, user_id, pid)
+
+    def refresh_paper_task(self, user_id: int, paper_id: int, removed: bool = False):
+        """后台任务入口，使用独立的数据库会话"""
+        db = SessionLocal()
+        try:
+            if removed:
+                self.remove_paper(db, user_id, paper_id)
+            else:
+                self.refresh_paper(db, user_id, paper_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"更新论文 {paper_id} 的相似度索引失败: {str(e)}")
+        finally:
+            db.close()
+
+    def refresh_papers_task(self, paper_ids: List[int]):
+        """后台任务入口：refresh_papers"""
+        db = SessionLocal()
+        try:
+            self.refresh_papers(db, paper_ids)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"更新相似度索引失败: {str(e)}")
+        finally:
+            db.close()
+
+    def rebuild_task(self, user_id: int):
+        """后台任务入口：全量重建（批量导入等一次新增大量论文时使用）"""
+        db = SessionLocal()
+        try:
+            self.rebuild(db, user_id)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"重建用户 {user_id} 的相似度索引失败: {str(e)}")
+        finally:
+            db.close()
+
+
+# 全局共享的相似度索引实例
+paper_similarity_service = PaperSimilarityService()
@@ -0,0 +1,359 @@
+"""
+PDF入库后台处理
+
+论文获得新的PDF后，任务写入 pdf_ingest_jobs（与论文变更同一事务，见 models/pdf_ingest_job.py），
+提交后唤醒后台任务；请求本身不做任何解析。每个任务：
+1. 解析PDF并写入文本缓存（已缓存则跳过），渲染第一页缩略图 —— 在进程池中执行
+2. 通过 PDFService 从缓存提取元数据，补全论文为空的 DOI / 摘要 / 作者
+3. 提取参考文献中的DOI，与用户文献库中相同DOI的论文批量建立 Citation 关联
+
+同时处理的任务数为 PDF_INGEST_CONCURRENCY，解析与渲染的进程数为 PDF_INGEST_PROCESSES；
+任务按条件更新领取，多个工作进程可以同时运行。失败的任务重试到 PDF_INGEST_MAX_ATTEMPTS 次，
+运行超过 PDF_INGEST_JOB_TIMEOUT_MINUTES 的任务（进程退出遗留）由 maintenance 放回队列。
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select, update, delete, insert, func, event
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import multiprocessing
+import os
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models import Paper, Blob, Citation, PdfIngestJob
+from ..models.pdf_ingest_job import PENDING_KEY
+from ..utils.pdf_text import parse_pdf_safely, render_thumbnail
+from .blob_service import blob_service
+from .pdf_service import pdf_service
+
+logger = logging.getLogger(__name__)
+
+# 已完成的任务保留天数
+FINISHED_RETENTION_DAYS = 7
+
+
+class PdfIngestService:
+    """PDF入库任务的领取、处理与后台运行"""
+
+    def __init__(self, concurrency: int = settings.PDF_INGEST_CONCURRENCY,
+                 processes: int = settings.PDF_INGEST_PROCESSES,
+                 max_attempts: int = settings.PDF_INGEST_MAX_ATTEMPTS,
+                 poll_seconds: float = settings.PDF_INGEST_POLL_SECONDS,
+                 job_timeout_minutes: float = settings.PDF_INGEST_JOB_TIMEOUT_MINUTES,
+                 thumbnail_width: int = settings.PDF_THUMBNAIL_WIDTH):
+        self.concurrency = concurrency
+        self.processes = processes or os.cpu_count() or 1
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.job_timeout = timedelta(minutes=job_timeout_minutes)
+        self.thumbnail_width = thumbnail_width
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+
+    # ------------------------------------------------------------ 队列
+
+    def claim(self, db: Session, batch_size: int = 10) -> Optional[Tuple[int, int, int]]:
+        """领取一个待处理任务，返回 (任务ID, 论文ID, 文件ID)；没有任务时返回 None"""
+        candidates = db.scalars(
+            select(PdfIngestJob.id).where(PdfIngestJob.status == "pending")
+            .order_by(PdfIngestJob.id).limit(batch_size)
+        ).all()
+        db.commit()
+        for job_id in candidates:
+            # 条件更新：并发的领取只有一个成功
+            claimed = db.execute(
+                update(PdfIngestJob)
+                .where(PdfIngestJob.id == job_id, PdfIngestJob.status == "pending")
+                .values(status="running", attempts=PdfIngestJob.attempts + 1, updated_at=datetime.utcnow())
+                .returning(PdfIngestJob.id, PdfIngestJob.paper_id, PdfIngestJob.blob_id)
+                .execution_options(synchronize_session=False)
+            ).first()
+            db.commit()
+            if claimed is not None:
+                return tuple(claimed)
+        return None
+
+    def _finish(self, db: Session, job_id: int, status: str, error: Optional[str] = None):
+        db.execute(
+            update(PdfIngestJob).where(PdfIngestJob.id == job_id)
+            .values(status=status, error=error[:500] if error else None, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    def fail(self, db: Session, job_id: int, error: str):
+        """记录失败：未达到重试次数时放回队列"""
+        db.rollback()
+        attempts = db.scalar(select(PdfIngestJob.attempts).where(PdfIngestJob.id == job_id)) or 0
+        self._finish(db, job_id, "pending" if attempts < self.max_attempts else "failed", error)
+        db.commit()
+        logger.error(f"处理PDF入库任务 {job_id} 失败（第 {attempts} 次）: {error}")
+
+    def maintenance(self, db: Session) -> Dict[str, int]:
+        """放回超时的运行中任务，删除过期的已完成任务"""
+        now = datetime.utcnow()
+        requeued = db.execute(
+            update(PdfIngestJob)
+            .where(PdfIngestJob.status == "running", PdfIngestJob.updated_at < now - self.job_timeout)
+            .values(status="pending", updated_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        pruned = db.execute(
+            delete(PdfIngestJob)
+            .where(PdfIngestJob.status.in_(("done", "skipped")),
+                   PdfIngestJob.updated_at < now - timedelta(days=FINISHED_RETENTION_DAYS))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        if requeued:
+            logger.warning(f"PDF入库: {requeued} 个超时任务已放回队列")
+        return {"requeued": requeued, "pruned": pruned}
+
+    def maintenance_task(self) -> Dict[str, int]:
+        """定时任务入口，使用独立的数据库会话"""
+        db = SessionLocal()
+        try:
+            return self.maintenance(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"PDF入库任务维护失败: {str(e)}")
+            return {}
+        finally:
+            db.close()
+
+    # ------------------------------------------------------------ 处理
+
+    def prepare(self, db: Session, job_id: int, paper_id: int, blob_id: int) -> Optional[Dict[str, Any]]:
+        """
+        检查任务是否仍然有效，返回进程池需要的输入；论文已删除或PDF已被替换时标记为 skipped 并返回 None
+        """
+        row = db.execute(
+            select(Paper.pdf_blob_id, Blob.sha256)
+            .select_from(Paper).join(Blob, Blob.id == Paper.pdf_blob_id)
+            .where(Paper.id == paper_id)
+        ).first()
+        if row is None or row.pdf_blob_id != blob_id:
+            self._finish(db, job_id, "skipped")
+            db.commit()
+            return None
+        sha256 = row.sha256
+        path = blob_service.path_for(sha256)
+        if not path.exists():
+            raise FileNotFoundError(f"PDF文件 {sha256} 不存在")
+        thumbnail = blob_service.thumbnail_path(sha256)
+        cached = pdf_service.get_cached(db, sha256) is not None
+        db.commit()
+        return {
+            "sha256": sha256,
+            "path": str(path),
+            "cached": cached,
+            "thumbnail": None if thumbnail.exists() else str(thumbnail),
+        }
+
+    def apply(self, db: Session, job_id: int, paper_id: int, plan: Dict[str, Any],
+              parsed: Optional[Dict[str, Any]]) -> Dict[str, int]:
+        """写入解析结果，补全元数据并关联参考文献，在一个事务中提交"""
+        sha256, path = plan["sha256"], plan["path"]
+        if parsed is not None:
+            pdf_service.store(db, sha256, parsed)
+        paper = db.get(Paper, paper_id)
+        if paper is None or paper.pdf_blob is None or paper.pdf_blob.sha256 != sha256:
+            self._finish(db, job_id, "skipped")
+            db.commit()
+            return {}
+
+        metadata = pdf_service.extract_metadata(db, path, sha256) or {}
+        references = pdf_service.extract_references(db, path, sha256) or []
+        updated = self.apply_metadata(db, paper, metadata, len(references))
+        linked = self.link_references(db, paper, references)
+        self._finish(db, job_id, "done")
+        db.commit()
+        return {"updated_fields": updated, "references": len(references), "linked": linked}
+
+    def apply_metadata(self, db: Session, paper: Paper, metadata: Dict[str, Any], reference_count: int) -> int:
+        """只补全论文为空的字段，返回更新的字段数"""
+        updated = 0
+        doi = metadata.get("doi")
+        if doi and not paper.doi:
+            # doi 全局唯一，已被其他论文使用时不填
+            taken = db.scalar(select(Paper.id).where(func.lower(Paper.doi) == doi.lower()).limit(1))
+            if taken is None:
+                paper.doi = doi[:100]
+                updated += 1
+        if metadata.get("abstract") and not paper.abstract:
+            paper.abstract = metadata["abstract"]
+            updated += 1
+        if metadata.get("authors") and not paper.authors:
+            paper.authors = metadata["authors"][:1000]
+            updated += 1
+        if reference_count and not paper.reference_count:
+            paper.reference_count = reference_count
+            updated += 1
+        return updated
+
+    def link_references(self, db: Session, paper: Paper, dois: List[str]) -> int:
+        """
+        为参考文献中出现、且在同一用户文献库中的论文批量创建引用关系，返回新建的条数
+
+        一次查询匹配所有DOI（不区分大小写），跳过已存在的关系，用一次 executemany 写入。
+        """
+        if not dois:
+            return 0
+        cited = db.execute(
+            select(Paper.id, Paper.doi)
+            .where(Paper.user_id == paper.user_id, Paper.id != paper.id,
+                   func.lower(Paper.doi).in_({doi.lower() for doi in dois}))
+        ).all()
+        if not cited:
+            return 0
+        existing = set(db.scalars(select(Citation.cited_paper_id).where(Citation.paper_id == paper.id)))
+        now = datetime.utcnow()
+        rows = [
+            {"paper_id": paper.id, "cited_paper_id": cited_id, "citation_text": doi,
+             "created_at": now, "updated_at": now}
+            for cited_id, doi in cited if cited_id not in existing
+        ]
+        if rows:
+            db.execute(insert(Citation), rows)
+        return len(rows)
+
+    def _prepare_job(self, job_id: int, paper_id: int, blob_id: int) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return self.prepare(db, job_id, paper_id, blob_id)
+        finally:
+            db.close()
+
+    def _apply_job(self, job_id: int, paper_id: int, plan: Dict[str, Any], parsed) -> Dict[str, int]:
+        db = SessionLocal()
+        try:
+            return self.apply(db, job_id, paper_id, plan, parsed)
+        finally:
+            db.close()
+
+    def _claim_job(self) -> Optional[Tuple[int, int, int]]:
+        db = SessionLocal()
+        try:
+            return self.claim(db)
+        finally:
+            db.close()
+
+    def _fail_job(self, job_id: int, error: str):
+        db = SessionLocal()
+        try:
+            self.fail(db, job_id, error)
+        except Exception as e:
+            logger.error(f"记录PDF入库任务 {job_id} 的失败状态失败: {e}")
+        finally:
+            db.close()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn：子进程不继承事件循环与数据库连接
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    async def _run_in_pool(self, func, *args):
+        """
+        在进程池中执行
+
+        子进程崩溃（段错误、被OOM终止）后整个进程池不可再用：换成新的进程池并重试一次，
+        同时在途的其他任务因此可以完成；再次崩溃时按普通失败计入重试次数。
+        """
+        loop = asyncio.get_running_loop()
+        for retry in (True, False):
+            executor = self._executor
+            try:
+                return await loop.run_in_executor(executor, func, *args)
+            except BrokenProcessPool as e:
+                # 并发的任务只替换一次
+                if executor is not None and self._executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._new_executor()
+                if not retry:
+                    raise
+                logger.warning(f"PDF解析进程池异常退出，已重建进程池并重试: {e}")
+
+    async def process(self, job_id: int, paper_id: int, blob_id: int):
+        """处理一个已领取的任务：数据库读写在线程池中，解析与渲染在进程池中"""
+        try:
+            plan = await run_in_threadpool(self._prepare_job, job_id, paper_id, blob_id)
+            if plan is None:
+                return
+            parsed = None
+            if not plan["cached"]:
+                parsed = await self._run_in_pool(parse_pdf_safely, plan["path"])
+                if parsed is None:
+                    raise ValueError("PDF无法解析")
+            if plan["thumbnail"] is not None:
+                await self._run_in_pool(render_thumbnail, plan["path"], plan["thumbnail"], self.thumbnail_width)
+            result = await run_in_threadpool(self._apply_job, job_id, paper_id, plan, parsed)
+            logger.info(f"论文 {paper_id} 的PDF入库处理完成: {result}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await run_in_threadpool(self._fail_job, job_id, str(e))
+
+    # ------------------------------------------------------------ 后台运行
+
+    def notify(self):
+        """有新任务入队（可在任意线程调用）"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is not None and wakeup is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(wakeup.set)
+
+    async def _consume(self):
+        while True:
+            # 先清除再领取：领取之后入队的任务一定会再次唤醒
+            self._wakeup.clear()
+            try:
+                job = await run_in_threadpool(self._claim_job)
+            except Exception as e:
+                logger.error(f"领取PDF入库任务失败: {str(e)}")
+                job = None
+            if job is not None:
+                await self.process(*job)
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """随应用启动；PDF_INGEST_CONCURRENCY 为0时不启动"""
+        if self.concurrency <= 0 or self._tasks:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._executor = self._new_executor()
+        self._tasks = [self._loop.create_task(self._consume()) for _ in range(self.concurrency)]
+        logger.info(f"PDF入库任务已启动，并发 {self.concurrency}，进程 {self.processes}")
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._loop = self._wakeup = None
+
+
+pdf_ingest_service = PdfIngestService()
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_ingest_worker(session):
+    if not session.in_nested_transaction() and session.info.pop(PENDING_KEY, False):
+        pdf_ingest_service.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_ingest_notification(session):
+    if not session.in_nested_transaction():
+        session.info.pop(PENDING_KEY, None)
@@ -1,10 +1,65 @@
-import PyPDF2
-import re
-from typing import Dict, Any, Optional
+"""
+PDF文本提取
+
+每个PDF（按内容 sha256）只解析一次：逐页文本与文档信息写入 pdf_texts / pdf_pages 缓存，
+元数据、全文、参考文献与概念提取都读取缓存，不再重复打开文件。
+解析优先使用 PyMuPDF，失败时回退到 PyPDF2（见 utils/pdf_text.py）；
+批量任务用 load_many 在进程池中并行解析未缓存的文件（解析是CPU密集型，线程受GIL限制）；
+进程池在首次使用时创建并一直保留，应用关闭时由 shutdown 结束。
+所有方法都是同步阻塞的，异步路由需放到线程池中调用。缓存在调用方的事务中写入，不提交。
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from typing import Dict, Any, Iterable, List, Optional, Sequence, Tuple, Union
+from pathlib import Path
+import hashlib
+import logging
+import multiprocessing
 import os
+import re
+import threading
+
+from ..config import settings
+from ..models import Blob, PdfText, PdfPage
+from ..utils.pdf_text import parse_pdf, parse_pdf_safely
+from ..utils.concept_terms import extract_concept_terms
+from .tag_service import insert_ignore
+from .blob_service import blob_service
+
+logger = logging.getLogger(__name__)
+
+# 参考文献部分的标题（独占一行）
+_REFERENCES_HEADING = re.compile(r'^\s*(?:\d+\.?\s*)?(?:references|bibliography|参考文献)\s*$', re.IGNORECASE | re.MULTILINE)
+_ABSTRACT_END = re.compile(r'\n\s*(?:keywords|index terms|(?:1\.?|I\.)?\s*introduction)\b', re.IGNORECASE)
+
+
+class CachedPDF:
+    """缓存中的PDF解析结果"""
+
+    __slots__ = ("sha256", "extractor", "info", "pages")
+
+    def __init__(self, sha256: str, extractor: Optional[str], info: Dict[str, str], pages: List[str]):
+        self.sha256 = sha256
+        self.extractor = extractor
+        self.info = info
+        self.pages = pages
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages)
+
 
 class PDFService:
-    def __init__(self):
+    def __init__(self, workers: int = settings.PDF_EXTRACT_WORKERS):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
         self.metadata_patterns = {
             'doi': r'10\.\d{4,9}/[-._;()/:\w]+',
             'authors': r'Authors?:\s*([^\n]+)',
@@ -12,75 +67,214 @@ class PDFService:
             'journal': r'Journal:\s*([^\n]+)',
             'date': r'Date:\s*([^\n]+)'
         }
-    
-    def extract_metadata(self, file_path: str) -> Optional[Dict[str, Any]]:
+
+    # ------------------------------------------------------------ 缓存
+
+    @staticmethod
+    def file_sha256(file_path: Union[str, Path]) -> str:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _cached(self, db: Session, hashes: Sequence[str]) -> Dict[str, CachedPDF]:
+        """一次查询读取多个文件的缓存"""
+        if not hashes:
+            return {}
+        documents = db.execute(select(PdfText).where(PdfText.sha256.in_(hashes))).scalars().all()
+        if not documents:
+            return {}
+        pages: Dict[str, List[str]] = {document.sha256: [] for document in documents}
+        rows = db.execute(
+            select(PdfPage.sha256, PdfPage.text)
+            .where(PdfPage.sha256.in_(list(pages)))
+            .order_by(PdfPage.sha256, PdfPage.page_number)
+        )
+        for sha256, text in rows:
+            pages[sha256].append(text)
+        return {
+            document.sha256: CachedPDF(
+                document.sha256, document.extractor,
+                {"title": document.title or "", "author": document.author or "",
+                 "subject": document.subject or "", "keywords": document.keywords or ""},
+                pages[document.sha256],
+            )
+            for document in documents
+        }
+
+    def get_cached(self, db: Session, sha256: str) -> Optional[CachedPDF]:
+        return self._cached(db, [sha256]).get(sha256)
+
+    def store(self, db: Session, sha256: str, parsed: Dict[str, Any]) -> CachedPDF:
+        """写入 parse_pdf 的解析结果（并发写入同一文件时保留先写入的一份）"""
+        info = {key: (value or "")[:500] for key, value in parsed["info"].items()}
+        inserted = db.execute(
+            insert_ignore(db, PdfText.__table__),
+            [{"sha256": sha256, "page_count": len(parsed["pages"]), "extractor": parsed["extractor"], **info}],
+        )
+        if inserted.rowcount and parsed["pages"]:
+            db.execute(
+                insert_ignore(db, PdfPage.__table__),
+                [{"sha256": sha256, "page_number": number, "text": text.replace("\x00", "")}
+                 for number, text in enumerate(parsed["pages"], start=1)],
+            )
+        return CachedPDF(sha256, parsed["extractor"], info, list(parsed["pages"]))
+
+    def load(self, db: Session, file_path: Union[str, Path], sha256: Optional[str] = None) -> Optional[CachedPDF]:
         """
-        从PDF文件中提取元数据
+        读取PDF的解析结果，未缓存时解析并写入缓存；文件无法解析时返回 None
+
+        sha256 已知时（如存储中的文件）直接按它查缓存，否则先计算文件哈希。
         """
         try:
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                
-                # 获取第一页文本
-                first_page = reader.pages[0].extract_text()
-                
-                # 提取元数据
-                metadata = {}
-                for key, pattern in self.metadata_patterns.items():
-                    match = re.search(pattern, first_page, re.IGNORECASE)
-                    if match:
-                        metadata[key] = match.group(1).strip()
-                
-                # 如果没有找到DOI，尝试从文件名提取
-                if 'doi' not in metadata:
-                    filename = os.path.basename(file_path)
-                    doi_match = re.search(self.metadata_patterns['doi'], filename)
-                    if doi_match:
-                        metadata['doi'] = doi_match.group(0)
-                
-                # 如果没有找到标题，使用文件名（不含扩展名）
-                if 'title' not in metadata:
-                    metadata['title'] = os.path.splitext(os.path.basename(file_path))[0]
-                
-                return metadata
-                
+            sha256 = sha256 or self.file_sha256(file_path)
+            cached = self.get_cached(db, sha256)
+            if cached is not None:
+                return cached
+            return self.store(db, sha256, parse_pdf(str(file_path)))
         except Exception as e:
-            print(f"Error extracting metadata: {str(e)}")
+            logger.error(f"解析PDF {file_path} 失败: {e}")
             return None
-    
-    def extract_text(self, file_path: str) -> Optional[str]:
+
+    def load_blob(self, db: Session, blob: Blob) -> Optional[CachedPDF]:
+        return self.load(db, blob_service.path_of(blob), blob.sha256)
+
+    def _pool(self) -> ProcessPoolExecutor:
+        """共享的解析进程池（首次使用时创建，避免每次批量任务都启动新的解释器）"""
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn：不继承父进程的线程与数据库连接；子进程只需导入 utils.pdf_text
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def shutdown(self):
+        """结束解析进程池（应用关闭时调用）"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def load_many(self, db: Session, files: Iterable[Tuple[Union[str, Path], str]]) -> Dict[str, CachedPDF]:
         """
-        提取PDF文件的文本内容
+        批量读取 (文件路径, sha256) 的解析结果，返回 sha256 -> 解析结果（解析失败的文件不在结果中）
+
+        已缓存的文件一次查询读出；未缓存的文件在进程池中并行解析，结果在当前进程写入缓存。
         """
-        try:
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
-        except Exception as e:
-            print(f"Error extracting text: {str(e)}")
+        files = {sha256: str(path) for path, sha256 in files}
+        results = self._cached(db, list(files))
+        missing = [(sha256, path) for sha256, path in files.items() if sha256 not in results]
+        if not missing:
+            return results
+
+        if self.workers > 1 and len(missing) > 1:
+            executor = self._pool()
+            try:
+                for (sha256, _), parsed in zip(missing, executor.map(parse_pdf_safely, (path for _, path in missing))):
+                    if parsed is not None:
+                        results[sha256] = self.store(db, sha256, parsed)
+            except BrokenProcessPool as e:
+                logger.error(f"PDF解析进程池异常退出，改为在当前进程中解析: {e}")
+                # 丢弃损坏的进程池，下次使用时重新创建
+                with self._executor_lock:
+                    if self._executor is executor:
+                        self._executor = None
+            missing = [(sha256, path) for sha256, path in missing if sha256 not in results]
+
+        for sha256, path in missing:
+            parsed = parse_pdf_safely(path)
+            if parsed is not None:
+                results[sha256] = self.store(db, sha256, parsed)
+        return results
+
+    # ------------------------------------------------------------ 提取
+
+    def extract_metadata(self, db: Session, file_path: Union[str, Path], sha256: Optional[str] = None,
+                         filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        从PDF中提取元数据（DOI、作者、摘要等）
+
+        文本字段从第一页匹配，第一页没有DOI时依次查找第二页与文件名；标题优先使用PDF文档信息，
+        没有时使用文件名（不含扩展名）。
+        """
+        document = self.load(db, file_path, sha256)
+        if document is None:
             return None
-    
-    def extract_references(self, file_path: str) -> Optional[list]:
+        first_page = document.pages[0] if document.pages else ""
+        filename = filename or os.path.basename(str(file_path))
+
+        metadata = {}
+        for key, pattern in self.metadata_patterns.items():
+            match = re.search(pattern, first_page, re.IGNORECASE)
+            if match:
+                metadata[key] = (match.group(1) if match.groups() else match.group(0)).strip()
+
+        if 'abstract' in metadata:
+            # 摘要截止到关键词或引言
+            metadata['abstract'] = _ABSTRACT_END.split(metadata['abstract'], maxsplit=1)[0].strip()
+        if 'doi' not in metadata:
+            for text in document.pages[1:2] + [filename]:
+                doi_match = re.search(self.metadata_patterns['doi'], text)
+                if doi_match:
+                    metadata['doi'] = doi_match.group(0)
+                    break
+        if 'doi' in metadata:
+            metadata['doi'] = metadata['doi'].rstrip('.,;)')
+
+        if 'authors' not in metadata and document.info.get('author'):
+            metadata['authors'] = document.info['author']
+        if document.info.get('keywords'):
+            metadata['keywords'] = document.info['keywords']
+        metadata['title'] = document.info.get('title') or os.path.splitext(filename)[0]
+        metadata['page_count'] = document.page_count
+        return metadata
+
+    def extract_text(self, db: Session, file_path: Union[str, Path], sha256: Optional[str] = None) -> Optional[str]:
+        """提取PDF文件的文本内容（页之间以换行分隔）"""
+        document = self.load(db, file_path, sha256)
+        return document.text if document is not None else None
+
+    def extract_references(self, db: Session, file_path: Union[str, Path], sha256: Optional[str] = None) -> Optional[list]:
         """
-        提取参考文献
+        提取参考文献中的DOI（去重，保持出现顺序）
+
+        从最后一个参考文献标题所在页开始查找；找不到标题时查找包含 References / Bibliography 的页。
         """
-        try:
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                references = []
-                
-                # 查找参考文献部分
-                for page in reader.pages:
-                    text = page.extract_text()
-                    if "References" in text or "Bibliography" in text:
-                        # 提取DOI
-                        dois = re.findall(self.metadata_patterns['doi'], text)
-                        references.extend(dois)
-                
-                return references
-        except Exception as e:
-            print(f"Error extracting references: {str(e)}")
-            return None 
\ No newline at end of file
+        document = self.load(db, file_path, sha256)
+        if document is None:
+            return None
+
+        start = None
+        for index, text in enumerate(document.pages):
+            if _REFERENCES_HEADING.search(text):
+                start = index
+        if start is not None:
+            pages = document.pages[start:]
+        else:
+            pages = [text for text in document.pages if "References" in text or "Bibliography" in text]
+
+        references = []
+        seen = set()
+        for text in pages:
+            for doi in re.findall(self.metadata_patterns['doi'], text):
+                doi = doi.rstrip('.,;)')
+                if doi.lower() not in seen:
+                    seen.add(doi.lower())
+                    references.append(doi)
+        return references
+
+    def extract_concepts(self, db: Session, file_path: Union[str, Path], sha256: Optional[str] = None,
+                         title: Optional[str] = None) -> Optional[List[str]]:
+        """从PDF正文（参考文献之前的部分）中提取候选概念"""
+        document = self.load(db, file_path, sha256)
+        if document is None:
+            return None
+        text = document.text
+        headings = list(_REFERENCES_HEADING.finditer(text))
+        if headings:
+            text = text[:headings[-1].start()]
+        return extract_concept_terms(text, title or document.info.get('title'))
+
+
+pdf_service = PDFService()
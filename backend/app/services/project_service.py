@@ -5,6 +5,7 @@ from typing import List, Optional, Dict
 from datetime import datetime
 
 from ..models import Project, project_paper, Paper, User
+from .paper_listing_service import paper_listing_service
 from ..schemas.project import ProjectCreate, ProjectUpdate, ProjectWithPapers, PaperInProject
 from ..crud.project import (
     get_project,
@@ -138,13 +139,8 @@ class ProjectService:
             if not project:
                 return None
             
-            # 获取项目关联的论文
-            papers = db.query(Paper).join(
-                project_paper,
-                Paper.id == project_paper.c.paper_id
-            ).filter(
-                project_paper.c.project_id == project_id
-            ).all()
+            # 获取项目关联的论文（只加载响应需要的列）
+            papers = paper_listing_service.list_papers(db, project_id=project_id, limit=None)
             
             # 创建带有论文列表的项目信息
             result = {
@@ -155,26 +151,9 @@ class ProjectService:
                 "created_at": project.created_at,
                 "updated_at": project.updated_at,
                 "is_public": project.is_public,
-                "papers": []
+                "papers": papers
             }
             
-            # 添加论文信息
-            for paper in papers:
-                paper_data = {
-                    "id": paper.id,
-                    "title": paper.title,
-                    "authors": paper.authors,
-                    "journal": paper.journal,
-                    "doi": paper.doi,
-                    "abstract": paper.abstract,
-                    "year": paper.year,
-                    "citations": paper.citation_count,
-                    "created_at": paper.created_at,
-                    "updated_at": paper.updated_at,
-                    "user_id": paper.user_id
-                }
-                result["papers"].append(paper_data)
-            
             return result
         except Exception as e:
             logger.error(f"获取项目 {project_id} 及其论文失败: {e}")
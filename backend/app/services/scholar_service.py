@@ -1,9 +1,14 @@
 import aiohttp
 import logging
-import random
 import asyncio
+import time
 from typing import Optional, List, Dict, Any
 
+from .mirror_health_service import MirrorPool, mirror_health_service
+
+# 镜像健康检查中的名称
+MIRROR_POOL = "google_scholar"
+
 class GoogleScholarService:
     """谷歌学术服务"""
     
@@ -19,10 +24,6 @@ class GoogleScholarService:
         'https://xueshu.cat-assets.workers.dev/scholar'
     ]
     
-    # 上次检查时间和可用域名列表
-    last_check_time = 0
-    verified_sites = []
-    check_interval = 1800  # 每30分钟检查一次可用性
     request_timeout = 10   # 每个请求10秒超时
     
     def __init__(self):
@@ -31,85 +32,12 @@ class GoogleScholarService:
         self.logger = logging.getLogger("GoogleScholarService")
     
     async def _verify_domains(self) -> List[str]:
-        """验证哪些镜像站点可用"""
-        current_time = asyncio.get_event_loop().time()
-        
-        # 如果验证过的域名列表不为空，且距离上次检查时间不超过检查间隔，直接返回缓存的结果
-        if (self.verified_sites and 
-            (current_time - self.last_check_time) < self.check_interval):
-            return self.verified_sites
-            
-        self.logger.info("验证谷歌学术镜像站点可用性")
-        available_sites = []
-        
-        # 创建异步会话
-        async with aiohttp.ClientSession() as session:
-            # 随机验证顺序，避免总是请求同一个站点
-            sites_to_check = random.sample(self.MIRROR_SITES, len(self.MIRROR_SITES))
-            
-            # 创建一个任务列表进行并发检查
-            tasks = []
-            for site in sites_to_check:
-                task = self._check_site_availability(session, site)
-                tasks.append(task)
-            
-            # 等待任务完成
-            try:
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                for site, result in zip(sites_to_check, results):
-                    # 忽略异常，只处理成功的结果
-                    if isinstance(result, bool) and result:
-                        available_sites.append(site)
-                        # 找到3个可用站点后停止检查，以加快速度
-                        if len(available_sites) >= 3:
-                            break
-            except Exception as e:
-                self.logger.error(f"验证域名时出错: {str(e)}")
-        
-        # 如果没有可用站点，使用原始列表（假设暂时无法连接）
-        if not available_sites:
-            self.logger.warning("没有可用的镜像站点，使用原始列表")
-            available_sites = self.MIRROR_SITES[:3]  # 使用前3个作为默认
-        
-        # 更新验证结果和时间
-        self.verified_sites = available_sites
-        self.last_check_time = current_time
-        
-        return available_sites
-    
-    async def _check_site_availability(self, session: aiohttp.ClientSession, site: str) -> bool:
-        """检查单个站点是否可用"""
-        try:
-            # 构造一个简单查询URL
-            test_url = f"{site}?q=test&as_ylo=2023"
-            
-            # 设置超时和请求头
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8'
-            }
-            
-            # 设置超时
-            timeout = aiohttp.ClientTimeout(total=self.request_timeout)
-            
-            async with session.get(test_url, headers=headers, timeout=timeout) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    # 检查内容是否包含典型的谷歌学术页面特征
-                    if 'gs_r' in html or 'gs_ri' in html:
-                        self.logger.info(f"镜像站点可用: {site}")
-                        return True
-                    else:
-                        self.logger.warning(f"镜像站点响应不包含谷歌学术特征: {site}")
-                else:
-                    self.logger.warning(f"镜像站点响应非200: {site}, 状态码: {response.status}")
-        
-        except asyncio.TimeoutError:
-            self.logger.warning(f"镜像站点请求超时: {site}")
-        except Exception as e:
-            self.logger.warning(f"镜像站点检查失败: {site}, 错误: {str(e)}")
-        
-        return False
+        """
+        返回依次尝试的镜像站点：可用的按延迟从快到慢，没有可用站点时取健康分数最高的3个
+
+        站点由 mirror_health_service 在后台并发探测，这里只读取结果，不阻塞请求。
+        """
+        return mirror_health_service.candidates(MIRROR_POOL)
     
     async def search(self, query: str) -> Dict[str, Any]:
         """搜索谷歌学术并返回包含更多信息的结果"""
@@ -148,6 +76,7 @@ class GoogleScholarService:
                 # 创建会话并发送请求
                 timeout = aiohttp.ClientTimeout(total=self.request_timeout)
                 
+                started = time.perf_counter()
                 async with aiohttp.ClientSession(timeout=timeout) as session:
                     async with session.get(search_url, headers=headers) as response:
                         if response.status == 200:
@@ -155,8 +84,9 @@ class GoogleScholarService:
                             html_content = await response.text()
                             
                             # 检查内容是否为谷歌学术页面（防止被重定向到登录页面等）
-                            if 'gs_r' in html_content or 'gs_ri' in html_content:
+                            if _looks_like_scholar(response.status, html_content):
                                 self.logger.info(f"成功从镜像站点获取搜索结果: {site}")
+                                mirror_health_service.record(MIRROR_POOL, site, True, (time.perf_counter() - started) * 1000)
                                 
                                 # 设置返回结果
                                 result["success"] = True
@@ -169,13 +99,33 @@ class GoogleScholarService:
                                 self.logger.warning(f"从镜像站点获取的内容不是谷歌学术页面: {site}")
                         else:
                             self.logger.warning(f"从镜像站点获取搜索结果失败, 状态码: {response.status}")
+                mirror_health_service.record(MIRROR_POOL, site, False)
             
             except asyncio.TimeoutError:
+                mirror_health_service.record(MIRROR_POOL, site, False)
                 self.logger.error(f"从镜像站点搜索超时: {site}")
             except Exception as e:
+                mirror_health_service.record(MIRROR_POOL, site, False)
                 self.logger.error(f"从镜像站点搜索失败: {site}, 错误: {str(e)}")
         
         # 所有镜像站点都失败
         self.logger.error("所有镜像站点都无法获取搜索结果")
         result["error"] = "无法获取搜索结果，所有镜像站点都不可用"
-        return result 
\ No newline at end of file
+        return result 
+
+
+def _looks_like_scholar(status_code: int, text: str) -> bool:
+    """页面包含谷歌学术搜索结果的特征（排除登录页、验证码页等）"""
+    return status_code == 200 and ('gs_r' in text or 'gs_ri' in text)
+
+
+mirror_health_service.register(MirrorPool(
+    MIRROR_POOL,
+    GoogleScholarService.MIRROR_SITES,
+    probe_url=lambda site: f"{site}?q=test&as_ylo=2023",
+    is_healthy=_looks_like_scholar,
+    headers={
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8'
+    },
+))
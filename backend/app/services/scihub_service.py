@@ -1,10 +1,17 @@
 import requests
+import httpx
 from bs4 import BeautifulSoup
 import re
 from typing import Optional, Dict, Any, List, Tuple
+from urllib.parse import urljoin
 import logging
 import time
-import random
+
+from ..config import settings
+from .mirror_health_service import MirrorPool, mirror_health_service
+
+# 镜像健康检查中的名称
+MIRROR_POOL = "scihub"
 
 class SciHubService:
     # 官方最新链接列表（按推荐顺序排列）
@@ -29,50 +36,52 @@ class SciHubService:
         })
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger("SciHubService")
-        self.verified_domains = []  # 存储已验证可用的域名
-        self.last_check_time = 0    # 上次检查域名的时间
-        self.check_interval = 3600  # 每小时检查一次域名可用性
     
     def _verify_domains(self, force_check=False) -> List[str]:
-        """验证域名是否可用，返回可用的域名列表"""
-        current_time = time.time()
-        
-        # 如果已有验证过的域名且未到检查间隔，直接返回
-        if self.verified_domains and not force_check and (current_time - self.last_check_time < self.check_interval):
-            return self.verified_domains
-        
-        self.logger.info("开始验证SciHub域名可用性...")
-        verified = []
-        
-        for domain in self.OFFICIAL_DOMAINS:
+        """
+        返回依次尝试的域名：可用的按延迟从快到慢，没有可用域名时取健康分数最高的3个
+
+        域名由 mirror_health_service 在后台并发探测，这里只读取结果，不阻塞请求；force_check 已不再需要，保留以兼容调用方。
+        """
+        return mirror_health_service.candidates(MIRROR_POOL)
+    
+    def domains(self) -> List[str]:
+        """异步下载使用的候选镜像（配置了 SCIHUB_DOMAINS 时只有配置的地址，如本地测试服务器）"""
+        return self._verify_domains()
+    
+    def _record(self, domain: str, status_code: Optional[int], started: float):
+        """把实际请求的结果反馈给健康检查：连接失败与5xx计为失败"""
+        ok = status_code is not None and status_code < 500
+        mirror_health_service.record(MIRROR_POOL, domain, ok, (time.perf_counter() - started) * 1000 if ok else None)
+    
+    async def resolve_pdf_url(self, doi: str, client: httpx.AsyncClient) -> Optional[str]:
+        """异步获取DOI对应的PDF地址：依次请求各镜像的论文页面，镜像直接返回PDF时不读取内容"""
+        for domain in self.domains():
+            url = f"{domain}{doi}"
+            started = time.perf_counter()
             try:
-                # 使用5秒超时，避免长时间等待
-                response = self.session.get(domain, timeout=5, allow_redirects=True)
-                
-                # 检查状态码和页面内容，确认是否是真正的SciHub页面
-                if response.status_code == 200 and ('sci-hub' in response.text.lower() or 'doi' in response.text.lower()):
-                    self.logger.info(f"域名 {domain} 可用")
-                    verified.append(domain)
-                    
-                    # 只需要验证找到3个可用域名即可，避免过多请求
-                    if len(verified) >= 3:
-                        break
-                else:
-                    self.logger.warning(f"域名 {domain} 响应异常: {response.status_code}")
+                async with client.stream("GET", url, timeout=15) as response:
+                    self._record(domain, response.status_code, started)
+                    if response.status_code >= 400:
+                        self.logger.warning(f"域名 {domain} 响应异常: {response.status_code}")
+                        continue
+                    if 'application/pdf' in response.headers.get('Content-Type', ''):
+                        return str(response.url)
+                    await response.aread()
+                soup = BeautifulSoup(response.text, 'html.parser')
+                pdf_url = self._extract_pdf_url(soup, str(response.url))
+                if pdf_url:
+                    self.logger.info(f"从SciHub获取PDF链接成功: {pdf_url}")
+                    return pdf_url
+                self.logger.warning(f"未能从 {domain} 提取PDF链接")
+            except httpx.TransportError as e:
+                self._record(domain, None, started)
+                self.logger.error(f"从 {domain} 获取论文失败: {str(e)}")
             except Exception as e:
-                self.logger.warning(f"域名 {domain} 验证失败: {str(e)}")
-            
-            # 随机延迟，避免频繁请求
-            time.sleep(random.uniform(0.5, 1.0))
-        
-        if not verified:
-            self.logger.warning("所有SciHub域名验证失败，使用默认列表")
-            verified = self.OFFICIAL_DOMAINS[:3]  # 使用前3个作为默认
-        
-        self.verified_domains = verified
-        self.last_check_time = current_time
+                self.logger.error(f"从 {domain} 获取论文失败: {str(e)}")
         
-        return verified
+        self.logger.error(f"所有SciHub域名尝试失败，无法获取论文 DOI: {doi}")
+        return None
     
     def get_paper_by_doi(self, doi: str) -> Optional[Dict[str, Any]]:
         """通过DOI获取论文信息"""
@@ -86,7 +95,13 @@ class SciHubService:
                 self.logger.info(f"正在从SciHub获取论文: {url}")
                 
                 # 发送请求
-                response = self.session.get(url, timeout=15)
+                started = time.perf_counter()
+                try:
+                    response = self.session.get(url, timeout=15)
+                except requests.RequestException:
+                    self._record(domain, None, started)
+                    raise
+                self._record(domain, response.status_code, started)
                 response.raise_for_status()
                 
                 # 检查响应内容类型是否为PDF
@@ -163,32 +178,20 @@ class SciHubService:
         pdf_elem = soup.find('embed', {'id': 'pdf'})
         if pdf_elem and 'src' in pdf_elem.attrs:
             src = pdf_elem['src']
-            # 如果是相对URL，转换为绝对URL
-            if src.startswith('//'):
-                return f"https:{src}"
-            elif not src.startswith(('http://', 'https://')):
-                return f"{base_url.rstrip('/')}/{src.lstrip('/')}"
-            return src
+            # 相对URL（包括 //host/path 与 /path）按页面地址转换为绝对URL
+            return urljoin(base_url, src)
         
         # 方法2：查找iframe
         iframe_elem = soup.find('iframe', {'id': 'pdf'})
         if iframe_elem and 'src' in iframe_elem.attrs:
             src = iframe_elem['src']
-            if src.startswith('//'):
-                return f"https:{src}"
-            elif not src.startswith(('http://', 'https://')):
-                return f"{base_url.rstrip('/')}/{src.lstrip('/')}"
-            return src
+            return urljoin(base_url, src)
         
         # 方法3：查找链接
         pdf_link = soup.find('a', href=lambda x: x and (x.endswith('.pdf') or 'pdf' in x))
         if pdf_link:
             href = pdf_link['href']
-            if href.startswith('//'):
-                return f"https:{href}"
-            elif not href.startswith(('http://', 'https://')):
-                return f"{base_url.rstrip('/')}/{href.lstrip('/')}"
-            return href
+            return urljoin(base_url, href)
         
         return ""
     
@@ -268,4 +271,17 @@ class SciHubService:
                     
         except Exception as e:
             self.logger.error(f"异步下载PDF失败: {str(e)}")
-            return None 
\ No newline at end of file
+            return None 
+
+
+def _looks_like_scihub(status_code: int, text: str) -> bool:
+    text = text.lower()
+    return status_code == 200 and ('sci-hub' in text or 'doi' in text)
+
+
+mirror_health_service.register(MirrorPool(
+    MIRROR_POOL,
+    [domain if domain.endswith("/") else f"{domain}/" for domain in settings.SCIHUB_DOMAINS] or SciHubService.OFFICIAL_DOMAINS,
+    is_healthy=_looks_like_scihub,
+    headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'},
+))
@@ -0,0 +1,338 @@
+from sqlalchemy import Table, Column, Integer, Text, MetaData, func, literal_column, or_, text
+from sqlalchemy.orm import Session
+from typing import List, Dict, Any, Optional, Tuple
+import logging
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# FTS5 外部内容表（由迁移 5c7e9a1b3d20 创建并用触发器同步），使用独立的 MetaData，不参与 create_all
+_fts_metadata = MetaData()
+papers_fts = Table(
+    "papers_fts", _fts_metadata,
+    Column("rowid", Integer), Column("title", Text), Column("abstract", Text), Column("authors", Text),
+)
+notes_fts = Table("notes_fts", _fts_metadata, Column("rowid", Integer), Column("content", Text))
+
+# bm25 列权重：标题 > 作者 > 摘要
+PAPER_BM25_WEIGHTS = (10.0, 2.0, 5.0)
+HIGHLIGHT_START, HIGHLIGHT_END = "<mark>", "</mark>"
+SNIPPET_ELLIPSIS = "…"
+SNIPPET_TOKENS = 32
+# trigram 分词下少于3个字符的词无法走索引
+TRIGRAM_MIN_LENGTH = 3
+
+
+class SearchBackend:
+    """当前数据库可用的全文检索实现: sqlite(FTS5) 或 postgresql(tsvector)"""
+
+    def __init__(self, dialect: str, tokenizer: Optional[str] = None):
+        self.dialect = dialect
+        self.tokenizer = tokenizer
+
+    def split_terms(self, query: str) -> Tuple[List[str], List[str]]:
+        """把查询拆分为 (走索引的词, 需用 LIKE 过滤的短词)"""
+        terms = [term for term in re.split(r"\s+", query.replace('"', " ").strip()) if term]
+        if self.dialect == "sqlite" and self.tokenizer == "trigram":
+            return ([t for t in terms if len(t) >= TRIGRAM_MIN_LENGTH],
+                    [t for t in terms if len(t) < TRIGRAM_MIN_LENGTH])
+        return terms, []
+
+    def match_query(self, terms: List[str]) -> str:
+        """FTS5 查询串：每个词作为短语，全部命中（unicode61 分词时按前缀匹配）"""
+        suffix = "*" if self.tokenizer != "trigram" else ""
+        return " ".join(f'"{term}"{suffix}' for term in terms)
+
+
+def highlight_terms(value: Optional[str], terms: List[str]) -> Optional[str]:
+    """在文本中标记命中的词（LIKE 回退时使用，大小写不敏感）"""
+    if not value or not terms:
+        return value
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    return pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}", value)
+
+
+def _snippet(value: Optional[str], terms: List[str], width: int = 120) -> Optional[str]:
+    """截取第一个命中词附近的文本并高亮"""
+    if not value:
+        return value
+    lowered = value.lower()
+    positions = [lowered.find(term.lower()) for term in terms]
+    positions = [p for p in positions if p >= 0]
+    start = max(min(positions) - width // 3, 0) if positions else 0
+    end = min(start + width, len(value))
+    text_part = value[start:end]
+    prefix = SNIPPET_ELLIPSIS if start > 0 else ""
+    suffix = SNIPPET_ELLIPSIS if end < len(value) else ""
+    return prefix + highlight_terms(text_part, terms) + suffix
+
+
+class SearchIndexService:
+    """论文与笔记的全文检索（SQLite FTS5 / PostgreSQL tsvector，均不可用时回退到 LIKE）"""
+
+    def __init__(self):
+        # 数据库URL -> SearchBackend（None 表示没有全文索引）
+        self._backends: Dict[str, Optional[SearchBackend]] = {}
+        self._lock = threading.Lock()
+
+    def backend(self, connection) -> Optional[SearchBackend]:
+        """检测连接所在数据库的全文索引（结果按数据库缓存）"""
+        key = str(connection.engine.url)
+        if key in self._backends:
+            return self._backends[key]
+        backend = self._detect(connection)
+        with self._lock:
+            self._backends[key] = backend
+        logger.info(f"全文检索: {backend.dialect + '/' + (backend.tokenizer or 'tsvector') if backend else '未建立索引，使用LIKE'}")
+        return backend
+
+    async def backend_async(self, db) -> Optional[SearchBackend]:
+        return await db.run_sync(lambda session: self.backend(session.connection()))
+
+    def reset_cache(self):
+        with self._lock:
+            self._backends.clear()
+
+    def _detect(self, connection) -> Optional[SearchBackend]:
+        dialect = connection.dialect.name
+        if dialect == "sqlite":
+            sql = connection.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'papers_fts'")
+            ).scalar()
+            if not sql:
+                return None
+            return SearchBackend("sqlite", "trigram" if "trigram" in sql else "unicode61")
+        if dialect == "postgresql":
+            exists = connection.execute(text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'papers' AND column_name = 'search_vector'"
+            )).scalar()
+            return SearchBackend("postgresql") if exists else None
+        return None
+
+    def paper_search_clauses(self, backend: Optional[SearchBackend], search: str, paper_table):
+        """
+        论文列表的检索条件
+
+        返回 (过滤条件列表, 排序表达式或None, 需要连接的FTS表或None)。
+        没有全文索引或全是短词时只返回 ILIKE 条件。
+        """
+        like_columns = (paper_table.c.title, paper_table.c.abstract, paper_table.c.authors)
+        if backend is None:
+            term = f"%{search}%"
+            return [or_(*(column.ilike(term) for column in like_columns))], None, None
+
+        fts_terms, short_terms = backend.split_terms(search)
+        clauses = [or_(*(column.ilike(f"%{term}%") for column in like_columns)) for term in short_terms]
+        if not fts_terms:
+            return clauses, None, None
+
+        if backend.dialect == "sqlite":
+            clauses.append(literal_column("papers_fts").op("MATCH")(backend.match_query(fts_terms)))
+            rank = func.bm25(literal_column("papers_fts"), *PAPER_BM25_WEIGHTS)
+            return clauses, rank, papers_fts
+
+        tsquery = func.websearch_to_tsquery("simple", " ".join(fts_terms))
+        vector = literal_column("papers.search_vector")
+        clauses.append(vector.op("@@")(tsquery))
+        return clauses, func.ts_rank_cd(vector, tsquery).desc(), None
+
+    def search_papers(self, db: Session, query: str, user_id: int, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """按相关度检索用户的论文，返回带高亮的结果"""
+        backend = self.backend(db.connection())
+        fts_terms, short_terms = backend.split_terms(query) if backend else ([], query.split())
+        if backend is None or not fts_terms:
+            return self._like_search_papers(db, fts_terms + short_terms, user_id, limit, offset)
+
+        if backend.dialect == "sqlite":
+            sql = f"""
+                SELECT p.id, p.title, p.authors, p.year, p.journal,
+                       highlight(papers_fts, 0, :hs, :he) AS title_highlight,
+                       highlight(papers_fts, 2, :hs, :he) AS authors_highlight,
+                       snippet(papers_fts, 1, :hs, :he, :ellipsis, {SNIPPET_TOKENS}) AS abstract_snippet,
+                       -bm25(papers_fts, {', '.join(str(w) for w in PAPER_BM25_WEIGHTS)}) AS score
+                FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid
+                WHERE papers_fts MATCH :q AND p.user_id = :user_id {self._short_term_sql(short_terms, 'p')}
+                ORDER BY score DESC LIMIT :limit OFFSET :offset
+            """
+            params = {"q": backend.match_query(fts_terms)}
+        else:
+            options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, HighlightAll=true"
+            sql = f"""
+                SELECT p.id, p.title, p.authors, p.year, p.journal,
+                       ts_headline('simple', p.title, q, :options) AS title_highlight,
+                       ts_headline('simple', coalesce(p.authors, ''), q, :options) AS authors_highlight,
+                       ts_headline('simple', coalesce(p.abstract, ''), q,
+                                   :snippet_options) AS abstract_snippet,
+                       ts_rank_cd(p.search_vector, q) AS score
+                FROM papers p, websearch_to_tsquery('simple', :q) q
+                WHERE p.search_vector @@ q AND p.user_id = :user_id
+                ORDER BY score DESC LIMIT :limit OFFSET :offset
+            """
+            params = {
+                "q": " ".join(fts_terms),
+                "options": options,
+                "snippet_options": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=35, MinWords=15",
+            }
+
+        params.update(self._short_term_params(short_terms))
+        params.update(hs=HIGHLIGHT_START, he=HIGHLIGHT_END, ellipsis=SNIPPET_ELLIPSIS,
+                      user_id=user_id, limit=limit, offset=offset)
+        rows = db.execute(text(sql), params).mappings().all()
+        return [dict(row) for row in rows]
+
+    def search_notes(self, db: Session, query: str, user_id: int, paper_id: Optional[int] = None,
+                     limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """按相关度检索用户的笔记，返回带高亮的片段"""
+        backend = self.backend(db.connection())
+        fts_terms, short_terms = backend.split_terms(query) if backend else ([], query.split())
+        paper_filter = "AND n.paper_id = :paper_id" if paper_id is not None else ""
+        if backend is None or not fts_terms:
+            terms = fts_terms + short_terms
+            sql = f"""
+                SELECT n.id, n.paper_id, n.page_number, n.content, n.updated_at
+                FROM notes n
+                WHERE n.user_id = :user_id {paper_filter} {self._short_term_sql(terms, 'n', ('content',))}
+                ORDER BY n.updated_at DESC LIMIT :limit OFFSET :offset
+            """
+            params = self._short_term_params(terms)
+            params.update(user_id=user_id, paper_id=paper_id, limit=limit, offset=offset)
+            return [
+                {"id": row["id"], "paper_id": row["paper_id"], "page_number": row["page_number"],
+                 "snippet": _snippet(row["content"], terms), "score": None}
+                for row in db.execute(text(sql), params).mappings().all()
+            ]
+
+        if backend.dialect == "sqlite":
+            sql = f"""
+                SELECT n.id, n.paper_id, n.page_number,
+                       snippet(notes_fts, 0, :hs, :he, :ellipsis, {SNIPPET_TOKENS}) AS snippet,
+                       -bm25(notes_fts) AS score
+                FROM notes_fts JOIN notes n ON n.id = notes_fts.rowid
+                WHERE notes_fts MATCH :q AND n.user_id = :user_id {paper_filter}
+                      {self._short_term_sql(short_terms, 'n', ('content',))}
+                ORDER BY score DESC LIMIT :limit OFFSET :offset
+            """
+            params = {"q": backend.match_query(fts_terms)}
+        else:
+            sql = f"""
+                SELECT n.id, n.paper_id, n.page_number,
+                       ts_headline('simple', n.content, q, :options) AS snippet,
+                       ts_rank_cd(n.search_vector, q) AS score
+                FROM notes n, websearch_to_tsquery('simple', :q) q
+                WHERE n.search_vector @@ q AND n.user_id = :user_id {paper_filter}
+                ORDER BY score DESC LIMIT :limit OFFSET :offset
+            """
+            params = {
+                "q": " ".join(fts_terms),
+                "options": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=35, MinWords=15",
+            }
+        params.update(self._short_term_params(short_terms))
+        params.update(hs=HIGHLIGHT_START, he=HIGHLIGHT_END, ellipsis=SNIPPET_ELLIPSIS,
+                      user_id=user_id, paper_id=paper_id, limit=limit, offset=offset)
+        return [dict(row) for row in db.execute(text(sql), params).mappings().all()]
+
+    def search_pdf_pages(self, db: Session, query: str, user_id: int, paper_id: Optional[int] = None,
+                         limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        在用户论文的PDF正文中检索，按页返回命中（论文、页码、高亮片段）
+
+        索引按文件内容建立（pdf_pages，由入库任务写入），通过 blobs -> papers.pdf_blob_id 限定为
+        用户自己的论文：PDF被删除或替换后立即不再命中，多篇论文共用同一文件时各自返回。
+        """
+        backend = self.backend(db.connection())
+        fts_terms, short_terms = backend.split_terms(query) if backend else ([], query.split())
+        paper_filter = "AND p.id = :paper_id" if paper_id is not None else ""
+        owned = "JOIN blobs b ON b.sha256 = pg.sha256 JOIN papers p ON p.pdf_blob_id = b.id"
+        if backend is None or not fts_terms:
+            terms = fts_terms + short_terms
+            sql = f"""
+                SELECT p.id AS paper_id, p.title, pg.page_number, pg.text
+                FROM papers p JOIN blobs b ON b.id = p.pdf_blob_id JOIN pdf_pages pg ON pg.sha256 = b.sha256
+                WHERE p.user_id = :user_id {paper_filter} {self._short_term_sql(terms, 'pg', ('text',))}
+                ORDER BY p.id, pg.page_number LIMIT :limit OFFSET :offset
+            """
+            params = self._short_term_params(terms)
+            params.update(user_id=user_id, paper_id=paper_id, limit=limit, offset=offset)
+            return [
+                {"paper_id": row["paper_id"], "title": row["title"], "page_number": row["page_number"],
+                 "snippet": _snippet(row["text"], terms), "score": None}
+                for row in db.execute(text(sql), params).mappings().all()
+            ]
+
+        if backend.dialect == "sqlite":
+            sql = f"""
+                SELECT p.id AS paper_id, p.title, pg.page_number,
+                       snippet(pdf_pages_fts, 0, :hs, :he, :ellipsis, {SNIPPET_TOKENS}) AS snippet,
+                       -bm25(pdf_pages_fts) AS score
+                FROM pdf_pages_fts JOIN pdf_pages pg ON pg.id = pdf_pages_fts.rowid {owned}
+                WHERE pdf_pages_fts MATCH :q AND p.user_id = :user_id {paper_filter}
+                      {self._short_term_sql(short_terms, 'pg', ('text',))}
+                ORDER BY score DESC LIMIT :limit OFFSET :offset
+            """
+            params = {"q": backend.match_query(fts_terms)}
+        else:
+            sql = f"""
+                SELECT p.id AS paper_id, p.title, pg.page_number,
+                       ts_headline('simple', pg.text, q, :options) AS snippet,
+                       ts_rank_cd(pg.search_vector, q) AS score
+                FROM pdf_pages pg {owned}, websearch_to_tsquery('simple', :q) q
+                WHERE pg.search_vector @@ q AND p.user_id = :user_id {paper_filter}
+                ORDER BY score DESC LIMIT :limit OFFSET :offset
+            """
+            params = {
+                "q": " ".join(fts_terms),
+                "options": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxWords=35, MinWords=15",
+            }
+        params.update(self._short_term_params(short_terms))
+        params.update(hs=HIGHLIGHT_START, he=HIGHLIGHT_END, ellipsis=SNIPPET_ELLIPSIS,
+                      user_id=user_id, paper_id=paper_id, limit=limit, offset=offset)
+        return [dict(row) for row in db.execute(text(sql), params).mappings().all()]
+
+    def rebuild(self, db: Session):
+        """按原表重建 FTS5 索引（批量导入绕过触发器或索引损坏时使用）"""
+        backend = self.backend(db.connection())
+        if backend is None or backend.dialect != "sqlite":
+            return
+        for table in ("papers_fts", "notes_fts", "pdf_pages_fts"):
+            db.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+        db.commit()
+        logger.info("全文索引已重建")
+
+    def _like_search_papers(self, db: Session, terms: List[str], user_id: int, limit: int, offset: int):
+        sql = f"""
+            SELECT p.id, p.title, p.authors, p.year, p.journal, p.abstract
+            FROM papers p
+            WHERE p.user_id = :user_id {self._short_term_sql(terms, 'p')}
+            ORDER BY p.created_at DESC LIMIT :limit OFFSET :offset
+        """
+        params = self._short_term_params(terms)
+        params.update(user_id=user_id, limit=limit, offset=offset)
+        results = []
+        for row in db.execute(text(sql), params).mappings().all():
+            results.append({
+                "id": row["id"], "title": row["title"], "authors": row["authors"],
+                "year": row["year"], "journal": row["journal"],
+                "title_highlight": highlight_terms(row["title"], terms),
+                "authors_highlight": highlight_terms(row["authors"], terms),
+                "abstract_snippet": _snippet(row["abstract"], terms),
+                "score": None,
+            })
+        return results
+
+    @staticmethod
+    def _short_term_sql(terms: List[str], alias: str, columns=("title", "abstract", "authors")) -> str:
+        """每个词需出现在任一列中（LOWER + LIKE，与 ILIKE 等价）"""
+        clauses = []
+        for i, _ in enumerate(terms):
+            any_column = " OR ".join(f"LOWER({alias}.{column}) LIKE :term{i}" for column in columns)
+            clauses.append(f"AND ({any_column})")
+        return " ".join(clauses)
+
+    @staticmethod
+    def _short_term_params(terms: List[str]) -> Dict[str, Any]:
+        return {f"term{i}": f"%{term.lower()}%" for i, term in enumerate(terms)}
+
+
+search_index_service = SearchIndexService()
@@ -1,84 +1,142 @@
+"""
+用户存储空间统计
+
+已用空间保存在 users.storage_used_bytes，论文PDF变更时在同一事务中原子增减（见 models/blob.py），
+配额检查只需按主键读一行，不再遍历磁盘目录；
+绕过 ORM 的批量写入等造成的偏差由 reconcile 按 papers / blobs 表重新计算后校正（定时执行）。
+"""
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
-from typing import Optional
-import logging
-import os
+from typing import Dict, Optional, Tuple
 from pathlib import Path
-from datetime import datetime
+import logging
 
 from ..models import User
 from ..config import settings
+from ..database import SessionLocal
+from .blob_service import blob_service
 
 logger = logging.getLogger(__name__)
 
+_MB = 1024 * 1024
+
+
 class StorageService:
-    def __init__(self):
-        self.upload_dir = Path(settings.UPLOAD_DIR)
-        self.upload_dir.mkdir(exist_ok=True)
-    
+    def __init__(self, default_capacity_mb: int = settings.STORAGE_DEFAULT_CAPACITY_MB):
+        self.default_capacity_mb = default_capacity_mb
+        self.upload_dir = Path(settings.UPLOAD_DIRECTORY)
+
+    def get_usage(self, db: Session, user_id: int) -> Tuple[int, int]:
+        """返回 (已用字节数, 容量字节数)，一次主键查询"""
+        row = db.execute(
+            select(User.storage_used_bytes, User.storage_capacity).where(User.id == user_id)
+        ).first()
+        if row is None:
+            raise ValueError("用户不存在")
+        used, capacity_mb = row
+        if capacity_mb is None:
+            capacity_mb = self.default_capacity_mb
+        return max(0, used or 0), capacity_mb * _MB
+
     def get_user_storage_info(self, db: Session, user_id: int) -> dict:
-        """获取用户存储信息"""
+        """获取用户存储信息（字节）"""
         try:
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                raise ValueError("用户不存在")
-            
-            # 计算已用空间
-            user_dir = self.upload_dir / str(user_id)
-            storage_used = 0
-            
-            if user_dir.exists():
-                for file_path in user_dir.glob("**/*"):
-                    if file_path.is_file():
-                        storage_used += file_path.stat().st_size
-            
-            # 更新用户的存储使用量
-            user.storage_used = storage_used
-            db.commit()
-            
+            used, capacity = self.get_usage(db, user_id)
             return {
-                "storage_capacity": user.storage_capacity,
-                "storage_used": storage_used,
-                "storage_free": max(0, user.storage_capacity - storage_used),
-                "usage_percentage": (storage_used / user.storage_capacity * 100) if user.storage_capacity > 0 else 0
+                "storage_capacity": capacity,
+                "storage_used": used,
+                "storage_free": max(0, capacity - used),
+                "usage_percentage": (used / capacity * 100) if capacity > 0 else 0
             }
         except Exception as e:
             logger.error(f"获取存储信息失败: {e}")
             raise
-    
+
     def check_storage_space(self, db: Session, user_id: int, file_size: int) -> bool:
-        """检查用户是否有足够的存储空间"""
+        """检查用户是否有足够的存储空间（file_size 为字节数）"""
         try:
-            storage_info = self.get_user_storage_info(db, user_id)
-            return storage_info["storage_free"] >= file_size
+            used, capacity = self.get_usage(db, user_id)
+            return capacity - used >= file_size
         except Exception as e:
             logger.error(f"检查存储空间失败: {e}")
             raise
-    
+
     def update_storage_usage(self, db: Session, user_id: int, file_size: int, is_add: bool = True) -> bool:
-        """更新用户存储使用量"""
-        try:
-            user = db.query(User).filter(User.id == user_id).first()
-            if not user:
-                raise ValueError("用户不存在")
-            
-            if is_add:
-                user.storage_used += file_size
-            else:
-                user.storage_used = max(0, user.storage_used - file_size)
-            
-            db.commit()
-            return True
-        except Exception as e:
-            db.rollback()
-            logger.error(f"更新存储使用量失败: {e}")
-            raise
-    
+        """
+        在当前事务中增减用户已用空间（字节），不提交
+
+        论文PDF的变更已由模型事件自动计入，只有不经过论文引用的文件才需要调用。
+        """
+        delta = file_size if is_add else -file_size
+        result = db.execute(
+            update(User).where(User.id == user_id)
+            .values(storage_used_bytes=User.storage_used_bytes + delta)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            raise ValueError("用户不存在")
+        return True
+
+    def reconcile(self, db: Session, user_id: Optional[int] = None) -> Dict[int, Tuple[int, int]]:
+        """
+        按论文引用的文件重新计算已用空间并校正，返回 用户ID -> (原值, 校正后的值)
+
+        先用一次聚合查询找出有偏差的用户，再逐个在事务中校正：先锁定用户行（并发的上传
+        在提交前持有该行的锁），再重新计算并写入，不会覆盖进行中的增减。
+        """
+        computed = blob_service.usage_subquery()
+        candidates = select(User.id).where(User.storage_used_bytes != computed)
+        if user_id is not None:
+            candidates = candidates.where(User.id == user_id)
+        drifted = db.scalars(candidates).all()
+        db.commit()
+
+        corrected = {}
+        for uid in drifted:
+            try:
+                # 空更新用于加锁（SQLite 上开始写事务）
+                locked = db.execute(
+                    update(User).where(User.id == uid).values(storage_used_bytes=User.storage_used_bytes)
+                    .returning(User.storage_used_bytes)
+                    .execution_options(synchronize_session=False)
+                ).scalar()
+                actual = blob_service.user_usage(db, uid)
+                if locked is not None and locked != actual:
+                    db.execute(
+                        update(User).where(User.id == uid).values(storage_used_bytes=actual)
+                        .execution_options(synchronize_session=False)
+                    )
+                    corrected[uid] = (locked, actual)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                logger.error(f"校正用户 {uid} 的存储用量失败: {e}")
+
+        if corrected:
+            logger.warning(f"存储用量校正: {len(corrected)} 个用户存在偏差 {corrected}")
+        return corrected
+
     def get_file_path(self, user_id: int, filename: str) -> Path:
         """获取文件完整路径"""
         return self.upload_dir / str(user_id) / filename
-    
+
     def ensure_user_directory(self, user_id: int) -> Path:
         """确保用户目录存在"""
         user_dir = self.upload_dir / str(user_id)
-        user_dir.mkdir(exist_ok=True)
-        return user_dir 
\ No newline at end of file
+        user_dir.mkdir(parents=True, exist_ok=True)
+        return user_dir
+
+    def reconcile_task(self) -> Dict[int, Tuple[int, int]]:
+        """定时任务入口，使用独立的数据库会话"""
+        db = SessionLocal()
+        try:
+            return self.reconcile(db)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"存储用量校正失败: {str(e)}")
+            return {}
+        finally:
+            db.close()
+
+
+storage_service = StorageService()
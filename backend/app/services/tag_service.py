@@ -0,0 +1,166 @@
+"""
+标签解析与论文-标签关联
+
+整个标签列表在调用方的事务中处理，不提交:
+- 解析: 一次 IN 查询，缺失的标签一次 insert-or-ignore 创建后再查一次
+- 关联: 一次 executemany 写入 paper_tag（冲突忽略），替换时一次 DELETE 去掉多余的关联
+常用标签的 名称->ID 缓存在进程内（LRU + 过期时间），新建标签的ID在事务提交后才进入缓存。
+"""
+from sqlalchemy import select, insert, delete, event
+from sqlalchemy.orm import Session
+from typing import Dict, List, Iterable, Optional, Sequence, Tuple
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+from ..models import Tag, paper_tag
+
+logger = logging.getLogger(__name__)
+
+# 缓存的标签数量与过期时间（秒）；其他进程删除标签后，本进程最多在过期时间内继续使用旧ID
+TAG_CACHE_SIZE = 2048
+TAG_CACHE_TTL = 300
+
+# 与 Tag.name 列长度一致
+MAX_TAG_LENGTH = 50
+
+_PENDING_KEY = "tag_service_pending"
+
+
+def normalize_tag_names(names: Optional[Iterable[str]]) -> List[str]:
+    """去掉首尾空白、截断到列长度并去重（保持顺序）"""
+    cleaned = (name.strip()[:MAX_TAG_LENGTH] for name in names or [] if name and name.strip())
+    return list(dict.fromkeys(cleaned))
+
+
+def insert_ignore(db: Session, table):
+    """按方言构造 INSERT ... ON CONFLICT DO NOTHING"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        return insert(table).prefix_with("IGNORE")
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+class TagService:
+    """批量解析标签并维护论文-标签关联"""
+
+    def __init__(self, cache_size: int = TAG_CACHE_SIZE, ttl: float = TAG_CACHE_TTL):
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self._cache: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------ 缓存
+
+    def _cached(self, names: Iterable[str]) -> Dict[str, int]:
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for name in names:
+                entry = self._cache.get(name)
+                if entry is None:
+                    continue
+                if entry[1] < now:
+                    del self._cache[name]
+                    continue
+                self._cache.move_to_end(name)
+                found[name] = entry[0]
+        return found
+
+    def _remember(self, mapping: Dict[str, int]):
+        if not mapping or self.cache_size <= 0:
+            return
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for name, tag_id in mapping.items():
+                self._cache[name] = (tag_id, expires)
+                self._cache.move_to_end(name)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _remember_after_commit(self, db: Session, mapping: Dict[str, int]):
+        """本事务新建的标签在提交后才缓存（见文件末尾的会话事件）"""
+        db.info.setdefault(_PENDING_KEY, {}).update(mapping)
+
+    def invalidate(self, name: Optional[str] = None):
+        """删除或重命名标签后清除缓存（不传名称时清空）"""
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
+
+    # ------------------------------------------------------------ 解析与关联
+
+    def resolve(self, db: Session, names: Iterable[str]) -> Dict[str, int]:
+        """标签名 -> ID，不存在的标签在当前事务中创建"""
+        names = normalize_tag_names(names)
+        resolved = self._cached(names)
+        missing = [name for name in names if name not in resolved]
+        if not missing:
+            return resolved
+
+        existing = dict(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(missing))).all())
+        resolved.update(existing)
+        self._remember(existing)
+
+        to_create = [name for name in missing if name not in existing]
+        if to_create:
+            db.execute(insert_ignore(db, Tag.__table__), [{"name": name} for name in to_create])
+            created = dict(db.execute(select(Tag.name, Tag.id).where(Tag.name.in_(to_create))).all())
+            resolved.update(created)
+            self._remember_after_commit(db, created)
+        return resolved
+
+    def link_many(self, db: Session, paper_tags: Sequence[Tuple[int, Iterable[str]]]) -> Dict[int, List[str]]:
+        """
+        为多篇论文添加标签（已有关联保持不变），返回 论文ID -> 标签名列表
+
+        所有论文的标签合并成一次解析，关联用一次 executemany 写入。
+        """
+        normalized = [(paper_id, normalize_tag_names(names)) for paper_id, names in paper_tags]
+        tag_ids = self.resolve(db, (name for _, names in normalized for name in names))
+        links = [{"paper_id": paper_id, "tag_id": tag_ids[name]}
+                 for paper_id, names in normalized for name in names if name in tag_ids]
+        if links:
+            db.execute(insert_ignore(db, paper_tag), links)
+        return {paper_id: [name for name in names if name in tag_ids] for paper_id, names in normalized}
+
+    def link(self, db: Session, paper_id: int, names: Iterable[str], replace: bool = False) -> List[str]:
+        """
+        为单篇论文添加标签，返回标签名列表
+
+        replace 为 True 时去掉不在列表中的已有标签。
+        """
+        names = normalize_tag_names(names)
+        tag_ids = self.resolve(db, names)
+        linked = [name for name in names if name in tag_ids]
+        if linked:
+            db.execute(insert_ignore(db, paper_tag), [{"paper_id": paper_id, "tag_id": tag_ids[name]} for name in linked])
+        if replace:
+            statement = delete(paper_tag).where(paper_tag.c.paper_id == paper_id)
+            if linked:
+                statement = statement.where(paper_tag.c.tag_id.not_in([tag_ids[name] for name in linked]))
+            db.execute(statement)
+        return linked
+
+
+tag_service = TagService()
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_created_tags(session):
+    # 保存点提交时也会触发，只在最外层事务提交后写入缓存
+    if not session.in_nested_transaction() and _PENDING_KEY in session.info:
+        tag_service._remember(session.info.pop(_PENDING_KEY))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_created_tags(session):
+    # 保存点回滚时其中新建的标签也已撤销，保守起见整体丢弃
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,74 @@
+"""
+头像图片归一化：把任意格式的上传图片转换为若干固定尺寸的正方形 WebP
+
+- 按 EXIF 方向旋转，居中裁剪为正方形；动图只取第一帧
+- 有透明通道时保留透明，否则转换为 RGB
+- 不写入 EXIF 等元数据（上传照片中的拍摄位置等信息不会被公开）
+- JPEG 按目标尺寸用 draft 降采样解码，大照片不必按原始分辨率解码
+"""
+from typing import Dict, Iterable
+from io import BytesIO
+import os
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+class InvalidAvatarImage(ValueError):
+    """上传内容不是可解码的图片，或像素数超出上限"""
+
+
+def _open(path: str, largest: int, max_pixels: int) -> Image.Image:
+    try:
+        image = Image.open(path)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise InvalidAvatarImage("无法识别的图片格式")
+    width, height = image.size
+    if width <= 0 or height <= 0 or width * height > max_pixels:
+        image.close()
+        raise InvalidAvatarImage(f"图片尺寸 {width}x{height} 超出上限")
+    # 只对 JPEG 生效：解码为不小于目标尺寸的最小缩放比例
+    image.draft("RGB", (largest, largest))
+    return image
+
+
+def _square(image: Image.Image, size: int) -> Image.Image:
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    # 居中裁剪与缩放一步完成；reducing_gap 先按整数倍快速缩小，再用 LANCZOS 缩放到目标尺寸
+    width, height = image.size
+    side = min(width, height)
+    left, top = (width - side) // 2, (height - side) // 2
+    return image.resize((size, size), Image.Resampling.LANCZOS, box=(left, top, left + side, top + side),
+                        reducing_gap=3.0)
+
+
+def normalize_avatar(path: str, sizes: Iterable[int], max_pixels: int, quality: int = 85) -> Dict[int, bytes]:
+    """
+    读取 path 中的图片，返回 尺寸 -> WebP 内容
+
+    先缩放到最大尺寸，较小的尺寸都从它缩放得到。图片无法解码时抛出 InvalidAvatarImage。
+    """
+    sizes = sorted(set(sizes), reverse=True)
+    with _open(path, sizes[0], max_pixels) as image:
+        try:
+            image.seek(0)
+            largest = _square(image, sizes[0])
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            raise InvalidAvatarImage(f"图片解码失败: {e}")
+
+    variants: Dict[int, bytes] = {}
+    for size in sizes:
+        resized = largest if size == sizes[0] else largest.resize((size, size), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, format="WEBP", quality=quality, method=4)
+        variants[size] = buffer.getvalue()
+    return variants
+
+
+def write_variants(directory: str, variants: Dict[int, bytes]):
+    """把各尺寸写入 directory/<尺寸>.webp"""
+    os.makedirs(directory, exist_ok=True)
+    for size, content in variants.items():
+        with open(os.path.join(directory, f"{size}.webp"), "wb") as file:
+            file.write(content)
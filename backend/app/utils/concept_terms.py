@@ -0,0 +1,47 @@
+"""
+从文本中提取候选概念（2-4个词的短语与高频单词）
+
+知识图谱的概念提取（标题+摘要）与PDF全文的概念提取共用同一套规则。
+"""
+from collections import Counter
+from typing import List, Optional
+import re
+
+STOP_WORDS = {
+    "the", "a", "an", "and", "or", "but", "if", "then", "of", "at", "to", "for", "with", "by",
+    "in", "on", "is", "are", "was", "were", "be", "this", "that", "have", "has", "had",
+    "do", "does", "did", "can", "could", "will", "would", "shall", "should", "may", "might",
+    "i", "you", "he", "she", "it", "we", "they", "their", "our", "my", "your", "his", "her",
+    "its", "there", "here", "where", "when", "why", "how", "what", "who", "which", "such",
+    "some", "any", "all", "many", "much", "more", "most", "other", "another", "each", "every"
+}
+
+_PHRASE_PATTERN = re.compile(r'\b[a-zA-Z][a-zA-Z\-]{2,}\s+(?:[a-zA-Z][a-zA-Z\-]{2,}\s+){0,2}[a-zA-Z][a-zA-Z\-]{2,}\b')
+_WORD_PATTERN = re.compile(r'\b[a-zA-Z][a-zA-Z\-]{2,}\b')
+
+
+def extract_concept_terms(text: str, title: Optional[str] = None, max_phrases: int = 10, max_words: int = 10) -> List[str]:
+    """
+    提取候选概念：优先短语（短语通常更有意义），单词至少出现2次
+
+    没有提取到任何概念时用标题中的前几个词作为概念；仍没有时返回空列表。
+    """
+    # PDF文本按行断开，短语可以跨行
+    lowered = re.sub(r"\s+", " ", text).lower()
+    phrases = _PHRASE_PATTERN.findall(lowered)
+    words = _WORD_PATTERN.findall(lowered)
+
+    # 过滤停用词（短语中所有单词都不能是停用词）
+    filtered_words = [word for word in words if word not in STOP_WORDS]
+    filtered_phrases = [phrase for phrase in phrases if all(part not in STOP_WORDS for part in phrase.split())]
+
+    concept_counts = Counter(filtered_phrases + filtered_words)
+    top_phrases = [phrase for phrase, count in concept_counts.most_common(20) if len(phrase.split()) > 1 and count >= 1]
+    top_single_words = [word for word, count in concept_counts.most_common(20) if len(word.split()) == 1 and count >= 2]
+    top_concepts = top_phrases[:max_phrases] + top_single_words[:max_words]
+
+    if not top_concepts and title:
+        title_parts = [part for part in title.lower().split() if part not in STOP_WORDS and len(part) > 3]
+        if title_parts:
+            top_concepts = [' '.join(title_parts[:3]) if len(title_parts) > 2 else ' '.join(title_parts)]
+    return top_concepts
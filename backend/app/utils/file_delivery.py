@@ -0,0 +1,205 @@
+"""
+本地文件下发：Range 分段请求、条件请求与零拷贝发送
+
+- Range: 支持单个字节区间（bytes=a-b / a- / -n），返回 206 与 Content-Range；多区间请求返回完整文件，
+  区间超出文件大小时返回 416；If-Range 与当前 ETag / Last-Modified 不一致时返回完整文件
+- 条件请求: If-None-Match（优先）与 If-Modified-Since 命中时返回 304，不读文件
+- 发送: ASGI 服务器支持 http.response.zerocopysend 扩展时交给服务器用 sendfile 发送，
+  支持 http.response.pathsend 时按路径发送完整文件，否则在线程池中分块读取
+- 交给 nginx: 配置 PDF_ACCEL_REDIRECT_PREFIX 后只返回 X-Accel-Redirect 头，由 nginx 的 internal
+  location 发送文件（nginx 自行处理 Range 与 sendfile），应用进程不再读取文件内容
+"""
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional, Tuple
+from urllib.parse import quote
+import anyio
+import hashlib
+import os
+import stat
+
+from ..config import settings
+
+CHUNK_SIZE = 256 * 1024
+
+
+def content_disposition(filename: str, disposition: str = "inline") -> str:
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀"""
+    if header.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def _not_modified(headers: Headers, etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _range_applies(headers: Headers, etag: str, last_modified: str) -> bool:
+    """If-Range 使用强比较：弱 ETag 不能用于分段请求"""
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return not etag.startswith("W/") and if_range == etag
+    return if_range == last_modified
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析 Range 头，返回闭区间 (start, end)；没有或无法处理时返回 None（发送完整文件）
+
+    区间完全超出文件大小时抛出 ValueError（调用方返回 416）。
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    try:
+        first_byte = int(first) if first.strip() else None
+        last_byte = int(last) if last.strip() else None
+    except ValueError:
+        return None
+    if not sep or (first_byte is None and last_byte is None):
+        return None
+    if first_byte is None:
+        # 后缀区间：最后 n 个字节
+        if last_byte == 0 or size == 0:
+            raise ValueError("区间超出文件大小")
+        return max(0, size - last_byte), size - 1
+    if last_byte is not None and first_byte > last_byte:
+        return None
+    if first_byte >= size:
+        raise ValueError("区间超出文件大小")
+    return first_byte, size - 1 if last_byte is None else min(last_byte, size - 1)
+
+
+class RangeFileResponse(Response):
+    """发送文件的 [start, end] 区间"""
+
+    def __init__(self, path: str, start: int, end: int, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, media_type: Optional[str] = None):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(max(0, end - start + 1))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        extensions = scope.get("extensions") or {}
+        if scope["method"].upper() == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in extensions:
+            # 由服务器调用 sendfile，数据不经过 Python
+            with open(self.path, "rb") as file:
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": self.start,
+                            "count": count, "more_body": False})
+        elif "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            async with await anyio.open_file(self.path, mode="rb") as file:
+                await file.seek(self.start)
+                remaining = count
+                while remaining > 0:
+                    chunk = await file.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+                if remaining > 0:
+                    # 文件在发送过程中被截断
+                    await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def file_response(
+    request: Request,
+    path: os.PathLike,
+    media_type: str = "application/octet-stream",
+    filename: Optional[str] = None,
+    disposition: str = "inline",
+    etag: Optional[str] = None,
+    cache_control: Optional[str] = None,
+    accel_path: Optional[str] = None,
+) -> Response:
+    """
+    按请求头返回文件的完整内容、区间（206）、304 或 416
+
+    etag 传入内容哈希等强校验值（不含引号）；不传时按修改时间与大小生成弱 ETag。
+    accel_path 为文件相对于 PDF_ACCEL_REDIRECT_PREFIX 的路径，配置了前缀时交给 nginx 发送。
+    调用方需保证文件存在（不存在时抛出 FileNotFoundError）。
+    """
+    stat_result = os.stat(path)
+    if not stat.S_ISREG(stat_result.st_mode):
+        raise FileNotFoundError(str(path))
+    size = stat_result.st_size
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+    if etag:
+        etag = f'"{etag}"'
+    else:
+        digest = hashlib.md5(f"{stat_result.st_mtime}-{size}".encode(), usedforsecurity=False).hexdigest()
+        etag = f'W/"{digest}"'
+
+    headers = {
+        "etag": etag,
+        "last-modified": last_modified,
+        "accept-ranges": "bytes",
+        "cache-control": cache_control or f"private, max-age={settings.PDF_CACHE_MAX_AGE}, must-revalidate",
+    }
+    if filename:
+        headers["content-disposition"] = content_disposition(filename, disposition)
+
+    if _not_modified(request.headers, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    if settings.PDF_ACCEL_REDIRECT_PREFIX and accel_path is not None:
+        # nginx 按 internal location 发送文件，Range 与条件请求由 nginx 处理
+        prefix = settings.PDF_ACCEL_REDIRECT_PREFIX.rstrip("/")
+        headers["x-accel-redirect"] = f"{prefix}/{quote(accel_path.lstrip('/'))}"
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    byte_range = None
+    if _range_applies(request.headers, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    if byte_range is None:
+        return RangeFileResponse(str(path), 0, size - 1, 200, headers, media_type)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return RangeFileResponse(str(path), start, end, 206, headers, media_type)
@@ -0,0 +1,167 @@
+"""
+索引顾问
+
+- enable_query_log: 通过 before_cursor_execute 事件把应用执行过的查询（按语句去重）写入JSON Lines日志，
+  设置 QUERY_LOG_PATH 后由 database.py 自动启用
+- analyze: 对日志中的每条语句执行 EXPLAIN QUERY PLAN，找出全表扫描与临时排序
+
+运行方式（在 backend 目录下）:
+    python -m app.utils.index_advisor query_log.jsonl [--database sqlite:///app.db] [--ignore-table tags] [--fail-on-scan]
+
+--fail-on-scan 时发现全表扫描返回非零退出码，可在CI中防止新接口引入未走索引的查询。
+"""
+from typing import List, Dict, Any, Optional, Iterable
+import argparse
+import json
+import logging
+import re
+import sys
+import threading
+
+from sqlalchemy import create_engine, event
+
+logger = logging.getLogger(__name__)
+
+# 需要分析的语句类型
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|UPDATE|DELETE)\b", re.IGNORECASE)
+# SQLite 查询计划中的全表扫描，如 "SCAN papers"；"SCAN papers USING INDEX ..." 不算
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+_TEMP_SORT = re.compile(r"USE TEMP B-TREE FOR (ORDER BY|GROUP BY|DISTINCT)")
+
+
+def enable_query_log(engine, path: str):
+    """记录引擎执行过的查询，每条不同的语句只写一次"""
+    seen = set()
+    lock = threading.Lock()
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _log_query(conn, cursor, statement, parameters, context, executemany):
+        if statement in seen or not _EXPLAINABLE.match(statement):
+            return
+        with lock:
+            if statement in seen:
+                return
+            seen.add(statement)
+            params = parameters[0] if executemany and parameters else parameters
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"statement": statement, "parameters": params},
+                                   ensure_ascii=False, default=str) + "\n")
+
+    logger.info(f"已启用查询日志: {path}")
+
+
+def load_query_log(path: str) -> List[Dict[str, Any]]:
+    """读取查询日志（按语句去重）"""
+    records, seen = [], set()
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if record["statement"] not in seen:
+                seen.add(record["statement"])
+                records.append(record)
+    return records
+
+
+def _parameters(params):
+    if params is None:
+        return ()
+    if isinstance(params, dict):
+        return params
+    return tuple(params)
+
+
+def explain(dbapi_connection, statement: str, parameters=None) -> List[str]:
+    """返回语句的查询计划明细行"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", _parameters(parameters))
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def analyze(database_url: str, records: Iterable[Dict[str, Any]],
+            ignore_tables: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """
+    回放查询并给出问题列表
+
+    返回的每一项包含 statement、plan、full_scans（被全表扫描的表）、temp_sorts 和 error。
+    """
+    if not database_url.startswith("sqlite"):
+        raise ValueError("索引顾问目前只支持 SQLite（EXPLAIN QUERY PLAN）")
+
+    ignored = {t.lower() for t in ignore_tables}
+    engine = create_engine(database_url)
+    findings = []
+    try:
+        raw = engine.raw_connection()
+        try:
+            for record in records:
+                statement = record["statement"]
+                finding = {"statement": statement, "plan": [], "full_scans": [], "temp_sorts": [], "error": None}
+                try:
+                    finding["plan"] = explain(raw, statement, record.get("parameters"))
+                except Exception as e:
+                    finding["error"] = str(e)
+                    findings.append(finding)
+                    continue
+                for detail in finding["plan"]:
+                    scan = _FULL_SCAN.match(detail)
+                    if scan and scan.group(1).lower() not in ignored:
+                        finding["full_scans"].append(scan.group(1))
+                    sort = _TEMP_SORT.search(detail)
+                    if sort:
+                        finding["temp_sorts"].append(sort.group(1))
+                if finding["full_scans"] or finding["temp_sorts"]:
+                    findings.append(finding)
+        finally:
+            raw.close()
+    finally:
+        engine.dispose()
+    return findings
+
+
+def _shorten(statement: str, width: int = 160) -> str:
+    text = " ".join(statement.split())
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from ..config import settings
+
+    parser = argparse.ArgumentParser(description="回放查询日志并找出未走索引的查询")
+    parser.add_argument("query_log", nargs="?", default=settings.QUERY_LOG_PATH or None)
+    parser.add_argument("--database", default=settings.DATABASE_URL)
+    parser.add_argument("--ignore-table", action="append", default=[],
+                        help="忽略的小表（全表扫描无害），可重复指定")
+    parser.add_argument("--fail-on-scan", action="store_true", help="发现全表扫描时返回退出码1")
+    args = parser.parse_args(argv)
+
+    if not args.query_log:
+        parser.error("请指定查询日志文件，或设置 QUERY_LOG_PATH")
+
+    records = load_query_log(args.query_log)
+    findings = analyze(args.database, records, args.ignore_table)
+
+    scans = [f for f in findings if f["full_scans"]]
+    sorts = [f for f in findings if f["temp_sorts"] and not f["full_scans"]]
+    errors = [f for f in findings if f["error"]]
+    print(f"共分析 {len(records)} 条语句: 全表扫描 {len(scans)} 条, 临时排序 {len(sorts)} 条, 无法分析 {len(errors)} 条")
+
+    for title, items in (("全表扫描", scans), ("临时排序", sorts)):
+        for finding in items:
+            tables = ", ".join(finding["full_scans"]) or ", ".join(finding["temp_sorts"])
+            print(f"\n[{title}] {tables}\n  {_shorten(finding['statement'])}")
+            for detail in finding["plan"]:
+                print(f"    - {detail}")
+    for finding in errors:
+        print(f"\n[无法分析] {finding['error']}\n  {_shorten(finding['statement'])}")
+
+    return 1 if args.fail_on_scan and scans else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+列表分页：基于 (排序键, id) 的游标分页与总数缓存
+
+游标分页用上一页最后一行的 (排序值, id) 作为下一页的起点，按索引定位，不随页码变深而变慢；
+游标是不透明的 base64 字符串，通过 X-Next-Cursor 响应头返回（没有下一页时不返回）。
+排序列允许为空时按“空值排在最后”分两段查询：先按排序值翻页，排序值为空的行在其后按 id 翻页，
+两段都能使用 (过滤列, 排序列) 索引。
+
+总数通过 X-Total-Count 响应头返回，结果按 (表, 过滤条件) 缓存在进程内；
+会话提交时涉及写入的表的缓存全部失效，其他进程的写入最多在 PAGINATION_COUNT_TTL 秒后反映出来。
+"""
+from sqlalchemy import Select, select, func, event, and_, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from datetime import datetime
+import base64
+import binascii
+import json
+import threading
+import time
+
+from ..config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+_CURSOR_VERSION = 1
+_WRITTEN_TABLES_KEY = "pagination_written_tables"
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析或与当前排序不匹配"""
+
+
+def encode_cursor(sort_key: str, value: Any, row_id: int) -> str:
+    payload = {"v": _CURSOR_VERSION, "k": sort_key, "id": row_id}
+    if isinstance(value, datetime):
+        payload["dt"] = value.isoformat()
+    else:
+        payload["s"] = value
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, sort_key: str) -> Tuple[Any, int]:
+    """返回 (排序值, id)；游标由其他排序方式生成时抛出 InvalidCursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+        if payload.get("v") != _CURSOR_VERSION or not isinstance(payload.get("id"), int):
+            raise InvalidCursor("游标格式错误")
+        value = datetime.fromisoformat(payload["dt"]) if "dt" in payload else payload.get("s")
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, ValueError, AttributeError, TypeError) as e:
+        raise InvalidCursor(f"无效的游标: {e}") from e
+    if payload.get("k") != sort_key:
+        raise InvalidCursor("游标与当前排序方式不匹配")
+    return value, payload["id"]
+
+
+class Keyset:
+    """
+    游标分页的排序定义：排序列 + id 列（保证顺序唯一）
+
+    key 写入游标，用于识别排序方式；同一列正序、倒序的游标不能混用。
+    """
+
+    def __init__(self, sort_column, id_column, descending: bool = True):
+        self.sort_column = sort_column
+        self.id_column = id_column
+        self.descending = descending
+        self.key = f"{sort_column.key}:{'desc' if descending else 'asc'}"
+        # 排序列就是主键或不允许为空时不需要空值段
+        self.nullable = sort_column is not id_column and bool(getattr(sort_column, "nullable", True))
+
+    def _direction(self, column):
+        return column.desc() if self.descending else column.asc()
+
+    def _after(self, column, value):
+        return column < value if self.descending else column > value
+
+    def order_by(self, query: Select) -> Select:
+        """单条语句排序（偏移分页使用），空值排在最后"""
+        if self.sort_column is self.id_column:
+            return query.order_by(self._direction(self.id_column))
+        return query.order_by(self._direction(self.sort_column).nulls_last(), self._direction(self.id_column))
+
+    def statements(self, query: Select, cursor: Optional[str]) -> List[Select]:
+        """按顺序需要执行的已排序语句（不含 LIMIT）"""
+        if self.sort_column is self.id_column:
+            if cursor is not None:
+                _, row_id = decode_cursor(cursor, self.key)
+                query = query.where(self._after(self.id_column, row_id))
+            return [query.order_by(self._direction(self.id_column))]
+
+        by_value = query.order_by(self._direction(self.sort_column), self._direction(self.id_column))
+        null_tail = query.where(self.sort_column.is_(None)).order_by(self._direction(self.id_column))
+        if self.nullable:
+            by_value = by_value.where(self.sort_column.is_not(None))
+        if cursor is None:
+            return [by_value, null_tail] if self.nullable else [by_value]
+
+        value, row_id = decode_cursor(cursor, self.key)
+        if value is None:
+            return [null_tail.where(self._after(self.id_column, row_id))]
+        # 先用单列范围条件定位（可走索引），再处理排序值相同的行
+        bound = self.sort_column <= value if self.descending else self.sort_column >= value
+        by_value = by_value.where(
+            bound,
+            or_(self._after(self.sort_column, value), and_(self.sort_column == value,
+                                                         self._after(self.id_column, row_id))),
+        )
+        return [by_value, null_tail] if self.nullable else [by_value]
+
+    def cursor_for(self, item: Any) -> str:
+        return encode_cursor(self.key, getattr(item, self.sort_column.key), getattr(item, self.id_column.key))
+
+
+class Page:
+    """一页结果；next_cursor 为 None 表示没有下一页"""
+
+    __slots__ = ("items", "next_cursor", "total")
+
+    def __init__(self, items: List[Any], next_cursor: Optional[str] = None, total: Optional[int] = None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.total = total
+
+    def apply_headers(self, response) -> "Page":
+        if self.next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = self.next_cursor
+        if self.total is not None:
+            response.headers[TOTAL_COUNT_HEADER] = str(self.total)
+        return self
+
+
+def _plan(query: Select, keyset: Keyset, cursor: Optional[str], skip: int) -> List[Select]:
+    if cursor is None and skip:
+        # 兼容旧的 skip 参数：偏移分页，仍返回下一页游标
+        return [keyset.order_by(query).offset(skip)]
+    return keyset.statements(query, cursor)
+
+
+def _finish(items: List[Any], keyset: Keyset, limit: Optional[int]) -> Page:
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        return Page(items, keyset.cursor_for(items[-1]))
+    return Page(items)
+
+
+def paginate(db: Session, query: Select, keyset: Keyset, limit: Optional[int] = 100,
+             cursor: Optional[str] = None, skip: int = 0) -> Page:
+    """执行游标分页查询（query 为未排序的 select(Model)），多取一行判断是否有下一页"""
+    items: List[Any] = []
+    for statement in _plan(query, keyset, cursor, skip):
+        if limit is not None:
+            statement = statement.limit(limit + 1 - len(items))
+        items.extend(db.scalars(statement).all())
+        if limit is not None and len(items) > limit:
+            break
+    return _finish(items, keyset, limit)
+
+
+async def paginate_async(db: AsyncSession, query: Select, keyset: Keyset, limit: Optional[int] = 100,
+                         cursor: Optional[str] = None, skip: int = 0) -> Page:
+    """paginate 的异步会话版本"""
+    items: List[Any] = []
+    for statement in _plan(query, keyset, cursor, skip):
+        if limit is not None:
+            statement = statement.limit(limit + 1 - len(items))
+        items.extend((await db.scalars(statement)).all())
+        if limit is not None and len(items) > limit:
+            break
+    return _finish(items, keyset, limit)
+
+
+def count_statement(query: Select) -> Select:
+    return select(func.count()).select_from(query.order_by(None).subquery())
+
+
+class CountCache:
+    """
+    按 (表, 过滤条件) 缓存的总数
+
+    key 由调用方给出（如 ("papers", user_id, year)），tables 为结果依赖的表，
+    这些表有写入提交时对应的缓存项全部失效。
+    """
+
+    def __init__(self, ttl: float = 60, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[int, float]] = {}
+        self._by_table: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[0]
+
+    def set(self, key: Hashable, tables: Iterable[str], value: int):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+                self._by_table.clear()
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+
+    def invalidate_tables(self, tables: Iterable[str]):
+        with self._lock:
+            for table in tables:
+                for key in self._by_table.pop(table, ()):
+                    self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+
+    def count(self, db: Session, key: Hashable, tables: Sequence[str], query: Select) -> int:
+        """取缓存的总数，未命中时执行 COUNT 并缓存"""
+        total = self.get(key)
+        if total is None:
+            total = db.scalar(count_statement(query)) or 0
+            self.set(key, tables, total)
+        return total
+
+    async def count_async(self, db: AsyncSession, key: Hashable, tables: Sequence[str], query: Select) -> int:
+        total = self.get(key)
+        if total is None:
+            total = (await db.scalar(count_statement(query))) or 0
+            self.set(key, tables, total)
+        return total
+
+
+# 全局共享的总数缓存
+count_cache = CountCache(ttl=settings.PAGINATION_COUNT_TTL)
+
+
+def _mark_written(session, tables: Iterable[str]):
+    session.info.setdefault(_WRITTEN_TABLES_KEY, set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    tables = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        mapper_table = getattr(type(obj), "__table__", None)
+        if mapper_table is not None:
+            tables.add(mapper_table.name)
+    # 多对多集合的变化写入关联表，所属对象在 dirty 中，关联表按关系补上
+    for obj in session.dirty:
+        for relationship in type(obj).__mapper__.relationships:
+            if relationship.secondary is not None:
+                tables.add(relationship.secondary.name)
+    if tables:
+        _mark_written(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_statement_tables(orm_execute_state):
+    # 批量 insert()/update()/delete() 语句不经过 flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            _mark_written(orm_execute_state.session, [table.name])
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_written_tables(session):
+    if not session.in_nested_transaction():
+        tables = session.info.pop(_WRITTEN_TABLES_KEY, None)
+        if tables:
+            count_cache.invalidate_tables(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_written_tables(session):
+    if not session.in_nested_transaction():
+        session.info.pop(_WRITTEN_TABLES_KEY, None)
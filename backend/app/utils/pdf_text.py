@@ -0,0 +1,110 @@
+"""
+PDF解析：一次读取全部页面文本与文档信息
+
+优先使用 PyMuPDF，未安装或解析失败时回退到 PyPDF2。
+parse_pdf 与 render_thumbnail 是模块级函数且只依赖文件路径，可以直接提交给进程池执行。
+"""
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pymupdf as fitz
+except ImportError:  # 旧版本 PyMuPDF 只提供 fitz 模块
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+
+# 文档信息中保留的字段
+INFO_FIELDS = ("title", "author", "subject", "keywords")
+
+
+def _clean(value: Any) -> str:
+    return str(value).replace("\x00", "").strip() if value else ""
+
+
+def _parse_with_pymupdf(path: str) -> Dict[str, Any]:
+    with fitz.open(path) as document:
+        pages = [page.get_text("text") for page in document]
+        info = document.metadata or {}
+    return {
+        "extractor": "pymupdf",
+        "pages": pages,
+        "info": {field: _clean(info.get(field)) for field in INFO_FIELDS},
+    }
+
+
+def _parse_with_pypdf2(path: str) -> Dict[str, Any]:
+    import PyPDF2
+
+    with open(path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        pages: List[str] = []
+        for page in reader.pages:
+            try:
+                pages.append(page.extract_text() or "")
+            except Exception:
+                # 单页解析失败不影响其他页
+                pages.append("")
+        info = reader.metadata or {}
+        return {
+            "extractor": "pypdf2",
+            "pages": pages,
+            "info": {field: _clean(info.get(f"/{field.capitalize()}")) for field in INFO_FIELDS},
+        }
+
+
+def parse_pdf(path: str) -> Dict[str, Any]:
+    """
+    解析PDF，返回 {"extractor": 解析器, "pages": 每页文本, "info": 文档信息}
+
+    两种解析器都失败时抛出最后一个异常。
+    """
+    if fitz is not None:
+        try:
+            return _parse_with_pymupdf(path)
+        except Exception as e:
+            logger.warning(f"PyMuPDF 解析 {path} 失败，改用 PyPDF2: {e}")
+    return _parse_with_pypdf2(path)
+
+
+def parse_pdf_safely(path: str) -> Optional[Dict[str, Any]]:
+    """parse_pdf 的进程池版本：解析失败时记录日志并返回 None"""
+    try:
+        return parse_pdf(path)
+    except Exception as e:
+        logger.error(f"解析PDF {path} 失败: {e}")
+        return None
+
+
+def render_thumbnail(path: str, output_path: str, width: int = 320) -> bool:
+    """
+    把第一页渲染为指定宽度的PNG，写入 output_path（先写临时文件再替换）
+
+    需要 PyMuPDF；未安装、文件没有页面或渲染失败时返回 False。
+    """
+    if fitz is None:
+        return False
+    temp_path = f"{output_path}.{uuid.uuid4().hex}.part"
+    try:
+        with fitz.open(path) as document:
+            if document.page_count == 0:
+                return False
+            page = document[0]
+            zoom = width / page.rect.width if page.rect.width else 1
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        pixmap.save(temp_path, output="png")
+        os.replace(temp_path, output_path)
+        return True
+    except Exception as e:
+        logger.error(f"渲染PDF {path} 的缩略图失败: {e}")
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        return False
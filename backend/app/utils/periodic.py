@@ -0,0 +1,47 @@
+"""
+进程内定时任务
+
+任务函数是同步的（通常自行创建数据库会话），在线程池中执行，不阻塞事件循环；
+多个工作进程会各自执行，任务本身需要能安全地并发运行。
+"""
+from starlette.concurrency import run_in_threadpool
+from typing import Callable, Dict, Optional
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJobs:
+    """按固定间隔执行的后台任务，随应用启动与关闭"""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, name: str, interval_seconds: float, func: Callable[[], object],
+              initial_delay: Optional[float] = None):
+        """启动任务（同名任务已在运行时忽略）；initial_delay 默认等于间隔，避免启动时集中执行"""
+        if interval_seconds <= 0 or name in self._tasks:
+            return
+        delay = interval_seconds if initial_delay is None else initial_delay
+        self._tasks[name] = asyncio.get_running_loop().create_task(self._run(name, interval_seconds, func, delay))
+        logger.info(f"定时任务 {name} 已启动，间隔 {interval_seconds:.0f} 秒")
+
+    async def _run(self, name: str, interval_seconds: float, func: Callable[[], object], delay: float):
+        await asyncio.sleep(delay)
+        while True:
+            try:
+                await run_in_threadpool(func)
+            except Exception as e:
+                logger.error(f"定时任务 {name} 执行失败: {str(e)}")
+            await asyncio.sleep(interval_seconds)
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+periodic_jobs = PeriodicJobs()
@@ -0,0 +1,288 @@
+"""
+请求级SQL查询统计
+
+- instrument_engine: 在引擎上注册 before/after_cursor_execute 事件，把每条语句的耗时
+  记入当前请求的 RequestQueryStats（通过 contextvars 传递，同步线程池与异步会话均可用）
+- QueryMetricsMiddleware: 为每个请求开启统计，写入 Server-Timing 响应头与结构化日志，
+  并按路由模板汇总到 metrics_registry（/api/metrics 读取）
+- assert_max_queries: 测试中断言一段代码（如一次 TestClient 请求）执行的查询数上限
+
+    with assert_max_queries(3):
+        client.get("/api/papers/", headers=headers)
+"""
+from typing import List, Dict, Any, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import heapq
+import json
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# 直方图分桶上界：请求耗时（毫秒）与每请求查询数，最后一个桶为 +Inf
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestQueryStats:
+    """单个请求（或一段代码）内执行的查询统计"""
+
+    def __init__(self, slowest_limit: int = 3):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_limit = slowest_limit
+        # 最小堆保存最慢的若干条语句: (耗时, 序号, 语句)
+        self._slowest: List[Tuple[float, int, str]] = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration: float):
+        with self._lock:
+            self.count += 1
+            self.total_time += duration
+            if self.slowest_limit <= 0:
+                return
+            item = (duration, self.count, statement)
+            if len(self._slowest) < self.slowest_limit:
+                heapq.heappush(self._slowest, item)
+            elif duration > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    @property
+    def slowest(self) -> List[Dict[str, Any]]:
+        """最慢的语句，按耗时降序"""
+        return [
+            {"statement": _shorten(statement), "duration_ms": round(duration * 1000, 3)}
+            for duration, _, statement in sorted(self._slowest, reverse=True)
+        ]
+
+
+# 当前请求的统计；中间件设置，线程池与 greenlet 会复制上下文，因此同一对象在请求内共享
+_current_stats: ContextVar[Optional[RequestQueryStats]] = ContextVar("query_stats", default=None)
+# assert_max_queries 开启的统计，不依赖上下文（TestClient 在另一线程中处理请求）
+_captures: List[RequestQueryStats] = []
+_captures_lock = threading.Lock()
+
+
+def _shorten(statement: str, width: int = 300) -> str:
+    text = " ".join(statement.split())
+    return text if len(text) <= width else text[:width - 3] + "..."
+
+
+def instrument_engine(engine):
+    """为引擎注册查询计时事件（异步引擎请传入 engine.sync_engine）"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start_time")
+        if not starts:
+            return
+        duration = time.perf_counter() - starts.pop()
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, duration)
+        if _captures:
+            with _captures_lock:
+                captures = list(_captures)
+            for capture in captures:
+                capture.record(statement, duration)
+
+
+def begin_request(slowest_limit: int = 3):
+    """开始统计当前上下文中的查询，返回 (统计对象, 用于还原的token)"""
+    stats = RequestQueryStats(slowest_limit)
+    return stats, _current_stats.set(stats)
+
+
+def end_request(token):
+    _current_stats.reset(token)
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    """当前请求的查询统计（不在请求内时为 None）"""
+    return _current_stats.get()
+
+
+@contextmanager
+def capture_queries(slowest_limit: int = 3):
+    """统计 with 块内所有引擎执行的查询（不区分请求）"""
+    stats = RequestQueryStats(slowest_limit)
+    with _captures_lock:
+        _captures.append(stats)
+    try:
+        yield stats
+    finally:
+        with _captures_lock:
+            _captures.remove(stats)
+
+
+@contextmanager
+def assert_max_queries(limit: int):
+    """断言 with 块内执行的查询数不超过 limit，超出时列出最慢的语句"""
+    with capture_queries(slowest_limit=5) as stats:
+        yield stats
+    if stats.count > limit:
+        statements = "\n".join(f"  {item['duration_ms']}ms {item['statement']}" for item in stats.slowest)
+        raise AssertionError(f"执行了 {stats.count} 条查询，超过上限 {limit}\n{statements}")
+
+
+class _Histogram:
+    """固定分桶的累计直方图"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        buckets, cumulative = {}, 0
+        for bound, count in zip(list(self.bounds) + ["+Inf"], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"buckets": buckets, "sum": round(self.sum, 3)}
+
+
+class _RouteMetrics:
+    def __init__(self, slowest_limit: int):
+        self.requests = 0
+        self.errors = 0
+        self.latency_ms = _Histogram(LATENCY_BUCKETS_MS)
+        self.queries = _Histogram(QUERY_COUNT_BUCKETS)
+        self.db_time_ms = 0.0
+        self.max_queries = 0
+        self.slowest_limit = slowest_limit
+        self.slowest: List[Dict[str, Any]] = []
+
+    def observe(self, status_code: int, duration_ms: float, stats: RequestQueryStats):
+        self.requests += 1
+        if status_code >= 500:
+            self.errors += 1
+        self.latency_ms.observe(duration_ms)
+        self.queries.observe(stats.count)
+        self.db_time_ms += stats.total_time * 1000
+        self.max_queries = max(self.max_queries, stats.count)
+        if stats.slowest:
+            merged = self.slowest + stats.slowest
+            merged.sort(key=lambda item: item["duration_ms"], reverse=True)
+            self.slowest = merged[:self.slowest_limit]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ms": self.latency_ms.to_dict(),
+            "queries": self.queries.to_dict(),
+            "avg_queries": round(self.queries.sum / self.requests, 2) if self.requests else 0,
+            "max_queries": self.max_queries,
+            "db_time_ms": round(self.db_time_ms, 3),
+            "slowest_statements": self.slowest,
+        }
+
+
+class MetricsRegistry:
+    """按 "方法 路由模板" 汇总的请求指标"""
+
+    def __init__(self, slowest_limit: int = 3):
+        self.slowest_limit = slowest_limit
+        self._routes: Dict[str, _RouteMetrics] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def observe(self, route: str, status_code: int, duration_ms: float, stats: RequestQueryStats):
+        with self._lock:
+            metrics = self._routes.get(route)
+            if metrics is None:
+                metrics = self._routes[route] = _RouteMetrics(self.slowest_limit)
+            metrics.observe(status_code, duration_ms, stats)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "since": self.started_at,
+                "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+                "query_count_buckets": list(QUERY_COUNT_BUCKETS),
+                "routes": {route: metrics.to_dict() for route, metrics in sorted(self._routes.items())},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self.started_at = time.time()
+
+
+metrics_registry = MetricsRegistry()
+
+
+def _route_template(scope) -> str:
+    """使用路由模板（如 /api/papers/{paper_id}）而不是实际路径，避免指标按ID膨胀"""
+    route = scope.get("route")
+    path = getattr(route, "path", None) or "<unmatched>"
+    return f"{scope.get('method', '')} {path}"
+
+
+class QueryMetricsMiddleware:
+    """
+    ASGI中间件：统计每个请求的查询数与数据库耗时
+
+    响应头示例: Server-Timing: db;dur=3.2;desc="4 queries", app;dur=12.5
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry, slowest_limit: int = 3,
+                 log_requests: bool = True):
+        self.app = app
+        self.registry = registry
+        self.slowest_limit = slowest_limit
+        self.log_requests = log_requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = begin_request(self.slowest_limit)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                app_ms = (time.perf_counter() - start) * 1000
+                timing = (f'db;dur={stats.total_time * 1000:.1f};desc="{stats.count} queries", '
+                          f'app;dur={app_ms:.1f}')
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timing.encode("latin-1")))
+                headers.append((b"x-query-count", str(stats.count).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_request(token)
+            duration_ms = (time.perf_counter() - start) * 1000
+            route = _route_template(scope)
+            self.registry.observe(route, status_code, duration_ms, stats)
+            if self.log_requests:
+                logger.info(json.dumps({
+                    "event": "request",
+                    "route": route,
+                    "path": scope.get("path"),
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 3),
+                    "queries": stats.count,
+                    "db_time_ms": round(stats.total_time * 1000, 3),
+                    "slowest": stats.slowest,
+                }, ensure_ascii=False))
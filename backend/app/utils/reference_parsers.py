@@ -0,0 +1,365 @@
+"""
+文献题录解析（BibTeX / RIS / CSV）
+
+所有解析器都以行迭代器为输入、逐条产出记录，不需要把整个文件读入内存。
+产出的记录是统一字段的字典:
+    title, authors（逗号分隔）, journal, year, doi, abstract, url, tags（列表）
+"""
+from typing import Iterator, Iterable, Dict, Any, List, Optional, Tuple
+import csv
+import io
+import re
+
+FORMATS = ("bibtex", "ris", "csv")
+
+_YEAR = re.compile(r"(1[5-9]\d\d|20\d\d)")
+_DOI_PREFIX = re.compile(r"^(?:https?://(?:dx\.)?doi\.org/|doi:\s*)", re.IGNORECASE)
+_TITLE_KEY = re.compile(r"[\W_]+", re.UNICODE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    """去掉 https://doi.org/ 等前缀并转小写（DOI 大小写不敏感）"""
+    if not doi:
+        return None
+    doi = _DOI_PREFIX.sub("", doi.strip()).strip().lower()
+    return doi or None
+
+
+def title_key(title: Optional[str]) -> str:
+    """用于查重的标题：小写并去掉所有标点与空白"""
+    return _TITLE_KEY.sub("", (title or "").lower())
+
+
+def parse_year(value: Optional[str]) -> Optional[int]:
+    match = _YEAR.search(value or "")
+    return int(match.group(1)) if match else None
+
+
+def split_keywords(value: Optional[str]) -> List[str]:
+    """关键词按分号或逗号拆分"""
+    if not value:
+        return []
+    separator = ";" if ";" in value else ","
+    return [item.strip() for item in value.split(separator) if item.strip()]
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = _WHITESPACE.sub(" ", value).strip()
+    return value or None
+
+
+def _record(title=None, authors=None, journal=None, year=None, doi=None,
+            abstract=None, url=None, tags=None) -> Dict[str, Any]:
+    return {
+        "title": _clean(title),
+        "authors": _clean(authors),
+        "journal": _clean(journal),
+        "year": year,
+        "doi": normalize_doi(doi),
+        "abstract": _clean(abstract),
+        "url": _clean(url),
+        "tags": tags or [],
+    }
+
+
+def detect_format(filename: Optional[str], head: str) -> Optional[str]:
+    """根据扩展名或文件开头内容判断格式"""
+    name = (filename or "").lower()
+    if name.endswith((".bib", ".bibtex")):
+        return "bibtex"
+    if name.endswith((".ris", ".txt")) and re.search(r"^TY  - ", head, re.MULTILINE):
+        return "ris"
+    if name.endswith(".ris"):
+        return "ris"
+    if name.endswith(".csv"):
+        return "csv"
+    stripped = head.lstrip("\ufeff \t\r\n")
+    if stripped.startswith("@") or re.search(r"^\s*@\w+\s*[{(]", head, re.MULTILINE):
+        return "bibtex"
+    if re.search(r"^TY  - ", head, re.MULTILINE):
+        return "ris"
+    first_line = stripped.splitlines()[0] if stripped else ""
+    if "," in first_line:
+        return "csv"
+    return None
+
+
+# ---------------------------------------------------------------- BibTeX
+
+_LATEX_REPLACEMENTS = (("\\&", "&"), ("\\%", "%"), ("\\_", "_"), ("\\$", "$"), ("\\#", "#"), ("~", " "), ("--", "-"))
+_LATEX_ACCENT = re.compile(r"\\[`'^\"~=.uvHcdbtk]\s*\{?(\w)\}?")
+
+
+def _latex_to_text(value: str) -> str:
+    value = _LATEX_ACCENT.sub(r"\1", value)
+    for source, target in _LATEX_REPLACEMENTS:
+        value = value.replace(source, target)
+    return value.replace("{", "").replace("}", "")
+
+
+def _bibtex_authors(value: Optional[str]) -> Optional[str]:
+    """把 BibTeX 作者（Last, First and Other, Name）转换为逗号分隔的 First Last 形式"""
+    if not value:
+        return None
+    names = []
+    for name in re.split(r"\s+and\s+", value):
+        name = name.strip()
+        if "," in name:
+            last, first = name.split(",", 1)
+            name = f"{first.strip()} {last.strip()}"
+        if name:
+            names.append(name)
+    return ", ".join(names)
+
+
+def _read_bibtex_value(text: str, pos: int) -> Tuple[str, int]:
+    """从 pos 开始读取一个字段值（{...}、"..." 或裸词，支持 # 拼接），返回 (值, 结束位置)"""
+    parts = []
+    length = len(text)
+    while pos < length:
+        while pos < length and text[pos].isspace():
+            pos += 1
+        if pos >= length:
+            break
+        char = text[pos]
+        if char == "{":
+            depth, start = 1, pos + 1
+            pos += 1
+            while pos < length and depth:
+                if text[pos] == "\\":
+                    pos += 2
+                    continue
+                if text[pos] == "{":
+                    depth += 1
+                elif text[pos] == "}":
+                    depth -= 1
+                pos += 1
+            parts.append(text[start:pos - 1])
+        elif char == '"':
+            depth, start = 0, pos + 1
+            pos += 1
+            while pos < length and not (text[pos] == '"' and depth == 0):
+                if text[pos] == "{":
+                    depth += 1
+                elif text[pos] == "}":
+                    depth -= 1
+                pos += 1
+            parts.append(text[start:pos])
+            pos += 1
+        else:
+            start = pos
+            while pos < length and text[pos] not in ",#}) \t\r\n":
+                pos += 1
+            parts.append(text[start:pos])
+        while pos < length and text[pos].isspace():
+            pos += 1
+        if pos < length and text[pos] == "#":
+            pos += 1
+            continue
+        break
+    return "".join(parts), pos
+
+
+def parse_bibtex_entry(entry: str) -> Optional[Tuple[str, Dict[str, str]]]:
+    """解析单条 @type{key, field = value, ...}，返回 (类型, 字段)；@comment/@string/@preamble 返回 None"""
+    match = re.match(r"\s*@\s*(\w+)\s*[{(]", entry)
+    if not match:
+        return None
+    entry_type = match.group(1).lower()
+    if entry_type in ("comment", "string", "preamble"):
+        return None
+    body = entry[match.end():]
+    # 跳过引用键
+    comma = body.find(",")
+    if comma < 0:
+        return entry_type, {}
+    pos, fields = comma + 1, {}
+    field_name = re.compile(r"\s*([\w\-:.]+)\s*=")
+    while True:
+        name_match = field_name.match(body, pos)
+        if not name_match:
+            break
+        value, pos = _read_bibtex_value(body, name_match.end())
+        fields[name_match.group(1).lower()] = _latex_to_text(value)
+        while pos < len(body) and body[pos] in ", \t\r\n":
+            pos += 1
+    return entry_type, fields
+
+
+def iter_bibtex_entries(lines: Iterable[str]) -> Iterator[str]:
+    """按定界符配平把行流切分为完整的条目文本（@type{...} 或 @type(...)）"""
+    buffer: List[str] = []
+    opening = closing = None
+    depth = 0
+    for line in lines:
+        if not buffer:
+            at = line.find("@")
+            if at < 0:
+                continue
+            line = line[at:]
+        buffer.append(line)
+        escaped = False
+        for char in line:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif opening is None:
+                if char in "{(":
+                    opening, closing = char, "}" if char == "{" else ")"
+                    depth = 1
+            elif char == opening:
+                depth += 1
+            elif char == closing:
+                depth -= 1
+                if depth == 0:
+                    break
+        if opening is not None and depth == 0:
+            yield "".join(buffer)
+            buffer, opening, closing = [], None, None
+    if buffer:
+        yield "".join(buffer)
+
+
+def iter_bibtex(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    for entry in iter_bibtex_entries(lines):
+        parsed = parse_bibtex_entry(entry)
+        if parsed is None:
+            continue
+        _, fields = parsed
+        yield _record(
+            title=fields.get("title"),
+            authors=_bibtex_authors(fields.get("author")),
+            journal=fields.get("journal") or fields.get("booktitle") or fields.get("publisher"),
+            year=parse_year(fields.get("year") or fields.get("date")),
+            doi=fields.get("doi"),
+            abstract=fields.get("abstract"),
+            url=fields.get("url"),
+            tags=split_keywords(fields.get("keywords")),
+        )
+
+
+# ---------------------------------------------------------------- RIS
+
+_RIS_LINE = re.compile(r"^([A-Z][A-Z0-9])  -\s?(.*)$")
+_RIS_FIELDS = {
+    "TI": "title", "T1": "title", "CT": "title",
+    "AU": "authors", "A1": "authors", "A2": "authors",
+    "JO": "journal", "JF": "journal", "T2": "journal", "JA": "journal", "BT": "journal",
+    "PY": "year", "Y1": "year", "DA": "year",
+    "DO": "doi",
+    "AB": "abstract", "N2": "abstract",
+    "UR": "url", "L2": "url",
+    "KW": "tags",
+}
+
+
+def iter_ris(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    current: Optional[Dict[str, List[str]]] = None
+    last_field = None
+    for raw in lines:
+        line = raw.rstrip("\r\n").lstrip("\ufeff")
+        match = _RIS_LINE.match(line)
+        if not match:
+            # 续行追加到上一个字段
+            if current is not None and last_field and line.strip():
+                current[last_field][-1] += " " + line.strip()
+            continue
+        tag, value = match.group(1), match.group(2).strip()
+        if tag == "TY":
+            current, last_field = {}, None
+        elif tag == "ER":
+            if current is not None:
+                yield _ris_record(current)
+            current, last_field = None, None
+        elif current is not None and tag in _RIS_FIELDS:
+            field = _RIS_FIELDS[tag]
+            # 同一字段只取第一个来源的标签（如 TI 与 T1 同时存在）
+            if field in ("title", "journal", "year", "abstract", "url", "doi") and field in current:
+                last_field = None
+                continue
+            current.setdefault(field, []).append(value)
+            last_field = field
+    if current:
+        yield _ris_record(current)
+
+
+def _ris_record(fields: Dict[str, List[str]]) -> Dict[str, Any]:
+    def first(name):
+        values = fields.get(name)
+        return values[0] if values else None
+
+    authors = [_bibtex_authors(name) for name in fields.get("authors", [])]
+    return _record(
+        title=first("title"),
+        authors=", ".join(a for a in authors if a) or None,
+        journal=first("journal"),
+        year=parse_year(first("year")),
+        doi=first("doi"),
+        abstract=first("abstract"),
+        url=first("url"),
+        tags=[tag for value in fields.get("tags", []) for tag in split_keywords(value)],
+    )
+
+
+# ---------------------------------------------------------------- CSV
+
+_CSV_COLUMNS = {
+    "title": ("title", "标题", "题名", "article title"),
+    "authors": ("authors", "author", "作者"),
+    "journal": ("journal", "venue", "source title", "publication", "期刊", "来源"),
+    "year": ("year", "publication year", "年份", "年"),
+    "doi": ("doi",),
+    "abstract": ("abstract", "摘要"),
+    "url": ("url", "link", "链接"),
+    "tags": ("tags", "keywords", "author keywords", "标签", "关键词"),
+}
+
+
+def iter_csv(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    reader = csv.DictReader(lines)
+    if not reader.fieldnames:
+        return
+    headers = {name.strip().lstrip("\ufeff").lower(): name for name in reader.fieldnames if name}
+    columns = {}
+    for field, aliases in _CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in headers:
+                columns[field] = headers[alias]
+                break
+
+    for row in reader:
+        def get(field):
+            column = columns.get(field)
+            return row.get(column) if column else None
+
+        authors = get("authors")
+        if authors and ";" in authors:
+            authors = ", ".join(a.strip() for a in authors.split(";") if a.strip())
+        yield _record(
+            title=get("title"),
+            authors=authors,
+            journal=get("journal"),
+            year=parse_year(get("year")),
+            doi=get("doi"),
+            abstract=get("abstract"),
+            url=get("url"),
+            tags=split_keywords(get("tags")),
+        )
+
+
+PARSERS = {"bibtex": iter_bibtex, "ris": iter_ris, "csv": iter_csv}
+
+
+def iter_records(binary_stream, fmt: str, encoding: str = "utf-8-sig") -> Iterator[Dict[str, Any]]:
+    """从二进制文件对象按行增量解码并解析"""
+    if fmt not in PARSERS:
+        raise ValueError(f"不支持的导入格式: {fmt}")
+    text = io.TextIOWrapper(binary_stream, encoding=encoding, errors="replace", newline="")
+    try:
+        yield from PARSERS[fmt](text)
+    finally:
+        text.detach()
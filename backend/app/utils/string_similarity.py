@@ -0,0 +1,66 @@
+"""
+字符串相似度计算
+
+基于归一化Levenshtein距离：similarity = 1 - distance / max(len1, len2)。
+- levenshtein_distance: 两行滚动数组的动态规划，支持超过阈值时提前退出
+- text_similarity: 单对字符串相似度（替代原先的整矩阵实现）
+
+这里只负责单对比较（两篇论文的相似度明细需要精确值，不设阈值）。一对多的批量比较与按阈值筛选
+由相似度索引（services/paper_similarity_service.py）完成：字符3-gram稀疏向量一次矩阵乘法打分，
+只持久化超过阈值的近邻，比逐对计算编辑距离快几个数量级（见 benchmarks/string_similarity.py）。
+"""
+from typing import Optional
+
+
+def levenshtein_distance(s1: str, s2: str, max_distance: Optional[int] = None) -> int:
+    """
+    计算编辑距离，只保留两行DP状态
+
+    指定 max_distance 时，一旦某一行的最小值超过它即提前返回 max_distance + 1。
+    """
+    if len(s1) < len(s2):
+        s1, s2 = s2, s1
+    m, n = len(s1), len(s2)
+    if max_distance is not None and m - n > max_distance:
+        return max_distance + 1
+    if n == 0:
+        return m
+
+    previous = list(range(n + 1))
+    current = [0] * (n + 1)
+    for i in range(1, m + 1):
+        current[0] = i
+        c1 = s1[i - 1]
+        row_min = i
+        for j in range(1, n + 1):
+            cost = 0 if c1 == s2[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if max_distance is not None and row_min > max_distance:
+            return max_distance + 1
+        previous, current = current, previous
+    return previous[n]
+
+
+def _max_distance(threshold: float, max_length: int) -> int:
+    """相似度阈值换算为允许的最大编辑距离"""
+    return int((1 - threshold) * max_length + 1e-9)
+
+
+def text_similarity(text1: Optional[str], text2: Optional[str], threshold: Optional[float] = None) -> float:
+    """计算两个文本的归一化相似度（忽略大小写），低于阈值时返回0"""
+    if not text1 or not text2:
+        return 0.0
+    s1 = text1.lower()
+    s2 = text2.lower()
+    if s1 == s2:
+        return 1.0
+
+    max_length = max(len(s1), len(s2))
+    max_distance = _max_distance(threshold, max_length) if threshold is not None else None
+    distance = levenshtein_distance(s1, s2, max_distance)
+    if max_distance is not None and distance > max_distance:
+        return 0.0
+    return 1 - distance / max_length
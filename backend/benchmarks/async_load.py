@@ -0,0 +1,131 @@
+"""
+异步数据库层负载测试：并发请求论文列表接口，同时测量事件循环延迟（loop lag）
+
+对比两种实现：
+- 同步会话：原先在 async def 路由中直接使用同步 Session（查询阻塞事件循环）
+- 异步会话：当前 /api/papers/ 使用的 AsyncSession
+
+注意：同步会话在并发数超过连接池容量时，等待连接会阻塞事件循环，
+而归还连接又依赖事件循环，请求会卡住直到 pool_timeout，因此默认并发保持在连接池大小以内。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.async_load [--papers 5000] [--concurrency 8] [--requests 200]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+# 必须在导入应用之前指定临时数据库
+_BENCH_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_BENCH_DIR, 'load.db')}"
+
+import httpx  # noqa: E402
+from fastapi import Depends  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.database import Base, engine, SessionLocal  # noqa: E402
+from app.dependencies import get_db, get_current_user, create_access_token  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User, Paper  # noqa: E402
+
+WORDS = "graph neural network attention transformer vision language model retrieval diffusion".split()
+
+
+@app.get("/bench/legacy-papers")
+async def legacy_papers(search: str = None, db: Session = Depends(get_db),
+                        current_user: User = Depends(get_current_user)):
+    """迁移前的写法：async def 中执行同步查询"""
+    query = db.query(Paper).filter(Paper.user_id == current_user.id)
+    if search:
+        term = f"%{search}%"
+        query = query.filter(Paper.title.ilike(term) | Paper.abstract.ilike(term) | Paper.authors.ilike(term))
+    papers = query.order_by(Paper.created_at.desc()).limit(100).all()
+    return [{"id": p.id, "title": p.title, "tags": [t.name for t in p.tags]} for p in papers]
+
+
+def _seed(count: int) -> str:
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        user = User(username="bench", email="bench@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        rng = random.Random(0)
+        db.bulk_insert_mappings(Paper, [
+            {
+                "title": " ".join(rng.choices(WORDS, k=8)),
+                "abstract": " ".join(rng.choices(WORDS, k=60)),
+                "authors": "Alice, Bob",
+                "user_id": user.id,
+                "year": 2000 + i % 25,
+            }
+            for i in range(count)
+        ])
+        db.commit()
+        return create_access_token({"sub": user.username})
+    finally:
+        db.close()
+
+
+async def _run(client: httpx.AsyncClient, path: str, headers: dict, total: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    lags = []
+    done = asyncio.Event()
+
+    async def one():
+        async with semaphore:
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+
+    async def monitor():
+        # 每10ms醒来一次，实际醒来时间与预期之差即事件循环被阻塞的时长
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lags.append(time.perf_counter() - start - 0.01)
+
+    pinger = asyncio.create_task(monitor())
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await pinger
+
+    lags.sort()
+    p50 = lags[len(lags) // 2] if lags else 0.0
+    p99 = lags[int(len(lags) * 0.99)] if lags else 0.0
+    return total / elapsed, p50, p99
+
+
+async def main_async(args):
+    # 关闭请求日志，避免日志输出主导耗时
+    logging.disable(logging.INFO)
+    token = _seed(args.papers)
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{args.papers} 篇论文, 并发 {args.concurrency}, 每种实现 {args.requests} 个请求")
+        for label, path in (
+            ("同步会话", "/bench/legacy-papers?search=diffusion"),
+            ("异步会话", "/api/papers/?search=diffusion"),
+        ):
+            # 预热
+            await client.get(path, headers=headers)
+            throughput, p50, p99 = await _run(client, path, headers, args.requests, args.concurrency)
+            print(f"{label:<8} {throughput:8.1f} 请求/秒   事件循环延迟 p50 {p50 * 1000:7.1f}ms  p99 {p99 * 1000:7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="异步数据库层负载测试")
+    parser.add_argument("--papers", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
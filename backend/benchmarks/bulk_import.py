@@ -0,0 +1,116 @@
+"""
+批量导入吞吐基准：逐篇 POST /api/papers/ 对比 POST /api/papers/import（BibTeX）
+
+每篇论文带 3 个标签并加入同一项目。逐篇创建时每篇论文、项目关联和每个标签都单独提交；
+批量导入按批次事务写入。两种方式的耗时都包含响应后执行的相似度索引后台任务。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.bulk_import [--single 300] [--papers 10000] [--chunk-size 500]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+# 必须在导入应用之前指定临时数据库
+_BENCH_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_BENCH_DIR, 'import.db')}"
+os.environ["QUERY_METRICS_LOG"] = "false"
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.database import engine, SessionLocal, upgrade_schema  # noqa: E402
+from app.dependencies import create_access_token  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import User, Project  # noqa: E402
+from app.services.paper_import_service import paper_import_service  # noqa: E402
+
+WORDS = ("graph neural network attention transformer vision language model retrieval diffusion "
+         "contrastive federated privacy robust molecule protein segmentation detection").split()
+TAGS = [f"topic-{i}" for i in range(50)]
+
+
+def _papers(rng: random.Random, count: int, offset: int):
+    for i in range(offset, offset + count):
+        yield {
+            "title": " ".join(rng.choices(WORDS, k=7)) + f" {i}",
+            "authors": f"Author {i % 997}, Author {i % 389}",
+            "journal": f"Journal {i % 40}",
+            "year": 2000 + i % 25,
+            "doi": f"10.5555/bench.{i}",
+            "abstract": " ".join(rng.choices(WORDS, k=80)),
+            "tags": rng.sample(TAGS, 3),
+        }
+
+
+def _bibtex(papers) -> bytes:
+    entries = []
+    for i, paper in enumerate(papers):
+        entries.append(
+            f"@article{{p{i},\n  title = {{{paper['title']}}},\n  author = {{{paper['authors'].replace(', ', ' and ')}}},\n"
+            f"  journal = {{{paper['journal']}}},\n  year = {{{paper['year']}}},\n  doi = {{{paper['doi']}}},\n"
+            f"  keywords = {{{'; '.join(paper['tags'])}}},\n  abstract = {{{paper['abstract']}}}\n}}\n"
+        )
+    return "".join(entries).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="逐篇创建与批量导入的吞吐对比")
+    parser.add_argument("--single", type=int, default=300, help="逐篇创建的论文数")
+    parser.add_argument("--papers", type=int, default=10000, help="批量导入的论文数")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    paper_import_service.chunk_size = args.chunk_size
+
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+    db = SessionLocal()
+    user = User(username="bench", email="bench@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    project = Project(name="bench", user_id=user.id)
+    db.add(project)
+    db.commit()
+    project_id = project.id
+    db.close()
+
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'bench'})}"}
+    rng = random.Random(0)
+
+    start = time.perf_counter()
+    for paper in _papers(rng, args.single, 0):
+        response = client.post("/api/papers/", headers=headers, json={**paper, "project_id": project_id})
+        response.raise_for_status()
+    single_time = time.perf_counter() - start
+    single_rate = args.single / single_time
+    print(f"逐篇 POST /api/papers/: {args.single} 篇 {single_time:.2f}s, {single_rate:.0f} 篇/秒")
+
+    payload = _bibtex(_papers(rng, args.papers, args.single))
+    start = time.perf_counter()
+    response = client.post(
+        "/api/papers/import", headers=headers,
+        files={"file": ("library.bib", payload)}, data={"project_id": str(project_id)},
+    )
+    response.raise_for_status()
+    import_time = time.perf_counter() - start
+    summary = json.loads(response.text.splitlines()[-1])
+    import_rate = summary["imported"] / import_time
+    print(f"批量导入 POST /api/papers/import: {summary['imported']} 篇 {import_time:.2f}s, {import_rate:.0f} 篇/秒 "
+          f"(导入本身 {summary['papers_per_second']:.0f} 篇/秒, 文件 {len(payload) / 1024 / 1024:.1f}MB, "
+          f"批次 {args.chunk_size})")
+    print(f"加速: {import_rate / single_rate:.1f}x")
+
+    # 再次导入同一文件：全部按DOI/标题判为重复
+    start = time.perf_counter()
+    response = client.post("/api/papers/import", headers=headers, files={"file": ("library.bib", payload)})
+    summary = json.loads(response.text.splitlines()[-1])
+    print(f"重复导入: 查重 {summary['duplicates']} 篇 {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
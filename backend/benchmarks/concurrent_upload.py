@@ -0,0 +1,90 @@
+"""
+并发上传内存基准：整文件读入内存后写盘 对比 FileService.stream_upload 按块流式写入
+
+模拟多个用户同时上传大文件（上传内容已由框架暂存在磁盘临时文件中，与 UploadFile 的实际情况一致），
+分别统计 Python 分配的峰值内存（tracemalloc）与进程常驻内存峰值（ru_maxrss）。
+先运行流式写入，常驻内存峰值只会增长，旧实现的峰值在其之后测得。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.concurrent_upload [--uploads 8] [--size-mb 50] [--chunk-size 1048576]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from fastapi import UploadFile
+
+from app.services.file_service import FileService
+
+
+def _make_source(directory: str, size_mb: int) -> str:
+    path = os.path.join(directory, "source.pdf")
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+def _uploads(source: str, count: int):
+    return [UploadFile(file=open(source, "rb"), filename=f"paper_{i}.pdf") for i in range(count)]
+
+
+async def _legacy_save(file: UploadFile, directory: str, index: int):
+    """旧实现：一次读入整个文件，再在事件循环中用阻塞 open() 写盘"""
+    content = await file.read()
+    with open(os.path.join(directory, f"legacy_{index}.pdf"), "wb") as f:
+        f.write(content)
+    return len(content)
+
+
+async def _streaming_save(service: FileService, file: UploadFile, index: int):
+    stored = await service.stream_upload(file, service.upload_dir / f"streaming_{index}.pdf")
+    return stored.size
+
+
+async def _measure(label: str, make_tasks):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    await asyncio.gather(*make_tasks())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{label:<10} 用时 {elapsed:6.2f}s  Python峰值分配 {peak / 1024 / 1024:8.1f}MB  进程峰值常驻 {max_rss_mb:8.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发上传的峰值内存对比")
+    parser.add_argument("--uploads", type=int, default=8, help="并发上传数")
+    parser.add_argument("--size-mb", type=int, default=50, help="每个文件的大小（MB）")
+    parser.add_argument("--chunk-size", type=int, default=1024 * 1024)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    directory = tempfile.mkdtemp()
+    try:
+        source = _make_source(directory, args.size_mb)
+        service = FileService(upload_dir=os.path.join(directory, "uploads"), chunk_size=args.chunk_size)
+        print(f"{args.uploads} 个并发上传，每个 {args.size_mb}MB，块大小 {args.chunk_size // 1024}KB")
+        print(f"基线进程峰值常驻 {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f}MB")
+
+        streaming = _uploads(source, args.uploads)
+        asyncio.run(_measure("流式写入", lambda: [_streaming_save(service, f, i) for i, f in enumerate(streaming)]))
+        legacy = _uploads(source, args.uploads)
+        asyncio.run(_measure("整读写入", lambda: [_legacy_save(f, directory, i) for i, f in enumerate(legacy)]))
+        for upload in streaming + legacy:
+            upload.file.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+SQLite 并发读写基准：一个写线程持续批量写入（模拟抓取 latest_papers），
+多个读线程同时执行列表查询，对比 dev 与 production-sqlite 配置档。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.db_concurrency [--seconds 10] [--readers 8] [--batch 2000]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database import create_app_engine
+
+SCHEMA = """
+CREATE TABLE latest_papers (
+    id INTEGER PRIMARY KEY,
+    title VARCHAR(500),
+    abstract TEXT,
+    source VARCHAR(50),
+    created_at REAL
+)
+"""
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_profile(profile: str, seconds: float, readers: int, batch: int):
+    directory = tempfile.mkdtemp()
+    engine = create_app_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile=profile,
+                               pool_size=readers + 2)
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA))
+
+    stop = threading.Event()
+    stats = {"writes": 0, "write_errors": 0, "reads": 0, "read_errors": 0}
+    latencies = []
+    lock = threading.Lock()
+
+    def writer():
+        payload = "x" * 2000
+        while not stop.is_set():
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("INSERT INTO latest_papers (title, abstract, source, created_at) "
+                             "VALUES (:title, :abstract, 'arxiv', :now)"),
+                        [{"title": f"paper {i}", "abstract": payload, "now": time.time()} for i in range(batch)]
+                    )
+                    # 抓取事务在提交前通常还会做网络请求，这里模拟持有写锁的时间
+                    time.sleep(0.02)
+                stats["writes"] += batch
+            except OperationalError:
+                stats["write_errors"] += 1
+
+    def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text(
+                        "SELECT id, title, source FROM latest_papers ORDER BY id DESC LIMIT 20"
+                    )).all()
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+                    stats["reads"] += 1
+            except OperationalError:
+                with lock:
+                    stats["read_errors"] += 1
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    print(f"{profile:<18} 读 {stats['reads'] / seconds:9,.0f} 次/秒  "
+          f"p50 {_percentile(latencies, 0.5) * 1000:7.2f}ms  p99 {_percentile(latencies, 0.99) * 1000:8.2f}ms  "
+          f"读失败 {stats['read_errors']:>5}  写 {stats['writes'] / seconds:9,.0f} 行/秒  写失败 {stats['write_errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 并发读写基准")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--batch", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"1个写线程 + {args.readers}个读线程, 每个配置档运行 {args.seconds}s")
+    for profile in ("dev", "production-sqlite"):
+        run_profile(profile, args.seconds, args.readers, args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+论文检索基准：ILIKE '%词%' 全表扫描 对比 FTS5 全文索引（BM25排序）
+
+数据库通过迁移建表（包含 papers_fts 与同步触发器），写入随机生成的中英文论文后，
+对同一组查询分别执行 ILIKE 与全文索引两种列表查询（与 /api/papers/?search= 相同的查询构建器）。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.full_text_search [--papers 100000] [--repeat 5]
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import create_app_engine, upgrade_schema
+from app.services.paper_listing_service import paper_listing_service
+from app.services.search_index_service import search_index_service
+
+# 英文字母频率（%），使合成词的三元组分布接近真实英文文本
+LETTER_FREQUENCIES = {
+    "e": 12.7, "t": 9.1, "a": 8.2, "o": 7.5, "i": 7.0, "n": 6.7, "s": 6.3, "h": 6.1, "r": 6.0,
+    "d": 4.3, "l": 4.0, "c": 2.8, "u": 2.8, "m": 2.4, "w": 2.4, "f": 2.2, "g": 2.0, "y": 2.0,
+    "p": 1.9, "b": 1.5, "v": 1.0, "k": 0.8, "j": 0.2, "x": 0.2, "q": 0.1, "z": 0.1,
+}
+CJK_CHARS = "图神经网络注意力机制知识谱强化学习对比扩散模型目标检测联邦隐私鲁棒生成表示分子蛋白质分割"
+
+
+def _vocabulary(rng: random.Random, size: int):
+    """生成合成词表（按字母频率生成的英文词与中文二、三、四字词）"""
+    letters, weights = list(LETTER_FREQUENCIES), list(LETTER_FREQUENCIES.values())
+    words = set()
+    while len(words) < size:
+        if rng.random() < 0.8:
+            words.add("".join(rng.choices(letters, weights, k=rng.randint(4, 10))))
+        else:
+            words.add("".join(rng.choices(CJK_CHARS, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _seed(session, count: int, user_id: int, vocabulary):
+    """词频服从Zipf分布：少数常见词出现在大量论文中，多数词只出现在少数论文中"""
+    rng = random.Random(0)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    batch = 5000
+    for start in range(0, count, batch):
+        rows = []
+        for i in range(start, min(start + batch, count)):
+            rows.append({
+                "title": " ".join(rng.choices(vocabulary, weights, k=8)),
+                "abstract": " ".join(rng.choices(vocabulary, weights, k=120)),
+                "authors": f"Author {i % 997}, Author {i % 389}",
+                "user_id": user_id,
+                "year": 2000 + i % 25,
+            })
+        session.execute(
+            text("INSERT INTO papers (title, abstract, authors, user_id, year, created_at, is_public) "
+                 "VALUES (:title, :abstract, :authors, :user_id, :year, CURRENT_TIMESTAMP, 1)"),
+            rows,
+        )
+    session.commit()
+
+
+def _queries(vocabulary):
+    """不同选择度的查询：常见词、中频词、低频词、两词组合与无结果"""
+    english = [w for w in vocabulary if w.isascii() and len(w) >= 5]
+    return [
+        ("常见词", english[5]),
+        ("中频词", english[300]),
+        ("低频词", english[5000]),
+        ("两词组合", f"{english[20]} {english[40]}"),
+        ("中文词", next(w for w in vocabulary[200:] if not w.isascii() and len(w) >= 3)),
+        ("无结果", "zzqqxx"),
+    ]
+
+
+def _time(session, query, repeat: int):
+    timings, rows = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(session.scalars(query).all())
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ILIKE 与 FTS5 全文检索延迟对比")
+    parser.add_argument("--papers", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    directory = tempfile.mkdtemp()
+    engine = create_app_engine(f"sqlite:///{os.path.join(directory, 'fts.db')}", profile="production-sqlite")
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+    Session = sessionmaker(bind=engine)
+    session = Session()
+    session.execute(text("INSERT INTO users (username, email, hashed_password, role, is_active) "
+                         "VALUES ('bench', 'bench@example.com', 'x', 'user', 1)"))
+    user_id = session.execute(text("SELECT id FROM users")).scalar()
+
+    vocabulary = _vocabulary(random.Random(1), args.vocabulary)
+    start = time.perf_counter()
+    _seed(session, args.papers, user_id, vocabulary)
+    print(f"写入 {args.papers} 篇论文（含触发器维护索引）: {time.perf_counter() - start:.1f}s")
+
+    backend = search_index_service.backend(session.connection())
+    print(f"全文索引: {backend.dialect}/{backend.tokenizer}")
+    print(f"{'查询':<28}{'ILIKE':>10}{'FTS5':>10}{'加速':>8}{'命中数':>8}")
+    for label, q in _queries(vocabulary):
+        like_query = paper_listing_service.build_query(user_id=user_id, search=q, limit=args.limit)
+        fts_query = paper_listing_service.build_query(user_id=user_id, search=q, limit=args.limit,
+                                                      search_backend=backend)
+        like_time, _ = _time(session, like_query, args.repeat)
+        fts_time, _ = _time(session, fts_query, args.repeat)
+        matches = session.execute(
+            text("SELECT count(*) FROM papers_fts WHERE papers_fts MATCH :q"), {"q": backend.match_query(q.split())}
+        ).scalar()
+        print(f"{label + ' ' + q:<28}{like_time * 1000:>8.1f}ms{fts_time * 1000:>8.1f}ms"
+              f"{like_time / fts_time:>7.1f}x{matches:>8}")
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
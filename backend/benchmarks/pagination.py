@@ -0,0 +1,111 @@
+"""
+分页基准：OFFSET 分页 对比 游标（keyset）分页的深页延迟，以及总数缓存
+
+同一用户写入大量论文后，用论文列表的查询构建器分别取第 1、10、100、1000... 页：
+- OFFSET: build_query(skip=页号*每页条数)，需要逐行跳过前面的所有行
+- 游标: 从上一页最后一行的 (created_at, id) 继续，按 ix_papers_user_created 索引直接定位
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.pagination [--papers 200000] [--page-size 20] [--repeat 5]
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import create_app_engine, upgrade_schema
+from app.models import Paper
+from app.services.paper_listing_service import paper_listing_service
+from app.utils.pagination import paginate, count_cache, count_statement
+
+
+def _seed(session, count: int, user_id: int, other_id: int):
+    """两个用户交错写入，created_at 有重复值以覆盖同值翻页"""
+    start = datetime(2020, 1, 1)
+    batch = 10000
+    for offset in range(0, count, batch):
+        rows = [{
+            "title": f"Paper {i}",
+            "user_id": user_id if i % 4 else other_id,
+            "year": 2000 + i % 25 if i % 7 else None,
+            "created_at": start + timedelta(seconds=i // 3),
+            "is_public": True,
+        } for i in range(offset, min(offset + batch, count))]
+        # 经 SQLAlchemy 绑定 created_at，与应用写入的时间格式一致
+        session.execute(insert(Paper), rows)
+    session.commit()
+
+
+def _median(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OFFSET 与游标分页的深页延迟对比")
+    parser.add_argument("--papers", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    directory = tempfile.mkdtemp()
+    engine = create_app_engine(f"sqlite:///{os.path.join(directory, 'pagination.db')}", profile="production-sqlite")
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+    session = sessionmaker(bind=engine)()
+    for name in ("bench", "other"):
+        session.execute(text("INSERT INTO users (username, email, hashed_password, role, is_active) "
+                             f"VALUES ('{name}', '{name}@example.com', 'x', 'user', 1)"))
+    user_id, other_id = session.execute(text("SELECT id FROM users ORDER BY id")).scalars().all()
+    _seed(session, args.papers, user_id, other_id)
+    session.execute(text("ANALYZE"))
+    owned = session.execute(text("SELECT count(*) FROM papers WHERE user_id = :u"), {"u": user_id}).scalar()
+    print(f"论文 {args.papers} 篇（当前用户 {owned} 篇），每页 {args.page_size} 条")
+
+    query, _ = paper_listing_service.filter_query(user_id=user_id)
+    keyset = paper_listing_service.keyset()
+
+    # 逐页走一遍记录每页的游标，作为“从上一页继续”的起点
+    last_page = owned // args.page_size
+    pages = [1, 10, 100, 1000, 5000, last_page]
+    pages = sorted({page for page in pages if page <= last_page})
+    cursors, cursor, page_number = {1: None}, None, 1
+    while page_number < pages[-1]:
+        cursor = paginate(session, query, keyset, limit=args.page_size, cursor=cursor).next_cursor
+        page_number += 1
+        cursors[page_number] = cursor
+
+    print(f"{'页号':>8}{'OFFSET':>12}{'游标':>12}{'加速':>9}")
+    for page in pages:
+        skip = (page - 1) * args.page_size
+        # 两种方式都在计时内构建语句，与每个请求的开销一致
+        offset_time, offset_rows = _median(lambda: session.scalars(
+            paper_listing_service.build_query(user_id=user_id, skip=skip, limit=args.page_size)
+        ).all(), args.repeat)
+        keyset_time, keyset_page = _median(
+            lambda: paginate(session, query, keyset, limit=args.page_size, cursor=cursors[page]), args.repeat
+        )
+        assert [p.id for p in offset_rows] == [p.id for p in keyset_page.items]
+        print(f"{page:>8}{offset_time * 1000:>10.2f}ms{keyset_time * 1000:>10.2f}ms{offset_time / keyset_time:>8.1f}x")
+
+    count_time, total = _median(lambda: session.scalar(count_statement(query)), args.repeat)
+    count_cache.clear()
+    count_cache.count(session, ("papers", user_id), ("papers",), query)
+    cached_time, _ = _median(lambda: count_cache.count(session, ("papers", user_id), ("papers",), query), args.repeat)
+    print(f"总数 {total}: COUNT {count_time * 1000:.2f}ms, 缓存命中 {cached_time * 1000:.4f}ms")
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+PDF正文检索基准：按页 LIKE 扫描 对比 pdf_pages_fts 全文索引（BM25排序、片段与页码）
+
+数据库通过迁移建表（包含 pdf_pages_fts 与同步触发器），按入库任务写入的结构生成合成语料：
+每个PDF一条 blobs 记录与若干页 pdf_pages，PDF分属多个用户的论文；查询走与 /api/search/pdf
+相同的 search_pdf_pages（按用户过滤），LIKE 一列为没有全文索引时的回退实现。
+LIKE 只扫描该用户的页面、凑够 limit 条即停止且不排序；全文索引需要为全库的所有命中计算 BM25，
+因此出现在大多数页面中的常见词反而更慢，选择性越高的查询加速越明显。
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.pdf_full_text_search [--pdfs 10000] [--pages 10] [--words 200] [--users 20]
+"""
+import argparse
+import hashlib
+import logging
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from app.database import create_app_engine, upgrade_schema
+from app.services.search_index_service import search_index_service, SearchIndexService
+from benchmarks.full_text_search import _vocabulary, _queries
+
+
+def _seed(session, pdfs: int, pages: int, words: int, users: int, vocabulary):
+    """词频服从Zipf分布；第 i 个PDF属于第 i % users 个用户"""
+    rng = random.Random(0)
+    weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+    session.execute(
+        text("INSERT INTO users (username, email, hashed_password, role, is_active, storage_used_bytes) "
+             "VALUES (:name, :email, 'x', 'user', 1, 0)"),
+        [{"name": f"bench{u}", "email": f"bench{u}@example.com"} for u in range(users)],
+    )
+    user_ids = session.execute(text("SELECT id FROM users ORDER BY id")).scalars().all()
+    batch = 500
+    for start in range(0, pdfs, batch):
+        blobs, papers, page_rows = [], [], []
+        for i in range(start, min(start + batch, pdfs)):
+            sha256 = hashlib.sha256(str(i).encode()).hexdigest()
+            blobs.append({"id": i + 1, "sha256": sha256, "size": pages * words * 8})
+            papers.append({"title": f"PDF {i}", "user_id": user_ids[i % users], "blob_id": i + 1})
+            for number in range(1, pages + 1):
+                page_rows.append({"sha256": sha256, "page_number": number,
+                                  "text": " ".join(rng.choices(vocabulary, weights, k=words))})
+        session.execute(text("INSERT INTO blobs (id, sha256, size, ref_count) VALUES (:id, :sha256, :size, 1)"), blobs)
+        session.execute(
+            text("INSERT INTO papers (title, user_id, pdf_blob_id, created_at, is_public) "
+                 "VALUES (:title, :user_id, :blob_id, CURRENT_TIMESTAMP, 1)"),
+            papers,
+        )
+        session.execute(
+            text("INSERT INTO pdf_pages (sha256, page_number, text) VALUES (:sha256, :page_number, :text)"),
+            page_rows,
+        )
+        session.commit()
+    return user_ids
+
+
+def _time(func, repeat: int):
+    timings, rows = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF正文 LIKE 与 FTS5 检索延迟对比")
+    parser.add_argument("--pdfs", type=int, default=10000)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--words", type=int, default=200, help="每页词数")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    directory = tempfile.mkdtemp()
+    engine = create_app_engine(f"sqlite:///{os.path.join(directory, 'pdf_fts.db')}", profile="production-sqlite")
+    with engine.begin() as conn:
+        upgrade_schema(conn)
+    session = sessionmaker(bind=engine)()
+
+    vocabulary = _vocabulary(random.Random(1), args.vocabulary)
+    start = time.perf_counter()
+    user_ids = _seed(session, args.pdfs, args.pages, args.words, args.users, vocabulary)
+    size_mb = os.path.getsize(os.path.join(directory, "pdf_fts.db")) / 1024 / 1024
+    print(f"写入 {args.pdfs} 个PDF、{args.pdfs * args.pages} 页（含触发器维护索引）: "
+          f"{time.perf_counter() - start:.1f}s，数据库 {size_mb:.0f}MB")
+
+    backend = search_index_service.backend(session.connection())
+    print(f"全文索引: {backend.dialect}/{backend.tokenizer}，按用户过滤（每个用户约 {args.pdfs // args.users} 个PDF）")
+    # 没有全文索引时的实现：同一方法，backend 固定为 None
+    like_service = SearchIndexService()
+    like_service.backend = lambda connection: None
+    user_id = user_ids[0]
+    print(f"{'查询':<28}{'LIKE':>10}{'FTS5':>10}{'加速':>8}{'命中页':>8}")
+    for label, q in _queries(vocabulary):
+        like_time, _ = _time(lambda: like_service.search_pdf_pages(session, q, user_id, limit=args.limit), args.repeat)
+        fts_time, hits = _time(lambda: search_index_service.search_pdf_pages(session, q, user_id, limit=args.limit),
+                               args.repeat)
+        matches = session.execute(
+            text("SELECT count(*) FROM pdf_pages_fts WHERE pdf_pages_fts MATCH :q"),
+            {"q": backend.match_query(q.split())},
+        ).scalar()
+        print(f"{label + ' ' + q:<28}{like_time * 1000:>8.1f}ms{fts_time * 1000:>8.1f}ms"
+              f"{like_time / fts_time:>7.1f}x{matches:>8}")
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Sci-Hub下载代理基准：整文件缓冲下载 对比 流式代理（首字节时间、并发请求的上游下载次数、缓存命中）
+
+在本地启动一个模拟镜像（论文页面中嵌入PDF链接，PDF按固定速率发送、支持 Range），
+SCIHUB_DOMAINS 指向它；不访问外网。
+- 缓冲: 原实现 download_pdf_async 读完整个PDF后才能返回
+- 流式: SciHubProxy.response 收到上游的第一块数据即可发送
+- 合并: 同一DOI的 N 个并发请求只向上游下载一次
+- 缓存: 下载完成后同一DOI按本地文件发送
+
+运行方式（在 backend 目录下）:
+    python -m benchmarks.scihub_proxy [--size-mb 8] [--rate-mb 20] [--concurrency 10]
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+
+def _stub_server(pdf: bytes, rate: float, counts: dict):
+    """模拟镜像：/<doi> 返回论文页面，/files/<doi>.pdf 按 rate 字节/秒发送PDF"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, content_type, body=b"", headers=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if not self.path.startswith("/files/"):
+                page = f'<html><body><embed id="pdf" src="/files{self.path}.pdf"></body></html>'
+                return self._send(200, "text/html", page.encode())
+            counts[self.path] = counts.get(self.path, 0) + 1
+            start = 0
+            if self.headers.get("Range"):
+                start = int(self.headers["Range"].split("=")[1].split("-")[0])
+            self.send_response(206 if start else 200)
+            if start:
+                self.send_header("Content-Range", f"bytes {start}-{len(pdf) - 1}/{len(pdf)}")
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("ETag", '"stub"')
+            self.send_header("Content-Length", str(len(pdf) - start))
+            self.end_headers()
+            chunk_size = 64 * 1024
+            for position in range(start, len(pdf), chunk_size):
+                self.wfile.write(pdf[position:position + chunk_size])
+                time.sleep(chunk_size / rate)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class _Request:
+    """SciHubProxy.response 只读取请求头"""
+
+    def __init__(self, headers=None):
+        from starlette.datastructures import Headers
+        self.headers = Headers(headers or {})
+
+
+async def _consume(response):
+    """读取流式响应，返回 (首字节时间, 总字节数)"""
+    start = time.perf_counter()
+    first, size = None, 0
+    if hasattr(response, "body_iterator"):
+        async for chunk in response.body_iterator:
+            first = first or time.perf_counter() - start
+            size += len(chunk)
+    else:
+        size = int(response.headers["content-length"])
+        first = time.perf_counter() - start
+    return first, size
+
+
+async def _run(args, base_url: str, counts: dict):
+    from app.services.scihub_service import SciHubService
+    from app.services.scihub_proxy_service import SciHubProxy
+
+    proxy = SciHubProxy(root=tempfile.mkdtemp())
+
+    start = time.perf_counter()
+    content = await SciHubService().download_pdf_async(f"{base_url}/files/10.1000/buffered.pdf")
+    buffered = time.perf_counter() - start
+    print(f"缓冲下载: 首字节 {buffered * 1000:.0f}ms（整个文件 {len(content) / 1024 / 1024:.1f}MB 读完后才能返回）")
+
+    start = time.perf_counter()
+    response = await proxy.response(_Request(), "10.1000/stream", "stream.pdf")
+    headers_at = time.perf_counter() - start
+    first, size = await _consume(response)
+    print(f"流式代理: 响应头 {headers_at * 1000:.0f}ms，首字节 {(headers_at + first) * 1000:.0f}ms，"
+          f"共 {time.perf_counter() - start:.2f}s / {size / 1024 / 1024:.1f}MB")
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[proxy.response(_Request(), "10.1000/shared", "shared.pdf")
+                                       for _ in range(args.concurrency)])
+    sizes = await asyncio.gather(*[_consume(response) for response in responses])
+    print(f"{args.concurrency} 个并发请求同一DOI: {time.perf_counter() - start:.2f}s，"
+          f"上游下载 {counts.get('/files/10.1000/shared.pdf', 0)} 次，每个响应 {sizes[0][1] / 1024 / 1024:.1f}MB")
+
+    start = time.perf_counter()
+    await _consume(await proxy.response(_Request(), "10.1000/shared", "shared.pdf"))
+    print(f"缓存命中: {(time.perf_counter() - start) * 1000:.1f}ms，"
+          f"上游下载仍为 {counts.get('/files/10.1000/shared.pdf', 0)} 次")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sci-Hub下载：缓冲与流式代理对比")
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--rate-mb", type=float, default=20, help="模拟镜像的发送速率（MB/s）")
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    pdf = b"%PDF-1.4\n" + os.urandom(int(args.size_mb * 1024 * 1024))
+    counts: dict = {}
+    server = _stub_server(pdf, args.rate_mb * 1024 * 1024, counts)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    # 在导入应用配置之前指定镜像与缓存目录
+    os.environ["SCIHUB_DOMAINS"] = json.dumps([base_url])
+    os.environ.setdefault("BLOB_DIRECTORY", tempfile.mkdtemp())
+    try:
+        asyncio.run(_run(args, base_url, counts))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ setup(
     install_requires=[
         "fastapi>=0.100.0",
         "uvicorn>=0.22.0",
-        "sqlalchemy>=2.0.0",
+        "sqlalchemy>=2.0.10",
         "pydantic>=2.0.0",
         "python-jose[cryptography]>=3.3.0",
         "passlib[bcrypt]>=1.7.4",